@@ -2,6 +2,7 @@
 echo DERRUBANDO O SISTEMA...
 taskkill /F /IM python.exe
 taskkill /F /IM streamlit.exe
+taskkill /F /IM nginx.exe
 echo.
 echo SISTEMA DESLIGADO COM SUCESSO.
 pause
\ No newline at end of file
@@ -0,0 +1,32 @@
+@echo off
+TITLE SERVIDOR IPAR (CLUSTER)
+cd /d "%~dp0"
+
+REM Quantidade de processos Streamlit (maximo 9). Se mudar aqui,
+REM ajuste tambem a lista "upstream" em deploy\nginx.conf
+set IPAR_WORKERS=4
+
+REM Conexoes diretas que o plano do Supabase aceita (o portal inteiro).
+REM Cada worker fica com (IPAR_MAX_CONEXOES - 10 dos servicos) / IPAR_WORKERS
+set IPAR_MAX_CONEXOES=60
+
+echo INICIANDO %IPAR_WORKERS% WORKERS STREAMLIT...
+for /L %%i in (1,1,%IPAR_WORKERS%) do (
+    start "IPAR WORKER %%i" /MIN cmd /c "set IPAR_WORKER_ID=%%i&& streamlit run main.py --server.address=127.0.0.1 --server.port=851%%i --server.headless=true"
+)
+
+echo INICIANDO SERVICO DE RELATORIOS...
+start "IPAR RELATORIOS" /MIN python ferramentas\servico_relatorios.py
+
+echo INICIANDO API DE INGESTAO (PORTA 8600)...
+start "IPAR INGESTAO" /MIN python ferramentas\servico_ingestao.py
+
+echo INICIANDO BALANCEADOR (NGINX)...
+start "IPAR NGINX" /MIN "%~dp0nginx\nginx.exe" -p "%~dp0nginx" -c "%~dp0deploy\nginx.conf"
+
+echo.
+echo ACESSE PELO TABLET EM:
+ipconfig | findstr "IPv4"
+echo :8501
+echo.
+pause
@@ -6,5 +6,9 @@ echo ACESSE PELO TABLET EM:
 ipconfig | findstr "IPv4"
 echo :8501
 echo.
+REM Servico que monta os relatorios Excel (fila + noturnos)
+start "IPAR RELATORIOS" /MIN python ferramentas\servico_relatorios.py
+REM API de ingestao em lote (CNCs, prensas e scripts), porta 8600
+start "IPAR INGESTAO" /MIN python ferramentas\servico_ingestao.py
 streamlit run main.py --server.address=192.168.0.251
 pause
\ No newline at end of file
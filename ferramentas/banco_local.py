@@ -0,0 +1,216 @@
+# ==============================================================================
+# BANCO LOCAL (SQLITE) PARA TESTES E MEDIÇÕES SEM SUPABASE
+# ==============================================================================
+# Cria o banco local (modules/local.py) com as mesmas tabelas do sistema
+# (modules/esquema.py) e preenche com dados sintéticos: cadastros,
+# apontamentos e paradas de N dias nos três setores. Depois é só apontar o
+# [postgres] do secrets.toml para o arquivo (DB_MOTOR = "sqlite") e rodar o
+# portal, o teste de carga ou o benchmark de leitura.
+#
+# Os DDLs rodam de novo depois da carga: é o que preenche o dicionário de
+# sugestões e o livro-razão do horímetro a partir do histórico (os mesmos
+# passos de migração do Supabase). A estatística de ciclo é reconstruída
+# pelo ciclos.cmds_reconstruir.
+#
+# Uso (na pasta do sistema):
+#   python ferramentas/banco_local.py --dias 365
+#   python ferramentas/banco_local.py --arquivo dados_locais/bench.db --dias 730 --por-dia 40
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pandas as pd  # noqa: E402
+
+import modules.banco as banco  # noqa: E402
+import modules.ciclos as ciclos  # noqa: E402
+import modules.esquema as esquema  # noqa: E402
+
+CLIENTES = ["SCANIA", "MERCEDES", "VOLVO", "IVECO", "MAN", "DAF", "RANDON", "MARCOPOLO"]
+MOTIVOS = ["SETUP", "FALTA DE MATERIAL", "MANUTENÇÃO CORRETIVA", "AJUSTE", "REFEIÇÃO", "FALTA DE OPERADOR"]
+
+
+def _nomes(prefixo, qtd):
+    return [f"{prefixo} {i:02d}" for i in range(1, qtd + 1)]
+
+
+def _turno(rnd, dia):
+    # Início entre 06:00 e 20:00, duração de 30 min a 4 h
+    ini = datetime.combine(dia, datetime.min.time()) + timedelta(minutes=rnd.randrange(360, 1200, 5))
+    fim = ini + timedelta(minutes=rnd.randrange(30, 240, 5))
+    return ini.time(), fim.time()
+
+
+def _pecas(rnd, qtd):
+    return [f"PC-{rnd.randrange(1000, 9999)}" for _ in range(qtd)]
+
+
+def _cadastros(setor, maquinas, operadores):
+    if setor == "usinagem":
+        return [
+            ("INSERT INTO usinagem_maquinas (nome, modelo) VALUES %s", banco.Linhas([(m, "CNC") for m in maquinas])),
+            ("INSERT INTO usinagem_operadores (nome) VALUES %s", banco.Linhas([(o,) for o in operadores])),
+            ("INSERT INTO usinagem_motivos_parada (motivo) VALUES %s", banco.Linhas([(m,) for m in MOTIVOS])),
+        ]
+    if setor == "estamparia":
+        return [
+            ("INSERT INTO estamparia_maquinas (nome) VALUES %s", banco.Linhas([(m,) for m in maquinas])),
+            ("INSERT INTO estamparia_operadores (nome) VALUES %s", banco.Linhas([(o,) for o in operadores])),
+            ("INSERT INTO estamparia_cad_operacoes (nome) VALUES %s",
+             banco.Linhas([(o,) for o in ["CORTE", "DOBRA", "REPUXO", "FURAÇÃO"]])),
+            ("INSERT INTO estamparia_cad_materias (nome) VALUES %s",
+             banco.Linhas([(m,) for m in ["AÇO 1020", "AÇO 1045", "INOX 304"]])),
+            ("INSERT INTO estamparia_cad_paradas (nome) VALUES %s", banco.Linhas([(m,) for m in MOTIVOS])),
+        ]
+    return [
+        ("INSERT INTO furadeira_operadores (nome) VALUES %s", banco.Linhas([(o,) for o in operadores])),
+        ("INSERT INTO furadeira_motivos_parada (motivo) VALUES %s", banco.Linhas([(m,) for m in MOTIVOS])),
+    ]
+
+
+def _movimento(setor, rnd, ini, dias, por_dia, maquinas, operadores):
+    """Apontamentos e paradas sintéticos do setor: (INSERT apontamentos, INSERT paradas)."""
+    pecas = _pecas(rnd, 60)
+    apont, paradas = [], []
+    for d in range(dias):
+        dia = ini + timedelta(days=d)
+        if dia.weekday() == 6:
+            continue
+        for _ in range(por_dia):
+            h_ini, h_fim = _turno(rnd, dia)
+            ciclo = round(rnd.uniform(8, 120), 1)
+            minutos = (datetime.combine(dia, h_fim) - datetime.combine(dia, h_ini)).seconds / 60
+            qtd = max(int(minutos * 60 / ciclo * rnd.uniform(0.6, 1.05)), 1)
+            refugo = rnd.choice([0, 0, 0, 1, 2, 5])
+            peca, cliente, oper = rnd.choice(pecas), rnd.choice(CLIENTES), rnd.choice(operadores)
+            maq = rnd.choice(maquinas)
+            if setor == "usinagem":
+                apont.append((dia, cliente, peca, f"O{rnd.randrange(1000, 9999)}", maq, ciclo, oper,
+                              rnd.choice([0, 0, 15, 30]), h_ini, h_fim, qtd, refugo))
+            elif setor == "estamparia":
+                apont.append((str(dia), cliente, peca, rnd.choice(["CORTE", "DOBRA", "REPUXO"]), "AÇO 1020", maq,
+                              ciclo, oper, rnd.choice([0, 0, 15]), h_ini.strftime("%H:%M"), h_fim.strftime("%H:%M"),
+                              qtd, refugo, int(3600 / ciclo)))
+            else:
+                apont.append((dia, oper, cliente, peca, "FURAR", ciclo, h_ini, h_fim, qtd, refugo,
+                              round(min(qtd * ciclo / 60 / max(minutos, 1) * 100, 150), 1)))
+        for _ in range(max(por_dia // 4, 1)):
+            h_ini, _ = _turno(rnd, dia)
+            h_fim = (datetime.combine(dia, h_ini) + timedelta(minutes=rnd.randrange(5, 90, 5))).time()
+            motivo, maq = rnd.choice(MOTIVOS), rnd.choice(maquinas)
+            if setor == "usinagem":
+                paradas.append((dia, maq, motivo, h_ini, h_fim))
+            elif setor == "estamparia":
+                paradas.append((str(dia), maq, motivo, h_ini.strftime("%H:%M"), h_fim.strftime("%H:%M")))
+            else:
+                paradas.append((dia, motivo, h_ini, h_fim))
+
+    if setor == "usinagem":
+        return [
+            ("""INSERT INTO usinagem_apontamentos (data_registro, cliente, descricao_pc, cod_programa, maquina,
+                tempo_ciclo_seg, operador, setup_min, inicio_prod, fim_prod, qtd_produzida, refugo) VALUES %s""",
+             banco.Linhas(apont)),
+            ("INSERT INTO usinagem_paradas_reg (data_registro, maquina, motivo, inicio, fim) VALUES %s",
+             banco.Linhas(paradas)),
+        ]
+    if setor == "estamparia":
+        return [
+            ("""INSERT INTO estamparia_apontamentos (data, cliente, descricao_pc, operacao, materia_prima, maquina,
+                tempo_ciclo_seg, operador, setup_min, inicio_prod, fim_prod, qtd_produzida, refugo, meta_pc_hora)
+                VALUES %s""", banco.Linhas(apont)),
+            ("INSERT INTO estamparia_paradas_reg (data, maquina, motivo, inicio, fim) VALUES %s",
+             banco.Linhas(paradas)),
+        ]
+    return [
+        ("""INSERT INTO furadeira_apontamentos (data_registro, operador, cliente, peca, tipo_operacao,
+            tempo_ciclo_seg, inicio_prod, fim_prod, qtd_produzida, refugo, eficiencia_calc) VALUES %s""",
+         banco.Linhas(apont)),
+        ("INSERT INTO furadeira_paradas_reg (data_registro, motivo, inicio, fim) VALUES %s", banco.Linhas(paradas)),
+    ]
+
+
+# Histórico para reconstruir a estatística de ciclo: (peca, maquina, operacao, data, ini, fim, setup)
+SQL_HISTORICO_CICLO = {
+    "usinagem": """SELECT descricao_pc AS peca, maquina, cod_programa AS operacao, data_registro AS data,
+                          inicio_prod, fim_prod, setup_min, qtd_produzida, refugo
+                     FROM usinagem_apontamentos WHERE ativo = 1""",
+    "estamparia": """SELECT descricao_pc AS peca, maquina, operacao, data, inicio_prod, fim_prod, setup_min,
+                            qtd_produzida, refugo
+                       FROM estamparia_apontamentos WHERE ativo = 1""",
+    "furadeira": """SELECT peca, '' AS maquina, tipo_operacao AS operacao, data_registro AS data,
+                           inicio_prod, fim_prod, 0 AS setup_min, qtd_produzida, refugo
+                      FROM furadeira_apontamentos WHERE ativo = 1""",
+}
+
+
+def _executar(conn, comandos):
+    with conn.cursor() as cur:
+        for query, params in comandos:
+            banco.executar_comando(cur, query, params)
+    conn.commit()
+
+
+def _ddl(conn, setor):
+    with conn.cursor() as cur:
+        for q in esquema.scripts(setor):
+            cur.execute(q)
+    conn.commit()
+
+
+def _contar(conn, tabela):
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM {tabela}")
+        return cur.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cria e preenche o banco local (SQLite)")
+    parser.add_argument("--arquivo", default=os.path.join("dados_locais", "banco_local.db"))
+    parser.add_argument("--dias", type=int, default=365, help="dias de histórico até hoje")
+    parser.add_argument("--por-dia", type=int, default=20, help="apontamentos por dia em cada setor")
+    parser.add_argument("--maquinas", type=int, default=8)
+    parser.add_argument("--operadores", type=int, default=12)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--apagar", action="store_true", help="apaga o arquivo antes de criar")
+    a = parser.parse_args()
+
+    os.chdir(RAIZ)
+    if a.apagar and os.path.exists(a.arquivo):
+        os.remove(a.arquivo)
+    conn = banco.conectar({"DB_MOTOR": "sqlite", "DB_ARQUIVO": a.arquivo})
+    rnd = random.Random(a.semente)
+    ini = date.today() - timedelta(days=a.dias - 1)
+
+    for setor in esquema.TABELAS:
+        t = time.perf_counter()
+        _ddl(conn, setor)
+        if _contar(conn, f"{setor}_apontamentos"):
+            print(f"{setor:<11}: já tem dados, pulando a carga (use --apagar para recriar)")
+            continue
+        maquinas = _nomes("MAQ", a.maquinas) if setor != "furadeira" else [""]
+        operadores = _nomes("OPERADOR", a.operadores)
+        _executar(conn, _cadastros(setor, maquinas, operadores)
+                  + _movimento(setor, rnd, ini, a.dias, a.por_dia, maquinas, operadores))
+        _ddl(conn, setor)
+
+        with conn.cursor() as cur:
+            cur.execute(SQL_HISTORICO_CICLO[setor])
+            hist = pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
+        hist["ciclo"] = ciclos.ciclo_real_df(hist, "data", "inicio_prod", "fim_prod", "setup_min")
+        _executar(conn, ciclos.cmds_reconstruir(setor, hist[["peca", "maquina", "operacao", "ciclo"]]))
+
+        print(f"{setor:<11}: {_contar(conn, f'{setor}_apontamentos'):>8} apontamentos, "
+              f"{_contar(conn, f'{setor}_paradas_reg'):>7} paradas  ({time.perf_counter() - t:.1f} s)")
+    conn.close()
+    print(f"\nBanco local pronto em {os.path.abspath(a.arquivo)}")
+    print('No .streamlit/secrets.toml: [postgres] DB_MOTOR = "sqlite" e DB_ARQUIVO = "' + a.arquivo + '"')
+
+
+if __name__ == "__main__":
+    main()
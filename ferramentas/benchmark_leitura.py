@@ -0,0 +1,78 @@
+# ==============================================================================
+# COMPARAÇÃO DE LEITURA EM MASSA: pd.read_sql x COPY (banco.ler_copy)
+# ==============================================================================
+# Lê o mesmo resultado pelos dois caminhos e mostra tempo e linhas/segundo.
+# Sem --tabela, usa uma consulta sintética (generate_series) com os tipos
+# de um apontamento: inteiro, data, hora, texto, número e timestamp.
+#
+# Uso (na pasta do sistema, com o .streamlit/secrets.toml configurado):
+#   python ferramentas/benchmark_leitura.py --linhas 10000 100000 500000
+#   python ferramentas/benchmark_leitura.py --tabela usinagem_apontamentos
+
+import argparse
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pandas as pd  # noqa: E402
+
+import modules.banco as banco  # noqa: E402
+from ferramentas.servico_relatorios import ler_credenciais  # noqa: E402
+
+SINTETICA = """
+    SELECT g AS id,
+           (DATE '2026-01-01' + (g %% 365)) AS data_registro,
+           (TIME '06:00' + (g %% 480) * INTERVAL '1 minute') AS hora,
+           'OP-' || (g %% 997) AS op,
+           (g %% 50)::numeric / 3 AS qtd,
+           NULLIF(g %% 7, 0) AS refugo,
+           TIMESTAMP '2026-01-01' + g * INTERVAL '1 second' AS criado_em
+    FROM generate_series(1, %(n)s) AS g
+"""
+
+
+def _medir(conn, ler, repeticoes):
+    melhor, df = None, None
+    for _ in range(repeticoes):
+        t = time.perf_counter()
+        with conn.cursor() as cur:
+            df = ler(cur)
+        conn.rollback()
+        dt = time.perf_counter() - t
+        melhor = dt if melhor is None else min(melhor, dt)
+    return melhor, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pd.read_sql x COPY")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--tabela", help="lê SELECT * da tabela em vez da consulta sintética")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    a = parser.parse_args()
+
+    conn = banco.conectar(ler_credenciais(), options=banco.opcao_tempo_limite("exportacao"))
+    conn.set_session(readonly=True)
+    casos = ([(f"{a.tabela}", f"SELECT * FROM {a.tabela}", None)] if a.tabela
+             else [(f"sintética {n}", SINTETICA, {"n": n}) for n in a.linhas])
+
+    print(f"{'consulta':<28}{'linhas':>10}{'read_sql (s)':>14}{'COPY (s)':>10}{'ganho':>8}")
+    try:
+        for nome, query, params in casos:
+            t_sql, df1 = _medir(conn, lambda cur: pd.read_sql(query, conn, params=params), a.repeticoes)
+            t_copy, df2 = _medir(conn, lambda cur: banco.ler_copy(conn, cur, query, params), a.repeticoes)
+            if len(df1) != len(df2) or list(df1.columns) != list(df2.columns):
+                print(f"  ATENÇÃO: resultados diferentes em {nome}")
+            else:
+                tipos = [f"{c} ({df1[c].dtype} x {df2[c].dtype})" for c in df1.columns if df1[c].dtype != df2[c].dtype]
+                if tipos:
+                    print(f"  ATENÇÃO: tipos diferentes em {nome}: {', '.join(tipos)}")
+            print(f"{nome:<28}{len(df2):>10}{t_sql:>14.2f}{t_copy:>10.2f}{t_sql / t_copy:>7.1f}x")
+    finally:
+        banco.fechar(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+# ==============================================================================
+# COLETOR DE PULSOS DAS MÁQUINAS (CONTADORES DE GOLPE / FIM DE CICLO)
+# ==============================================================================
+# Lê o fluxo de pulsos (arquivo ou socket TCP, uma linha por pulso, formato
+# em modules/pulsos.py), agrega em janelas por máquina e grava apontamentos
+# e paradas candidatas em lote, pelas mesmas regras da ingestão HTTP
+# (ferramentas/servico_ingestao.py, modo parcial: linha rejeitada vai para
+# dados_locais/pulsos_rejeitados_<setor>.csv e o resto é gravado).
+#
+# Três threads ligadas por filas com tamanho máximo:
+#   leitor -> fila de pulsos -> agregador -> fila de lotes -> gravador
+# Se o banco cair (conexão ou tempo limite), o gravador segura o lote e
+# tenta de novo; a fila de lotes enche, o agregador para de consumir, a
+# fila de pulsos enche e o leitor para de ler: no TCP o controlador sente
+# pelo próprio socket (nada se perde), no arquivo a leitura só espera.
+# Outro erro do banco (horário cruzado, valor recusado...) falharia de
+# novo: o lote é regravado linha a linha e só a linha recusada vai para os
+# rejeitados.
+#
+# Uso (na pasta do sistema):
+#   python ferramentas/coletor_pulsos.py --gerar dados_locais/pulsos_teste.jsonl --horas 8 --maquinas 6
+#   python ferramentas/coletor_pulsos.py --setor estamparia --arquivo dados_locais/pulsos_teste.jsonl
+#   python ferramentas/coletor_pulsos.py --setor estamparia --arquivo \\prensa01\contador.log --seguir
+#   python ferramentas/coletor_pulsos.py --setor usinagem --porta 8700
+#
+# Sem --seguir e sem --porta é REPLAY: o arquivo é lido o mais rápido
+# possível e o relógio é o horário dos próprios pulsos (dá para repetir o
+# mesmo fluxo e comparar o resultado). Cada apontamento e parada sai com
+# chave_envio (máquina + início): repetir o replay, ou reenviar um lote
+# depois de queda do banco, não duplica nada (conta em "repetidos").
+
+import argparse
+import csv
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pandas as pd  # noqa: E402
+
+import modules.banco as banco  # noqa: E402
+import modules.ingestao as ingestao  # noqa: E402
+import modules.plantas as plantas  # noqa: E402
+import modules.pulsos as pulsos  # noqa: E402
+from ferramentas.servico_ingestao import gravar  # noqa: E402
+from ferramentas.servico_relatorios import ler_secrets  # noqa: E402
+
+FIM = object()
+
+
+class Estatisticas:
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.valores = {"pulsos": 0, "invalidos": 0, "apontamentos": 0, "paradas": 0,
+                        "gravados": 0, "repetidos": 0, "rejeitados": 0, "falhas_banco": 0}
+
+    def somar(self, chave, n=1):
+        with self.trava:
+            self.valores[chave] += n
+
+    def texto(self, agregador=None):
+        with self.trava:
+            v = dict(self.valores)
+        extra = f", {agregador.atrasados} atrasados, {agregador.pendentes()} abertos" if agregador else ""
+        return ", ".join(f"{v[k]} {k}" for k in v) + extra
+
+
+# ------------------------------------------------------------------------------
+# LEITORES
+# ------------------------------------------------------------------------------
+
+def ler_arquivo(caminho, fila, seguir):
+    with open(caminho, encoding="utf-8") as f:
+        while True:
+            linha = f.readline()
+            if linha:
+                fila.put(linha)
+            elif seguir:
+                time.sleep(0.5)
+            else:
+                break
+    fila.put(FIM)
+
+
+def servidor_tcp(porta, fila):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for linha in self.rfile:
+                # put() bloqueia com a fila cheia: o TCP segura o controlador
+                fila.put(linha.decode("utf-8", errors="replace"))
+
+    class Servidor(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    servidor = Servidor(("0.0.0.0", porta), Handler)
+    threading.Thread(target=servidor.serve_forever, name="pulsos-tcp", daemon=True).start()
+    return servidor
+
+
+# ------------------------------------------------------------------------------
+# GRAVADOR
+# ------------------------------------------------------------------------------
+
+# Erros em que vale esperar e tentar o mesmo lote de novo
+TRANSITORIOS = ("conexao", "tempo")
+
+
+def gravar_por_linha(pool, setor, tipo, df):
+    """
+    Grava uma linha por transação; a que o banco recusa volta com o erro.
+    Banco fora (TRANSITORIOS) interrompe e sobe o erro.
+    """
+    gravados = repetidos = 0
+    ruins = []
+    for i in df.index:
+        try:
+            g, r, rep = gravar(pool, setor, tipo, df.loc[[i]], parcial=True)
+        except Exception as e:
+            if banco.tipo_erro(e) in TRANSITORIOS:
+                raise
+            g, rep, r = 0, 0, df.loc[[i]].assign(erro=banco.mensagem_erro(e, "Erro SQL", "escrita"))
+        gravados += g
+        repetidos += rep
+        ruins.append(r)
+    return gravados, pd.concat(ruins), repetidos
+
+
+def gravador(lotes, pool, setor, est, arquivo_rejeitados):
+    espera = 1
+    while True:
+        item = lotes.get()
+        if item is FIM:
+            return
+        tipo, linhas = item
+        colunas = ingestao.SETORES[setor][tipo]["colunas"]
+        df = pd.DataFrame(linhas, columns=colunas)
+        por_linha = False
+        while True:
+            try:
+                # Nova tentativa é segura: cada linha leva chave_envio (pulsos.para_ingestao)
+                if por_linha:
+                    gravados, ruins, repetidos = gravar_por_linha(pool, setor, tipo, df)
+                else:
+                    gravados, ruins, repetidos = gravar(pool, setor, tipo, df, parcial=True)
+                espera = 1
+                break
+            except Exception as e:
+                if banco.tipo_erro(e) not in TRANSITORIOS:
+                    # Ex.: cruza com o que já está gravado (modo bloquear). De novo
+                    # linha a linha, para só a recusada ir para os rejeitados
+                    print(f"[{datetime.now():%H:%M:%S}] {banco.mensagem_erro(e, 'Erro SQL', 'escrita')} "
+                          f"- gravando {tipo} linha a linha", flush=True)
+                    por_linha = True
+                    continue
+                # Banco fora: segura o lote (a fila enche e freia o resto)
+                est.somar("falhas_banco")
+                print(f"[{datetime.now():%H:%M:%S}] {banco.mensagem_erro(e, 'Erro SQL', 'escrita')} "
+                      f"- nova tentativa em {espera} s", flush=True)
+                time.sleep(espera)
+                espera = min(espera * 2, 60)
+        est.somar("gravados", gravados)
+        est.somar("repetidos", repetidos)
+        if len(ruins):
+            est.somar("rejeitados", len(ruins))
+            novo = not os.path.exists(arquivo_rejeitados)
+            with open(arquivo_rejeitados, "a", newline="", encoding="utf-8") as f:
+                w = csv.writer(f, delimiter=";")
+                if novo:
+                    w.writerow(["tipo"] + colunas + ["erro"])
+                for i in ruins.index:
+                    w.writerow([tipo] + [linhas[i][c] for c in colunas] + [ruins.at[i, "erro"]])
+
+
+# ------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Coletor de pulsos das máquinas")
+    parser.add_argument("--setor", choices=sorted(pulsos.CAMPO_PROGRAMA), default="estamparia")
+    parser.add_argument("--planta", default=plantas.PADRAO)
+    fonte = parser.add_mutually_exclusive_group()
+    fonte.add_argument("--arquivo", help="arquivo de pulsos (replay, ou acompanhando com --seguir)")
+    fonte.add_argument("--porta", type=int, help="recebe pulsos por TCP nesta porta")
+    fonte.add_argument("--gerar", metavar="ARQUIVO", help="só grava um fluxo de teste e sai")
+    parser.add_argument("--seguir", action="store_true", help="continua lendo o que for acrescentado ao arquivo")
+    parser.add_argument("--janela", type=int, default=pulsos.JANELA_MIN, help="minutos por apontamento")
+    parser.add_argument("--limiar", type=int, default=pulsos.LIMIAR_PARADA_MIN, help="minutos sem pulso = parada")
+    parser.add_argument("--parada-max", type=int, default=pulsos.PARADA_MAX_MIN,
+                        help="acima disso sem pulso é máquina desligada (minutos)")
+    parser.add_argument("--motivo", default=pulsos.MOTIVO_PARADA, help="motivo gravado nas paradas detectadas")
+    parser.add_argument("--operador", help="operador quando o pulso não traz")
+    parser.add_argument("--peca", help="peça quando o pulso não traz")
+    parser.add_argument("--intervalo", type=float, default=10, help="segundos entre gravações")
+    parser.add_argument("--fila", type=int, default=20000, help="pulsos em memória antes de frear a leitura")
+    parser.add_argument("--lotes", type=int, default=20, help="lotes esperando o banco antes de frear")
+    parser.add_argument("--horas", type=float, default=8, help="(--gerar) horas de fluxo")
+    parser.add_argument("--maquinas", type=int, default=4, help="(--gerar) máquinas")
+    parser.add_argument("--semente", type=int, default=42, help="(--gerar) mesmo número = mesmo fluxo")
+    a = parser.parse_args()
+
+    os.chdir(RAIZ)
+    if a.gerar:
+        n = 0
+        with open(a.gerar, "w", encoding="utf-8") as f:
+            for linha in pulsos.fluxo_teste(a.maquinas, horas=a.horas, semente=a.semente):
+                f.write(linha + "\n")
+                n += 1
+        print(f"{n} pulsos em {a.gerar}")
+        return
+    if not a.arquivo and not a.porta:
+        parser.error("informe --arquivo, --porta ou --gerar")
+
+    secrets = ler_secrets()
+    banco.configurar(secrets.get("tempo_limite", {}))
+    pool = banco.Conexoes(plantas.credenciais(secrets, a.planta), 1)
+    replay = bool(a.arquivo) and not a.seguir
+
+    agregador = pulsos.Agregador(a.setor, a.janela, a.limiar, a.parada_max, motivo=a.motivo,
+                                 padrao={"operador": a.operador, "peca": a.peca})
+    cfg = ingestao.SETORES[a.setor]
+    est = Estatisticas()
+    fila_pulsos = queue.Queue(maxsize=a.fila)
+    fila_lotes = queue.Queue(maxsize=a.lotes)
+    rejeitados = os.path.join("dados_locais", f"pulsos_rejeitados_{a.setor}.csv")
+    os.makedirs("dados_locais", exist_ok=True)
+
+    t_gravador = threading.Thread(target=gravador, name="pulsos-gravador",
+                                  args=(fila_lotes, pool, a.setor, est, rejeitados))
+    t_gravador.start()
+    if a.arquivo:
+        threading.Thread(target=ler_arquivo, name="pulsos-leitor", daemon=True,
+                         args=(a.arquivo, fila_pulsos, a.seguir)).start()
+    else:
+        servidor_tcp(a.porta, fila_pulsos)
+    print(f"Coletor de pulsos ({a.setor}, janela {a.janela} min, parada > {a.limiar} min): "
+          f"{'replay de ' + a.arquivo if replay else a.arquivo or f'TCP porta {a.porta}'}", flush=True)
+
+    def despachar(tudo=False):
+        agora = agregador.relogio if replay else datetime.now()
+        if agora is None:
+            return
+        aps, pars = agregador.fechar(agora, tudo=tudo)
+        aps, pars = pulsos.para_ingestao(a.setor, aps, pars, cfg["apontamentos"]["colunas"],
+                                         cfg["paradas"]["colunas"], cfg["data"])
+        est.somar("apontamentos", len(aps))
+        est.somar("paradas", len(pars))
+        # put() bloqueia com a fila cheia: o agregador espera o banco
+        if aps:
+            fila_lotes.put(("apontamentos", aps))
+        if pars:
+            fila_lotes.put(("paradas", pars))
+
+    ultimo_envio = ultimo_log = time.monotonic()
+    try:
+        while True:
+            try:
+                linha = fila_pulsos.get(timeout=1)
+            except queue.Empty:
+                linha = None
+            if linha is FIM:
+                break
+            if linha is not None:
+                try:
+                    p = pulsos.ler_pulso(linha)
+                    if p:
+                        agregador.adicionar(p)
+                        est.somar("pulsos")
+                except pulsos.PulsoInvalido as e:
+                    est.somar("invalidos")
+                    if est.valores["invalidos"] <= 10:
+                        print(f"Pulso inválido: {e}", flush=True)
+            if time.monotonic() - ultimo_envio >= a.intervalo:
+                despachar()
+                ultimo_envio = time.monotonic()
+            if not replay and time.monotonic() - ultimo_log >= 60:
+                print(f"[{datetime.now():%H:%M:%S}] {est.texto(agregador)}", flush=True)
+                ultimo_log = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Desligando ou fim do replay: fecha tudo o que está aberto e grava
+        despachar(tudo=True)
+        fila_lotes.put(FIM)
+        t_gravador.join()
+        print(f"Fim: {est.texto(agregador)}", flush=True)
+        if est.valores["rejeitados"]:
+            print(f"Linhas rejeitadas em {rejeitados}")
+
+
+if __name__ == "__main__":
+    main()
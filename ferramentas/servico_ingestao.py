@@ -0,0 +1,200 @@
+# ==============================================================================
+# SERVIÇO DE INGESTÃO (API HTTP PARA SCRIPTS E CONTROLADORES DAS MÁQUINAS)
+# ==============================================================================
+# Fica ligado junto com o sistema (LIGAR_SISTEMA.bat / LIGAR_CLUSTER.bat) e
+# recebe lotes de apontamentos e paradas de qualquer setor. Regras e
+# comandos em modules/ingestao.py (as mesmas da grade do turno).
+#
+#   POST /<setor>/<apontamentos|paradas>[?planta=<id>][&parcial=1]
+#     Authorization: Bearer <token da seção [ingestao] do secrets.toml>
+#     Content-Type: application/json  [{"data_registro": "2026-10-19", "maquina": "CNC-01", ...}, ...]
+#                   text/csv          cabeçalho com os mesmos nomes de coluna
+#
+#   200 {"gravados": n}
+#   422 {"linhas_com_erro": n, "erros": [{"linha": 3, "erro": "..."}, ...]}   nada foi gravado
+#   parcial=1: grava as linhas boas; 200 {"gravados": n, "linhas_com_erro": ..., "erros": [...]}
+#   400 corpo ilegível / colunas desconhecidas, 401 token, 404 destino,
+#   409 chave_envio já usada por outro registro, ou horário cruzado com
+#       o que já está gravado (modules/sobreposicao.py, modo bloquear),
+#   413 lote grande demais,
+#   500 erro do banco no lote (reenviar não resolve: ver o log do serviço),
+#   503 banco fora do ar (pode reenviar)
+#
+# Com a coluna chave_envio (uma por registro, gerada por quem envia) o
+# reenvio é seguro: o que já foi gravado volta em "repetidos", sem erro.
+#
+# Cada requisição roda numa thread, com uma conexão do pool da planta.
+# Lotes do mesmo setor e planta entram em fila no banco (trava por setor):
+# a conferência de sobreposição vê o que o lote anterior acabou de gravar.
+#
+# Uso (na pasta do sistema):
+#   python ferramentas/servico_ingestao.py --porta 8600 --conexoes 4
+
+import argparse
+import hmac
+import json
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pandas as pd  # noqa: E402
+
+import modules.banco as banco  # noqa: E402
+import modules.horimetro as horimetro  # noqa: E402
+import modules.ingestao as ingestao  # noqa: E402
+import modules.plantas as plantas  # noqa: E402
+from ferramentas.servico_relatorios import ler_secrets  # noqa: E402
+
+# Corpo maior que isso nem é lido (~20 mil linhas de CSV cabem folgado)
+MAX_BYTES = 8 * 1024 * 1024
+
+
+def gravar(pool, setor, tipo, df, parcial=False):
+    """
+    Valida e grava o lote numa transação. Devolve (gravados, linhas com
+    erro, repetidos). Sem 'parcial', qualquer erro cancela o lote inteiro;
+    com ele as linhas boas são gravadas e só as ruins voltam. Linhas com
+    chave_envio já gravada são puladas (reenvio) e só contadas.
+    """
+    def acao(conn, cur):
+        # Um lote por vez no setor: sobreposição e horímetro veem o lote anterior
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"ingestao:{setor}",))
+        periodo = ingestao.intervalo(df, setor)
+        # Reenvio (mesma chave_envio) sai antes da validação: não é erro nem sobreposição
+        gravadas = set()
+        if periodo and df["chave_envio"].ne("").any():
+            cur.execute(ingestao.sql_chaves(setor, tipo), periodo)
+            gravadas = {r[0] for r in cur.fetchall()}
+        repetidos = ingestao.repetidos(df, gravadas)
+        novos = df[~repetidos]
+        if novos.empty:
+            conn.rollback()
+            return 0, novos.assign(erro=""), int(repetidos.sum())
+
+        cadastros = ingestao.ler_cadastros(cur, setor)
+        existentes = None
+        if tipo == "apontamentos" and periodo:
+            cur.execute(ingestao.sql_existentes(setor), periodo)
+            existentes = pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
+
+        validado = ingestao.validar(novos, setor, tipo, cadastros, existentes)
+        ruins = validado[validado["erro"] != ""]
+        bons = validado[validado["erro"] == ""]
+        if bons.empty or (len(ruins) and not parcial):
+            conn.rollback()
+            return 0, ruins, int(repetidos.sum())
+
+        comandos, maquinas = ingestao.comandos(bons, setor, tipo)
+        for query, params in comandos:
+            banco.executar_comando(cur, query, params)
+        conn.commit()
+        if maquinas:
+            for query, params in [c for m in maquinas for c in horimetro.cmds_snapshot(setor, m)]:
+                banco.executar_comando(cur, query, params)
+            conn.commit()
+        return len(bons), ruins, int(repetidos.sum())
+    return pool.executar(acao)
+
+
+def criar_handler(pools, token):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _responder(self, status, corpo):
+            dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            # Teste de vida (monitoramento)
+            if urlparse(self.path).path == "/saude":
+                self._responder(200, {"ok": True, "plantas": list(pools)})
+            else:
+                self._responder(404, {"erro": "use POST /<setor>/<apontamentos|paradas>"})
+
+        def do_POST(self):
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            if tamanho > MAX_BYTES:
+                self.close_connection = True
+                return self._responder(413, {"erro": f"lote acima de {MAX_BYTES // (1024 * 1024)} MB"})
+            corpo = self.rfile.read(tamanho)
+
+            recebido = self.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            if not hmac.compare_digest(recebido.encode(), token.encode()):
+                return self._responder(401, {"erro": "token inválido"})
+
+            url = urlparse(self.path)
+            partes = [p for p in url.path.split("/") if p]
+            query = parse_qs(url.query)
+            planta = query.get("planta", [plantas.PADRAO])[0]
+            parcial = query.get("parcial", ["0"])[0] == "1"
+            if len(partes) != 2 or planta not in pools:
+                return self._responder(404, {"erro": "use POST /<setor>/<apontamentos|paradas>[?planta=<id>]"})
+            setor, tipo = partes
+
+            formato = "csv" if "csv" in self.headers.get("Content-Type", "") else "json"
+            t = time.perf_counter()
+            try:
+                df = ingestao.ler(corpo, formato, setor, tipo)
+            except ingestao.LoteInvalido as e:
+                return self._responder(400, {"erro": str(e)})
+            if df.empty:
+                return self._responder(200, {"gravados": 0})
+            try:
+                gravados, ruins, repetidos = gravar(pools[planta], setor, tipo, df, parcial)
+            except Exception as e:
+                if banco.tipo_erro(e) == "duplicado":
+                    return self._responder(409, {"erro": f"chave_envio já usada por outro registro: {e}"})
+                if banco.tipo_erro(e) == "sobreposicao":
+                    return self._responder(409, {"erro": banco.mensagem_erro(e, "Erro SQL", "escrita")})
+                self.log_message("%s", banco.mensagem_erro(e, "Erro SQL", "escrita"))
+                # Só a queda da conexão pede reenvio; o resto falharia de novo
+                status = 503 if banco.tipo_erro(e) == "conexao" else 500
+                return self._responder(status, {"erro": banco.mensagem_erro(e, "Erro SQL", "escrita")})
+            total, erros = ingestao.erros(ruins)
+            if total and not gravados:
+                return self._responder(422, {"linhas_com_erro": total, "erros": erros})
+            self.log_message("%s/%s [%s]: %d registros (%d repetidos) em %.2f s", setor, tipo, planta, gravados,
+                             repetidos, time.perf_counter() - t)
+            resposta = {"gravados": gravados}
+            if repetidos:
+                resposta["repetidos"] = repetidos
+            if total:
+                resposta.update(linhas_com_erro=total, erros=erros)
+            self._responder(200, resposta)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API de ingestão em lote do Portal IPAR")
+    parser.add_argument("--endereco", default="0.0.0.0")
+    parser.add_argument("--porta", type=int, default=8600)
+    parser.add_argument("--conexoes", type=int, default=4, help="conexões de escrita por planta")
+    a = parser.parse_args()
+
+    os.chdir(RAIZ)
+    secrets = ler_secrets()
+    token = str(secrets.get("ingestao", {}).get("token", ""))
+    if not token:
+        sys.exit('Configure o token em .streamlit/secrets.toml:\n[ingestao]\ntoken = "..."')
+    banco.configurar(secrets.get("tempo_limite", {}))
+    pools = {p: banco.Conexoes(cfg["credenciais"], a.conexoes) for p, cfg in plantas.configuradas(secrets).items()}
+
+    servidor = ThreadingHTTPServer((a.endereco, a.porta), criar_handler(pools, token))
+    servidor.daemon_threads = True
+    print(f"Serviço de ingestão em http://{a.endereco}:{a.porta} ({len(pools)} planta(s), "
+          f"{a.conexoes} conexões por planta)")
+    servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# ==============================================================================
+# SERVIÇO DE RELATÓRIOS (RODA FORA DO STREAMLIT)
+# ==============================================================================
+# Fica ligado junto com o sistema (LIGAR_SISTEMA.bat / LIGAR_CLUSTER.bat).
+# A cada poucos segundos:
+#   - agenda os relatórios noturnos (dia anterior e mês até ontem)
+#   - pega os pedidos da fila e monta os .xlsx num pool de processos
+#   - apaga arquivos antigos
+# Ver modules/relatorios.py.
+#
+# Com várias plantas (modules/plantas.py), cada planta usa no máximo
+# --por-planta processos do pool (padrão: processos / nº de plantas).
+#
+# Uso (na pasta do sistema):
+#   python ferramentas/servico_relatorios.py --processos 2 --hora-noturna 2
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import modules.plantas as plantas  # noqa: E402
+import modules.relatorios as relatorios  # noqa: E402
+
+
+def ler_secrets():
+    """O .streamlit/secrets.toml do app."""
+    caminho = os.path.join(RAIZ, ".streamlit", "secrets.toml")
+    try:
+        import tomllib
+        with open(caminho, "rb") as f:
+            return tomllib.load(f)
+    except ImportError:
+        import toml
+        return toml.load(caminho)
+
+
+def ler_credenciais():
+    """Mesmas credenciais do app: seção [postgres] do .streamlit/secrets.toml."""
+    return dict(ler_secrets()["postgres"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço de relatórios do Portal IPAR")
+    parser.add_argument("--processos", type=int, default=2)
+    parser.add_argument("--hora-noturna", type=int, default=2, help="hora (0-23) dos relatórios noturnos")
+    parser.add_argument("--intervalo", type=float, default=2.0)
+    parser.add_argument("--por-planta", type=int, help="máximo de relatórios simultâneos de uma planta")
+    a = parser.parse_args()
+
+    os.chdir(RAIZ)
+    config = plantas.configuradas(ler_secrets())
+    credenciais = {p: cfg["credenciais"] for p, cfg in config.items()}
+    por_planta = a.por_planta or max(1, a.processos // len(config))
+    relatorios.retomar_interrompidos()
+    print(f"Serviço de relatórios: {a.processos} processos ({por_planta} por planta, {len(config)} planta(s)), "
+          f"noturnos às {a.hora_noturna}h")
+
+    pool = ProcessPoolExecutor(max_workers=a.processos)
+    rodando = {}
+    ultima_limpeza = 0
+    while True:
+        if relatorios.agendar_noturnos(a.hora_noturna, plantas=list(config)):
+            print("Relatórios noturnos na fila")
+
+        for futuro in [f for f in rodando if f.done()]:
+            pedido_id = rodando.pop(futuro)
+            try:
+                futuro.result()
+            except Exception as e:
+                # Processo do pool morreu no meio (gerar() já trata os erros comuns)
+                relatorios.concluir(pedido_id, erro=f"Erro: {e}")
+
+        for pedido_id in relatorios.pegar_proximos(a.processos - len(rodando), por_planta):
+            try:
+                rodando[pool.submit(relatorios.gerar, pedido_id, credenciais)] = pedido_id
+            except BrokenProcessPool:
+                # Pool quebrado (processo morto pelo Windows, falta de memória): recria
+                relatorios.retomar_interrompidos()
+                pool = ProcessPoolExecutor(max_workers=a.processos)
+                rodando.clear()
+                break
+
+        if time.time() - ultima_limpeza > 3600:
+            relatorios.limpar_antigos()
+            ultima_limpeza = time.time()
+
+        time.sleep(a.intervalo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# ==============================================================================
+# TESTE DE CARGA LOCAL (1 PROCESSO x VÁRIOS WORKERS)
+# ==============================================================================
+# Simula a troca de turno: vários tablets executando o app ao mesmo tempo.
+# Cada "tablet" é um AppTest do Streamlit que roda o main.py inteiro
+# (login já feito) várias vezes seguidas. Mede execuções por segundo:
+#
+#   - modo 1 worker : todos os tablets num processo só
+#   - modo N workers: tablets divididos entre N processos (como no cluster)
+#
+# Num processo os tablets se revezam (um script por vez): é o que o GIL
+# deixa fazer com execuções que são quase só Python, e o AppTest não roda
+# em threads (o Runtime do Streamlit é global). Cada processo faz uma
+# execução de aquecimento (imports, caches) fora da medição.
+#
+# Uso (na pasta do sistema, com o .streamlit/secrets.toml configurado):
+#   python ferramentas/teste_carga.py --workers 4 --tablets 16 --reruns 10
+
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _tablet(usuario):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(RAIZ, "main.py"), default_timeout=60)
+    at.session_state["logado"] = True
+    at.session_state["usuario"] = usuario
+    return at
+
+
+def _grupo_de_tablets(args):
+    """Um processo (worker) atendendo vários tablets. Devolve (execuções, segundos)."""
+    tablets, usuario, reruns = args
+    os.chdir(RAIZ)
+    sys.path.insert(0, RAIZ)
+    apps = [_tablet(usuario) for _ in range(tablets)]
+    _tablet(usuario).run()
+    inicio = time.perf_counter()
+    for _ in range(reruns):
+        for at in apps:
+            at.run()
+    return tablets * reruns, time.perf_counter() - inicio
+
+
+def medir(workers, tablets, usuario, reruns):
+    # Sempre em processos novos: o AppTest troca o __main__ de quem o roda
+    divisao = [tablets // workers + (1 if i < tablets % workers else 0) for i in range(workers)]
+    with Pool(workers) as pool:
+        grupos = pool.map(_grupo_de_tablets, [(n, usuario, reruns) for n in divisao if n])
+    # Os processos medem juntos: vale o mais lento
+    return sum(n for n, _ in grupos) / max(s for _, s in grupos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga local do Portal IPAR")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--tablets", type=int, default=16)
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--usuario", default="lider_estamparia")
+    a = parser.parse_args()
+
+    base = medir(1, a.tablets, a.usuario, a.reruns)
+    print(f"1 worker : {base:8.1f} execuções/s")
+    escala = medir(a.workers, a.tablets, a.usuario, a.reruns)
+    print(f"{a.workers} workers: {escala:8.1f} execuções/s  ({escala / base:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
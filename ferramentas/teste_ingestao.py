@@ -0,0 +1,85 @@
+# ==============================================================================
+# VAZÃO DA INGESTÃO (ler + validar + gravar um lote, sem o HTTP)
+# ==============================================================================
+# Gera lotes sintéticos de apontamentos da usinagem (20 máquinas, 10 min por
+# linha, sem horário cruzado) em CSV e mede ingestao.ler +
+# servico_ingestao.gravar, e depois o reenvio do mesmo lote (só chave_envio).
+# Cada tamanho roda num banco local novo (SQLite, pasta temporária): mede o
+# código do serviço, não a rede nem o Postgres. Os números do Supabase saem
+# rodando o serviço de verdade com o coletor ou um script das máquinas.
+#
+# Uso (na pasta do sistema):
+#   python ferramentas/teste_ingestao.py --linhas 1000 5000 20000
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import modules.banco as banco  # noqa: E402
+import modules.esquema as esquema  # noqa: E402
+import modules.ingestao as ingestao  # noqa: E402
+from ferramentas import servico_ingestao  # noqa: E402
+
+MAQUINAS = [f"CNC-{i:02d}" for i in range(1, 21)]
+CABECALHO = ("chave_envio,data_registro,maquina,operador,descricao_pc,tempo_ciclo_seg,"
+             "inicio_prod,fim_prod,qtd_produzida,refugo")
+
+
+def lote_csv(n):
+    linhas = [CABECALHO]
+    inicio = datetime.combine(date(2026, 3, 2), datetime.min.time())
+    for i in range(n):
+        maquina = MAQUINAS[i % len(MAQUINAS)]
+        ini = inicio + timedelta(minutes=10 * (i // len(MAQUINAS)))
+        fim = ini + timedelta(minutes=10)
+        linhas.append(f"{maquina}:{ini:%Y-%m-%d %H:%M},{ini:%Y-%m-%d},{maquina},ANA,PC-{i % 37},12,"
+                      f"{ini:%H:%M},{fim:%H:%M},50,{i % 3}")
+    return "\n".join(linhas).encode("utf-8")
+
+
+def banco_novo(pasta, n):
+    pool = banco.Conexoes({"DB_MOTOR": "sqlite", "DB_ARQUIVO": os.path.join(pasta, f"ingestao_{n}.db")}, 1)
+
+    def criar(conn, cur):
+        for q in esquema.scripts("usinagem"):
+            cur.execute(q)
+        cur.execute_values("INSERT INTO usinagem_maquinas (nome) VALUES %s", [(m,) for m in MAQUINAS])
+        cur.execute("INSERT INTO usinagem_operadores (nome) VALUES ('Ana')")
+        conn.commit()
+    pool.executar(criar)
+    return pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="vazão da ingestão no banco local")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1000, 5000, 20000])
+    a = parser.parse_args()
+
+    print(f"{'linhas':>8}{'gravar (s)':>12}{'linhas/s':>10}{'reenvio (s)':>13}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for n in a.linhas:
+            pool = banco_novo(pasta, n)
+            corpo = lote_csv(n)
+            t = time.perf_counter()
+            gravados, ruins, _ = servico_ingestao.gravar(
+                pool, "usinagem", "apontamentos", ingestao.ler(corpo, "csv", "usinagem", "apontamentos"))
+            t_gravar = time.perf_counter() - t
+            if gravados != n:
+                print(f"  ATENÇÃO: {gravados} de {n} gravadas; primeiro erro: {ruins['erro'].iloc[0]}")
+            t = time.perf_counter()
+            _, _, repetidos = servico_ingestao.gravar(
+                pool, "usinagem", "apontamentos", ingestao.ler(corpo, "csv", "usinagem", "apontamentos"))
+            t_reenvio = time.perf_counter() - t
+            if repetidos != n:
+                print(f"  ATENÇÃO: reenvio pulou {repetidos} de {n}")
+            print(f"{n:>8}{t_gravar:>12.2f}{n / t_gravar:>10.0f}{t_reenvio:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
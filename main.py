@@ -1,7 +1,13 @@
 import streamlit as st
+from collections import deque
+from contextlib import nullcontext
 import modules.usinagem as usinagem
 import modules.estamparia as estamparia
 import modules.furadeiras as furadeiras
+import modules.cluster as cluster
+import modules.plantas as plantas
+import modules.corporativo as corporativo
+import modules.perfil as perfil
 
 # Configuração da Página
 st.set_page_config(page_title="Portal IPAR", page_icon="🏭", layout="wide")
@@ -19,9 +25,30 @@ PERMISSOES = {
     "lider_usinagem": ["Usinagem (CNC)"],
     "lider_estamparia": ["Estamparia (Prensas)"],
     "lider_furadeira": ["Furadeiras / Acabamento"],
-    "admin": ["Usinagem (CNC)", "Estamparia (Prensas)", "Furadeiras / Acabamento"] # Admin vê tudo
+    "admin": ["Usinagem (CNC)", "Estamparia (Prensas)", "Furadeiras / Acabamento", "Visão Corporativa",
+              "Ordens de Produção"] # Admin vê tudo
 }
 
+# Plantas (unidades) de cada usuário: ids da seção [plantas] do secrets.toml
+# (ver modules/plantas.py). "*" = todas. Quem não está aqui fica na planta padrão.
+# Com mais de uma, a planta é escolhida na barra lateral.
+PLANTAS = {
+    "admin": ["*"],
+}
+
+# Quem pode ligar o perfil de execução (modules/perfil.py)
+PERFIL = ["admin"]
+
+# Cookie com o token de login: fica no navegador, fora da URL e do histórico
+COOKIE_SESSAO = "ipar_sessao"
+
+def plantas_do_usuario(user):
+    configuradas = list(plantas.configuradas(st.secrets))
+    lista = PLANTAS.get(user, [plantas.PADRAO])
+    if "*" in lista:
+        return configuradas
+    return [p for p in lista if p in configuradas]
+
 def check_login(user, password):
     return USUARIOS.get(user) == password
 
@@ -36,12 +63,74 @@ def login_screen():
                 if check_login(user, password):
                     st.session_state['usuario'] = user
                     st.session_state['logado'] = True
+                    # Sessão gravada no servidor: vale em qualquer worker do cluster
+                    token = cluster.criar_sessao(user)
+                    st.session_state['token_sessao'] = token
+                    st.session_state['cookie_sessao'] = token
                     st.rerun()
                 else:
                     st.error("Acesso Negado.")
 
+def gravar_cookie():
+    # Grava (ou apaga, token vazio) o cookie pedido no login/saída. O script
+    # roda na página e o cookie vai junto quando o navegador reconecta,
+    # em qualquer worker (st.context.cookies)
+    if 'cookie_sessao' not in st.session_state:
+        return
+    token = st.session_state.pop('cookie_sessao')
+    validade = int(cluster.VALIDADE_SESSAO.total_seconds()) if token else 0
+    st.html(f"<script>document.cookie = '{COOKIE_SESSAO}={token}; path=/; max-age={validade}; SameSite=Strict';</script>",
+            unsafe_allow_javascript=True)
+
+def restaurar_sessao():
+    # Tablet reconectou (ou caiu em outro worker): recupera o login pelo cookie
+    if "sessao" in st.query_params:
+        # Link antigo com o token na URL: não vale mais, só sai da barra de endereço
+        del st.query_params["sessao"]
+    token = st.context.cookies.get(COOKIE_SESSAO)
+    usuario = cluster.validar_sessao(token)
+    if usuario:
+        st.session_state['usuario'] = usuario
+        st.session_state['logado'] = True
+        st.session_state['token_sessao'] = token
+
+def painel_perfil(perfis):
+    # Execução que acabou de rodar (medida) + as anteriores guardadas na sessão
+    if not perfis:
+        return
+    p = perfis[-1]
+    consultas = p.tabela_consultas()
+    st.divider()
+    with st.expander("⏱️ Perfil desta execução", expanded=True):
+        k1, k2, k3 = st.columns(3)
+        k1.metric("Tempo da tela", f"{p.segundos:.2f} s")
+        k2.metric("SQL (soma)", f"{p.sql_segundos():.2f} s")
+        k3.metric("Comandos SQL", len(p.consultas))
+        t1, t2, t3, t4 = st.tabs(["Camadas", "Funções do portal", "Consultas", f"Últimas {len(perfis)}"])
+        with t1:
+            if p.prof is None:
+                st.caption("Sem cProfile nesta execução (outro perfil em andamento no servidor).")
+            st.dataframe(p.camadas, hide_index=True, use_container_width=True,
+                         column_config={"segundos": st.column_config.NumberColumn("Segundos (tempo próprio)", format="%.3f"),
+                                        "pct": st.column_config.NumberColumn("%", format="%.1f")})
+        with t2:
+            st.dataframe(p.funcoes, hide_index=True, use_container_width=True,
+                         column_config={"acumulado_s": st.column_config.NumberColumn("Acumulado (s)", format="%.3f"),
+                                        "proprio_s": st.column_config.NumberColumn("Próprio (s)", format="%.3f")})
+        with t3:
+            st.dataframe(consultas, hide_index=True, use_container_width=True,
+                         column_config={"total_s": st.column_config.NumberColumn("Total (s)", format="%.3f"),
+                                        "max_s": st.column_config.NumberColumn("Máx (s)", format="%.3f")})
+        with t4:
+            st.dataframe(perfil.historico(perfis), hide_index=True, use_container_width=True)
+            st.download_button("⬇️ Baixar perfis (.zip: .prof para snakeviz / pstats e CSV das consultas)",
+                               perfil.zip_perfis(perfis), "perfis_portal.zip", "application/zip",
+                               on_click="ignore", key="perfil_zip")
+
 def main():
     if 'logado' not in st.session_state: st.session_state['logado'] = False
+    if not st.session_state['logado']: restaurar_sessao()
+    gravar_cookie()
 
     if not st.session_state['logado']:
         login_screen()
@@ -51,12 +140,28 @@ def main():
         st.sidebar.markdown(f"👤 **{usuario_atual.upper()}**")
         
         if st.sidebar.button("Sair"):
+            cluster.encerrar_sessao(st.session_state.get('token_sessao'))
+            st.session_state['cookie_sessao'] = ""
             st.session_state['logado'] = False
             st.rerun()
 
         st.sidebar.divider()
         st.sidebar.title("Navegação")
         
+        # Planta do usuário: conexões, espelho e caches dos setores seguem esta escolha
+        minhas_plantas = plantas_do_usuario(usuario_atual)
+        if not minhas_plantas:
+            st.error("Seu usuário não tem planta configurada.")
+            return
+        if len(minhas_plantas) > 1:
+            if st.session_state.get('planta') not in minhas_plantas:
+                st.session_state['planta'] = minhas_plantas[0]
+            st.sidebar.selectbox("Planta:", minhas_plantas, key="planta",
+                                 format_func=lambda p: plantas.nome(st.secrets, p))
+        else:
+            st.session_state['planta'] = minhas_plantas[0]
+            st.sidebar.markdown(f"🏭 **{plantas.nome(st.secrets, minhas_plantas[0])}**")
+
         # Filtra o menu baseado no usuário
         opcoes_validas = PERMISSOES.get(usuario_atual, [])
         if not opcoes_validas:
@@ -70,13 +175,28 @@ def main():
             menu = opcoes_validas[0] # Seleciona o único disponível
             st.sidebar.markdown(f"📍 **{menu}**")
 
+        # Perfil de execução (só quem está em PERFIL; desligado não mede nada)
+        medindo = False
+        if usuario_atual in PERFIL:
+            st.sidebar.divider()
+            medindo = st.sidebar.toggle("⏱️ Perfil de execução", key="perfil_ligado",
+                                        help="Mede cada execução desta tela: SQL, pandas, gráficos e Streamlit.")
+        perfis = st.session_state.setdefault("perfis", deque(maxlen=perfil.MAX_PERFIS))
+
         # Roteador de Módulos
-        if menu == "Usinagem (CNC)":
-            usinagem.render_app()
-        elif menu == "Estamparia (Prensas)":
-            estamparia.render_app()
-        elif menu == "Furadeiras / Acabamento":
-            furadeiras.render_app()
+        with perfil.medir(menu, perfis) if medindo else nullcontext():
+            if menu == "Usinagem (CNC)":
+                usinagem.render_app()
+            elif menu == "Estamparia (Prensas)":
+                estamparia.render_app()
+            elif menu == "Furadeiras / Acabamento":
+                furadeiras.render_app()
+            elif menu == "Visão Corporativa":
+                corporativo.render_app(plantas_do_usuario(usuario_atual))
+            elif menu == "Ordens de Produção":
+                corporativo.render_ordens(plantas_do_usuario(usuario_atual))
+        if medindo:
+            painel_perfil(perfis)
 
 if __name__ == "__main__":
     main()
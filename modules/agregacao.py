@@ -0,0 +1,124 @@
+# ==============================================================================
+# TOTAIS DE PERÍODO EM BLOCOS (MEMÓRIA CONSTANTE)
+# ==============================================================================
+# O painel normal lê todos os apontamentos do período num DataFrame: com
+# "De:"/"Até:" de alguns anos a memória do servidor cresce junto. Para
+# períodos longos, lemos em blocos de TAMANHO_BLOCO linhas (cursor do lado
+# do servidor, ver banco.ler_em_blocos) e cada bloco é somado nos totais e
+# descartado:
+#
+#   - PRODUÇÃO por máquina x operador: peças boas, refugo, minutos teóricos
+#     e minutos reais
+#   - PARADAS por máquina: minutos parados
+#
+# O tamanho dos totais depende de quantas máquinas e operadores existem,
+# não do período. As contas por linha são as mesmas do painel normal
+# (preparar_producao / preparar_paradas), então os números batem.
+
+import pandas as pd
+
+import modules.lote as lote
+
+# Linhas por bloco lido do banco
+TAMANHO_BLOCO = 50000
+
+# Períodos maiores que isso (dias) vão pelos totais em blocos
+DIAS_EM_MEMORIA = 92
+
+COLUNAS_PRODUCAO = ["qtd_produzida", "refugo", "tempo_teorico_min", "tempo_real_min"]
+CHAVES_PRODUCAO = ["maquina", "operador"]
+
+
+def _intervalo(df, col_data, col_ini, col_fim):
+    # Início/fim com a data do registro; fim menor que início = virou o dia.
+    # Horário validado linha a linha, como no trigger: 'HH:MM' e 'HH:MM:SS'
+    # podem vir misturados na mesma coluna (texto da estamparia)
+    dia = pd.to_datetime(df[col_data].astype(str).str.slice(0, 10), errors="coerce")
+    ini = dia + lote._hora(df[col_ini])
+    fim = dia + lote._hora(df[col_fim])
+    fim = fim.where(~(fim < ini), fim + pd.Timedelta(days=1))
+    return ini, fim
+
+
+def preparar_producao(df, col_data="data"):
+    """
+    Acrescenta dt_ini, dt_fim, tempo_real_min e tempo_teorico_min aos
+    apontamentos. Os minutos vêm de min_real/min_teorico, gravados pelo
+    banco (modules/metricas.py), quando a consulta os traz.
+    """
+    for c in ["qtd_produzida", "refugo", "tempo_ciclo_seg"]:
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+    df['dt_ini'], df['dt_fim'] = _intervalo(df, col_data, 'inicio_prod', 'fim_prod')
+    if 'min_real' in df:
+        df['tempo_real_min'] = pd.to_numeric(df['min_real'], errors="coerce")
+        df['tempo_teorico_min'] = pd.to_numeric(df['min_teorico'], errors="coerce")
+    else:
+        df['tempo_real_min'] = (df['dt_fim'] - df['dt_ini']).dt.total_seconds() / 60
+        df['tempo_teorico_min'] = ((df['qtd_produzida'] + df['refugo']) * df['tempo_ciclo_seg']) / 60
+    return df
+
+
+def preparar_paradas(df, col_data="data"):
+    """Acrescenta dt_ini, dt_fim e tempo_parado_min (de min_parada, se vier) às paradas."""
+    df['dt_ini'], df['dt_fim'] = _intervalo(df, col_data, 'inicio', 'fim')
+    if 'min_parada' in df:
+        df['tempo_parado_min'] = pd.to_numeric(df['min_parada'], errors="coerce")
+    else:
+        df['tempo_parado_min'] = (df['dt_fim'] - df['dt_ini']).dt.total_seconds() / 60
+    return df
+
+
+def somar_producao(df):
+    """Totais de produção de um bloco (já preparado) por máquina x operador."""
+    return df.groupby(CHAVES_PRODUCAO, dropna=False)[COLUNAS_PRODUCAO].sum()
+
+
+def somar_paradas(df):
+    """Minutos parados de um bloco (já preparado) por máquina."""
+    return df.groupby("maquina", dropna=False)[["tempo_parado_min"]].sum()
+
+
+def acumular(total, parcial):
+    """Soma os totais de um bloco aos acumulados (None = nada ainda)."""
+    if total is None:
+        return parcial
+    niveis = list(range(parcial.index.nlevels))
+    return pd.concat([total, parcial]).groupby(level=niveis, dropna=False).sum()
+
+
+def totais_producao(blocos, col_data="data"):
+    """Percorre os blocos de apontamentos e devolve (totais, nº de linhas lidas)."""
+    total, linhas = None, 0
+    for bloco in blocos:
+        total = acumular(total, somar_producao(preparar_producao(bloco, col_data)))
+        linhas += len(bloco)
+    vazio = pd.DataFrame(columns=CHAVES_PRODUCAO + COLUNAS_PRODUCAO).set_index(CHAVES_PRODUCAO)
+    return (vazio if total is None else total), linhas
+
+
+def totais_paradas(blocos, col_data="data"):
+    total = None
+    for bloco in blocos:
+        total = acumular(total, somar_paradas(preparar_paradas(bloco, col_data)))
+    return pd.DataFrame(columns=["tempo_parado_min"]) if total is None else total
+
+
+def indicadores(prod, paradas):
+    """
+    Disponibilidade, performance, qualidade e OEE (%) a partir dos totais.
+    Mesma conta do painel: performance limitada a 100%.
+    """
+    tempo_prod = prod['tempo_real_min'].sum()
+    tempo_parado = paradas['tempo_parado_min'].sum() if not paradas.empty else 0
+    tempo_disp = tempo_prod + tempo_parado
+    boas, refugo = prod['qtd_produzida'].sum(), prod['refugo'].sum()
+    total_pcs = boas + refugo
+
+    disp = (tempo_prod / tempo_disp * 100) if tempo_disp > 0 else 0
+    perf = min((prod['tempo_teorico_min'].sum() / tempo_prod * 100) if tempo_prod > 0 else 0, 100)
+    qual = (boas / total_pcs * 100) if total_pcs > 0 else 0
+    return {
+        "disponibilidade": disp, "performance": perf, "qualidade": qual,
+        "oee": (disp / 100) * (perf / 100) * (qual / 100) * 100,
+        "total_pcs": total_pcs, "refugo": refugo,
+    }
@@ -0,0 +1,637 @@
+# ==============================================================================
+# CONEXÃO COM O POSTGRES: TEMPO LIMITE, RECONEXÃO E CANCELAMENTO
+# ==============================================================================
+# Cada setor continua com a sua conexão cacheada (init_connection), mas passa
+# a executar tudo por aqui:
+#
+#   - TEMPO LIMITE por classe de consulta ('SET LOCAL statement_timeout'):
+#     busca de formulário curta, dashboard médio, exportação longa.
+#   - KEEPALIVE TCP na conexão, para o Windows perceber link morto.
+#   - PRE-PING: conexão parada há mais de INTERVALO_PING segundos é testada
+#     com 'SELECT 1' antes de usar; morta -> reconecta sem erro na tela.
+#     Leitura que cai no meio é repetida uma vez na conexão nova (escrita
+#     só se tiver chave de envio, ver modules/envio.py).
+#   - PARALELO: consultas independentes de uma tela vão juntas, cada uma
+#     numa conexão do pool de leitura da planta (paralelo, leitores).
+#   - CANCELAMENTO: se o usuário clicar em outra coisa (o Streamlit pede para
+#     parar/reexecutar o script), a consulta em andamento é cancelada no
+#     servidor em vez de prender o tablet até terminar.
+#   - PERFIL: com o perfil do admin ligado, cada comando é medido
+#     (modules/perfil.py); desligado, o cursor é o do psycopg2 mais um teste.
+#
+# MOTORES: o padrão é o Postgres (Supabase). Com DB_MOTOR = "sqlite" nas
+# credenciais, conectar() abre o banco local (modules/local.py), que tem a
+# mesma interface da conexão do psycopg2; só o que é próprio do Postgres
+# (COPY, execute_values) é desviado aqui. Assim o sistema inteiro roda e
+# é medido numa máquina só, sem internet.
+
+import contextvars
+import datetime
+import queue
+import time
+import tempfile
+import threading
+import weakref
+from contextlib import contextmanager
+
+import pandas as pd
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.extras
+
+import modules.cluster as cluster
+import modules.local as local
+import modules.perfil as perfil
+
+# Tempo limite por classe, em segundos (0 = sem limite).
+# Pode ser ajustado no secrets.toml, seção [tempo_limite].
+TEMPO_LIMITE = {
+    "formulario": 5,     # listas, buscas por chave, validações
+    "escrita": 15,       # INSERT/UPDATE de apontamentos e cadastros
+    "leitura": 15,       # tabelas de últimos registros, histórico
+    "dashboard": 60,     # agregações de período
+    "exportacao": 300,   # Excel completo, recálculos
+    "manutencao": 0,     # DDL / migrações (init_db)
+}
+
+# Classes lidas em massa por COPY (ver ler_copy)
+CLASSES_EM_MASSA = {"dashboard", "exportacao"}
+
+# Conexão parada há mais que isso é testada antes de usar (segundos)
+INTERVALO_PING = 15
+
+PARAMETROS_TCP = {
+    "connect_timeout": 10,
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
+}
+
+# De quanto em quanto tempo o vigia confere pedidos de cancelamento (segundos)
+INTERVALO_VIGIA = 0.25
+
+# Conexões de leitura em paralelo por planta em cada worker (ver leitores);
+# no cluster, no máximo o que sobra do orçamento do worker
+CONEXOES_LEITURA = 4
+
+
+class _Conexao(psycopg2.extensions.connection):
+    # Subclasse só para poder guardar o horário do último uso bem-sucedido
+    ultimo_ok = 0.0
+
+
+class _Cursor(psycopg2.extensions.cursor):
+    # Mede cada comando quando o perfil da sessão está ligado (modules/perfil.py)
+    def execute(self, query, vars=None):
+        t = perfil.relogio()
+        if t is None:
+            return super().execute(query, vars)
+        try:
+            return super().execute(query, vars)
+        finally:
+            perfil.consulta(t, query, self.rowcount)
+
+    def copy_expert(self, sql, file, size=8192):
+        t = perfil.relogio()
+        if t is None:
+            return super().copy_expert(sql, file, size)
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            perfil.consulta(t, sql, self.rowcount)
+
+
+def configurar(config):
+    """Aplica os tempos do secrets.toml ([tempo_limite] classe = segundos)."""
+    for classe, seg in dict(config or {}).items():
+        TEMPO_LIMITE[classe] = seg
+
+
+def motor(credenciais):
+    """'postgres' (padrão) ou 'sqlite' (banco local, ver modules/local.py)."""
+    return credenciais.get("DB_MOTOR", "postgres")
+
+
+def conectar(credenciais, **extra):
+    c = credenciais
+    if motor(c) == local.MOTOR:
+        return local.conectar(c, options=extra.get("options", ""))
+    if c.get("DB_SCHEMA"):
+        # Planta com schema próprio (ver modules/plantas.py): mesmas tabelas, outro schema
+        extra["options"] = f"{extra.get('options', '')} -c search_path={c['DB_SCHEMA']},public".strip()
+    with _vaga():
+        conn = psycopg2.connect(
+            host=c["DB_HOST"], user=c["DB_USER"], password=c["DB_PASS"],
+            dbname=c["DB_NAME"], port=c["DB_PORT"], sslmode='require',
+            application_name="portal_ipar", connection_factory=_Conexao, cursor_factory=_Cursor,
+            **{**PARAMETROS_TCP, **extra}
+        )
+        _abertas.add(conn)
+    if c.get("DB_SCHEMA"):
+        _garantir_schema(conn, c["DB_SCHEMA"])
+    conn.ultimo_ok = time.monotonic()
+    return conn
+
+
+# Conexões do processo, para o orçamento do worker (cluster.orcamento_conexoes).
+# Conexão fechada ou descartada sai sozinha (WeakSet + conn.closed).
+_abertas = weakref.WeakSet()
+_abrindo = 0
+_trava_abertas = threading.Lock()
+
+
+@contextmanager
+def _vaga():
+    """
+    Reserva uma vaga no orçamento de conexões do worker antes de abrir
+    outra. Sem vaga, espera até connect_timeout uma ser fechada e então
+    desiste com OperationalError (tratado como falta de conexão).
+    """
+    global _abrindo
+    limite = cluster.orcamento_conexoes()
+    if limite is None:
+        yield
+        return
+    prazo = time.monotonic() + PARAMETROS_TCP["connect_timeout"]
+    while True:
+        with _trava_abertas:
+            if sum(1 for c in list(_abertas) if not c.closed) + _abrindo < limite:
+                _abrindo += 1
+                break
+        if time.monotonic() > prazo:
+            raise psycopg2.OperationalError(
+                f"limite de {limite} conexões por worker atingido (IPAR_MAX_CONEXOES / IPAR_WORKERS)")
+        time.sleep(0.1)
+    try:
+        yield
+    finally:
+        with _trava_abertas:
+            _abrindo -= 1
+
+
+# Schemas de planta já conferidos neste processo
+_schemas_ok = set()
+
+
+def _garantir_schema(conn, schema):
+    """
+    Cria o schema da planta se ainda não existir. Schema que não existe é
+    ignorado no search_path: sem isto a planta nova cairia no 'public' e
+    leria e gravaria os dados da planta padrão. Sem permissão para criar,
+    a conexão é recusada.
+    """
+    if schema in _schemas_ok:
+        return
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regnamespace(%s) IS NOT NULL", (schema,))
+            if not cur.fetchone()[0]:
+                cur.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+            cur.execute("SELECT current_schema() = %s", (schema,))
+            if not cur.fetchone()[0]:
+                raise psycopg2.ProgrammingError(f"search_path não aponta para o schema {schema}")
+        conn.commit()
+    except Exception:
+        conn.close()
+        raise
+    _schemas_ok.add(schema)
+
+
+def opcao_tempo_limite(classe):
+    """Para conexões fora do Streamlit: conectar(..., options=opcao_tempo_limite('exportacao'))."""
+    return f"-c statement_timeout={int(TEMPO_LIMITE.get(classe, 0) * 1000)}"
+
+
+def viva(conn):
+    """Pre-ping: False se a conexão estiver fechada ou não responder."""
+    if conn is None or conn.closed:
+        return False
+    status = conn.get_transaction_status()
+    if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    try:
+        if status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+            conn.rollback()
+        if time.monotonic() - getattr(conn, "ultimo_ok", 0) < INTERVALO_PING:
+            return True
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.ultimo_ok = time.monotonic()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def fechar(conn):
+    try:
+        if conn is not None and not conn.closed:
+            conn.close()
+    except Exception:
+        pass
+
+
+# ------------------------------------------------------------------------------
+# CANCELAMENTO QUANDO O USUÁRIO SAI DA TELA
+# ------------------------------------------------------------------------------
+
+_em_execucao = {}
+_trava = threading.Lock()
+_vigia = None
+
+
+def _contexto_script():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        # Fora do Streamlit (serviços em ferramentas/) não há contexto: sem aviso
+        return get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return None
+
+
+def _parada_pedida(ctx):
+    # O Streamlit marca o pedido de STOP/RERUN em script_requests e só o
+    # atende na próxima chamada st.*; com a thread presa no socket isso
+    # nunca acontece, então o vigia olha o pedido direto.
+    try:
+        estado = ctx.script_requests._state
+        return getattr(estado, "value", estado) in ("STOP", "RERUN")
+    except Exception:
+        return False
+
+
+def _vigiar():
+    while True:
+        time.sleep(INTERVALO_VIGIA)
+        with _trava:
+            itens = list(_em_execucao.items())
+        for chave, (conn, ctx) in itens:
+            if _parada_pedida(ctx):
+                try:
+                    conn.cancel()
+                except Exception:
+                    pass
+                with _trava:
+                    _em_execucao.pop(chave, None)
+
+
+@contextmanager
+def cancelavel(conn):
+    """Registra a consulta no vigia enquanto ela roda (só dentro do Streamlit)."""
+    global _vigia
+    ctx = _contexto_script()
+    if ctx is None:
+        yield
+        return
+    chave = object()
+    with _trava:
+        _em_execucao[chave] = (conn, ctx)
+        if _vigia is None or not _vigia.is_alive():
+            _vigia = threading.Thread(target=_vigiar, name="banco-vigia", daemon=True)
+            _vigia.start()
+    try:
+        yield
+    finally:
+        with _trava:
+            _em_execucao.pop(chave, None)
+
+
+# ------------------------------------------------------------------------------
+# EXECUÇÃO
+# ------------------------------------------------------------------------------
+
+def _origem(e):
+    # O pandas embrulha o erro do psycopg2 (DatabaseError "Execution failed")
+    while e is not None and not isinstance(e, psycopg2.Error):
+        e = e.__cause__ or e.__context__
+    return e
+
+
+def tipo_erro(e):
+    """
+    'tempo' (statement_timeout), 'cancelada' (usuário saiu), 'conexao',
+    'duplicado' (índice único), 'sobreposicao' (horário cruzado,
+    modules/sobreposicao.py) ou None.
+    """
+    o = _origem(e)
+    if isinstance(o, psycopg2.extensions.QueryCanceledError):
+        return "tempo" if "timeout" in str(o) else "cancelada"
+    if isinstance(o, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+        return "conexao"
+    # 23505 = unique_violation (o banco local não tem pgcode: vai pela mensagem)
+    if isinstance(o, psycopg2.IntegrityError) and (o.pgcode == "23505" or "UNIQUE constraint" in str(o)):
+        return "duplicado"
+    # 23P01 = exclusion_violation (restrição EXCLUDE ou o trigger de sobreposição)
+    if isinstance(o, psycopg2.errors.ExclusionViolation) or getattr(o, "pgcode", None) == "23P01":
+        return "sobreposicao"
+    return None
+
+
+def mensagem_erro(e, titulo, classe=None):
+    tipo = tipo_erro(e)
+    if tipo == "tempo":
+        return (f"A consulta passou do tempo limite ({TEMPO_LIMITE.get(classe, 0)} s). "
+                "Tente um período menor.")
+    if tipo == "cancelada":
+        return "Consulta cancelada."
+    if tipo == "conexao":
+        return f"Sem conexão com o banco. Tente novamente em instantes. ({_origem(e)})"
+    if tipo == "sobreposicao":
+        # Mensagem do trigger já diz com o que cruzou; a da restrição não
+        texto = str(_origem(e)).strip().splitlines()[0]
+        return texto if texto.startswith("Horário cruza") else \
+            "Horário cruza com outro registro da mesma máquina. Confira início e fim."
+    return f"{titulo}: {e}"
+
+
+# ------------------------------------------------------------------------------
+# LEITURA EM MASSA (COPY ... TO STDOUT)
+# ------------------------------------------------------------------------------
+# pd.read_sql monta uma tupla Python por linha e depois adivinha os tipos.
+# Para exportações e dashboards de período longo, o Postgres manda o
+# resultado inteiro como CSV (COPY) e o parser em C do pandas (ou o do
+# pyarrow, se instalado) monta as colunas já com o tipo certo, tirado do
+# esquema da própria consulta.
+#
+# Os tipos são os do pd.read_sql pelo psycopg2, para a tela não depender
+# de qual dos dois leu: inteiro (float com NULL), float (também o NUMERIC:
+# o read_sql converte o Decimal, coerce_float=True), bool, texto,
+# datetime64 para timestamp e objetos date / time para DATE e TIME.
+
+# OIDs dos tipos do Postgres
+_INTEIROS = {20, 21, 23}
+_REAIS = {700, 701, 1700}
+_LOGICO = 16
+_DATA = 1082
+_HORA = 1083
+_MOMENTOS = {1114: False, 1184: True}  # timestamp / timestamptz
+
+NULO_COPY = r"\N"
+
+# Resultado na memória até 64 MB; acima disso vai para um arquivo temporário
+MEMORIA_COPY = 64 * 1024 * 1024
+
+# Esquemas guardados (consultas com valores no texto não repetem a chave)
+MAX_ESQUEMAS = 500
+
+_esquemas = {}
+_trava_esquemas = threading.Lock()
+
+try:
+    import pyarrow  # noqa: F401
+    _TEM_ARROW = True
+except ImportError:
+    _TEM_ARROW = False
+
+
+def _sql_texto(conn, cur, query, params):
+    sql = cur.mogrify(query, params) if params else query.encode()
+    return sql.decode(psycopg2.extensions.encodings.get(conn.encoding, "utf-8")).strip().rstrip(";")
+
+
+def esquema(cur, query, sql):
+    """
+    [(coluna, oid do tipo)] do resultado, sem ler linhas (LIMIT 0).
+    Guardado por texto da consulta e conexão (schema da planta): os
+    parâmetros não mudam os tipos.
+    """
+    chave = (cur.connection.dsn, query)
+    colunas = _esquemas.get(chave)
+    if colunas is None:
+        cur.execute(f"SELECT * FROM ({sql}) AS q LIMIT 0")
+        colunas = [(d.name, d.type_code) for d in cur.description]
+        with _trava_esquemas:
+            if len(_esquemas) >= MAX_ESQUEMAS:
+                # Sai o mais antigo (o dict guarda a ordem de inserção)
+                _esquemas.pop(next(iter(_esquemas)), None)
+            _esquemas[chave] = colunas
+    return colunas
+
+
+def _por_valor(s, conversor):
+    # Datas e horários se repetem muito: cada valor distinto é convertido uma vez
+    return s.map({v: conversor(v) for v in s.dropna().unique()})
+
+
+def ler_copy(conn, cur, query, params=None, arrow=False):
+    """
+    Mesmo resultado de pd.read_sql(query, conn, params), via COPY em CSV.
+    arrow=True devolve colunas pyarrow (se o pyarrow estiver instalado).
+    """
+    if local.e_local(conn):
+        return local.ler(conn, cur, query, params)
+    sql = _sql_texto(conn, cur, query, params)
+    colunas = esquema(cur, query, sql)
+    nomes = [c for c, _ in colunas]
+
+    with tempfile.SpooledTemporaryFile(max_size=MEMORIA_COPY) as buf:
+        cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, NULL '{NULO_COPY}')", buf)
+        if buf.tell() == 0:
+            return pd.DataFrame(columns=nomes)
+        buf.seek(0)
+        # Número vem como float (aceita NULL); o resto como texto e é convertido abaixo
+        tipos = {c: ("float64" if oid in _INTEIROS or oid in _REAIS else str) for c, oid in colunas}
+        opcoes = dict(header=None, names=nomes, dtype=tipos, na_values=[NULO_COPY], keep_default_na=False)
+        if _TEM_ARROW:
+            opcoes["engine"] = "pyarrow"
+            if arrow:
+                opcoes["dtype_backend"] = "pyarrow"
+        df = pd.read_csv(buf, **opcoes)
+
+    for c, oid in colunas:
+        if oid in _INTEIROS and not arrow and not df[c].isna().any():
+            df[c] = df[c].astype("int64")  # igual ao read_sql: inteiro se não houver NULL
+        elif oid == _LOGICO:
+            df[c] = df[c].map({"t": True, "f": False})
+        elif oid == _DATA:
+            df[c] = _por_valor(df[c], datetime.date.fromisoformat)
+        elif oid == _HORA:
+            df[c] = _por_valor(df[c], datetime.time.fromisoformat)
+        elif oid in _MOMENTOS:
+            df[c] = pd.to_datetime(df[c], format="ISO8601", utc=_MOMENTOS[oid])
+    return df
+
+
+def ler_em_blocos(conn, query, params=None, tamanho=50000):
+    """
+    Gerador de DataFrames de até 'tamanho' linhas, por cursor do lado do
+    servidor (DECLARE/FETCH): o resultado inteiro nunca fica na memória,
+    nem aqui nem no psycopg2. Consumir dentro de executar() (transação aberta).
+    """
+    with conn.cursor(name="ler_em_blocos") as cur:
+        cur.itersize = tamanho
+        cur.execute(query, params)
+        while True:
+            linhas = cur.fetchmany(tamanho)
+            if not linhas:
+                break
+            yield pd.DataFrame(linhas, columns=[d[0] for d in cur.description])
+
+
+class Sql(str):
+    """
+    Comando do Postgres com a versão do banco local (modules/local.py) junto,
+    para o pouco que não tem tradução automática (CTE de escrita, LATERAL,
+    triggers). Para o psycopg2 é uma str comum.
+    local: SQL do SQLite, com os mesmos parâmetros; vários comandos separados
+    por ';' ('' = nada a fazer no banco local).
+    """
+
+    def __new__(cls, postgres, local):
+        sql = super().__new__(cls, postgres)
+        sql.local = local
+        return sql
+
+
+class Linhas(list):
+    """
+    Parâmetros de várias linhas para um INSERT ... VALUES %s.
+    Num comando (query, Linhas([...])) todas vão num statement só (execute_values).
+    molde: template de cada linha, ex. '(%s, %s::bigint)' (padrão: só %s).
+    """
+
+    def __init__(self, linhas=(), molde=None):
+        super().__init__(linhas)
+        self.molde = molde
+
+
+def executar_comando(cur, query, params):
+    """Um comando (query, params) de run_transaction."""
+    if isinstance(params, Linhas):
+        if local.e_local(cur.connection):
+            cur.execute_values(query, params, params.molde)
+        elif params:
+            psycopg2.extras.execute_values(cur, query, params, template=params.molde, page_size=len(params))
+    else:
+        cur.execute(query, params)
+
+
+def executar(obter_conexao, acao, classe, repetir=False):
+    """
+    Roda acao(conn, cur) com o tempo limite da classe e cancelável.
+    obter_conexao(forcar) devolve a conexão do setor (forcar=True reconecta).
+    repetir=True (leituras, ou escrita com chave de envio: ver modules/envio.py):
+    se a conexão cair no meio, reconecta e tenta mais uma vez. Erros sobem
+    para o chamador mostrar.
+    """
+    conn = obter_conexao(False)
+    if conn is None:
+        raise psycopg2.OperationalError("sem conexão")
+    for tentativa in range(2 if repetir else 1):
+        try:
+            with cancelavel(conn), conn.cursor() as cur:
+                cur.execute("SET LOCAL statement_timeout = %s", (int(TEMPO_LIMITE.get(classe, 0) * 1000),))
+                res = acao(conn, cur)
+            conn.ultimo_ok = time.monotonic()
+            return res
+        except Exception as e:
+            if tipo_erro(e) == "conexao":
+                conn = obter_conexao(True)
+                if conn is not None and tentativa == 0 and repetir:
+                    continue
+                raise
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+            raise
+
+
+# ------------------------------------------------------------------------------
+# LEITURAS EM PARALELO
+# ------------------------------------------------------------------------------
+# Tela com várias consultas independentes (produção + paradas do dashboard,
+# as listas dos selectbox) pagava a soma das idas e voltas ao Supabase.
+# paralelo() dispara todas ao mesmo tempo, cada uma numa conexão do pool
+# de leitura da planta (leitores), e a tela espera só a mais lenta. A
+# conexão cacheada do setor continua com a escrita e as leituras avulsas.
+
+class Conexoes:
+    """
+    Pool simples de conexões de uma planta (uma por thread em uso).
+    Abre sob demanda: conexão que nunca foi pedida não existe.
+    """
+
+    def __init__(self, credenciais, tamanho, classe="escrita"):
+        self.credenciais = credenciais
+        self.classe = classe
+        self.livres = queue.LifoQueue()
+        for _ in range(tamanho):
+            self.livres.put(None)
+
+    def _abrir(self):
+        return conectar(self.credenciais, options=opcao_tempo_limite(self.classe))
+
+    def executar(self, acao, classe=None, repetir=False):
+        """acao(conn, cur) numa conexão livre (espera se todas estiverem em uso)."""
+        conn = self.livres.get()
+        atual = [conn]
+
+        def obter(forcar=False):
+            if forcar or not viva(atual[0]):
+                fechar(atual[0])
+                atual[0] = None
+                atual[0] = self._abrir()
+            return atual[0]
+        try:
+            return executar(obter, acao, classe or self.classe, repetir)
+        finally:
+            self.livres.put(atual[0])
+
+
+_leitores = {}
+_trava_leitores = threading.Lock()
+
+
+def leitores(credenciais):
+    """Pool de leitura da planta, um por processo (todos os setores usam o mesmo)."""
+    chave = repr(sorted(credenciais.items()))
+    with _trava_leitores:
+        if chave not in _leitores:
+            limite = cluster.orcamento_conexoes()
+            tamanho = CONEXOES_LEITURA if limite is None else \
+                min(CONEXOES_LEITURA, max(limite - cluster.CONEXOES_FIXAS, 1))
+            _leitores[chave] = Conexoes(credenciais, tamanho, classe="leitura")
+        return _leitores[chave]
+
+
+def acao_leitura(query, params, classe):
+    """acao(conn, cur) -> DataFrame: COPY nas classes em massa, pd.read_sql nas outras."""
+    if classe in CLASSES_EM_MASSA:
+        return lambda conn, cur: ler_copy(conn, cur, query, params)
+    return lambda conn, cur: pd.read_sql(query, conn, params=params)
+
+
+def paralelo(tarefas):
+    """
+    Roda ao mesmo tempo as funções sem argumento de tarefas ({nome: função})
+    e devolve {nome: resultado} quando todas terminarem. Cada thread leva o
+    contexto do script do Streamlit (session_state, cache, cancelamento).
+    Exceção de uma tarefa sobe depois que todas acabarem.
+    """
+    if len(tarefas) <= 1:
+        return {nome: funcao() for nome, funcao in tarefas.items()}
+    resultados, erros = {}, []
+
+    def rodar(nome, funcao):
+        try:
+            resultados[nome] = funcao()
+        except BaseException as e:  # inclui o pedido de parada do Streamlit
+            erros.append(e)
+
+    # Cada thread com uma cópia do contexto (perfil da sessão, ver modules/perfil.py)
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(rodar, *item),
+                                name=f"banco-paralelo-{item[0]}", daemon=True)
+               for item in tarefas.items()]
+    if _contexto_script() is not None:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx
+        for t in threads:
+            add_script_run_ctx(t)
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if erros:
+        raise erros[0]
+    return {nome: resultados[nome] for nome in tarefas}
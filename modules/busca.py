@@ -0,0 +1,154 @@
+# ==============================================================================
+# BUSCA NO HISTÓRICO (TEXTO LIVRE EM PORTUGUÊS + FILTROS)
+# ==============================================================================
+# Cliente, peça, código de programa, motivo, observação, descrição da
+# manutenção: o supervisor digita palavras e recebe os registros mais
+# relevantes, paginados, em vez de rolar a tabela do histórico.
+#
+# Cada tabela pesquisável tem um índice GIN sobre o documento de busca
+# (to_tsvector com a configuração 'ipar_pt': português com radicais e sem
+# acento, "manutenção" acha "manutencao" e "trocas" acha "troca"). O índice
+# é de EXPRESSÃO, sem coluna nova: o espelho e os SELECT * não mudam. A
+# consulta repete a mesma expressão (documento()) para o Postgres usar o
+# índice; o peso de cada coluna (A = código/peça/cliente, B = máquina/
+# operador, C = texto livre) ordena o resultado (ts_rank_cd).
+#
+# O texto aceita a sintaxe de busca da web: palavras (todas), "frase
+# exata", OR e -palavra para excluir.
+#
+# No banco local (modules/local.py) não há índice: ipar_busca (Python)
+# confere e pontua linha a linha, com a mesma sintaxe.
+
+import modules.banco as banco
+
+# Linhas por página
+PAGINA = 50
+
+# Configuração de busca do Postgres (criada pelo ddl)
+CONFIG = "ipar_pt"
+
+SETORES = {"usinagem": "Usinagem", "estamparia": "Estamparia", "furadeira": "Furadeiras"}
+
+TIPOS = {"apontamentos": "Apontamento", "paradas": "Parada", "manutencoes": "Manutenção"}
+
+# Por setor e tipo: tabela, coluna de data, chave (máquina/operador) e
+# colunas pesquisadas por peso
+TABELAS = {
+    "usinagem": {
+        "apontamentos": {"tabela": "usinagem_apontamentos", "data": "data_registro", "chave": "maquina",
+                         "pesos": {"A": ["cod_programa", "descricao_pc", "cliente"], "B": ["maquina", "operador"]}},
+        "paradas": {"tabela": "usinagem_paradas_reg", "data": "data_registro", "chave": "maquina",
+                    "pesos": {"A": ["motivo"], "B": ["maquina"], "C": ["observacao"]}},
+        "manutencoes": {"tabela": "usinagem_manutencoes", "data": "data_manut", "chave": "maquina",
+                        "pesos": {"A": ["tipo_manut"], "B": ["maquina", "tecnico"], "C": ["pecas_trocadas"]}},
+    },
+    "estamparia": {
+        "apontamentos": {"tabela": "estamparia_apontamentos", "data": "data", "chave": "maquina",
+                         "pesos": {"A": ["descricao_pc", "cliente", "operacao", "materia_prima"],
+                                   "B": ["maquina", "operador"]}},
+        "paradas": {"tabela": "estamparia_paradas_reg", "data": "data", "chave": "maquina",
+                    "pesos": {"A": ["motivo"], "B": ["maquina"], "C": ["observacao"]}},
+        "manutencoes": {"tabela": "estamparia_manutencoes", "data": "data_manut", "chave": "maquina",
+                        "pesos": {"A": ["tipo_manut"], "B": ["maquina", "tecnico"], "C": ["descricao"]}},
+    },
+    "furadeira": {
+        "apontamentos": {"tabela": "furadeira_apontamentos", "data": "data_registro", "chave": "operador",
+                         "pesos": {"A": ["peca", "cliente", "tipo_operacao"], "B": ["operador"], "C": ["observacao"]}},
+        "paradas": {"tabela": "furadeira_paradas_reg", "data": "data_registro", "chave": None,
+                    "pesos": {"A": ["motivo"], "C": ["observacao"]}},
+    },
+}
+
+
+def _colunas(cfg):
+    return [c for cols in cfg["pesos"].values() for c in cols]
+
+
+def documento(cfg):
+    """Expressão do documento de busca (a MESMA no índice e na consulta)."""
+    partes = []
+    for peso, cols in cfg["pesos"].items():
+        texto = " || ' ' || ".join(f"coalesce({c}, '')" for c in cols)
+        partes.append(f"setweight(to_tsvector('{CONFIG}', {texto}), '{peso}')")
+    return " || ".join(partes)
+
+
+def ddl(setor):
+    """SQL (Postgres, idempotente) da configuração de busca e dos índices GIN do setor."""
+    sql = f"""
+    CREATE EXTENSION IF NOT EXISTS unaccent;
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config
+                        WHERE cfgname = '{CONFIG}' AND cfgnamespace = current_schema()::regnamespace) THEN
+            CREATE TEXT SEARCH CONFIGURATION {CONFIG} (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION {CONFIG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END $$;
+    """
+    for cfg in TABELAS[setor].values():
+        t = cfg["tabela"]
+        sql += f"""
+    CREATE INDEX IF NOT EXISTS ix_{t}_busca ON {t} USING gin (({documento(cfg)})) WHERE ativo = 1;
+    """
+    return sql
+
+
+def _select(setor, tipo, cfg, com_chave, local):
+    t, data, chave = cfg["tabela"], cfg["data"], cfg["chave"]
+    texto = " || ' · ' || ".join(f"coalesce({c}, '')" for c in _colunas(cfg))
+    if local:
+        rank = f"ipar_busca(%(texto)s, {texto})"
+        casa = f"{rank} > 0"
+    else:
+        q = f"websearch_to_tsquery('{CONFIG}', %(texto)s)"
+        rank = f"ts_rank_cd({documento(cfg)}, {q})"
+        casa = f"({documento(cfg)}) @@ {q}"
+    filtro_chave = f" AND {chave} = %(chave)s" if com_chave and chave else ""
+    return f"""
+        SELECT '{SETORES[setor]}' AS setor, '{TIPOS[tipo]}' AS registro, id, {data}::date AS data,
+               {chave or "NULL"} AS maquina_operador, {texto} AS texto, {rank} AS relevancia
+          FROM {t}
+         WHERE ativo = 1 AND {casa}
+           AND {data}::date BETWEEN %(ini)s AND %(fim)s{filtro_chave}"""
+
+
+def _consulta(alvos, com_chave, local):
+    partes = " UNION ALL".join(_select(s, tipo, TABELAS[s][tipo], com_chave, local) for s, tipo in alvos)
+    if not alvos:
+        # Nada pesquisável na escolha (ex.: manutenções da furadeira): mesmas colunas, nenhuma linha
+        partes = """
+        SELECT NULL AS setor, NULL AS registro, NULL AS id, NULL AS data, NULL AS maquina_operador,
+               NULL AS texto, 0 AS relevancia WHERE 1 = 0"""
+    return f"""
+    SELECT r.*, COUNT(*) OVER () AS total FROM ({partes}
+    ) r
+    ORDER BY relevancia DESC, data DESC, id DESC
+    LIMIT %(limite)s OFFSET %(deslocamento)s"""
+
+
+def alvos(setores, tipos):
+    """(setor, tipo) pesquisáveis entre os escolhidos (furadeira não tem manutenções)."""
+    return [(s, t) for s in setores for t in tipos if t in TABELAS[s]]
+
+
+def consulta(setores, tipos, texto, ini, fim, chave=None, pagina=0):
+    """
+    Busca paginada: (Sql, params) para o get_dataframe do setor (ou da tela
+    geral). Colunas: setor, registro, id, data, maquina_operador, texto,
+    relevancia e total (linhas encontradas, igual em todas). chave filtra
+    máquina/operador exatos; pagina começa em 0.
+    """
+    lista = alvos(setores, tipos)
+    if chave:
+        # Filtro por máquina/operador deixa de fora o que não tem (paradas da furadeira)
+        lista = [(s, t) for s, t in lista if TABELAS[s][t]["chave"]]
+    params = {"texto": texto, "ini": ini, "fim": fim, "chave": chave,
+              "limite": PAGINA, "deslocamento": pagina * PAGINA}
+    return banco.Sql(_consulta(lista, bool(chave), False), _consulta(lista, bool(chave), True)), params
+
+
+def paginas(df):
+    """Total de linhas encontradas e de páginas, a partir de uma página do resultado."""
+    total = int(df["total"].iloc[0]) if not df.empty else 0
+    return total, max(1, -(-total // PAGINA))
@@ -0,0 +1,127 @@
+# ==============================================================================
+# EDIÇÃO DE CADASTROS EM GRADE (DIFF + GRAVAÇÃO EM LOTE)
+# ==============================================================================
+# Operadores, máquinas, motivos de parada... são editados num st.data_editor.
+# Ao salvar, comparamos a grade com o que foi carregado e só o que mudou vai
+# para o banco:
+#
+#   - NOVOS      linhas sem id                 -> INSERT
+#   - ALTERADOS  id existente com valor mudado -> UPDATE
+#   - REMOVIDOS  id que sumiu da grade         -> ativo = 0 (exclusão lógica)
+#
+# Nome novo que já existe numa linha excluída reativa essa linha (ativo = 1)
+# em vez de inserir outra: o nome é único também entre as inativas
+# (UNIQUE nos cadastros da estamparia). Linha apagada e digitada de novo
+# na mesma edição continua sendo a mesma linha.
+#
+# Tudo num statement só por tabela (CTEs de escrita sobre um VALUES montado
+# pelo execute_values), dentro da transação do setor. Listas com centenas de
+# linhas custam uma ida ao banco, não uma por linha.
+
+import pandas as pd
+
+import modules.banco as banco
+
+
+def _limpar(s):
+    # Mesma normalização dos cadastros antigos: maiúsculas, espaços simples
+    return s.astype(object).where(s.notna(), "").astype(str).str.split().str.join(" ").str.upper()
+
+
+def _difere(a, b):
+    # Diferente, tratando NaN == NaN (célula vazia que continuou vazia)
+    return (a != b) & ~(a.isna() & b.isna())
+
+
+def diff(original, editado, colunas, chave="id"):
+    """
+    Compara a grade editada com a carregada. A primeira coluna é o nome
+    (obrigatório, único, normalizado). Retorna dict com 'novos' e
+    'alterados' (DataFrames), 'removidos' (lista de ids) e 'erro' (texto
+    ou None: com erro nada deve ser gravado).
+    """
+    nome = colunas[0]
+    ed = editado.copy()
+    ed[nome] = _limpar(ed[nome])
+    # Linha nova deixada em branco é ignorada
+    ed = ed[ed[chave].notna() | (ed[nome] != "")]
+
+    resultado = {"novos": ed.iloc[0:0], "alterados": ed.iloc[0:0], "removidos": [], "erro": None}
+    vazios = ed[ed[nome] == ""]
+    if not vazios.empty:
+        resultado["erro"] = f"{len(vazios)} linha(s) com {nome} em branco. Para excluir, apague a linha."
+        return resultado
+    repetidos = ed.loc[ed[nome].duplicated(keep=False), nome].unique()
+    if len(repetidos):
+        resultado["erro"] = "Nomes repetidos: " + ", ".join(repetidos)
+        return resultado
+
+    antes = original.set_index(chave)[colunas]
+    novos = ed[ed[chave].isna()]
+    # Apagada e digitada de novo: volta a ser a linha original (nomes já normalizados)
+    sumiram = antes.index.difference(ed[chave].dropna().astype(antes.index.dtype))
+    ids = pd.Series(sumiram, index=_limpar(antes.loc[sumiram, nome]).to_numpy())
+    ids = ids[~ids.index.duplicated()]
+    de_volta = novos[nome].isin(ids.index)
+    ed = pd.concat([ed[ed[chave].notna()], novos[de_volta].assign(**{chave: novos.loc[de_volta, nome].map(ids)})])
+    resultado["novos"] = novos[~de_volta]
+    depois = ed.astype({chave: antes.index.dtype}).set_index(chave)[colunas]
+    comum = depois.index.intersection(antes.index)
+    mudou = pd.DataFrame({c: _difere(depois.loc[comum, c], antes.loc[comum, c]) for c in colunas}).any(axis=1)
+    resultado["alterados"] = depois.loc[comum][mudou].reset_index()
+    resultado["removidos"] = [int(i) for i in antes.index.difference(depois.index)]
+    return resultado
+
+
+def vazio(dif):
+    return dif["novos"].empty and dif["alterados"].empty and not dif["removidos"]
+
+
+def resumo(dif):
+    return f"{len(dif['novos'])} novo(s), {len(dif['alterados'])} alterado(s), {len(dif['removidos'])} excluído(s)"
+
+
+def cmd_aplicar(tabela, dif, colunas, tipos=None, chave="id"):
+    """
+    Um comando (query, banco.Linhas) que aplica o diff inteiro na tabela.
+    tipos: {coluna: tipo SQL} para as colunas que não são texto.
+    """
+    tipos = tipos or {}
+    cols = ", ".join(colunas)
+    molde = "(%s, %s::bigint, " + ", ".join(f"%s::{tipos.get(c, 'text')}" for c in colunas) + ")"
+
+    def tuplas(df, op):
+        parte = df[[chave] + colunas].astype(object)
+        parte = parte.where(parte.notna(), None)
+        return [(op, *r) for r in parte.itertuples(index=False)]
+
+    linhas = (tuplas(dif["novos"], "N") + tuplas(dif["alterados"], "A")
+              + [("R", i) + (None,) * len(colunas) for i in dif["removidos"]])
+    sets = ", ".join(f"{c} = d.{c}" for c in colunas)
+    nome = colunas[0]
+    # Linha excluída (a mais recente) com o nome de uma nova
+    inativa = f"(SELECT MAX(x.{chave}) FROM {tabela} x WHERE x.{nome} = d.{nome} AND x.ativo = 0)"
+    sql = f"""
+        WITH d (op, {chave}, {cols}) AS (VALUES %s),
+        alterados AS (
+            UPDATE {tabela} t SET {sets} FROM d WHERE t.{chave} = d.{chave} AND d.op = 'A' RETURNING 1
+        ),
+        removidos AS (
+            UPDATE {tabela} t SET ativo = 0 FROM d WHERE t.{chave} = d.{chave} AND d.op = 'R' RETURNING 1
+        ),
+        reativados AS (
+            UPDATE {tabela} t SET {sets}, ativo = 1 FROM d WHERE d.op = 'N' AND t.{chave} = {inativa} RETURNING 1
+        )
+        INSERT INTO {tabela} ({cols}, ativo) SELECT {cols}, 1 FROM d WHERE d.op = 'N' AND {inativa} IS NULL
+    """
+    # Banco local (SQLite) não tem CTE de escrita: quatro comandos na mesma
+    # transação (o INSERT já vê a reativação e pula os nomes ativos)
+    d = f"WITH d (op, {chave}, {cols}) AS (VALUES %s)"
+    local = f"""
+        {d} UPDATE {tabela} AS t SET {sets} FROM d WHERE t.{chave} = d.{chave} AND d.op = 'A';
+        {d} UPDATE {tabela} AS t SET ativo = 0 FROM d WHERE t.{chave} = d.{chave} AND d.op = 'R';
+        {d} UPDATE {tabela} AS t SET {sets}, ativo = 1 FROM d WHERE d.op = 'N' AND t.{chave} = {inativa};
+        {d} INSERT INTO {tabela} ({cols}, ativo) SELECT {cols}, 1 FROM d WHERE d.op = 'N'
+            AND NOT EXISTS (SELECT 1 FROM {tabela} x WHERE x.{nome} = d.{nome} AND x.ativo = 1)
+    """
+    return banco.Sql(sql, local), banco.Linhas(linhas, molde)
@@ -0,0 +1,252 @@
+# ==============================================================================
+# ESTATÍSTICA DE CICLO REAL POR (PEÇA, MÁQUINA, OPERAÇÃO)
+# ==============================================================================
+# Cada apontamento salvo alimenta a tabela '<setor>_ciclo_stats' com o ciclo
+# real medido (segundos por peça). Guardamos por chave:
+#   - n, média e m2 (algoritmo de Welford -> variância sem reler o histórico)
+#   - um histograma em faixas logarítmicas (5% de largura) para mediana e
+#     percentis, atualizado com um simples "+1" na faixa do ciclo
+#
+# A chave (peca, maquina, operacao) é a PRIMARY KEY, então a consulta do
+# formulário é uma busca por índice.
+#
+# Setores: na usinagem a "operação" é o código do programa; na furadeira
+# não existe máquina (fica '').
+
+import math
+import pandas as pd
+
+import modules.banco as banco
+
+# Faixas do histograma: de 0.1 s até ~1 h, cada uma 5% maior que a anterior
+CICLO_MINIMO = 0.1
+RAZAO_FAIXA = 1.05
+NUM_FAIXAS = 216
+
+# Abaixo disso o histórico ainda é pouco para dizer o que é "fora do padrão"
+MINIMO_AMOSTRAS = 5
+
+
+def _chave(peca, maquina, operacao):
+    return (
+        (peca or "").strip().upper(),
+        (maquina or "").strip().upper(),
+        (operacao or "").strip().upper(),
+    )
+
+
+def faixa(ciclo):
+    """Índice (1..NUM_FAIXAS, padrão de array do Postgres) da faixa do ciclo."""
+    k = int(math.floor(math.log(max(ciclo, CICLO_MINIMO) / CICLO_MINIMO) / math.log(RAZAO_FAIXA)))
+    return min(max(k, 0), NUM_FAIXAS - 1) + 1
+
+
+def _centro_faixa(indice):
+    # Média geométrica dos limites da faixa
+    return CICLO_MINIMO * RAZAO_FAIXA ** (indice - 1 + 0.5)
+
+
+def ciclo_real_seg(horas_trab, setup_min, total_pecas):
+    """Ciclo real médio (s/pç) descontando o setup. 0 se não houve peças."""
+    if total_pecas <= 0:
+        return 0
+    return max((horas_trab * 3600) - ((setup_min or 0) * 60), 0) / total_pecas
+
+
+def ciclo_real_df(df, col_data, col_ini, col_fim, col_setup=None):
+    """
+    Mesmo cálculo de ciclo_real_seg, vetorizado sobre o histórico
+    (com a correção de virada de dia quando o fim é menor que o início).
+    """
+    dt_ini = pd.to_datetime(df[col_data].astype(str) + ' ' + df[col_ini].astype(str))
+    dt_fim = pd.to_datetime(df[col_data].astype(str) + ' ' + df[col_fim].astype(str))
+    dt_fim = dt_fim.where(dt_fim >= dt_ini, dt_fim + pd.Timedelta(days=1))
+    seg = (dt_fim - dt_ini).dt.total_seconds()
+    if col_setup:
+        seg = (seg - df[col_setup].fillna(0) * 60).clip(lower=0)
+    total = df['qtd_produzida'].fillna(0) + df['refugo'].fillna(0)
+    return (seg / total.where(total > 0)).fillna(0)
+
+
+def ddl(prefixo):
+    return f"""
+    CREATE TABLE IF NOT EXISTS {prefixo}_ciclo_stats (
+        peca TEXT NOT NULL,
+        maquina TEXT NOT NULL DEFAULT '',
+        operacao TEXT NOT NULL DEFAULT '',
+        n INTEGER NOT NULL DEFAULT 0,
+        media DOUBLE PRECISION NOT NULL DEFAULT 0,
+        m2 DOUBLE PRECISION NOT NULL DEFAULT 0,
+        hist INTEGER[] NOT NULL,
+        atualizado_em TIMESTAMP DEFAULT now(),
+        PRIMARY KEY (peca, maquina, operacao)
+    );
+    """
+
+
+# ------------------------------------------------------------------------------
+# ESCRITA
+# ------------------------------------------------------------------------------
+
+def cmd_registrar(prefixo, peca, maquina, operacao, ciclo):
+    """
+    Atualização incremental (Welford + histograma) de um novo ciclo medido.
+    Retorna (query, params) para entrar na transação do apontamento,
+    ou None se o ciclo não for válido.
+    """
+    if not ciclo or ciclo <= 0:
+        return None
+    peca, maquina, operacao = _chave(peca, maquina, operacao)
+    if not peca:
+        return None
+    k = faixa(ciclo)
+    hist = [0] * NUM_FAIXAS
+    hist[k - 1] = 1
+    t = f"{prefixo}_ciclo_stats"
+    sql = f"""
+        INSERT INTO {t} AS s (peca, maquina, operacao, n, media, m2, hist)
+        VALUES (%(peca)s, %(maquina)s, %(operacao)s, 1, %(x)s, 0, %(hist)s)
+        ON CONFLICT (peca, maquina, operacao) DO UPDATE SET
+            n = s.n + 1,
+            media = s.media + (%(x)s - s.media) / (s.n + 1),
+            m2 = s.m2 + (%(x)s - s.media) * (%(x)s - (s.media + (%(x)s - s.media) / (s.n + 1))),
+            {{hist}},
+            atualizado_em = now()
+    """
+    # Banco local: o array é JSON, somado por função (modules/local.py)
+    sql = banco.Sql(sql.format(hist="hist[%(k)s] = s.hist[%(k)s] + 1"),
+                    sql.format(hist="hist = ipar_soma_posicao(s.hist, %(k)s, 1)"))
+    return sql, {"peca": peca, "maquina": maquina, "operacao": operacao,
+                 "x": float(ciclo), "hist": hist, "k": k}
+
+
+def cmds_reconstruir(prefixo, df):
+    """
+    Recalcula a tabela inteira a partir do histórico.
+    df: colunas peca, maquina, operacao, ciclo (um registro por apontamento).
+    Retorna a lista de comandos (DELETE + INSERT em lote) para uma transação.
+    """
+    t = f"{prefixo}_ciclo_stats"
+    comandos = [(f"DELETE FROM {t}", ())]
+    if df.empty:
+        return comandos
+    comandos.append((f"""
+        INSERT INTO {t} (peca, maquina, operacao, n, media, m2, hist)
+        {_SELECT_GRUPOS}
+    """, _agrupar(df)))
+    return comandos
+
+
+def cmd_registrar_lote(prefixo, df):
+    """
+    Versão em lote do cmd_registrar (apontamento pela grade do turno).
+    df: colunas peca, maquina, operacao, ciclo. Cada chave é resumida
+    (n, média, m2, histograma) e somada ao que já existe com a fórmula
+    de Chan para juntar duas amostras. Um comando só; None se não houver
+    ciclo válido.
+    """
+    grupos = _agrupar(df)
+    if not grupos[0]:
+        return None
+    t = f"{prefixo}_ciclo_stats"
+    sql = f"""
+        INSERT INTO {t} AS s (peca, maquina, operacao, n, media, m2, hist)
+        {_SELECT_GRUPOS}
+        ON CONFLICT (peca, maquina, operacao) DO UPDATE SET
+            n = s.n + EXCLUDED.n,
+            media = s.media + (EXCLUDED.media - s.media) * EXCLUDED.n / (s.n + EXCLUDED.n),
+            m2 = s.m2 + EXCLUDED.m2 + (EXCLUDED.media - s.media) {{quadrado}} * s.n * EXCLUDED.n / (s.n + EXCLUDED.n),
+            hist = {{soma}},
+            atualizado_em = now()
+    """
+    sql = banco.Sql(
+        sql.format(quadrado="^ 2", soma="ARRAY(SELECT a + b FROM unnest(s.hist, EXCLUDED.hist) WITH ORDINALITY AS u(a, b, i) ORDER BY i)"),
+        sql.format(quadrado="* (EXCLUDED.media - s.media)", soma="ipar_soma_arrays(s.hist, EXCLUDED.hist)"))
+    return sql, grupos
+
+
+_SELECT_GRUPOS = """SELECT p, m, o, n, me, m2, h::int[]
+        FROM unnest(%s::text[], %s::text[], %s::text[], %s::int[],
+                    %s::float8[], %s::float8[], %s::text[]) AS x(p, m, o, n, me, m2, h)"""
+
+
+def _agrupar(df):
+    # Resumo por chave (peca, maquina, operacao) em listas paralelas, na
+    # ordem dos parâmetros de _SELECT_GRUPOS
+    pecas, maquinas, operacoes, ns, medias, m2s, hists = [], [], [], [], [], [], []
+    df = df[(df['ciclo'] > 0) & df['peca'].notna()].copy()
+    for col in ("peca", "maquina", "operacao"):
+        df[col] = df[col].fillna("").astype(str).str.strip().str.upper()
+    df = df[df['peca'] != ""]
+    df['k'] = df['ciclo'].map(faixa)
+
+    for (peca, maquina, operacao), g in df.groupby(["peca", "maquina", "operacao"]):
+        hist = [0] * NUM_FAIXAS
+        for k, qtd in g['k'].value_counts().items():
+            hist[int(k) - 1] = int(qtd)
+        media = float(g['ciclo'].mean())
+        pecas.append(peca); maquinas.append(maquina); operacoes.append(operacao)
+        ns.append(len(g)); medias.append(media)
+        m2s.append(float(((g['ciclo'] - media) ** 2).sum()))
+        hists.append("{" + ",".join(map(str, hist)) + "}")
+    return (pecas, maquinas, operacoes, ns, medias, m2s, hists)
+
+
+# ------------------------------------------------------------------------------
+# LEITURA
+# ------------------------------------------------------------------------------
+
+def sql_consulta(prefixo):
+    """Busca pela PRIMARY KEY; parâmetros: (peca, maquina, operacao)."""
+    return f"SELECT n, media, m2, hist FROM {prefixo}_ciclo_stats WHERE peca = %s AND maquina = %s AND operacao = %s"
+
+
+def params_consulta(peca, maquina, operacao):
+    return _chave(peca, maquina, operacao)
+
+
+def _percentil(hist, total, p):
+    alvo = p * total
+    acumulado = 0
+    for i, qtd in enumerate(hist, start=1):
+        acumulado += qtd
+        if qtd and acumulado >= alvo:
+            return _centro_faixa(i)
+    return 0
+
+
+def resumo(linha):
+    """
+    Converte a linha (n, media, m2, hist) em estatísticas prontas.
+    Retorna None se não houver histórico.
+    """
+    if not linha:
+        return None
+    n, media, m2, hist = linha
+    if not n:
+        return None
+    total = sum(hist)
+    return {
+        "n": n,
+        "media": media,
+        "desvio": math.sqrt(m2 / (n - 1)) if n > 1 else 0,
+        "mediana": _percentil(hist, total, 0.50),
+        "p10": _percentil(hist, total, 0.10),
+        "p25": _percentil(hist, total, 0.25),
+        "p75": _percentil(hist, total, 0.75),
+        "p90": _percentil(hist, total, 0.90),
+    }
+
+
+def faixa_normal(stats):
+    """Limites de Tukey (Q1 - 1.5 IQR, Q3 + 1.5 IQR) do ciclo real."""
+    # Histórico muito "redondo" cai todo numa faixa: garante largura mínima de 10%
+    iqr = max(stats["p75"] - stats["p25"], 0.1 * stats["mediana"])
+    return max(stats["p25"] - 1.5 * iqr, 0), stats["p75"] + 1.5 * iqr
+
+
+def eh_outlier(ciclo, stats):
+    if not stats or stats["n"] < MINIMO_AMOSTRAS or ciclo <= 0:
+        return False
+    inf, sup = faixa_normal(stats)
+    return ciclo < inf or ciclo > sup
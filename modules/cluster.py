@@ -0,0 +1,134 @@
+# ==============================================================================
+# ESTADO COMPARTILHADO ENTRE OS WORKERS (VÁRIOS PROCESSOS STREAMLIT)
+# ==============================================================================
+# Com o LIGAR_CLUSTER.bat rodam vários 'streamlit run main.py' atrás do nginx.
+# O que precisa ser visto por TODOS os processos fica num SQLite local
+# (mesma máquina, sem ida à internet):
+#   - sessões de login (o tablet que cair em outro worker continua logado)
+#   - versões de cache (quando um worker altera um cadastro, os outros
+#     descartam a lista cacheada na próxima leitura)
+#
+# Também daqui sai o orçamento de conexões com o Supabase de cada worker
+# (o LIGAR_CLUSTER.bat passa IPAR_WORKERS e IPAR_MAX_CONEXOES para todos).
+
+import os
+import sqlite3
+import secrets
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+PASTA_DADOS = os.environ.get(
+    "IPAR_DADOS_LOCAIS",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dados_locais")
+)
+ARQUIVO_DB = os.path.join(PASTA_DADOS, "cluster.db")
+
+# Sessão de login expira depois de 1 turno longo
+VALIDADE_SESSAO = timedelta(hours=14)
+
+# Conexões diretas que o plano do Supabase aceita para o portal inteiro
+MAX_CONEXOES_BANCO = int(os.environ.get("IPAR_MAX_CONEXOES", "60"))
+
+# Parte do total que fica para os serviços (relatórios, ingestão, coletor)
+CONEXOES_SERVICOS = int(os.environ.get("IPAR_CONEXOES_SERVICOS", "10"))
+
+# Conexões fixas de um worker por planta: a do setor e a do espelho, nos 3 setores
+CONEXOES_FIXAS = 6
+
+_estrutura_ok = False
+
+
+@contextmanager
+def _conectar():
+    """
+    Abre o SQLite compartilhado. Conexão curta por operação: o arquivo é
+    local e o WAL permite leituras simultâneas de todos os workers.
+    """
+    global _estrutura_ok
+    os.makedirs(PASTA_DADOS, exist_ok=True)
+    conn = sqlite3.connect(ARQUIVO_DB, timeout=10)
+    try:
+        if not _estrutura_ok:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS sessoes (
+                token TEXT PRIMARY KEY, usuario TEXT NOT NULL,
+                criado_em TEXT NOT NULL, expira_em TEXT NOT NULL)""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS versoes_cache (
+                chave TEXT PRIMARY KEY, versao INTEGER NOT NULL DEFAULT 0)""")
+            _estrutura_ok = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# ------------------------------------------------------------------------------
+# ORÇAMENTO DE CONEXÕES
+# ------------------------------------------------------------------------------
+
+def orcamento_conexoes():
+    """
+    Quantas conexões com o banco este processo pode ter abertas: a parte
+    de um worker em (MAX_CONEXOES_BANCO - CONEXOES_SERVICOS). None (sem
+    limite) fora do cluster: LIGAR_SISTEMA.bat e os serviços, que têm
+    pool de tamanho fixo dentro da parte reservada.
+    """
+    if not os.environ.get("IPAR_WORKER_ID"):
+        return None
+    workers = max(int(os.environ.get("IPAR_WORKERS", "1")), 1)
+    return max((MAX_CONEXOES_BANCO - CONEXOES_SERVICOS) // workers, 1)
+
+
+# ------------------------------------------------------------------------------
+# SESSÕES DE LOGIN
+# ------------------------------------------------------------------------------
+
+def criar_sessao(usuario):
+    """Grava a sessão no servidor e devolve o token que vai no cookie do navegador."""
+    token = secrets.token_urlsafe(24)
+    agora = datetime.now()
+    with _conectar() as conn:
+        conn.execute("INSERT INTO sessoes (token, usuario, criado_em, expira_em) VALUES (?, ?, ?, ?)",
+                     (token, usuario, agora.isoformat(), (agora + VALIDADE_SESSAO).isoformat()))
+        # Aproveita para limpar sessões vencidas
+        conn.execute("DELETE FROM sessoes WHERE expira_em < ?", (agora.isoformat(),))
+    return token
+
+
+def validar_sessao(token):
+    """Retorna o usuário dono do token, ou None se não existir/expirou."""
+    if not token:
+        return None
+    with _conectar() as conn:
+        row = conn.execute("SELECT usuario FROM sessoes WHERE token = ? AND expira_em >= ?",
+                           (token, datetime.now().isoformat())).fetchone()
+    return row[0] if row else None
+
+
+def encerrar_sessao(token):
+    if not token:
+        return
+    with _conectar() as conn:
+        conn.execute("DELETE FROM sessoes WHERE token = ?", (token,))
+
+
+# ------------------------------------------------------------------------------
+# VERSÕES DE CACHE (INVALIDAÇÃO ENTRE WORKERS)
+# ------------------------------------------------------------------------------
+
+def versao_cache(chave):
+    """
+    Versão atual de um grupo de cache (ex: nome da tabela de cadastro).
+    Entra como argumento das funções com st.cache_data: mudou a versão,
+    muda a chave do cache em todos os workers.
+    """
+    with _conectar() as conn:
+        row = conn.execute("SELECT versao FROM versoes_cache WHERE chave = ?", (chave,)).fetchone()
+    return row[0] if row else 0
+
+
+def invalidar_cache(chave):
+    with _conectar() as conn:
+        conn.execute("""INSERT INTO versoes_cache (chave, versao) VALUES (?, 1)
+                        ON CONFLICT(chave) DO UPDATE SET versao = versao + 1""", (chave,))
@@ -0,0 +1,232 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from datetime import date, timedelta
+import modules.banco as banco
+import modules.busca as busca
+import modules.ordens as ordens
+import modules.plantas as plantas
+
+# ==============================================================================
+# VISÃO CORPORATIVA (TODAS AS PLANTAS)
+# ==============================================================================
+# Produção, refugo, eficiência e paradas de cada planta e setor no período.
+# Uma consulta de somas por planta, nas colunas de métricas gravadas pelo
+# banco (modules/metricas.py): nenhuma linha de apontamento vem para cá.
+# Conexões próprias desta tela (uma por planta, só leitura): ela não
+# disputa a conexão dos tablets de nenhuma planta.
+#
+# No fim da tela, a busca de texto em todos os setores (modules/busca.py).
+# render_ordens: acompanhamento de uma ordem nos setores (modules/ordens.py).
+
+# (setor, prefixo das tabelas, filtro de data)
+SETORES = [
+    ("Usinagem", "usinagem", "data_registro"),
+    ("Estamparia", "estamparia", "data::date"),
+    ("Furadeiras", "furadeira", "data_registro"),
+]
+
+def _sql_setor(setor, prefixo, data):
+    return f"""
+    SELECT '{setor}' AS setor,
+           COALESCE(SUM(qtd_produzida), 0) AS boas, COALESCE(SUM(refugo), 0) AS refugo,
+           COALESCE(SUM(min_real), 0) AS min_real, COALESCE(SUM(min_teorico), 0) AS min_teorico,
+           (SELECT COALESCE(SUM(min_parada), 0) FROM {prefixo}_paradas_reg
+             WHERE ativo = 1 AND {data} BETWEEN %(ini)s AND %(fim)s) AS min_parada
+      FROM {prefixo}_apontamentos
+     WHERE ativo = 1 AND {data} BETWEEN %(ini)s AND %(fim)s"""
+
+SQL_TOTAIS = "\n    UNION ALL".join(_sql_setor(*s) for s in SETORES)
+
+
+@st.cache_resource(ttl=3600)
+def init_connection(planta):
+    banco.configurar(st.secrets.get("tempo_limite", {}))
+    conn = banco.conectar(plantas.credenciais(st.secrets, planta))
+    conn.set_session(readonly=True)
+    return conn
+
+def _conexao(planta):
+    def obter(forcar=False):
+        conn = init_connection(planta)
+        if forcar or not banco.viva(conn):
+            banco.fechar(conn)
+            init_connection.clear(planta)
+            conn = init_connection(planta)
+        return conn
+    return obter
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_totais(planta, ini, fim):
+    def ler(conn, cur):
+        cur.execute(SQL_TOTAIS, {"ini": ini, "fim": fim})
+        df = pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
+        conn.rollback()
+        return df
+    return banco.executar(_conexao(planta), ler, "dashboard", repetir=True)
+
+def buscar(planta, query, params):
+    def ler(conn, cur):
+        cur.execute(query, params)
+        df = pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
+        conn.rollback()
+        return df
+    return banco.executar(_conexao(planta), ler, "leitura", repetir=True)
+
+def _indicadores(df):
+    # Eficiência = teórico / real; refugo sobre o total produzido
+    df = df.copy()
+    num = ["boas", "refugo", "min_real", "min_teorico", "min_parada"]
+    df[num] = df[num].astype(float)
+    df["eficiencia"] = (df["min_teorico"] / df["min_real"].where(df["min_real"] > 0) * 100).fillna(0)
+    total = df["boas"] + df["refugo"]
+    df["refugo_pct"] = (df["refugo"] / total.where(total > 0) * 100).fillna(0)
+    df["horas_paradas"] = df["min_parada"] / 60
+    return df
+
+def render_app(lista_plantas):
+    st.header("🌐 Visão Corporativa")
+    c1, c2 = st.columns(2)
+    d_ini = c1.date_input("De:", date.today().replace(day=1), key="corp_ini")
+    d_fim = c2.date_input("Até:", date.today(), key="corp_fim")
+
+    partes = []
+    for planta in lista_plantas:
+        try:
+            df = get_totais(planta, d_ini, d_fim)
+        except Exception as e:
+            # Uma planta fora do ar não derruba a visão das outras
+            st.warning(f"{plantas.nome(st.secrets, planta)}: " + banco.mensagem_erro(e, "Erro na leitura", "dashboard"))
+            continue
+        partes.append(df.assign(planta=plantas.nome(st.secrets, planta)))
+    if not partes:
+        st.info("Nenhuma planta respondeu.")
+        return
+
+    df = pd.concat(partes, ignore_index=True)
+    por_planta = _indicadores(df.groupby("planta", as_index=False, sort=False).sum(numeric_only=True))
+    geral = _indicadores(df.sum(numeric_only=True).to_frame().T)
+
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Peças Boas (todas as plantas)", f"{int(geral['boas'].iloc[0]):,}".replace(",", "."))
+    k2.metric("Refugo", f"{geral['refugo_pct'].iloc[0]:.1f}%")
+    k3.metric("Eficiência", f"{geral['eficiencia'].iloc[0]:.1f}%")
+    k4.metric("Horas Paradas", f"{geral['horas_paradas'].iloc[0]:.0f} h")
+
+    g1, g2 = st.columns(2)
+    with g1:
+        st.markdown("##### Peças Boas por Planta e Setor")
+        fig = px.bar(df, x="planta", y="boas", color="setor", text_auto=True, labels={"planta": "", "boas": "Peças"})
+        st.plotly_chart(fig, use_container_width=True)
+    with g2:
+        st.markdown("##### Eficiência por Planta (%)")
+        fig = px.bar(por_planta, x="planta", y="eficiencia", text_auto='.1f', range_y=[0, 110], labels={"planta": ""})
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.markdown("##### Detalhe por Planta e Setor")
+    det = _indicadores(df)[["planta", "setor", "boas", "refugo", "refugo_pct", "eficiencia", "horas_paradas"]]
+    st.dataframe(det, hide_index=True, use_container_width=True,
+                 column_config={"planta": "Planta", "setor": "Setor", "boas": "Boas", "refugo": "Refugo",
+                                "refugo_pct": st.column_config.NumberColumn("Refugo %", format="%.1f"),
+                                "eficiencia": st.column_config.NumberColumn("Eficiência %", format="%.1f"),
+                                "horas_paradas": st.column_config.NumberColumn("Horas Paradas", format="%.1f")})
+
+    st.divider()
+    st.markdown("##### 🔎 Busca no Histórico (todos os setores)")
+    _fragmento_busca(lista_plantas)
+
+@st.fragment
+def _fragmento_busca(lista_plantas):
+    # Mesma busca das telas dos setores, nos três de uma vez, numa planta
+    c0, c1, c2, c3 = st.columns([1, 3, 1, 1])
+    planta = c0.selectbox("Planta", lista_plantas, format_func=lambda p: plantas.nome(st.secrets, p),
+                          key="corp_busca_planta")
+    texto = c1.text_input("Buscar", placeholder='ex.: cliente, peça, "troca de óleo" -preventiva', key="corp_busca_texto")
+    b_ini = c2.date_input("De", date.today() - timedelta(days=365), key="corp_busca_ini")
+    b_fim = c3.date_input("Até", date.today(), key="corp_busca_fim")
+    c4, c5 = st.columns(2)
+    setores = c4.multiselect("Setores", list(busca.SETORES), default=list(busca.SETORES),
+                             format_func=busca.SETORES.get, key="corp_busca_setores")
+    tipos = c5.multiselect("Em", list(busca.TIPOS), default=list(busca.TIPOS), format_func=busca.TIPOS.get,
+                           key="corp_busca_tipos")
+    if not texto.strip() or not setores or not tipos:
+        st.caption("Digite uma ou mais palavras: todas precisam aparecer no registro.")
+        return
+
+    # Busca nova volta para a primeira página
+    filtro = (planta, texto, b_ini, b_fim, tuple(setores), tuple(tipos))
+    if st.session_state.get("corp_busca_filtro") != filtro:
+        st.session_state["corp_busca_filtro"] = filtro
+        st.session_state["corp_busca_pag"] = 0
+    pag = st.session_state["corp_busca_pag"]
+
+    query, params = busca.consulta(setores, tipos, texto, b_ini, b_fim, pagina=pag)
+    try:
+        df = buscar(planta, query, params)
+    except Exception as e:
+        st.warning(banco.mensagem_erro(e, "Erro na leitura", "leitura"))
+        return
+    total, n_pag = busca.paginas(df)
+    if not total:
+        st.info("Nada encontrado no período.")
+        return
+    st.caption(f"{total} registros encontrados, página {pag + 1} de {n_pag}.")
+    st.dataframe(df.drop(columns=["total"]), hide_index=True, use_container_width=True,
+                 column_config={"setor": "Setor", "registro": "Registro", "data": "Data",
+                                "maquina_operador": "Máquina / Operador", "texto": "Texto",
+                                "relevancia": st.column_config.NumberColumn("Relevância", format="%.3f")})
+    c_a, c_p = st.columns(2)
+    c_a.button("◀ Anterior", disabled=pag == 0, key="corp_busca_ant",
+               on_click=lambda: st.session_state.update(corp_busca_pag=pag - 1))
+    c_p.button("Próxima ▶", disabled=pag + 1 >= n_pag, key="corp_busca_prox",
+               on_click=lambda: st.session_state.update(corp_busca_pag=pag + 1))
+
+def render_ordens(lista_plantas):
+    st.header("📦 Ordens de Produção")
+    st.caption("Quanto de cada ordem (campo Cliente / Ordem Produção) já passou por cada setor.")
+    planta = lista_plantas[0]
+    if len(lista_plantas) > 1:
+        planta = st.selectbox("Planta", lista_plantas, format_func=lambda p: plantas.nome(st.secrets, p),
+                              key="ord_planta")
+    try:
+        recentes = buscar(planta, ordens.SQL_RECENTES, {"limite": ordens.LIMITE_RECENTES})
+    except Exception as e:
+        st.warning(banco.mensagem_erro(e, "Erro na leitura", "leitura"))
+        return
+    ordem = st.selectbox("Ordem", recentes["ordem"], index=None, accept_new_options=True,
+                         placeholder="Digite ou escolha", key="ord_ordem")
+
+    if not ordem:
+        # Sem ordem escolhida: as mais recentes, somadas nos setores
+        if recentes.empty:
+            st.info("Nenhuma ordem apontada ainda.")
+            return
+        st.markdown("##### Ordens com atividade mais recente")
+        df = ordens.indicadores(recentes)
+        st.dataframe(df[["ordem", "setores", "boas", "refugo", "refugo_pct", "horas", "ultimo_dia"]],
+                     hide_index=True, use_container_width=True,
+                     column_config={"ordem": "Ordem", "setores": "Setores", "boas": "Boas", "refugo": "Refugo",
+                                    "refugo_pct": st.column_config.NumberColumn("Refugo %", format="%.1f"),
+                                    "horas": st.column_config.NumberColumn("Horas", format="%.1f"),
+                                    "ultimo_dia": st.column_config.DateColumn("Última Atividade", format="DD/MM/YYYY")})
+        return
+
+    df = buscar(planta, ordens.SQL_ORDEM, ordens.params_ordem(ordem))
+    if df.empty:
+        st.info(f"Nenhum apontamento ativo para a ordem {ordem}.")
+        return
+    df = ordens.indicadores(df)
+    geral = ordens.indicadores(df[["boas", "refugo", "min_real"]].sum().to_frame().T)
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Peças Boas (soma dos setores)", f"{int(geral['boas'].iloc[0]):,}".replace(",", "."))
+    k2.metric("Refugo", f"{geral['refugo_pct'].iloc[0]:.1f}%")
+    k3.metric("Horas", f"{geral['horas'].iloc[0]:.1f} h")
+    k4.metric("Última Atividade", pd.to_datetime(df["ultimo_dia"]).max().strftime("%d/%m/%Y"))
+
+    df["setor"] = df["setor"].map(ordens.ROTULOS).fillna(df["setor"])
+    st.dataframe(df[["setor", "apontamentos", "boas", "refugo", "refugo_pct", "horas", "ultimo_dia"]],
+                 hide_index=True, use_container_width=True,
+                 column_config={"setor": "Setor", "apontamentos": "Apontamentos", "boas": "Boas", "refugo": "Refugo",
+                                "refugo_pct": st.column_config.NumberColumn("Refugo %", format="%.1f"),
+                                "horas": st.column_config.NumberColumn("Horas", format="%.1f"),
+                                "ultimo_dia": st.column_config.DateColumn("Última Atividade", format="DD/MM/YYYY")})
@@ -0,0 +1,69 @@
+# ==============================================================================
+# ENVIO IDEMPOTENTE (CLIQUE DUPLO E NOVA TENTATIVA NÃO GRAVAM EM DOBRO)
+# ==============================================================================
+# Em link lento o operador aperta "Salvar" de novo e o primeiro clique já
+# tinha gravado: apontamento duplicado e horímetro somado duas vezes.
+# Conferir antes de gravar ("já existe?") custaria mais uma ida ao banco.
+#
+# Cada envio leva uma chave gerada na sessão (chave_envio) e a tabela tem
+# índice único nela (só entre os ativos: registro excluído e lançado de
+# novo grava normal). O INSERT com chave vai na mesma transação do
+# horímetro, ciclo e sugestões: chave repetida -> o banco recusa, a
+# transação inteira volta e a tela trata como "já gravado". Sem nenhuma
+# consulta a mais, e por isso a escrita com chave pode ser repetida
+# automaticamente depois de uma queda de conexão (banco.executar).
+#
+# A chave é o hash do conteúdo com o token do login (o mesmo do cookie,
+# main.restaurar_sessao): o mesmo registro enviado duas vezes no mesmo
+# login (clique duplo, nova tentativa, F5 ou tablet que reconectou em
+# outro worker) cai na mesma chave; o mesmo conteúdo vindo de outro login
+# não. Sem token (sessão que não passou pelo login) vale um número gerado
+# na sessão do Streamlit, que o F5 troca.
+
+import hashlib
+import uuid
+
+import modules.banco as banco
+
+COLUNA = "chave_envio"
+
+# Token do login no st.session_state (main.py) e, na falta dele, número da
+# sessão gerado no primeiro envio
+_TOKEN = "token_sessao"
+_SESSAO = "_envio_sessao"
+
+
+def ddl(tabelas):
+    """SQL (Postgres) da coluna chave_envio + índice único nas tabelas. Idempotente."""
+    sql = ""
+    for t in tabelas:
+        sql += f"""
+    ALTER TABLE {t} ADD COLUMN IF NOT EXISTS {COLUNA} TEXT;
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_{t}_{COLUNA} ON {t} ({COLUNA}) WHERE ativo = 1;
+    """
+    return sql
+
+
+def chave(estado, *valores):
+    """
+    Chave de envio de um registro: hash dos valores com o token do login
+    (ou o número da sessão). estado: o st.session_state (ou qualquer dict
+    da sessão).
+    """
+    sessao = estado.get(_TOKEN) or estado.setdefault(_SESSAO, uuid.uuid4().hex)
+    return hashlib.sha1(repr((sessao,) + valores).encode("utf-8")).hexdigest()
+
+
+def chaves(estado, linhas):
+    """Uma chave por linha (tuplas de lote.linhas), para INSERT em lote."""
+    return [chave(estado, *linha) for linha in linhas]
+
+
+def tem_chave(comandos):
+    """True se algum comando (query, params) grava com chave de envio."""
+    return any(COLUNA in query for query, _ in comandos)
+
+
+def repetido(e):
+    """True se o erro é o índice único da chave de envio (registro já gravado)."""
+    return banco.tipo_erro(e) == "duplicado" and COLUNA in str(e)
@@ -0,0 +1,365 @@
+# ==============================================================================
+# ESPELHO LOCAL (SQLITE) DAS TABELAS DO SUPABASE PARA LEITURA
+# ==============================================================================
+# Os tablets estão na mesma rede do servidor (192.168.0.251), mas toda leitura
+# ia até o Supabase pela internet. O espelho guarda uma cópia das tabelas dos
+# setores num SQLite no próprio servidor:
+#
+#   - ESCRITA continua indo só para o Postgres (fonte da verdade)
+#   - LEITURA (listas, últimos registros, dashboards, histórico) vai no espelho
+#
+# Sincronização incremental por tabela:
+#   - linhas novas        -> id > último id copiado
+#   - alterações/exclusão -> coluna 'atualizado_em' (mantida por trigger no
+#                            Postgres; exclusão aqui é sempre 'ativo = 0')
+# Uma thread mantém o espelho atualizado a cada INTERVALO_SYNC segundos.
+#
+# Garantia de defasagem: antes de ler, se a última sincronização da tabela
+# tiver mais de 'estalidade_max' segundos, sincroniza na hora. Se não der
+# (internet fora, sync demorando), a leitura levanta EspelhoIndisponivel e
+# quem chamou lê direto do Postgres.
+#
+# Tipos: as colunas DATE, TIME e TIMESTAMP do Postgres são declaradas com
+# esses tipos no SQLite e a leitura devolve date/time/datetime, como o
+# pd.read_sql no Postgres e o banco.ler_copy (conversores registrados em
+# modules/local.py). Espelho antigo, com as tabelas sem tipo, é recriado e
+# copiado de novo na primeira sincronização.
+#
+# As telas dos setores usam do_setor / ler / invalidar (um espelho por
+# processo, setor e planta).
+
+import os
+import re
+import json
+import sqlite3
+import threading
+import time as _time
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import pandas as pd
+import psycopg2
+import psycopg2.extras
+
+import modules.banco as banco
+import modules.perfil as perfil
+import modules.plantas as plantas
+from modules.cluster import PASTA_DADOS
+
+ARQUIVO_DB = os.path.join(PASTA_DADOS, "espelho.db")
+
+# Defasagem máxima aceita numa leitura (segundos)
+ESTALIDADE_MAX = 30
+# Intervalo da sincronização em segundo plano (segundos)
+INTERVALO_SYNC = 10
+# Janela de segurança: transações que gravaram com 'atualizado_em' antigo
+# mas só comitaram depois da última leitura ainda são pegas
+MARGEM_MARCADOR = timedelta(minutes=2)
+LOTE = 5000
+
+# Tipos do Postgres (OID) declarados nas colunas do espelho
+_TIPOS = {1082: "DATE", 1083: "TIME", 1114: "TIMESTAMP", 1184: "TIMESTAMP"}
+
+# Espelhos abertos no processo: {(planta, tabelas): Espelho}
+_abertos = {}
+_trava_abertos = threading.Lock()
+
+
+class EspelhoIndisponivel(Exception):
+    pass
+
+
+def ddl_marcadores(tabelas):
+    """
+    SQL (Postgres) que cria a coluna 'atualizado_em' + trigger + índice
+    nas tabelas espelhadas. Idempotente.
+    """
+    sql = """
+    CREATE OR REPLACE FUNCTION ipar_marca_atualizacao() RETURNS trigger AS $$
+    BEGIN
+        NEW.atualizado_em := clock_timestamp();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql;
+    """
+    for t in tabelas:
+        sql += f"""
+    ALTER TABLE {t} ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMP DEFAULT clock_timestamp();
+    CREATE INDEX IF NOT EXISTS ix_{t}_atualizado ON {t} (atualizado_em);
+    DROP TRIGGER IF EXISTS trg_{t}_atualizado ON {t};
+    CREATE TRIGGER trg_{t}_atualizado BEFORE INSERT OR UPDATE ON {t}
+        FOR EACH ROW EXECUTE FUNCTION ipar_marca_atualizacao();
+    """
+    return sql
+
+
+def _valor_local(v):
+    """Converte valores do Postgres para tipos que o SQLite guarda."""
+    if isinstance(v, datetime):
+        return v.isoformat(sep=" ")
+    if isinstance(v, (date, time)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, (list, dict)):
+        return json.dumps(v, default=str)
+    if isinstance(v, psycopg2.extras.Range):
+        # periodo (tsrange, modules/sobreposicao.py) vira o texto do Postgres
+        if v.isempty:
+            return "empty"
+        return f"{'[' if v.lower_inc else '('}{v.lower},{v.upper}{']' if v.upper_inc else ')'}"
+    return v
+
+
+def para_sqlite(query, params):
+    """
+    Traduz uma query de LEITURA simples do dialeto Postgres/psycopg2
+    para o SQLite: placeholders, casts '::tipo' e ILIKE.
+    """
+    q = re.sub(r"::\w+(\[\])?", "", query)
+    q = re.sub(r"\bILIKE\b", "LIKE", q, flags=re.IGNORECASE)
+    if isinstance(params, dict):
+        q = re.sub(r"%\((\w+)\)s", r":\1", q)
+        params = {k: _valor_local(v) for k, v in params.items()}
+    else:
+        q = q.replace("%s", "?")
+        params = tuple(_valor_local(v) for v in (params or ()))
+    return q.replace("%%", "%"), params
+
+
+def _tabelas_da_query(query):
+    return set(re.findall(r"\b(?:FROM|JOIN)\s+([a-z_][a-z0-9_]*)", query, flags=re.IGNORECASE))
+
+
+class Espelho:
+    """
+    Espelho de um conjunto de tabelas. Uma instância por setor (mesmo
+    arquivo SQLite para todos). Seguro para várias threads do Streamlit.
+    """
+
+    def __init__(self, credenciais, tabelas, estalidade_max=ESTALIDADE_MAX, arquivo=ARQUIVO_DB):
+        self.credenciais = dict(credenciais)
+        self.tabelas = list(tabelas)
+        self.estalidade_max = estalidade_max
+        self.arquivo = arquivo
+        self._travas = {t: threading.Lock() for t in self.tabelas}
+        self._pg = None
+        self._thread = None
+        os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+        with self._local() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS _sync (
+                tabela TEXT PRIMARY KEY, ultimo_id INTEGER, marcador TEXT, sincronizado_em REAL)""")
+
+    # --------------------------------------------------------------------------
+    # Conexões
+    # --------------------------------------------------------------------------
+
+    @contextmanager
+    def _local(self):
+        conn = sqlite3.connect(self.arquivo, timeout=30, detect_types=sqlite3.PARSE_DECLTYPES)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _postgres(self):
+        # Conexão própria do espelho (não divide transação com a tela do usuário)
+        if not banco.viva(self._pg):
+            banco.fechar(self._pg)
+            self._pg = banco.conectar(self.credenciais, options=banco.opcao_tempo_limite("exportacao"))
+            self._pg.set_session(readonly=True, autocommit=True)
+        return self._pg
+
+    # --------------------------------------------------------------------------
+    # Sincronização
+    # --------------------------------------------------------------------------
+
+    def _estado(self, conn, tabela):
+        row = conn.execute("SELECT ultimo_id, marcador, sincronizado_em FROM _sync WHERE tabela = ?", (tabela,)).fetchone()
+        return row if row else (0, None, 0.0)
+
+    def _garantir_tabela(self, conn, tabela, colunas, tipos):
+        """Cria/atualiza a tabela no SQLite. True se ela foi (re)criada vazia."""
+        existentes = {r[1]: r[2] for r in conn.execute(f"PRAGMA table_info({tabela})")}
+        if any(c != "id" and c in existentes and existentes[c] != t for c, t in zip(colunas, tipos)):
+            # Espelho de antes dos tipos (ou tipo mudou no Postgres): recria
+            conn.execute(f"DROP TABLE {tabela}")
+            existentes = {}
+        if not existentes:
+            defs = ", ".join(f'"{c}"' + (" INTEGER PRIMARY KEY" if c == "id" else f" {t}" if t else "")
+                             for c, t in zip(colunas, tipos))
+            conn.execute(f"CREATE TABLE {tabela} ({defs})")
+            return True
+        # Coluna nova no Postgres -> acrescenta no espelho
+        for c, t in zip(colunas, tipos):
+            if c not in existentes:
+                conn.execute(f'ALTER TABLE {tabela} ADD COLUMN "{c}" {t}'.rstrip())
+        return False
+
+    def sincronizar(self, tabela, espera=None):
+        """
+        Traz as linhas novas/alteradas de uma tabela. Retorna False se outra
+        thread já estiver sincronizando e 'espera' (segundos) estourar.
+        """
+        trava = self._travas[tabela]
+        if not trava.acquire(timeout=-1 if espera is None else espera):
+            return False
+        try:
+            inicio = _time.time()
+            with self._local() as conn:
+                ultimo_id, marcador, _ = self._estado(conn, tabela)
+                desde = (datetime.fromisoformat(marcador) - MARGEM_MARCADOR) if marcador else datetime(1900, 1, 1)
+
+                pg = self._postgres()
+                sql = f"SELECT * FROM {tabela} WHERE id > %s OR atualizado_em > %s"
+                with pg.cursor() as cur:
+                    cur.execute(sql, (ultimo_id or 0, desde))
+                    colunas = [d[0] for d in cur.description]
+                    tipos = [_TIPOS.get(d[1], "") for d in cur.description]
+                    if self._garantir_tabela(conn, tabela, colunas, tipos) and (ultimo_id or marcador):
+                        # Tabela recriada: copia tudo de novo
+                        ultimo_id, marcador = 0, None
+                        cur.execute(sql, (0, datetime(1900, 1, 1)))
+                    i_id, i_marca = colunas.index("id"), colunas.index("atualizado_em")
+                    nomes = ", ".join(f'"{c}"' for c in colunas)
+                    marcas = ", ".join("?" for _ in colunas)
+                    while True:
+                        linhas = cur.fetchmany(LOTE)
+                        if not linhas:
+                            break
+                        conn.executemany(f"INSERT OR REPLACE INTO {tabela} ({nomes}) VALUES ({marcas})",
+                                         [tuple(_valor_local(v) for v in r) for r in linhas])
+                        ultimo_id = max([ultimo_id or 0] + [r[i_id] for r in linhas])
+                        maior = max((r[i_marca] for r in linhas if r[i_marca]), default=None)
+                        if maior and (not marcador or maior.isoformat(sep=" ") > marcador):
+                            marcador = maior.isoformat(sep=" ")
+
+                conn.execute("INSERT OR REPLACE INTO _sync (tabela, ultimo_id, marcador, sincronizado_em) VALUES (?, ?, ?, ?)",
+                             (tabela, ultimo_id, marcador, inicio))
+            return True
+        except psycopg2.Error:
+            # Conexão ruim: descarta para a próxima tentativa reconectar
+            banco.fechar(self._pg)
+            self._pg = None
+            raise
+        finally:
+            trava.release()
+
+    def sincronizar_tudo(self):
+        for t in self.tabelas:
+            try:
+                self.sincronizar(t, espera=0)
+            except Exception:
+                pass  # tenta de novo no próximo ciclo
+
+    def iniciar(self, intervalo=INTERVALO_SYNC):
+        """Liga a thread de sincronização em segundo plano (uma por processo)."""
+        if self._thread and self._thread.is_alive():
+            return
+        def laco():
+            while True:
+                self.sincronizar_tudo()
+                _time.sleep(intervalo)
+        self._thread = threading.Thread(target=laco, name="espelho-sync", daemon=True)
+        self._thread.start()
+
+    def invalidar(self, *queries):
+        """
+        Chamado depois de uma escrita no Postgres: marca as tabelas gravadas
+        como desatualizadas (em todos os workers, o arquivo é o mesmo), para
+        a próxima leitura já sincronizar e enxergar o que acabou de ser salvo.
+        """
+        tabelas = set()
+        for q in queries:
+            tabelas |= set(re.findall(r"\b(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+([a-z_][a-z0-9_]*)", q, flags=re.IGNORECASE))
+        tabelas &= set(self.tabelas)
+        if not tabelas:
+            return
+        try:
+            with self._local() as conn:
+                conn.executemany("UPDATE _sync SET sincronizado_em = 0 WHERE tabela = ?", [(t,) for t in tabelas])
+        except sqlite3.Error:
+            pass  # na pior hipótese a leitura fica defasada até o limite
+
+    # --------------------------------------------------------------------------
+    # Leitura
+    # --------------------------------------------------------------------------
+
+    def defasagem(self, tabela):
+        with self._local() as conn:
+            _, _, em = self._estado(conn, tabela)
+        return _time.time() - (em or 0)
+
+    def ler(self, query, params=None):
+        """
+        Executa uma query de leitura no espelho e devolve um DataFrame.
+        Garante que todas as tabelas usadas estão dentro da defasagem máxima.
+        """
+        tabelas = _tabelas_da_query(query)
+        if not tabelas or not tabelas.issubset(self.tabelas):
+            raise EspelhoIndisponivel(f"Tabela fora do espelho: {tabelas - set(self.tabelas)}")
+        for t in tabelas:
+            if self.defasagem(t) > self.estalidade_max:
+                try:
+                    ok = self.sincronizar(t, espera=2)
+                except Exception as e:
+                    raise EspelhoIndisponivel(str(e))
+                if not ok and self.defasagem(t) > self.estalidade_max:
+                    raise EspelhoIndisponivel(f"Sincronização de {t} em andamento")
+        q, p = para_sqlite(query, params)
+        t = perfil.relogio()
+        try:
+            with self._local() as conn:
+                df = pd.read_sql(q, conn, params=p)
+        except Exception as e:
+            raise EspelhoIndisponivel(str(e))
+        if t is not None:
+            perfil.consulta(t, f"[espelho] {q}", len(df))
+        return df
+
+
+# ------------------------------------------------------------------------------
+# Usado pelas telas dos setores
+# ------------------------------------------------------------------------------
+
+def do_setor(secrets, planta, tabelas):
+    """
+    Espelho das tabelas de um setor na planta, com a sincronização em
+    segundo plano ligada (um por processo). None com [espelho] ativo = false
+    no secrets e no banco local (modules/local.py), que já está na máquina.
+    """
+    cfg = secrets.get("espelho", {})
+    credenciais = plantas.credenciais(secrets, planta)
+    if not cfg.get("ativo", True) or banco.motor(credenciais) != "postgres":
+        return None
+    chave = (planta, tuple(tabelas))
+    with _trava_abertos:
+        esp = _abertos.get(chave)
+        if esp is None:
+            esp = Espelho(credenciais, tabelas, estalidade_max=cfg.get("estalidade_max", ESTALIDADE_MAX),
+                          arquivo=plantas.arquivo_local(planta, ARQUIVO_DB))
+            esp.iniciar()
+            _abertos[chave] = esp
+    return esp
+
+
+def ler(esp, query, params, alternativa):
+    """
+    Leitura pelo espelho (esp pode ser None). Se ele não puder garantir a
+    defasagem máxima, devolve alternativa() (a leitura direto no banco).
+    """
+    if esp:
+        try:
+            return esp.ler(query, params)
+        except EspelhoIndisponivel:
+            pass
+    return alternativa()
+
+
+def invalidar(esp, *queries):
+    """Depois de uma escrita: a próxima leitura das tabelas gravadas já sincroniza."""
+    if esp:
+        esp.invalidar(*queries)
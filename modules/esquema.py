@@ -0,0 +1,151 @@
+# ==============================================================================
+# DEFINIÇÃO DAS TABELAS DOS SETORES
+# ==============================================================================
+# Estrutura base de cada setor (apontamentos, paradas, manutenções e
+# cadastros) no dialeto do Postgres, idempotente (IF NOT EXISTS). As
+# estruturas auxiliares continuam nos módulos donos delas (horímetro,
+# ciclos, sugestões, marcadores do espelho, chave de envio, métricas,
+# sobreposição de horários, índices de busca, ordens de produção);
+# scripts(setor) junta tudo na ordem certa.
+#
+# É o que os init_db_* rodam no Supabase (onde as tabelas já existem e nada
+# muda) e o que cria do zero o banco local (modules/local.py).
+
+import modules.busca as busca
+import modules.ciclos as ciclos
+import modules.envio as envio
+import modules.espelho as espelho
+import modules.horimetro as horimetro
+import modules.metricas as metricas
+import modules.ordens as ordens
+import modules.sobreposicao as sobreposicao
+import modules.sugestoes as sugestoes
+
+TABELAS = {
+    "usinagem": """
+    CREATE TABLE IF NOT EXISTS usinagem_apontamentos (
+        id SERIAL PRIMARY KEY, data_registro DATE, cliente TEXT, descricao_pc TEXT, cod_programa TEXT,
+        maquina TEXT, tempo_ciclo_seg REAL, operador TEXT, setup_min INTEGER, inicio_prod TIME, fim_prod TIME,
+        qtd_produzida INTEGER, refugo INTEGER, ativo INTEGER DEFAULT 1, criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS usinagem_paradas_reg (
+        id SERIAL PRIMARY KEY, data_registro DATE, maquina TEXT, motivo TEXT, inicio TIME, fim TIME,
+        observacao TEXT, ativo INTEGER DEFAULT 1
+    );
+    CREATE TABLE IF NOT EXISTS usinagem_manutencoes (
+        id SERIAL PRIMARY KEY, data_manut DATE, maquina TEXT, tipo_manut TEXT, pecas_trocadas TEXT,
+        tecnico TEXT, ativo INTEGER DEFAULT 1
+    );
+    CREATE TABLE IF NOT EXISTS usinagem_maquinas (
+        id SERIAL PRIMARY KEY, nome TEXT, modelo TEXT, horimetro_total REAL DEFAULT 0,
+        meta_manutencao REAL DEFAULT 500, ativo INTEGER DEFAULT 1
+    );
+    CREATE TABLE IF NOT EXISTS usinagem_operadores (id SERIAL PRIMARY KEY, nome TEXT, ativo INTEGER DEFAULT 1);
+    CREATE TABLE IF NOT EXISTS usinagem_motivos_parada (id SERIAL PRIMARY KEY, motivo TEXT, ativo INTEGER DEFAULT 1);
+    """,
+
+    # Mesma estrutura do setup_estamparia.py (data e horários em texto)
+    "estamparia": """
+    CREATE TABLE IF NOT EXISTS estamparia_apontamentos (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        data TEXT, cliente TEXT, descricao_pc TEXT, operacao TEXT, materia_prima TEXT, maquina TEXT,
+        tempo_ciclo_seg REAL, operador TEXT, setup_min INTEGER, inicio_prod TEXT, fim_prod TEXT,
+        qtd_produzida INTEGER, refugo INTEGER, meta_pc_hora INTEGER DEFAULT 0,
+        custo_refugo_unit REAL DEFAULT 0, ativo INTEGER DEFAULT 1
+    );
+    CREATE TABLE IF NOT EXISTS estamparia_paradas_reg (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        data TEXT, maquina TEXT, motivo TEXT, inicio TEXT, fim TEXT, observacao TEXT, ativo INTEGER DEFAULT 1
+    );
+    CREATE TABLE IF NOT EXISTS estamparia_operadores (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, nome TEXT UNIQUE, ativo INTEGER DEFAULT 1
+    );
+    CREATE TABLE IF NOT EXISTS estamparia_maquinas (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, nome TEXT UNIQUE,
+        horimetro_total REAL DEFAULT 0, meta_manutencao REAL DEFAULT 500, ativo INTEGER DEFAULT 1
+    );
+    CREATE TABLE IF NOT EXISTS estamparia_manutencoes (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        data_manut TEXT, maquina TEXT, tipo_manut TEXT, descricao TEXT, tecnico TEXT, ativo INTEGER DEFAULT 1
+    );
+    CREATE TABLE IF NOT EXISTS estamparia_cad_operacoes (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, nome TEXT UNIQUE, ativo INTEGER DEFAULT 1
+    );
+    CREATE TABLE IF NOT EXISTS estamparia_cad_materias (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, nome TEXT UNIQUE, ativo INTEGER DEFAULT 1
+    );
+    CREATE TABLE IF NOT EXISTS estamparia_cad_paradas (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, nome TEXT UNIQUE, ativo INTEGER DEFAULT 1
+    );
+    """,
+
+    "furadeira": """
+    CREATE TABLE IF NOT EXISTS furadeira_operadores (id SERIAL PRIMARY KEY, nome TEXT, ativo INTEGER DEFAULT 1);
+    CREATE TABLE IF NOT EXISTS furadeira_motivos_parada (id SERIAL PRIMARY KEY, motivo TEXT, ativo INTEGER DEFAULT 1);
+    CREATE TABLE IF NOT EXISTS furadeira_apontamentos (
+        id SERIAL PRIMARY KEY, data_registro DATE, operador TEXT, cliente TEXT, peca TEXT,
+        tipo_operacao TEXT, tempo_ciclo_seg REAL, inicio_prod TIME, fim_prod TIME,
+        qtd_produzida INTEGER, refugo INTEGER, eficiencia_calc REAL, observacao TEXT,
+        ativo INTEGER DEFAULT 1, criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS furadeira_paradas_reg (
+        id SERIAL PRIMARY KEY, data_registro DATE, motivo TEXT, inicio TIME, fim TIME,
+        observacao TEXT, ativo INTEGER DEFAULT 1
+    );
+    """,
+}
+
+# Tabelas copiadas para o espelho local (SQLite no servidor da fábrica)
+TABELAS_ESPELHO = {
+    "usinagem": ["usinagem_apontamentos", "usinagem_paradas_reg", "usinagem_manutencoes",
+                 "usinagem_operadores", "usinagem_maquinas", "usinagem_motivos_parada"],
+    "estamparia": ["estamparia_apontamentos", "estamparia_paradas_reg", "estamparia_manutencoes",
+                   "estamparia_operadores", "estamparia_maquinas", "estamparia_cad_operacoes",
+                   "estamparia_cad_materias", "estamparia_cad_paradas"],
+    "furadeira": ["furadeira_operadores", "furadeira_motivos_parada", "furadeira_apontamentos", "furadeira_paradas_reg"],
+}
+
+# Tabelas gravadas pelos formulários, com chave de envio (modules/envio.py)
+TABELAS_ENVIO = {
+    "usinagem": ["usinagem_apontamentos", "usinagem_paradas_reg", "usinagem_manutencoes"],
+    "estamparia": ["estamparia_apontamentos", "estamparia_paradas_reg", "estamparia_manutencoes"],
+    "furadeira": ["furadeira_apontamentos", "furadeira_paradas_reg"],
+}
+
+# Campos de texto livre com autocompletar (campo -> coluna em <setor>_apontamentos)
+CAMPOS_SUGESTAO = {
+    "usinagem": {"cliente": "cliente", "descricao_pc": "descricao_pc", "cod_programa": "cod_programa"},
+    "estamparia": {"cliente": "cliente", "descricao_pc": "descricao_pc"},
+    "furadeira": {"cliente": "cliente", "peca": "peca"},
+}
+
+# Parâmetros das métricas gravadas (modules/metricas.py)
+METRICAS = {
+    "usinagem": {"col_indice": "maquina"},
+    "estamparia": {"indice_data": False},
+    "furadeira": {"col_indice": "operador", "eficiencia": True},
+}
+
+# Setores com livro-razão do horímetro (a furadeira não cadastra máquinas)
+COM_HORIMETRO = ("usinagem", "estamparia")
+
+
+def scripts(setor, modo_sobreposicao="aviso"):
+    """
+    Todos os DDLs do setor, na ordem de execução (cada um é um run_query).
+    modo_sobreposicao: 'aviso' ou 'bloquear' (modules/sobreposicao.py).
+    """
+    lista = [TABELAS[setor]]
+    if setor in COM_HORIMETRO:
+        lista.append(horimetro.ddl(setor))
+    lista += [
+        ciclos.ddl(setor),
+        sugestoes.ddl(setor, f"{setor}_apontamentos", CAMPOS_SUGESTAO[setor]),
+        espelho.ddl_marcadores(TABELAS_ESPELHO[setor]),
+        envio.ddl(TABELAS_ENVIO[setor]),
+        metricas.ddl(setor, **METRICAS[setor]),
+        sobreposicao.ddl(setor, modo_sobreposicao),
+        busca.ddl(setor),
+        ordens.ddl(setor),
+    ]
+    return lista
@@ -2,9 +2,25 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import psycopg2
 from datetime import datetime, date, time, timedelta
-import io
+import modules.horimetro as horimetro
+import modules.cluster as cluster
+import modules.ciclos as ciclos
+import modules.sugestoes as sugestoes
+import modules.turnos as turnos
+import modules.espelho as espelho
+import modules.banco as banco
+import modules.relatorios as relatorios
+import modules.graficos as graficos
+import modules.lote as lote
+import modules.cadastro as cadastro
+import modules.agregacao as agregacao
+import modules.esquema as esquema
+import modules.metricas as metricas
+import modules.envio as envio
+import modules.sobreposicao as sobreposicao
+import modules.busca as busca
+import modules.plantas as plantas
 
 # ==============================================================================
 # 1. CONFIGURAÇÕES DE CONEXÃO E BANCO DE DADOS (COM CACHE)
@@ -13,78 +29,250 @@ import io
 # Senha para áreas administrativas
 SENHA_SUPERVISOR = "1234"
 
+def _planta():
+    """
+    Planta do usuário logado (escolhida no main.py). Conexão, espelho e
+    caches são por planta: ela entra como argumento das funções cacheadas.
+    """
+    return st.session_state.get("planta", plantas.PADRAO)
+
+def _versao_cache(tabela):
+    return cluster.versao_cache(plantas.chave(_planta(), tabela))
+
+def _invalidar_cache(tabela):
+    cluster.invalidar_cache(plantas.chave(_planta(), tabela))
+
 @st.cache_resource(ttl=3600)
-def init_connection():
+def init_connection(planta):
     """
-    Estabelece a conexão com o Supabase (PostgreSQL) usando st.secrets.
+    Estabelece a conexão com o Supabase (PostgreSQL) da planta.
     Usa cache_resource para manter a conexão aberta por 1 hora (3600s),
-    evitando reconectar a cada interação do usuário.
+    evitando reconectar a cada interação do usuário. A conexão tem
+    keepalive TCP (ver modules/banco.py). Uma conexão por planta.
     """
     try:
-        return psycopg2.connect(
-            host=st.secrets["postgres"]["DB_HOST"],
-            user=st.secrets["postgres"]["DB_USER"],
-            password=st.secrets["postgres"]["DB_PASS"],
-            dbname=st.secrets["postgres"]["DB_NAME"],
-            port=st.secrets["postgres"]["DB_PORT"],
-            sslmode='require'
-        )
+        banco.configurar(st.secrets.get("tempo_limite", {}))
+        return banco.conectar(plantas.credenciais(st.secrets, planta))
     except Exception as e:
         st.error(f"Erro Fatal de Conexão: {e}")
         return None
 
-def run_query(query, params=(), fetch=False, commit=False):
+def get_connection(forcar=False):
+    """
+    Devolve a conexão do cache validada (pre-ping). Se o link caiu e a
+    conexão morreu, descarta o cache e reconecta sem mostrar erro.
+    """
+    planta = _planta()
+    conn = init_connection(planta)
+    if forcar or not banco.viva(conn):
+        banco.fechar(conn)
+        init_connection.clear(planta)  # só a desta planta
+        conn = init_connection(planta)
+    return conn
+
+def run_query(query, params=(), fetch=False, commit=False, classe=None):
     """
     Executa comandos SQL usando a conexão em cache.
     NÃO fecha a conexão ao final, apenas faz rollback em caso de erro.
+    'classe' define o tempo limite (banco.TEMPO_LIMITE); o padrão é
+    'escrita' com commit e 'formulario' sem.
     """
-    conn = init_connection()
-    result = None
-    
-    if conn:
-        try:
-            # Context manager (with) fecha o cursor automaticamente, mas mantém a conexão
-            with conn.cursor() as cur:
-                cur.execute(query, params)
-                if fetch:
-                    result = cur.fetchall()
-            
-            if commit:
-                conn.commit()
-                
-        except Exception as e:
-            # Em conexão persistente, é OBRIGATÓRIO fazer rollback se der erro,
-            # senão a próxima consulta falha com "current transaction is aborted"
-            conn.rollback()
-            st.error(f"Erro na execução do SQL: {e}")
-            
-    return result
+    def acao(conn, cur):
+        result = None
+        cur.execute(query, params)
+        if fetch:
+            result = cur.fetchall()
+        if commit:
+            conn.commit()
+            _apos_escrita(query)
+        return result
 
-def get_dataframe(query, params=()):
+    classe = classe or ("escrita" if commit else "formulario")
+    try:
+        # Leitura que cai por queda de conexão é repetida; escrita não
+        return banco.executar(get_connection, acao, classe, repetir=not commit)
+    except Exception as e:
+        st.error(banco.mensagem_erro(e, "Erro na execução do SQL", classe))
+        return None
+
+def get_dataframe(query, params=(), classe="leitura"):
     """
     Retorna um Pandas DataFrame a partir de uma query SQL.
     Usa a conexão em cache e trata erros sem fechar o socket.
+    Classes 'dashboard' e 'exportacao' leem em massa via COPY.
     """
-    conn = init_connection()
-    df = pd.DataFrame()
-    
-    if conn:
+    try:
+        return banco.executar(get_connection, banco.acao_leitura(query, params, classe), classe, repetir=True)
+    except Exception as e:
+        st.error(banco.mensagem_erro(e, "Erro ao ler dados", classe))
+        return pd.DataFrame()
+
+def run_transaction(comandos, classe="escrita"):
+    """
+    Executa uma lista de comandos (query, params) numa única transação.
+    Se qualquer um falhar, desfaz todos (rollback) e retorna None.
+    Com chave de envio (modules/envio.py) a transação é repetida se a
+    conexão cair, e chave já gravada conta como sucesso (clique duplo).
+    Horário cruzado com outro apontamento ou parada da máquina
+    (modules/sobreposicao.py): no modo aviso grava e avisa, no bloquear
+    a transação é recusada.
+    """
+    def acao(conn, cur):
+        for query, params in comandos:
+            banco.executar_comando(cur, query, params)
+        conn.commit()
+        _apos_escrita(*(q for q, _ in comandos))
+        for aviso in sobreposicao.avisos(conn):
+            st.toast(aviso, icon="⚠️")
+        return "OK"
+
+    try:
+        return banco.executar(get_connection, acao, classe, repetir=envio.tem_chave(comandos))
+    except Exception as e:
+        if envio.repetido(e):
+            st.toast("Este envio já estava gravado: nada foi duplicado.")
+            return "OK"
+        st.error(banco.mensagem_erro(e, "Erro na execução do SQL", classe))
+        return None
+
+@st.cache_resource
+def init_db_estamparia(planta):
+    """
+    Cria/migra as tabelas do setor e as estruturas auxiliares (horímetro,
+    ciclos, sugestões, espelho, métricas, sobreposição; ver modules/esquema.py).
+    Cacheado: roda uma vez por processo, não a cada interação.
+    """
+    modo = sobreposicao.modo(st.secrets.get("sobreposicao", {}), "estamparia")
+    for q in esquema.scripts("estamparia", modo):
+        run_query(q, commit=True, classe="manutencao")
+    metricas.preencher(lambda q: run_query(q, fetch=True, commit=True, classe="manutencao"))
+    return True
+
+# Tabelas copiadas para o espelho local (SQLite no servidor da fábrica)
+TABELAS_ESPELHO = esquema.TABELAS_ESPELHO["estamparia"]
+
+def get_espelho(planta):
+    """
+    Espelho local das tabelas do setor (modules/espelho.py), um por processo
+    e planta. None com [espelho] ativo = false no secrets e com o banco
+    local (modules/local.py), que já está na máquina.
+    """
+    return espelho.do_setor(st.secrets, planta, TABELAS_ESPELHO)
+
+def _apos_escrita(*queries):
+    """
+    Avisa o espelho das tabelas gravadas (a próxima leitura já sincroniza).
+    """
+    espelho.invalidar(get_espelho(_planta()), *queries)
+
+def ler_local(query, params=(), classe="leitura"):
+    """
+    Leitura pela rede local (espelho). Se o espelho não puder garantir a
+    defasagem máxima, lê direto do Supabase com get_dataframe.
+    """
+    return espelho.ler(get_espelho(_planta()), query, params, lambda: get_dataframe(query, params, classe))
+
+def _ler_banco(planta, query, params=(), classe="leitura"):
+    """
+    Leitura numa conexão do pool de leitura da planta (não na cacheada):
+    várias rodam ao mesmo tempo (ler_varios, get_listas).
+    """
+    leitores = banco.leitores(plantas.credenciais(st.secrets, planta))
+    return leitores.executar(banco.acao_leitura(query, params, classe), classe, repetir=True)
+
+def ler_varios(consultas, classe="leitura"):
+    """
+    Consultas independentes da tela ({nome: (query, params)}) ao mesmo
+    tempo: a tela espera só a mais lenta (banco.paralelo). Cada uma segue
+    o caminho do ler_local (espelho se der, senão o Supabase).
+    """
+    planta = _planta()
+    esp = get_espelho(planta)
+
+    def ler(query, params):
+        def no_banco():
+            try:
+                return _ler_banco(planta, query, params, classe)
+            except Exception as e:
+                return e  # mostrado abaixo, na thread da tela
+        return espelho.ler(esp, query, params, no_banco)
+
+    res = banco.paralelo({nome: (lambda q=q, p=p: ler(q, p)) for nome, (q, p) in consultas.items()})
+    for nome, r in res.items():
+        if isinstance(r, Exception):
+            st.error(banco.mensagem_erro(r, "Erro ao ler dados", classe))
+            res[nome] = pd.DataFrame()
+    return res
+
+# Campos com autocompletar: campo da sugestão -> coluna em estamparia_apontamentos
+CAMPOS_SUGESTAO = esquema.CAMPOS_SUGESTAO["estamparia"]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_sugestoes(planta, campo):
+    """
+    Valores mais usados do campo (opções do autocompletar).
+    O filtro enquanto digita acontece no navegador, sem ir ao banco.
+    """
+    res = run_query(sugestoes.sql_mais_usados("estamparia"), (campo, sugestoes.LIMITE_OPCOES), fetch=True)
+    return [r[0] for r in res] if res else []
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_parecidos(planta, campo, termo):
+    """
+    Grafias existentes parecidas com o termo (prefixo ou trigram).
+    """
+    res = run_query(sugestoes.sql_parecidos("estamparia"), sugestoes.params_parecidos(campo, termo), fetch=True)
+    return [r[0] for r in res] if res else []
+
+def sugerir_grafia(dados, rotulos):
+    """
+    Na confirmação, oferece trocar um valor novo por uma grafia já usada
+    (modules/sugestoes.py).
+    """
+    sugestoes.sugerir_grafia(dados, rotulos, lambda campo, termo: get_parecidos(_planta(), campo, termo),
+                             dados.__setitem__)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_ciclo_stats(planta, peca, maquina, operacao):
+    """
+    Estatística de ciclo real da combinação peça/máquina/operação
+    (busca pela chave primária). None se ainda não houver histórico.
+    """
+    res = run_query(ciclos.sql_consulta("estamparia"), ciclos.params_consulta(peca, maquina, operacao), fetch=True)
+    return ciclos.resumo(res[0]) if res else None
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _get_list_cache(planta, table_suffix, versao):
+    """
+    Leitura cacheada da lista. 'versao' vem do cluster: quando qualquer
+    worker altera o cadastro, a versão muda e o cache de todos expira.
+    """
+    query = f"SELECT nome FROM estamparia_{table_suffix} WHERE ativo = 1 ORDER BY nome"
+    def no_banco():
         try:
-            df = pd.read_sql(query, conn, params=params)
+            return _ler_banco(planta, query, classe="formulario")
         except Exception as e:
-            conn.rollback() # Limpa a transação em caso de erro na leitura
-            st.error(f"Erro ao ler dados: {e}")
-            
-    return df
+            st.error(banco.mensagem_erro(e, "Erro na execução do SQL", "formulario"))
+            raise LookupError(table_suffix) from e # Erro de banco não deve ficar no cache
+    return espelho.ler(get_espelho(planta), query, None, no_banco)["nome"].tolist()
 
 def get_list(table_suffix):
     """
     Busca lista de nomes ativos para dropdowns.
     Adiciona automaticamente o prefixo 'estamparia_'.
     """
-    query = f"SELECT nome FROM estamparia_{table_suffix} WHERE ativo = 1 ORDER BY nome"
-    res = run_query(query, fetch=True)
-    return [r[0] for r in res] if res else []
+    try:
+        return _get_list_cache(_planta(), table_suffix, _versao_cache(f"estamparia_{table_suffix}"))
+    except LookupError:
+        return []
+
+def get_listas(*sufixos):
+    """
+    Várias listas de uma vez, em paralelo: as que não estão no cache vão
+    ao banco juntas, e a tela espera só a mais lenta.
+    """
+    res = banco.paralelo({s: (lambda s=s: get_list(s)) for s in sufixos})
+    return [res[s] for s in sufixos]
 
 def soft_delete(table_suffix, id_registro):
     """
@@ -92,6 +280,7 @@ def soft_delete(table_suffix, id_registro):
     """
     query = f"UPDATE estamparia_{table_suffix} SET ativo = 0 WHERE id = %s"
     run_query(query, (id_registro,), commit=True)
+    _invalidar_cache(f"estamparia_{table_suffix}")
 
 # ==============================================================================
 # 2. FUNÇÃO PRINCIPAL (ENVELOPE)
@@ -101,6 +290,8 @@ def render_app():
     """
     Função principal que renderiza todo o módulo de Estamparia.
     """
+    init_db_estamparia(_planta())
+
     st.markdown("## 🏭 Módulo de Estamparia")
     st.markdown("---")
 
@@ -115,12 +306,13 @@ def render_app():
         "⚙️ Status Máquinas",
         "🛠️ Prontuário Manutenção",
         "⚙️ Cadastros Gerais",       
-        "📂 Histórico & Exportar"    
+        "📂 Histórico & Exportar",
+        "🔎 Busca no Histórico"
     ], key="nav_estamparia")
 
     # Controle de Acesso Supervisor
     autenticado = False
-    areas_restritas = ["⚙️ Cadastros Gerais", "📂 Histórico & Exportar"]
+    areas_restritas = ["⚙️ Cadastros Gerais", "📂 Histórico & Exportar", "🔎 Busca no Histórico"]
 
     if menu in areas_restritas:
         st.sidebar.markdown("🔒 **Área Restrita**")
@@ -138,124 +330,18 @@ def render_app():
     # ---------------- APONTAMENTO DIÁRIO ----------------
     if menu == "📝 Apontamento Diário":
         st.subheader("📝 Registro de Produção")
-        
-        if "confirma_est" not in st.session_state:
-            st.session_state.confirma_est = None
-        
-        # Carrega Listas
-        ops = get_list("operadores")
-        maqs = get_list("maquinas")
-        list_materias = get_list("cad_materias")
-        list_operacoes = get_list("cad_operacoes")
-        
-        if not ops or not maqs:
-            st.warning("⚠️ Cadastre Operadores e Máquinas em 'Cadastros Gerais' antes de apontar.")
+        modo = st.radio("Lançamento", ["Um apontamento", "Turno inteiro (grade)"], horizontal=True, key="est_modo")
+        if modo == "Um apontamento":
+            _fragmento_apontamento()
         else:
-            if st.session_state.confirma_est is None:
-                with st.form("form_prod_est", clear_on_submit=False):
-                    st.markdown("##### 1. Identificação")
-                    c1, c2, c3 = st.columns(3)
-                    with c1:
-                        data_reg = st.date_input("Data", date.today())
-                        cliente = st.text_input("Cliente")
-                        operador = st.selectbox("Operador", ops)
-                        maquina = st.selectbox("Máquina", maqs)
-                    with c2:
-                        desc_pc = st.text_input("Produto / Peça")
-                        operacao = st.selectbox("Operação", list_operacoes) if list_operacoes else st.text_input("Operação")
-                    with c3:
-                        materia = st.selectbox("Matéria-Prima", list_materias) if list_materias else st.text_input("Matéria")
-                        tempo_c = st.number_input("Ciclo (seg/pç)", value=5.0, step=0.1, min_value=0.1)
-
-                    st.markdown("##### 2. Quantidades e Horários")
-                    c4, c5, c6 = st.columns(3)
-                    with c4:
-                        qtd_p = st.number_input("Peças Boas", min_value=0)
-                        refugo = st.number_input("Refugo", min_value=0)
-                    with c5:
-                        h_i = st.time_input("Hora Início", time(7, 30))
-                        h_f = st.time_input("Hora Fim", time(17, 0))
-                    with c6:
-                        setup = st.number_input("Tempo Setup (min)", value=0)
-
-                    if st.form_submit_button("🔍 Revisar"):
-                        # Cálculo de horas
-                        dt_i = datetime.combine(data_reg, h_i)
-                        dt_f = datetime.combine(data_reg, h_f)
-                        if h_f < h_i: dt_f += timedelta(days=1)
-                        horas_trab = (dt_f - dt_i).total_seconds() / 3600
-                        
-                        erro = False
-                        if horas_trab <= 0:
-                            st.error("Tempo inválido.")
-                            erro = True
-                        if (qtd_p + refugo) <= 0:
-                            st.error("Quantidade zerada.")
-                            erro = True
-
-                        if not erro:
-                            st.session_state.confirma_est = {
-                                "data": data_reg, "cliente": cliente, "descricao_pc": desc_pc, 
-                                "operacao": operacao, "materia": materia, "maquina": maquina, 
-                                "tempo_c": tempo_c, "operador": operador, "setup": setup, 
-                                "h_i": h_i, "h_f": h_f, "qtd_p": qtd_p, "refugo": refugo,
-                                "horas_trab": horas_trab
-                            }
-                            st.rerun()
-
-            else:
-                # Confirmação
-                d = st.session_state.confirma_est
-                st.info("✋ **Confirme os dados:**")
-                k1, k2, k3, k4 = st.columns(4)
-                k1.metric("Produto", d['descricao_pc'])
-                k2.metric("Total Peças", int(d['qtd_p'] + d['refugo']))
-                k3.metric("Tempo", f"{d['horas_trab']:.2f} h")
-                
-                prod_total = d['qtd_p'] + d['refugo']
-                ciclo_real = (d['horas_trab'] * 3600) / prod_total if prod_total > 0 else 0
-                k4.metric("Ciclo Real", f"{ciclo_real:.1f}s")
-                
-                col_ok, col_nok = st.columns(2)
-                if col_ok.button("✅ SALVAR"):
-                    sql = """
-                        INSERT INTO estamparia_apontamentos 
-                        (data, cliente, descricao_pc, operacao, materia_prima, maquina, tempo_ciclo_seg, 
-                        operador, setup_min, inicio_prod, fim_prod, qtd_produzida, refugo, ativo) 
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 1)
-                    """
-                    params = (
-                        d['data'], d['cliente'], d['descricao_pc'], d['operacao'], d['materia'], d['maquina'],
-                        d['tempo_c'], d['operador'], d['setup'], d['h_i'].strftime("%H:%M"), 
-                        d['h_f'].strftime("%H:%M"), d['qtd_p'], d['refugo']
-                    )
-                    run_query(sql, params, commit=True)
-                    
-                    # Atualiza Horímetro
-                    run_query("UPDATE estamparia_maquinas SET horimetro_total = horimetro_total + %s WHERE nome = %s", 
-                             (d['horas_trab'], d['maquina']), commit=True)
-                    
-                    st.success("Salvo com sucesso!")
-                    st.session_state.confirma_est = None
-                    st.rerun()
-                
-                if col_nok.button("❌ VOLTAR"):
-                    st.session_state.confirma_est = None
-                    st.rerun()
+            _fragmento_grade()
 
-        st.divider()
-        st.markdown("### Últimos Registros")
-        df_ult = get_dataframe("""
-            SELECT id, data, maquina, operador, descricao_pc as "Produto", qtd_produzida as "Qtd" 
-            FROM estamparia_apontamentos WHERE ativo = 1 ORDER BY id DESC LIMIT 5
-        """)
-        st.dataframe(df_ult, use_container_width=True, hide_index=True)
+        _fragmento_ultimos()
 
     # ---------------- REGISTRAR PARADA ----------------
     elif menu == "⏸️ Registrar Parada":
         st.subheader("⏸️ Registrar Parada")
-        maqs = get_list("maquinas")
-        motivos = get_list("cad_paradas")
+        maqs, motivos = get_listas("maquinas", "cad_paradas")
         
         with st.form("form_parada_est"):
             c1, c2 = st.columns(2)
@@ -268,104 +354,30 @@ def render_app():
             
             if st.form_submit_button("Salvar Parada"):
                 sql = """
-                    INSERT INTO estamparia_paradas_reg (data, maquina, motivo, inicio, fim, observacao, ativo)
-                    VALUES (%s, %s, %s, %s, %s, %s, 1)
+                    INSERT INTO estamparia_paradas_reg (data, maquina, motivo, inicio, fim, observacao, chave_envio, ativo)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, 1)
                 """
-                run_query(sql, (dt_p, mq_p, mt_p, h_i.strftime("%H:%M"), h_f.strftime("%H:%M"), obs), commit=True)
-                st.success("Parada registrada!")
+                params = (dt_p, mq_p, mt_p, h_i.strftime("%H:%M"), h_f.strftime("%H:%M"), obs)
+                # Chave do envio: o segundo clique no mesmo registro não duplica
+                if run_transaction([(sql, params + (envio.chave(st.session_state, *params),))]):
+                    st.success("Parada registrada!")
         
         st.divider()
         st.write("Paradas de Hoje:")
-        df_par = get_dataframe("SELECT * FROM estamparia_paradas_reg WHERE data::date = %s AND ativo = 1", (date.today(),))
+        df_par = ler_local("SELECT * FROM estamparia_paradas_reg WHERE data::date = %s AND ativo = 1", (date.today(),))
         st.dataframe(df_par, use_container_width=True)
 
     # ---------------- DASHBOARD ----------------
     elif menu == "📊 Dashboard":
         st.subheader("📊 Indicadores de Performance")
         
-        # Filtro de Data
-        c1, c2 = st.columns(2)
-        d_ini = c1.date_input("De:", date.today().replace(day=1), key="d1_est")
-        d_fim = c2.date_input("Até:", date.today(), key="d2_est")
-        
-        # Carrega Dados
-        df = get_dataframe("SELECT * FROM estamparia_apontamentos WHERE ativo = 1 AND data::date BETWEEN %s AND %s", (d_ini, d_fim))
-        df_p = get_dataframe("SELECT * FROM estamparia_paradas_reg WHERE ativo = 1 AND data::date BETWEEN %s AND %s", (d_ini, d_fim))
-        
-        if df.empty:
-            st.info("Sem produção no período.")
-        else:
-            # Processamento de Dados
-            df['dt_ini'] = pd.to_datetime(df['data'].astype(str) + ' ' + df['inicio_prod'].astype(str))
-            df['dt_fim'] = pd.to_datetime(df['data'].astype(str) + ' ' + df['fim_prod'].astype(str))
-            df.loc[df['dt_fim'] < df['dt_ini'], 'dt_fim'] += timedelta(days=1)
-            
-            df['tempo_real_min'] = (df['dt_fim'] - df['dt_ini']).dt.total_seconds() / 60
-            df['tempo_teorico_min'] = ((df['qtd_produzida'] + df['refugo']) * df['tempo_ciclo_seg']) / 60
-            
-            # Cálculos KPI
-            tempo_prod = df['tempo_real_min'].sum()
-            tempo_parado = 0
-            
-            if not df_p.empty:
-                df_p['dt_ini'] = pd.to_datetime(df_p['data'].astype(str) + ' ' + df_p['inicio'].astype(str))
-                df_p['dt_fim'] = pd.to_datetime(df_p['data'].astype(str) + ' ' + df_p['fim'].astype(str))
-                df_p.loc[df_p['dt_fim'] < df_p['dt_ini'], 'dt_fim'] += timedelta(days=1)
-                tempo_parado = ((df_p['dt_fim'] - df_p['dt_ini']).dt.total_seconds() / 60).sum()
-            
-            tempo_disp = tempo_prod + tempo_parado
-            idx_disp = (tempo_prod / tempo_disp * 100) if tempo_disp > 0 else 0
-            
-            idx_perf = (df['tempo_teorico_min'].sum() / tempo_prod * 100) if tempo_prod > 0 else 0
-            if idx_perf > 100: idx_perf = 100
-            
-            total_pcs = df['qtd_produzida'].sum() + df['refugo'].sum()
-            idx_qual = (df['qtd_produzida'].sum() / total_pcs * 100) if total_pcs > 0 else 0
-            
-            oee = (idx_disp/100) * (idx_perf/100) * (idx_qual/100) * 100
-            
-            # Gráfico Gauge OEE
-            col_g, col_k = st.columns([1, 2])
-            with col_g:
-                fig = go.Figure(go.Indicator(
-                    mode = "gauge+number", value = oee, title = {'text': "OEE"},
-                    gauge = {'axis': {'range': [0, 100]}, 'bar': {'color': "#3366CC"},
-                             'steps': [{'range': [0, 65], 'color': "#FF9999"}, {'range': [85, 100], 'color': "#99FF99"}]}
-                ))
-                fig.update_layout(height=250, margin=dict(l=20,r=20,t=40,b=20))
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col_k:
-                k1, k2, k3 = st.columns(3)
-                k1.metric("Disponibilidade", f"{idx_disp:.1f}%")
-                k2.metric("Performance", f"{idx_perf:.1f}%")
-                k3.metric("Qualidade", f"{idx_qual:.1f}%", delta=f"Refugo: {df['refugo'].sum()}")
-                st.info(f"Produção Total: **{int(total_pcs)} peças**")
-
-            # Gráficos de Barra
-            g1, g2 = st.columns(2)
-            with g1:
-                st.markdown("##### Eficiência por Operador")
-                op_stats = df.groupby("operador").agg({"tempo_teorico_min": "sum", "tempo_real_min": "sum"}).reset_index()
-                op_stats['Efic'] = 0.0
-                mask = op_stats['tempo_real_min'] > 0
-                op_stats.loc[mask, 'Efic'] = (op_stats.loc[mask, 'tempo_teorico_min'] / op_stats.loc[mask, 'tempo_real_min']) * 100
-                fig_op = px.bar(op_stats, x="operador", y="Efic", text_auto='.1f', range_y=[0,110])
-                st.plotly_chart(fig_op, use_container_width=True)
+        _fragmento_dashboard()
 
     # ---------------- STATUS MÁQUINAS ----------------
     elif menu == "⚙️ Status Máquinas":
         st.subheader("⚙️ Manutenção Preventiva (Horímetros)")
-        df_mq = get_dataframe("SELECT * FROM estamparia_maquinas WHERE ativo = 1 ORDER BY nome")
         
-        if not df_mq.empty:
-            for _, r in df_mq.iterrows():
-                perc = (r['horimetro_total'] / r['meta_manutencao']) if r['meta_manutencao'] > 0 else 0
-                st.write(f"**{r['nome']}**")
-                c1, c2 = st.columns([4, 1])
-                c1.progress(min(perc, 1.0))
-                c2.write(f"{r['horimetro_total']:.0f} / {r['meta_manutencao']:.0f} h")
-                if perc >= 1: st.error("⚠️ Manutenção Vencida!")
+        _fragmento_horimetros()
 
     # ---------------- PRONTUÁRIO MANUTENÇÃO ----------------
     elif menu == "🛠️ Prontuário Manutenção":
@@ -383,41 +395,33 @@ def render_app():
             
             if st.form_submit_button("Registrar"):
                 sql = """
-                    INSERT INTO estamparia_manutencoes (data_manut, maquina, tipo_manut, descricao, tecnico, ativo)
-                    VALUES (%s, %s, %s, %s, %s, 1)
+                    INSERT INTO estamparia_manutencoes (data_manut, maquina, tipo_manut, descricao, tecnico, chave_envio, ativo)
+                    VALUES (%s, %s, %s, %s, %s, %s, 1)
                 """
-                run_query(sql, (dt_m, mq_m, tp_m, desc, tec), commit=True)
+                params = (dt_m, mq_m, tp_m, desc, tec)
+                # Chave do envio primeiro: clique duplo não zera o horímetro duas vezes
+                comandos = [(sql, params + (envio.chave(st.session_state, *params, zerar),))]
                 
                 if zerar:
-                    run_query("UPDATE estamparia_maquinas SET horimetro_total = 0 WHERE nome = %s", (mq_m,), commit=True)
+                    # Zeragem vira evento no livro-razão (não apaga o histórico)
+                    comandos.append(horimetro.cmd_zeragem("estamparia", mq_m, f"MANUTENCAO {tp_m.upper()}",
+                                                          horimetro.momento_do_dia(dt_m)))
                 
-                st.success("Manutenção registrada!")
+                if run_transaction(comandos):
+                    st.success("Manutenção registrada!")
 
     # ---------------- CADASTROS GERAIS ----------------
     elif menu == "⚙️ Cadastros Gerais" and autenticado:
         st.subheader("⚙️ Cadastros")
         t1, t2, t3, t4, t5 = st.tabs(["Operadores", "Máquinas", "Operações", "Materiais", "Paradas"])
         
-        def crud_simples(sufixo, label):
-            c1, c2 = st.columns([3, 1])
-            novo = c1.text_input(f"Novo {label}", key=f"n_{sufixo}")
-            if c2.button("Adicionar", key=f"add_{sufixo}"):
-                if novo:
-                    run_query(f"INSERT INTO estamparia_{sufixo} (nome, ativo) VALUES (%s, 1)", (novo.upper(),), commit=True)
-                    st.rerun()
-            
-            df = get_dataframe(f"SELECT * FROM estamparia_{sufixo} WHERE ativo=1 ORDER BY nome")
-            for _, r in df.iterrows():
-                ca, cb = st.columns([4, 1])
-                ca.write(r['nome'])
-                if cb.button("🗑️", key=f"del_{sufixo}_{r['id']}"):
-                    soft_delete(sufixo, r['id'])
-                    st.rerun()
+        def texto(rotulo):
+            return {"nome": st.column_config.TextColumn(rotulo, required=True)}
 
-        with t1: crud_simples("operadores", "Operador")
-        with t3: crud_simples("cad_operacoes", "Operação")
-        with t4: crud_simples("cad_materias", "Matéria")
-        with t5: crud_simples("cad_paradas", "Motivo")
+        with t1: _fragmento_cadastro("operadores", ["nome"], texto("Operador"))
+        with t3: _fragmento_cadastro("cad_operacoes", ["nome"], texto("Operação"))
+        with t4: _fragmento_cadastro("cad_materias", ["nome"], texto("Matéria"))
+        with t5: _fragmento_cadastro("cad_paradas", ["nome"], texto("Motivo"))
         
         with t2: # Máquinas (com meta)
             c1, c2, c3 = st.columns([2,1,1])
@@ -427,16 +431,14 @@ def render_app():
                 if nm:
                     run_query("INSERT INTO estamparia_maquinas (nome, meta_manutencao, ativo) VALUES (%s, %s, 1)", 
                              (nm.upper(), meta), commit=True)
+                    _invalidar_cache("estamparia_maquinas")
                     st.rerun()
             
-            df = get_dataframe("SELECT * FROM estamparia_maquinas WHERE ativo=1 ORDER BY nome")
-            for _, r in df.iterrows():
-                ca, cb, cc = st.columns([3, 1, 1])
-                ca.write(r['nome'])
-                cb.write(f"{r['meta_manutencao']}h")
-                if cc.button("🗑️", key=f"del_mq_{r['id']}"):
-                    soft_delete("maquinas", r['id'])
-                    st.rerun()
+            # Nome travado na grade: é ele que liga apontamentos e horímetro à máquina
+            _fragmento_cadastro("maquinas", ["nome", "meta_manutencao"], {
+                "nome": st.column_config.TextColumn("Máquina", disabled=True),
+                "meta_manutencao": st.column_config.NumberColumn("Meta (h)", min_value=0, step=10),
+            }, tipos={"meta_manutencao": "real"})
 
     # ---------------- HISTÓRICO E EXPORTAR ----------------
     elif menu == "📂 Histórico & Exportar" and autenticado:
@@ -444,7 +446,7 @@ def render_app():
         tab_v, tab_e = st.tabs(["Visualizar", "Exportar Excel"])
         
         with tab_v:
-            df = get_dataframe("SELECT id, data, maquina, operador, descricao_pc FROM estamparia_apontamentos WHERE ativo=1 ORDER BY id DESC LIMIT 20")
+            df = ler_local("SELECT id, data, maquina, operador, descricao_pc FROM estamparia_apontamentos WHERE ativo=1 ORDER BY id DESC LIMIT 20")
             st.dataframe(df, use_container_width=True)
             
             del_id = st.number_input("ID para excluir", step=1)
@@ -453,18 +455,550 @@ def render_app():
                 st.success("Excluído.")
                 st.rerun()
         
+            with st.expander("🔄 Recalcular estatísticas de ciclo"):
+                st.caption("Reconstrói a tabela de ciclos a partir de todo o histórico.")
+                if st.button("Recalcular Ciclos"):
+                    df_h = get_dataframe("""
+                        SELECT descricao_pc AS peca, maquina, operacao, data, inicio_prod, fim_prod,
+                               setup_min, qtd_produzida, refugo
+                        FROM estamparia_apontamentos WHERE ativo = 1
+                    """, classe="exportacao")
+                    if not df_h.empty:
+                        df_h['ciclo'] = ciclos.ciclo_real_df(df_h, 'data', 'inicio_prod', 'fim_prod', 'setup_min')
+                    if run_transaction(ciclos.cmds_reconstruir("estamparia", df_h), classe="exportacao"):
+                        get_ciclo_stats.clear()
+                        st.success(f"Estatísticas recalculadas ({len(df_h)} apontamentos).")
+
+            with st.expander("⏱️ Horários cruzados na mesma máquina"):
+                st.caption("Apontamento x apontamento, parada x parada e apontamento x parada da mesma máquina: "
+                           "o tempo entra em dobro na disponibilidade. Corrija ou exclua um dos dois; com "
+                           "[sobreposicao] estamparia = \"bloquear\" o banco recusa novos.")
+                if st.button("Procurar Sobreposições"):
+                    df_s = get_dataframe(sobreposicao.relatorio("estamparia"), classe="exportacao")
+                    if df_s.empty:
+                        st.success("Nenhum horário cruzado.")
+                    else:
+                        st.warning(f"{len(df_s)} pares cruzados, {df_s['minutos_cruzados'].sum():.0f} min contados em dobro.")
+                        st.dataframe(df_s, use_container_width=True, hide_index=True)
+                        st.download_button("⬇️ Baixar CSV", df_s.to_csv(index=False, sep=";").encode("utf-8-sig"),
+                                           "sobreposicoes_estamparia.csv", "text/csv")
+        
         with tab_e:
-            c1, c2 = st.columns(2)
-            d1 = c1.date_input("Início", date.today().replace(day=1))
-            d2 = c2.date_input("Fim", date.today())
-            
-            if st.button("Gerar Relatório Excel"):
-                df1 = get_dataframe("SELECT * FROM estamparia_apontamentos WHERE ativo=1 AND data::date BETWEEN %s AND %s", (d1, d2))
-                df2 = get_dataframe("SELECT * FROM estamparia_paradas_reg WHERE ativo=1 AND data::date BETWEEN %s AND %s", (d1, d2))
-                
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    if not df1.empty: df1.to_excel(writer, sheet_name="Producao", index=False)
-                    if not df2.empty: df2.to_excel(writer, sheet_name="Paradas", index=False)
-                
-                st.download_button("⬇️ Baixar", output.getvalue(), f"Estamparia_{d1}_{d2}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            _fragmento_relatorios()
+
+    elif menu == "🔎 Busca no Histórico" and autenticado:
+        st.header("🔎 Busca no Histórico")
+        st.caption("Apontamentos, paradas e manutenções por cliente, peça, operação, motivo ou observação.")
+        _fragmento_busca()
+
+# ==============================================================================
+# 4. FRAGMENTOS (RERUN PARCIAL)
+# ==============================================================================
+# Cada bloco é um @st.fragment: mexer num widget dele reexecuta só o bloco
+# (e só as consultas dele), não a página toda. Depois de gravar, st.rerun()
+# normal atualiza a página inteira (ex.: Últimos Registros).
+
+@st.fragment
+def _fragmento_apontamento():
+    """
+    Formulário + confirmação. Trocar peça/máquina/operação (ciclo padrão)
+    não recarrega os Últimos Registros.
+    """
+    if "confirma_est" not in st.session_state:
+        st.session_state.confirma_est = None
+
+    # Carrega Listas
+    ops, maqs, list_materias, list_operacoes = get_listas("operadores", "maquinas", "cad_materias", "cad_operacoes")
+
+    if not ops or not maqs:
+        st.warning("⚠️ Cadastre Operadores e Máquinas em 'Cadastros Gerais' antes de apontar.")
+    else:
+        if st.session_state.confirma_est is None:
+            st.markdown("##### 1. Identificação")
+            # Fora do form para reagir na hora: define o ciclo padrão aprendido
+            c1, c2, c3 = st.columns(3)
+            desc_pc = c1.selectbox("Produto / Peça", get_sugestoes(_planta(), "descricao_pc"), index=None,
+                                   accept_new_options=True, placeholder="Digite ou escolha", key="est_peca")
+            maquina = c2.selectbox("Máquina", maqs, key="est_maquina")
+            operacao = c3.selectbox("Operação", list_operacoes, key="est_operacao") if list_operacoes else c3.text_input("Operação", key="est_operacao")
+            stats_ciclo = get_ciclo_stats(_planta(), desc_pc, maquina, operacao) if desc_pc else None
+            ciclo_padrao = max(round(stats_ciclo['mediana'], 1), 0.1) if stats_ciclo else 5.0
+
+            with st.form("form_prod_est", clear_on_submit=False):
+                c1, c2, c3 = st.columns(3)
+                with c1:
+                    data_reg = st.date_input("Data", date.today())
+                    operador = st.selectbox("Operador", ops)
+                with c2:
+                    cliente = st.selectbox("Cliente", get_sugestoes(_planta(), "cliente"), index=None,
+                                           accept_new_options=True, placeholder="Digite ou escolha")
+                with c3:
+                    materia = st.selectbox("Matéria-Prima", list_materias) if list_materias else st.text_input("Matéria")
+                    tempo_c = st.number_input("Ciclo (seg/pç)", value=ciclo_padrao, step=0.1, min_value=0.1,
+                                              help=f"Padrão aprendido: mediana de {stats_ciclo['n']} apontamentos" if stats_ciclo else None)
+
+                st.markdown("##### 2. Quantidades e Horários")
+                c4, c5, c6 = st.columns(3)
+                with c4:
+                    qtd_p = st.number_input("Peças Boas", min_value=0)
+                    refugo = st.number_input("Refugo", min_value=0)
+                with c5:
+                    h_i = st.time_input("Hora Início", time(7, 30))
+                    h_f = st.time_input("Hora Fim", time(17, 0))
+                with c6:
+                    setup = st.number_input("Tempo Setup (min)", value=0)
+
+                if st.form_submit_button("🔍 Revisar"):
+                    # Cálculo de horas
+                    dt_i = datetime.combine(data_reg, h_i)
+                    dt_f = datetime.combine(data_reg, h_f)
+                    if h_f < h_i: dt_f += timedelta(days=1)
+                    horas_trab = (dt_f - dt_i).total_seconds() / 3600
+
+                    erro = False
+                    if horas_trab <= 0:
+                        st.error("Tempo inválido.")
+                        erro = True
+                    if (qtd_p + refugo) <= 0:
+                        st.error("Quantidade zerada.")
+                        erro = True
+
+                    if not erro:
+                        st.session_state.confirma_est = {
+                            "data": data_reg, "cliente": sugestoes.normalizar(cliente),
+                            "descricao_pc": sugestoes.normalizar(desc_pc), 
+                            "operacao": operacao, "materia": materia, "maquina": maquina, 
+                            "tempo_c": tempo_c, "operador": operador, "setup": setup, 
+                            "h_i": h_i, "h_f": h_f, "qtd_p": qtd_p, "refugo": refugo,
+                            "horas_trab": horas_trab, "fim": dt_f
+                        }
+                        st.rerun(scope="fragment")
+
+        else:
+            # Confirmação
+            d = st.session_state.confirma_est
+            st.info("✋ **Confirme os dados:**")
+            k1, k2, k3, k4 = st.columns(4)
+            k1.metric("Produto", d['descricao_pc'])
+            k2.metric("Total Peças", int(d['qtd_p'] + d['refugo']))
+            k3.metric("Tempo", f"{d['horas_trab']:.2f} h")
+
+            prod_total = d['qtd_p'] + d['refugo']
+            ciclo_real = ciclos.ciclo_real_seg(d['horas_trab'], d['setup'], prod_total)
+            k4.metric("Ciclo Real", f"{ciclo_real:.1f}s")
+
+            # Sinaliza ciclo fora da faixa normal do histórico
+            stats_ciclo = get_ciclo_stats(_planta(), d['descricao_pc'], d['maquina'], d['operacao'])
+            if ciclos.eh_outlier(ciclo_real, stats_ciclo):
+                lim_inf, lim_sup = ciclos.faixa_normal(stats_ciclo)
+                st.warning(f"⚠️ Ciclo real fora do padrão histórico: normal entre {lim_inf:.1f}s e {lim_sup:.1f}s "
+                           f"(mediana {stats_ciclo['mediana']:.1f}s em {stats_ciclo['n']} apontamentos). Confira quantidades e horários.")
+
+            sugerir_grafia(d, {"cliente": "Cliente", "descricao_pc": "Produto"})
+
+            col_ok, col_nok = st.columns(2)
+            if col_ok.button("✅ SALVAR"):
+                sql = """
+                    INSERT INTO estamparia_apontamentos 
+                    (data, cliente, descricao_pc, operacao, materia_prima, maquina, tempo_ciclo_seg, 
+                    operador, setup_min, inicio_prod, fim_prod, qtd_produzida, refugo, chave_envio, ativo) 
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 1)
+                """
+                params = (
+                    d['data'], d['cliente'], d['descricao_pc'], d['operacao'], d['materia'], d['maquina'],
+                    d['tempo_c'], d['operador'], d['setup'], d['h_i'].strftime("%H:%M"), 
+                    d['h_f'].strftime("%H:%M"), d['qtd_p'], d['refugo']
+                )
+                # Chave do envio (modules/envio.py): clique duplo ou nova tentativa
+                # esbarra no índice único e a transação inteira não se repete
+                params += (envio.chave(st.session_state, *params),)
+                # Apontamento + evento de uso no horímetro numa transação só
+                comandos = [
+                    (sql, params),
+                    horimetro.cmd_uso("estamparia", d['maquina'], d['horas_trab'], "APONTAMENTO", d['fim']),
+                ]
+                # Atualização incremental da estatística de ciclo
+                cmd_ciclo = ciclos.cmd_registrar("estamparia", d['descricao_pc'], d['maquina'], d['operacao'], ciclo_real)
+                if cmd_ciclo:
+                    comandos.append(cmd_ciclo)
+                # Conta o uso de cliente/peça no dicionário de sugestões
+                for campo in CAMPOS_SUGESTAO:
+                    cmd_sug = sugestoes.cmd_registrar("estamparia", campo, d[campo])
+                    if cmd_sug:
+                        comandos.append(cmd_sug)
+                ok = run_transaction(comandos)
+
+                if ok:
+                    run_transaction(horimetro.cmds_snapshot("estamparia", d['maquina']))
+                    get_sugestoes.clear()
+                    get_parecidos.clear()
+                    st.success("Salvo com sucesso!")
+                    st.session_state.confirma_est = None
+                    st.rerun()
+
+            if col_nok.button("❌ VOLTAR"):
+                st.session_state.confirma_est = None
+                st.rerun(scope="fragment")
+
+
+# Colunas da grade do turno (mesmos nomes de estamparia_apontamentos)
+COLUNAS_GRADE = {"maquina": "texto", "operador": "texto", "operacao": "texto", "materia_prima": "texto",
+                 "descricao_pc": "texto", "cliente": "texto", "tempo_ciclo_seg": "numero", "setup_min": "numero",
+                 "inicio_prod": "hora", "fim_prod": "hora", "qtd_produzida": "numero", "refugo": "numero"}
+
+
+@st.fragment
+def _fragmento_grade():
+    """
+    Turno inteiro numa grade: todas as linhas validadas juntas e gravadas
+    numa transação só (ver modules/lote.py).
+    """
+    ops, maqs, list_materias, list_operacoes = get_listas("operadores", "maquinas", "cad_materias", "cad_operacoes")
+    if not ops or not maqs:
+        st.warning("⚠️ Cadastre Operadores e Máquinas em 'Cadastros Gerais' antes de apontar.")
+        return
+
+    def lista_ou_texto(rotulo, opcoes):
+        if opcoes:
+            return st.column_config.SelectboxColumn(rotulo, options=opcoes)
+        return st.column_config.TextColumn(rotulo)
+
+    # A versão troca a key do editor: depois de gravar a grade volta em branco
+    st.session_state.setdefault("grade_est_versao", 0)
+    data_reg = st.date_input("Data do Turno", date.today(), key="grade_est_data")
+    grade = st.data_editor(
+        lote.grade_vazia(COLUNAS_GRADE), num_rows="dynamic", hide_index=True, use_container_width=True,
+        key=f"grade_est_{st.session_state.grade_est_versao}",
+        column_config={
+            "maquina": st.column_config.SelectboxColumn("Máquina", options=maqs, required=True),
+            "operador": st.column_config.SelectboxColumn("Operador", options=ops, required=True),
+            "operacao": lista_ou_texto("Operação", list_operacoes),
+            "materia_prima": lista_ou_texto("Matéria-Prima", list_materias),
+            "descricao_pc": st.column_config.TextColumn("Produto", required=True),
+            "cliente": st.column_config.TextColumn("Cliente"),
+            "tempo_ciclo_seg": st.column_config.NumberColumn("Ciclo (s/pç)", min_value=0.1, step=0.1, required=True),
+            "setup_min": st.column_config.NumberColumn("Setup (min)", min_value=0, step=1, default=0),
+            "inicio_prod": st.column_config.TimeColumn("Início", format="HH:mm", step=60, required=True),
+            "fim_prod": st.column_config.TimeColumn("Fim", format="HH:mm", step=60, required=True),
+            "qtd_produzida": st.column_config.NumberColumn("Boas", min_value=0, step=1, default=0),
+            "refugo": st.column_config.NumberColumn("Refugo", min_value=0, step=1, default=0),
+        })
+
+    if not st.button("💾 Validar e Gravar Lote"):
+        return
+    df = lote.preparar(grade, data_reg)
+    if df.empty:
+        st.warning("A grade está vazia.")
+        return
+
+    # Validação de todas as linhas juntas, contra o que já foi gravado no dia
+    existentes = ler_local("SELECT maquina, data, inicio_prod, fim_prod FROM estamparia_apontamentos WHERE ativo = 1 AND data::date = %s",
+                           (data_reg,))
+    existentes = lote.preparar(existentes, None, col_data="data") if not existentes.empty else None
+    df = lote.validar(df, {"maquina": "Máquina", "operador": "Operador", "descricao_pc": "Produto", "tempo_ciclo_seg": "Ciclo"},
+                      existentes=existentes)
+    erros = df[df['erro'] != ""]
+    if not erros.empty:
+        st.error(f"❌ {len(erros)} linha(s) com problema. Nada foi gravado.")
+        st.dataframe(erros.assign(linha=erros.index + 1)[['linha', 'maquina', 'inicio_prod', 'fim_prod', 'erro']],
+                     hide_index=True, use_container_width=True)
+        return
+
+    df['data'] = data_reg
+    df['ativo'] = 1
+    df[['setup_min', 'qtd_produzida', 'refugo']] = df[['setup_min', 'qtd_produzida', 'refugo']].fillna(0).astype(int)
+    for campo in CAMPOS_SUGESTAO:
+        df[campo] = df[campo].where(df[campo].notna(), None).map(sugestoes.normalizar)
+    df['ciclo'] = ciclos.ciclo_real_df(df, 'data', 'inicio_prod', 'fim_prod', 'setup_min')
+    # Horários gravados como 'HH:MM', igual ao formulário
+    df['inicio_prod'] = df['dt_ini'].dt.strftime("%H:%M")
+    df['fim_prod'] = df['dt_fim'].dt.strftime("%H:%M")
+
+    # Todos os apontamentos num INSERT só + horímetro por máquina + ciclos e sugestões em lote
+    colunas = ['data', 'cliente', 'descricao_pc', 'operacao', 'materia_prima', 'maquina', 'tempo_ciclo_seg',
+               'operador', 'setup_min', 'inicio_prod', 'fim_prod', 'qtd_produzida', 'refugo', 'ativo']
+    # Uma chave de envio por linha: gravar a mesma grade de novo não duplica
+    df['chave_envio'] = envio.chaves(st.session_state, lote.linhas(df, colunas))
+    colunas.append('chave_envio')
+    comandos = [(f"INSERT INTO estamparia_apontamentos ({', '.join(colunas)}) VALUES %s",
+                 banco.Linhas(lote.linhas(df, colunas)))]
+    horas = lote.horas_por_maquina(df)
+    comandos += [horimetro.cmd_uso("estamparia", m, h, "APONTAMENTO LOTE", fim) for m, h, fim in lote.usos_por_dia(df)]
+    cmd_ciclo = ciclos.cmd_registrar_lote("estamparia", df.rename(columns={'descricao_pc': 'peca'}))
+    cmd_sug = sugestoes.cmd_registrar_lote("estamparia", {campo: df[campo] for campo in CAMPOS_SUGESTAO})
+    comandos += [c for c in (cmd_ciclo, cmd_sug) if c]
+
+    if run_transaction(comandos):
+        run_transaction([c for m in horas for c in horimetro.cmds_snapshot("estamparia", m)])
+        get_sugestoes.clear()
+        get_parecidos.clear()
+        get_ciclo_stats.clear()
+        st.session_state.grade_est_versao += 1
+        st.toast(f"Salvo com sucesso! {len(df)} apontamentos ({sum(horas.values()):.1f} h em {len(horas)} máquina(s)).")
+        st.rerun()
+
+
+@st.fragment
+def _fragmento_cadastro(sufixo, colunas, column_config, tipos=None):
+    """
+    Cadastro editado na grade: inclua, altere ou apague linhas e salve tudo
+    de uma vez. Só o que mudou vai para o banco, num comando só
+    (ver modules/cadastro.py). Apagar a linha = exclusão lógica.
+    """
+    tabela = f"estamparia_{sufixo}"
+    chave_versao = f"cad_{sufixo}_versao"
+    st.session_state.setdefault(chave_versao, 0)
+    original = ler_local(f"SELECT id, {', '.join(colunas)} FROM {tabela} WHERE ativo = 1 ORDER BY {colunas[0]}")
+    editado = st.data_editor(
+        original, num_rows="dynamic", hide_index=True, use_container_width=True,
+        key=f"cad_{sufixo}_{st.session_state[chave_versao]}",
+        column_config={"id": None, **column_config})
+
+    if not st.button("💾 Salvar alterações", key=f"salvar_{sufixo}"):
+        return
+    dif = cadastro.diff(original, editado, colunas)
+    if dif["erro"]:
+        st.error(f"❌ {dif['erro']} Nada foi gravado.")
+    elif cadastro.vazio(dif):
+        st.info("Nenhuma alteração.")
+    elif run_transaction([cadastro.cmd_aplicar(tabela, dif, colunas, tipos)]):
+        _invalidar_cache(tabela)
+        st.session_state[chave_versao] += 1
+        st.toast(f"✅ {cadastro.resumo(dif)}.")
+        st.rerun()
+
+
+@st.fragment
+def _fragmento_ultimos():
+    """
+    Últimos 5 apontamentos (pelo espelho local).
+    """
+    st.divider()
+    st.markdown("### Últimos Registros")
+    df_ult = ler_local("""
+        SELECT id, data, maquina, operador, descricao_pc as "Produto", qtd_produzida as "Qtd" 
+        FROM estamparia_apontamentos WHERE ativo = 1 ORDER BY id DESC LIMIT 5
+    """)
+    st.dataframe(df_ult, use_container_width=True, hide_index=True)
+
+
+@st.fragment
+def _fragmento_dashboard():
+    """
+    Filtro de período + KPIs + gráficos: trocar as datas reexecuta só o painel.
+    """
+    # Filtro de Data
+    c1, c2 = st.columns(2)
+    d_ini = c1.date_input("De:", date.today().replace(day=1), key="d1_est")
+    d_fim = c2.date_input("Até:", date.today(), key="d2_est")
+
+    # Período longo (ou pedido): totais lidos em blocos, sem carregar as linhas
+    longo = (d_fim - d_ini).days + 1 > agregacao.DIAS_EM_MEMORIA
+    if longo or st.toggle("Somar em blocos", key="blocos_est", help="Memória constante, para qualquer período"):
+        _painel_em_blocos(d_ini, d_fim)
+        return
+
+    # Carrega Dados
+    # Produção e paradas do período vêm juntas (em paralelo)
+    dados = ler_varios({
+        "prod": ("SELECT * FROM estamparia_apontamentos WHERE ativo = 1 AND data::date BETWEEN %s AND %s", (d_ini, d_fim)),
+        "paradas": ("SELECT * FROM estamparia_paradas_reg WHERE ativo = 1 AND data::date BETWEEN %s AND %s", (d_ini, d_fim)),
+    }, "dashboard")
+    df, df_p = dados["prod"], dados["paradas"]
+
+    if df.empty:
+        st.info("Sem produção no período.")
+    else:
+        # Processamento de Dados (mesmas contas dos totais em blocos)
+        df = agregacao.preparar_producao(df)
+        if not df_p.empty:
+            df_p = agregacao.preparar_paradas(df_p)
+        prod = agregacao.somar_producao(df)
+        paradas = agregacao.somar_paradas(df_p) if not df_p.empty else pd.DataFrame(columns=["tempo_parado_min"])
+
+        g1, g2 = _painel_kpis(prod, paradas)
+
+        # Intervalos fatiados por turno e hora (virada de dia incluída)
+        lista_turnos = turnos.turnos_do_setor(st.secrets.get("turnos", {}), "estamparia")
+        df['teorico_min'] = df['tempo_teorico_min']
+        f_prod = turnos.fatiar(df, lista_turnos, ['teorico_min', 'qtd_produzida', 'refugo'], ['maquina'])
+        f_par = turnos.fatiar(df_p, lista_turnos, colunas_chave=['maquina']) if not df_p.empty else None
+
+        with g2:
+            st.markdown("##### OEE por Turno")
+            oee_t = turnos.oee_por_turno(f_prod, f_par, paradas_dentro=False, por_dia=False)
+            fig_t = px.bar(oee_t, x="turno", y="oee", text_auto='.1f', range_y=[0, 110],
+                           hover_data={"disponibilidade": ':.1f', "performance": ':.1f', "qualidade": ':.1f'})
+            st.plotly_chart(fig_t, use_container_width=True)
+
+        st.markdown("##### Ocupação por Máquina x Hora do Dia (%)")
+        mapa = turnos.mapa_calor(f_prod, 'maquina', dias=(d_fim - d_ini).days + 1)
+        fig_hm = px.imshow(mapa, labels=dict(x="Hora do Dia", y="Máquina", color="% Ocupado"),
+                           color_continuous_scale="RdYlGn", zmin=0, zmax=100, aspect="auto")
+        st.plotly_chart(fig_hm, use_container_width=True)
+
+        # Série no tempo reduzida (LTTB): o gráfico tem no máximo
+        # graficos.PONTOS_MAX pontos, seja 1 dia ou 1 ano de período
+        st.markdown("##### Peças Boas por Hora no Período")
+        serie = graficos.serie_por_periodo(f_prod, 'qtd_produzida', freq='h')
+        fig_s = px.line(serie, x='periodo', y='qtd_produzida', labels={'periodo': '', 'qtd_produzida': 'Peças/h'})
+        st.plotly_chart(fig_s, use_container_width=True)
+
+
+def _painel_kpis(prod, paradas):
+    """
+    Gauge do OEE, KPIs e eficiência por operador a partir dos totais
+    (agregacao.somar_* ou agregacao.totais_*). Devolve as colunas dos
+    gráficos de barra (a segunda fica livre para quem chamou).
+    """
+    ind = agregacao.indicadores(prod, paradas)
+
+    # Gráfico Gauge OEE
+    col_g, col_k = st.columns([1, 2])
+    with col_g:
+        fig = go.Figure(go.Indicator(
+            mode = "gauge+number", value = ind['oee'], title = {'text': "OEE"},
+            gauge = {'axis': {'range': [0, 100]}, 'bar': {'color': "#3366CC"},
+                     'steps': [{'range': [0, 65], 'color': "#FF9999"}, {'range': [85, 100], 'color': "#99FF99"}]}
+        ))
+        fig.update_layout(height=250, margin=dict(l=20,r=20,t=40,b=20))
+        st.plotly_chart(fig, use_container_width=True)
+
+    with col_k:
+        k1, k2, k3 = st.columns(3)
+        k1.metric("Disponibilidade", f"{ind['disponibilidade']:.1f}%")
+        k2.metric("Performance", f"{ind['performance']:.1f}%")
+        k3.metric("Qualidade", f"{ind['qualidade']:.1f}%", delta=f"Refugo: {int(ind['refugo'])}")
+        st.info(f"Produção Total: **{int(ind['total_pcs'])} peças**")
+
+    # Gráficos de Barra
+    g1, g2 = st.columns(2)
+    with g1:
+        st.markdown("##### Eficiência por Operador")
+        op_stats = graficos.eficiencia(prod.reset_index(), ["operador"], "tempo_teorico_min", "tempo_real_min")
+        fig_op = px.bar(op_stats, x="operador", y="Efic", text_auto='.1f', range_y=[0,110])
+        st.plotly_chart(fig_op, use_container_width=True)
+    return g1, g2
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def get_totais_periodo(planta, d_ini, d_fim):
+    """
+    Totais do período lidos em blocos (cursor do lado do servidor): a
+    memória não cresce com o período. Ver modules/agregacao.py.
+    """
+    q_prod = """SELECT data, maquina, operador, inicio_prod, fim_prod, qtd_produzida, refugo, tempo_ciclo_seg,
+                       min_real, min_teorico
+                FROM estamparia_apontamentos WHERE ativo = 1 AND data::date BETWEEN %s AND %s"""
+    q_par = "SELECT data, maquina, inicio, fim, min_parada FROM estamparia_paradas_reg WHERE ativo = 1 AND data::date BETWEEN %s AND %s"
+
+    def acao(conn, cur):
+        prod, linhas = agregacao.totais_producao(banco.ler_em_blocos(conn, q_prod, (d_ini, d_fim), agregacao.TAMANHO_BLOCO))
+        paradas = agregacao.totais_paradas(banco.ler_em_blocos(conn, q_par, (d_ini, d_fim), agregacao.TAMANHO_BLOCO))
+        return prod, paradas, linhas
+    return banco.executar(get_connection, acao, "exportacao", repetir=True)
+
+
+def _painel_em_blocos(d_ini, d_fim):
+    """
+    Painel de período longo: KPIs, eficiência por operador e tabela por
+    máquina, tudo a partir dos totais. Turno, mapa de calor e série por
+    hora precisam das linhas e ficam para períodos de até
+    agregacao.DIAS_EM_MEMORIA dias.
+    """
+    try:
+        with st.spinner("Somando o período em blocos..."):
+            prod, paradas, linhas = get_totais_periodo(_planta(), d_ini, d_fim)
+    except Exception as e:
+        st.error(banco.mensagem_erro(e, "Erro ao ler dados", "exportacao"))
+        return
+    if prod.empty:
+        st.info("Sem produção no período.")
+        return
+
+    st.caption(f"Período longo: {linhas} apontamentos somados em blocos de {agregacao.TAMANHO_BLOCO}. "
+               f"Turnos, mapa de calor e série por hora aparecem para até {agregacao.DIAS_EM_MEMORIA} dias.")
+    g1, g2 = _painel_kpis(prod, paradas)
+
+    with g2:
+        st.markdown("##### Eficiência por Máquina")
+        mq = graficos.eficiencia(prod.reset_index(), ["maquina"], "tempo_teorico_min", "tempo_real_min")
+        fig_mq = px.bar(mq, x="maquina", y="Efic", text_auto='.1f', range_y=[0,110])
+        st.plotly_chart(fig_mq, use_container_width=True)
+
+    st.markdown("##### Totais por Máquina")
+    tab = prod.groupby(level="maquina", dropna=False).sum().join(paradas, how="outer").fillna(0)
+    st.dataframe(tab.rename(columns={"qtd_produzida": "Boas", "refugo": "Refugo", "tempo_teorico_min": "Teórico (min)",
+                                     "tempo_real_min": "Real (min)", "tempo_parado_min": "Parado (min)"}).round(1),
+                 use_container_width=True)
+
+
+@st.fragment
+def _fragmento_horimetros():
+    """
+    Horímetros na data escolhida.
+    """
+    # Horímetros de todas as máquinas numa query só, em qualquer data
+    dt_pos = st.date_input("Posição em", date.today(), key="pos_horimetro_est")
+    df_mq = get_dataframe(horimetro.sql_maquinas_com_horimetro("estamparia", ate=True),
+                          {"ate": datetime.combine(dt_pos, time.max)})
+
+    if not df_mq.empty:
+        for _, r in df_mq.iterrows():
+            perc = (r['horimetro_atual'] / r['meta_manutencao']) if r['meta_manutencao'] > 0 else 0
+            st.write(f"**{r['nome']}**")
+            c1, c2 = st.columns([4, 1])
+            c1.progress(min(perc, 1.0))
+            c2.write(f"{r['horimetro_atual']:.0f} / {r['meta_manutencao']:.0f} h")
+            if perc >= 1: st.error("⚠️ Manutenção Vencida!")
+
+
+@st.fragment
+def _fragmento_relatorios():
+    """
+    Pedido, andamento e download dos relatórios Excel (modules/relatorios.py).
+    """
+    # Dia anterior e mês até ontem já ficam prontos toda madrugada.
+    relatorios.painel("estamparia", _planta(), st.session_state.get('usuario'))
+
+
+@st.fragment
+def _fragmento_busca():
+    """
+    Busca de texto no histórico (modules/busca.py): índice no banco, ordenada
+    por relevância e paginada. Trocar de página reexecuta só este bloco.
+    """
+    c1, c2, c3 = st.columns([3, 1, 1])
+    texto = c1.text_input("Buscar", placeholder='ex.: cliente, peça, operação, "troca de ferramenta" -preventiva',
+                          key="est_busca_texto")
+    b_ini = c2.date_input("De", date.today() - timedelta(days=365), key="est_busca_ini")
+    b_fim = c3.date_input("Até", date.today(), key="est_busca_fim")
+    c4, c5 = st.columns([2, 1])
+    tipos = c4.multiselect("Em", list(busca.TIPOS), default=list(busca.TIPOS), format_func=busca.TIPOS.get,
+                           key="est_busca_tipos")
+    maq = c5.selectbox("Máquina", ["Todas"] + get_list("maquinas"), key="est_busca_maq")
+    if not texto.strip() or not tipos:
+        st.caption("Digite uma ou mais palavras: todas precisam aparecer no registro.")
+        return
+
+    # Busca nova volta para a primeira página
+    filtro = (texto, b_ini, b_fim, tuple(tipos), maq)
+    if st.session_state.get("est_busca_filtro") != filtro:
+        st.session_state["est_busca_filtro"] = filtro
+        st.session_state["est_busca_pag"] = 0
+    pag = st.session_state["est_busca_pag"]
+
+    query, params = busca.consulta(["estamparia"], tipos, texto, b_ini, b_fim, None if maq == "Todas" else maq, pag)
+    df = get_dataframe(query, params)
+    total, n_pag = busca.paginas(df)
+    if not total:
+        st.info("Nada encontrado no período.")
+        return
+    st.caption(f"{total} registros encontrados, página {pag + 1} de {n_pag}.")
+    st.dataframe(df.drop(columns=["setor", "total"]).rename(columns={"maquina_operador": "maquina"}),
+                 use_container_width=True, hide_index=True)
+    c_a, c_p = st.columns(2)
+    c_a.button("◀ Anterior", disabled=pag == 0, key="est_busca_ant",
+               on_click=lambda: st.session_state.update(est_busca_pag=pag - 1))
+    c_p.button("Próxima ▶", disabled=pag + 1 >= n_pag, key="est_busca_prox",
+               on_click=lambda: st.session_state.update(est_busca_pag=pag + 1))
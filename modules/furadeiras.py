@@ -2,83 +2,171 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import psycopg2
 from datetime import datetime, date, time, timedelta
-import io
+import modules.ciclos as ciclos
+import modules.sugestoes as sugestoes
+import modules.turnos as turnos
+import modules.espelho as espelho
+import modules.banco as banco
+import modules.relatorios as relatorios
+import modules.graficos as graficos
+import modules.cadastro as cadastro
+import modules.esquema as esquema
+import modules.metricas as metricas
+import modules.envio as envio
+import modules.sobreposicao as sobreposicao
+import modules.busca as busca
+import modules.plantas as plantas
 
 # ==============================================================================
 # 1. CONEXÃO E BANCO DE DADOS (COM CACHE DE PERFORMANCE)
 # ==============================================================================
 
+# Planta do usuário logado (main.py): conexão, espelho e caches são por planta
+def _planta():
+    return st.session_state.get("planta", plantas.PADRAO)
+
 @st.cache_resource(ttl=3600)
-def init_connection():
+def init_connection(planta):
     try:
-        return psycopg2.connect(
-            host=st.secrets["postgres"]["DB_HOST"],
-            user=st.secrets["postgres"]["DB_USER"],
-            password=st.secrets["postgres"]["DB_PASS"],
-            dbname=st.secrets["postgres"]["DB_NAME"],
-            port=st.secrets["postgres"]["DB_PORT"],
-            sslmode='require'
-        )
+        banco.configurar(st.secrets.get("tempo_limite", {}))
+        return banco.conectar(plantas.credenciais(st.secrets, planta))  # com keepalive TCP
     except Exception as e:
         st.error(f"Erro Conexão: {e}")
         return None
 
-def run_query(query, params=(), fetch=False, commit=False):
-    conn = init_connection()
-    if not conn: return None
-    try:
+def get_connection(forcar=False):
+    # Pre-ping: se a conexão do cache morreu (queda de link), reconecta
+    planta = _planta()
+    conn = init_connection(planta)
+    if forcar or not banco.viva(conn):
+        banco.fechar(conn)
+        init_connection.clear(planta)  # só a desta planta
+        conn = init_connection(planta)
+    return conn
+
+# 'classe' = tempo limite da consulta (banco.TEMPO_LIMITE)
+def run_query(query, params=(), fetch=False, commit=False, classe=None):
+    def acao(conn, cur):
         # Usamos 'with' para garantir que o cursor feche, mas a conexão fica aberta
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            res = None
-            if commit: 
-                conn.commit()
-                res = "OK"
-            if fetch: 
-                res = cur.fetchall()
+        res = None
+        cur.execute(query, params)
+        if commit: 
+            conn.commit()
+            _apos_escrita(query)
+            res = "OK"
+        if fetch: 
+            res = cur.fetchall()
         return res
+    classe = classe or ("escrita" if commit else "formulario")
+    try:
+        return banco.executar(get_connection, acao, classe, repetir=not commit)
     except Exception as e:
-        st.error(f"Erro SQL: {e}")
-        conn.rollback()
+        st.error(banco.mensagem_erro(e, "Erro SQL", classe))
         return None
 
-def get_dataframe(query, params=None):
-    conn = init_connection()
-    if not conn: return pd.DataFrame()
+def get_dataframe(query, params=None, classe="leitura"):
+    # Dashboard/exportação: leitura em massa por COPY (banco.ler_copy)
     try:
-        df = pd.read_sql(query, conn, params=params)
-        return df
-    except Exception: 
+        return banco.executar(get_connection, banco.acao_leitura(query, params, classe), classe, repetir=True)
+    except Exception as e:
+        # Erro de leitura continua silencioso; só tempo limite avisa
+        if banco.tipo_erro(e) == "tempo": st.warning(banco.mensagem_erro(e, "", classe))
         return pd.DataFrame()
 
+def run_transaction(comandos, classe="escrita"):
+    # Vários comandos (query, params) numa transação só: grava tudo ou nada.
+    # Com chave de envio (modules/envio.py) é repetida se a conexão cair, e
+    # chave já gravada conta como sucesso (clique duplo). Operador em dois
+    # apontamentos no mesmo horário: aviso ou erro (modules/sobreposicao.py).
+    def acao(conn, cur):
+        for query, params in comandos:
+            banco.executar_comando(cur, query, params)
+        conn.commit()
+        _apos_escrita(*(q for q, _ in comandos))
+        for aviso in sobreposicao.avisos(conn): st.toast(aviso, icon="⚠️")
+        return "OK"
+    try:
+        return banco.executar(get_connection, acao, classe, repetir=envio.tem_chave(comandos))
+    except Exception as e:
+        if envio.repetido(e):
+            st.toast("Este envio já estava gravado: nada foi duplicado.")
+            return "OK"
+        st.error(banco.mensagem_erro(e, "Erro SQL", classe))
+        return None
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_ciclo_stats(planta, peca, tipo_operacao):
+    # Furadeira não tem cadastro de máquina: a chave usa maquina = ''
+    res = run_query(ciclos.sql_consulta("furadeira"), ciclos.params_consulta(peca, "", tipo_operacao), fetch=True)
+    return ciclos.resumo(res[0]) if res else None
+
+# Autocompletar de cliente e peça (valores mais usados; filtro no navegador)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_sugestoes(planta, campo):
+    res = run_query(sugestoes.sql_mais_usados("furadeira"), (campo, sugestoes.LIMITE_OPCOES), fetch=True)
+    return [r[0] for r in res] if res else []
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_parecidos(planta, campo, termo):
+    res = run_query(sugestoes.sql_parecidos("furadeira"), sugestoes.params_parecidos(campo, termo), fetch=True)
+    return [r[0] for r in res] if res else []
+
+# Espelho local (SQLite no servidor da fábrica): leituras pela rede local
+TABELAS_ESPELHO = esquema.TABELAS_ESPELHO["furadeira"]
+
+# Um por processo e planta (modules/espelho.py); sem espelho no banco local
+def get_espelho(planta):
+    return espelho.do_setor(st.secrets, planta, TABELAS_ESPELHO)
+
+def _apos_escrita(*queries):
+    espelho.invalidar(get_espelho(_planta()), *queries)
+
+def ler_local(query, params=None, classe="leitura"):
+    # Espelho dentro da defasagem máxima; senão, direto do Supabase
+    return espelho.ler(get_espelho(_planta()), query, params, lambda: get_dataframe(query, params, classe))
+
+def ler_varios(consultas, classe="leitura"):
+    # Consultas independentes da tela ({nome: (query, params)}) ao mesmo tempo,
+    # cada uma numa conexão do pool de leitura da planta (banco.paralelo):
+    # a tela espera só a mais lenta. Espelho primeiro, como no ler_local.
+    planta = _planta()
+    esp = get_espelho(planta)
+    leitores = banco.leitores(plantas.credenciais(st.secrets, planta))
+    def ler(query, params):
+        def no_banco():
+            try: return leitores.executar(banco.acao_leitura(query, params, classe), classe, repetir=True)
+            except Exception as e: return e
+        return espelho.ler(esp, query, params, no_banco)
+    res = banco.paralelo({nome: (lambda q=q, p=p: ler(q, p)) for nome, (q, p) in consultas.items()})
+    for nome, r in res.items():
+        if isinstance(r, Exception):
+            # Mesmo critério do get_dataframe: só tempo limite avisa
+            if banco.tipo_erro(r) == "tempo": st.warning(banco.mensagem_erro(r, "", classe))
+            res[nome] = pd.DataFrame()
+    return res
+
 # ... (O resto do código init_db_furadeira, render_app, etc., continua igual)
 
-def init_db_furadeira():
-    queries = [
-        "CREATE TABLE IF NOT EXISTS furadeira_operadores (id SERIAL PRIMARY KEY, nome TEXT, ativo INTEGER DEFAULT 1);",
-        "CREATE TABLE IF NOT EXISTS furadeira_motivos_parada (id SERIAL PRIMARY KEY, motivo TEXT, ativo INTEGER DEFAULT 1);",
-        """CREATE TABLE IF NOT EXISTS furadeira_apontamentos (
-            id SERIAL PRIMARY KEY, data_registro DATE, operador TEXT, cliente TEXT, peca TEXT, 
-            tipo_operacao TEXT, tempo_ciclo_seg REAL, inicio_prod TIME, fim_prod TIME, 
-            qtd_produzida INTEGER, refugo INTEGER, eficiencia_calc REAL, observacao TEXT, 
-            ativo INTEGER DEFAULT 1, criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );""",
-        "CREATE TABLE IF NOT EXISTS furadeira_paradas_reg (id SERIAL PRIMARY KEY, data_registro DATE, motivo TEXT, inicio TIME, fim TIME, observacao TEXT, ativo INTEGER DEFAULT 1);"
-    ]
-    for q in queries: run_query(q, commit=True)
+# Roda uma vez por processo (cache): os CREATE/seed não vão ao banco a cada clique
+@st.cache_resource
+def init_db_furadeira(planta):
+    # Tabelas + ciclos, sugestões, espelho, métricas e sobreposição (modules/esquema.py)
+    modo = sobreposicao.modo(st.secrets.get("sobreposicao", {}), "furadeira")
+    for q in esquema.scripts("furadeira", modo): run_query(q, commit=True, classe="manutencao")
+    metricas.preencher(lambda q: run_query(q, fetch=True, commit=True, classe="manutencao"))
     
     # Inserir motivos padrão se vazio
     if run_query("SELECT count(*) FROM furadeira_motivos_parada", fetch=True)[0][0] == 0:
         padroes = ["Afiação de Broca", "Quebra de Ferramenta", "Setup/Preparação", "Aguardando Material", "Manutenção", "Limpeza/5S", "Refeição"]
         for p in padroes: run_query("INSERT INTO furadeira_motivos_parada (motivo, ativo) VALUES (%s, 1)", (p,), commit=True)
+    return True
 
 # ==============================================================================
 # 2. APP PRINCIPAL DA FURADEIRA
 # ==============================================================================
 def render_app():
-    init_db_furadeira()
+    init_db_furadeira(_planta())
     
     st.sidebar.divider()
     # Menu Interno da Furadeira
@@ -95,103 +183,21 @@ def render_app():
     if menu_fura == "📝 Apontamento Diário":
         st.header("📝 Apontamento de Produção")
         
-        ops = [r[0] for r in run_query("SELECT nome FROM furadeira_operadores WHERE ativo=1 ORDER BY nome", fetch=True)]
-        if not ops: st.warning("Cadastre operadores na aba Admin primeiro.")
-        
-        with st.form("form_fura"):
-            c1, c2, c3 = st.columns(3)
-            dt = c1.date_input("Data", date.today())
-            op = c2.selectbox("Operador", ops) if ops else c2.text_input("Operador")
-            tipo = c3.selectbox("Operação", ["Furadeira (F)", "Escareador (E)", "Rosqueadeira (R)", "Rebarba (RB)"])
-            
-            c4, c5 = st.columns(2)
-            cli = c4.text_input("Cliente")
-            peca = c5.text_input("Peça")
-            
-            st.markdown("---")
-            k1, k2, k3 = st.columns(3)
-            hi = k1.time_input("Início", time(7,0))
-            hf = k2.time_input("Fim", time(17,0))
-            ciclo = k3.number_input("Ciclo (seg)", value=30.0, step=1.0)
-            
-            k4, k5 = st.columns(2)
-            qtd = k4.number_input("Produzido (Boas)", min_value=0)
-            ref = k5.number_input("Refugo", min_value=0)
-            obs = st.text_area("Obs")
-            
-            if st.form_submit_button("Salvar Produção"):
-                dti = datetime.combine(dt, hi)
-                dtf = datetime.combine(dt, hf)
-                if hf < hi: dtf += timedelta(days=1)
-                h_trab = (dtf - dti).total_seconds() / 3600
-                
-                # Cálculo Eficiência
-                efic = 0
-                if h_trab > 0:
-                    prod_teorica = (h_trab * 3600) / ciclo if ciclo > 0 else 0
-                    efic = ((qtd + ref) / prod_teorica * 100) if prod_teorica > 0 else 0
-                
-                sigla = {"Furadeira (F)":"F", "Escareador (E)":"E", "Rosqueadeira (R)":"R", "Rebarba (RB)":"RB"}.get(tipo, "F")
-                
-                run_query("""INSERT INTO furadeira_apontamentos 
-                    (data_registro, operador, cliente, peca, tipo_operacao, tempo_ciclo_seg, inicio_prod, fim_prod, qtd_produzida, refugo, eficiencia_calc, observacao, ativo)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,1)""",
-                    (dt, op, cli.upper(), peca.upper(), sigla, ciclo, hi, hf, qtd, ref, efic, obs), commit=True)
-                st.success(f"Salvo! Eficiência: {efic:.1f}%")
-                st.rerun()
+        _fragmento_apontamento()
 
     # --------------------------------------------------------------------------
     # 2. DASHBOARD & KPIS (NOVO!)
     # --------------------------------------------------------------------------
     elif menu_fura == "📊 Dashboard & KPIs":
         st.header("📊 Indicadores de Desempenho")
-        filtro_data = st.date_input("Filtrar Data", date.today())
-        
-        # Dados do dia
-        df = get_dataframe(f"SELECT * FROM furadeira_apontamentos WHERE ativo=1 AND data_registro='{filtro_data}'")
-        
-        # KPI Cards
-        total_pcs = df['qtd_produzida'].sum() if not df.empty else 0
-        total_ref = df['refugo'].sum() if not df.empty else 0
-        media_efic = df['eficiencia_calc'].mean() if not df.empty else 0
-        
-        k1, k2, k3 = st.columns(3)
-        k1.metric("Peças Produzidas", f"{total_pcs}")
-        k2.metric("Refugo Total", f"{total_ref}", delta=f"{(total_ref/(total_pcs+total_ref)*100 if total_pcs>0 else 0):.1f}% Taxa", delta_color="inverse")
-        k3.metric("Eficiência Média", f"{media_efic:.1f}%")
-        
-        st.divider()
-        
-        # Gráficos
-        c1, c2 = st.columns(2)
-        
-        with c1:
-            if not df.empty:
-                st.subheader("Eficiência por Operador")
-                # Gráfico de Barras Colorido pela Eficiência
-                fig_bar = px.bar(df, x='operador', y='eficiencia_calc', color='cliente', title="Eficiência % por Registro", text_auto='.1f')
-                fig_bar.add_hline(y=90, line_dash="dot", annotation_text="Meta 90%", annotation_position="bottom right")
-                st.plotly_chart(fig_bar, use_container_width=True)
-            else:
-                st.info("Sem produção nesta data.")
-                
-        with c2:
-            st.subheader("Motivos de Parada (Pareto)")
-            df_par = get_dataframe(f"SELECT * FROM furadeira_paradas_reg WHERE ativo=1 AND data_registro='{filtro_data}'")
-            if not df_par.empty:
-                # Converter para minutos
-                df_par['minutos'] = df_par.apply(lambda x: (datetime.combine(date.min, x['fim']) - datetime.combine(date.min, x['inicio'])).seconds / 60, axis=1)
-                fig_pie = px.pie(df_par, values='minutos', names='motivo', title='Distribuição de Tempo Parado')
-                st.plotly_chart(fig_pie, use_container_width=True)
-            else:
-                st.info("Nenhuma parada registrada hoje.")
+        _fragmento_dashboard()
 
     # --------------------------------------------------------------------------
     # 3. PARADAS
     # --------------------------------------------------------------------------
     elif menu_fura == "🛑 Registro de Paradas":
         st.header("🛑 Registrar Parada")
-        mots = [r[0] for r in run_query("SELECT motivo FROM furadeira_motivos_parada WHERE ativo=1 ORDER BY motivo", fetch=True)]
+        mots = list(ler_local("SELECT motivo FROM furadeira_motivos_parada WHERE ativo=1 ORDER BY motivo").get("motivo", []))
         
         with st.form("form_p"):
             c1, c2 = st.columns(2)
@@ -202,10 +208,12 @@ def render_app():
             fim = c4.time_input("Fim", time(10,15))
             
             if st.form_submit_button("Salvar Parada"):
-                run_query("INSERT INTO furadeira_paradas_reg (data_registro, motivo, inicio, fim, observacao, ativo) VALUES (%s,%s,%s,%s,%s,1)",
-                          (date.today(), mot, ini, fim, obs), commit=True)
-                st.success("Registrado!")
-                st.rerun()
+                params = (date.today(), mot, ini, fim, obs)
+                # Chave do envio: o segundo clique no mesmo registro não duplica
+                if run_transaction([("INSERT INTO furadeira_paradas_reg (data_registro, motivo, inicio, fim, observacao, chave_envio, ativo) VALUES (%s,%s,%s,%s,%s,%s,1)",
+                                     params + (envio.chave(st.session_state, *params),))]):
+                    st.success("Registrado!")
+                    st.rerun()
 
     # --------------------------------------------------------------------------
     # 4. CADASTROS & ADMIN (COM SENHA!)
@@ -221,30 +229,256 @@ def render_app():
         
         # --- SE PASSOU DA SENHA, MOSTRA TUDO: ---
         st.success("Acesso Permitido")
-        tab1, tab2, tab3 = st.tabs(["👥 Operadores", "🛑 Motivos Parada", "📤 Exportar Excel"])
+        tab1, tab2, tab3, tab4 = st.tabs(["👥 Operadores", "🛑 Motivos Parada", "📤 Exportar Excel", "🔎 Busca"])
         
-        # Editor Genérico
+        # Editor Genérico: só o que mudou vai para o banco, num comando só
+        # (ver modules/cadastro.py). Linha apagada = exclusão lógica.
         def admin_editor(tabela, col_nome, key):
-            df = get_dataframe(f"SELECT id, {col_nome}, ativo FROM {tabela} WHERE ativo=1 ORDER BY {col_nome}")
-            edit = st.data_editor(df, column_config={"id":None, "ativo":None, col_nome: st.column_config.TextColumn("Nome", required=True)}, num_rows="dynamic", key=key)
+            st.session_state.setdefault(f"{key}_versao", 0)
+            df = ler_local(f"SELECT id, {col_nome} FROM {tabela} WHERE ativo=1 ORDER BY {col_nome}")
+            edit = st.data_editor(df, column_config={"id":None, col_nome: st.column_config.TextColumn("Nome", required=True)},
+                                  num_rows="dynamic", hide_index=True, key=f"{key}_{st.session_state[f'{key}_versao']}")
             if st.button(f"Salvar {key}"):
-                for i, row in edit.iterrows():
-                    if row[col_nome]:
-                        if pd.notna(row['id']): run_query(f"UPDATE {tabela} SET {col_nome}=%s WHERE id=%s", (str(row[col_nome]).upper(), int(row['id'])), commit=True)
-                        else: run_query(f"INSERT INTO {tabela} ({col_nome}, ativo) VALUES (%s,1)", (str(row[col_nome]).upper(),), commit=True)
-                st.success("Salvo!"); st.rerun()
+                dif = cadastro.diff(df, edit, [col_nome])
+                if dif["erro"]: st.error(f"❌ {dif['erro']} Nada foi gravado.")
+                elif cadastro.vazio(dif): st.info("Nenhuma alteração.")
+                elif run_transaction([cadastro.cmd_aplicar(tabela, dif, [col_nome])]):
+                    st.session_state[f"{key}_versao"] += 1
+                    st.success(f"Salvo! {cadastro.resumo(dif)}."); st.rerun()
         
         with tab1: admin_editor("furadeira_operadores", "nome", "ed_ops")
         with tab2: admin_editor("furadeira_motivos_parada", "motivo", "ed_mots")
         with tab3:
             st.subheader("Histórico Completo")
-            df_full = get_dataframe("SELECT * FROM furadeira_apontamentos WHERE ativo=1 ORDER BY id DESC")
+            df_full = ler_local("SELECT * FROM furadeira_apontamentos WHERE ativo=1 ORDER BY id DESC", classe="exportacao")
             st.dataframe(df_full, use_container_width=True)
             
-            # Botão de Download
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df_full.to_excel(writer, sheet_name='Producao', index=False)
-                get_dataframe("SELECT * FROM furadeira_paradas_reg WHERE ativo=1").to_excel(writer, sheet_name='Paradas', index=False)
+            _fragmento_relatorios()
             
-            st.download_button("📥 Baixar Planilha Completa", buffer.getvalue(), "relatorio_furadeira.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            if st.button("🔄 Recalcular Estatísticas de Ciclo"):
+                df_h = get_dataframe("SELECT peca, '' AS maquina, tipo_operacao AS operacao, data_registro, inicio_prod, fim_prod, qtd_produzida, refugo FROM furadeira_apontamentos WHERE ativo=1", classe="exportacao")
+                if not df_h.empty:
+                    df_h['ciclo'] = ciclos.ciclo_real_df(df_h, 'data_registro', 'inicio_prod', 'fim_prod')
+                if run_transaction(ciclos.cmds_reconstruir("furadeira", df_h), classe="exportacao"):
+                    get_ciclo_stats.clear()
+                    st.success(f"Recalculado a partir de {len(df_h)} apontamentos.")
+
+            # Operador em dois apontamentos no mesmo horário (tempo contado em dobro)
+            if st.button("⏱️ Procurar Horários Cruzados"):
+                df_s = get_dataframe(sobreposicao.relatorio("furadeira"), classe="exportacao")
+                if df_s.empty: st.success("Nenhum horário cruzado.")
+                else:
+                    st.warning(f"{len(df_s)} pares cruzados, {df_s['minutos_cruzados'].sum():.0f} min contados em dobro.")
+                    st.dataframe(df_s, use_container_width=True, hide_index=True)
+                    st.download_button("📥 Baixar CSV", df_s.to_csv(index=False, sep=";").encode("utf-8-sig"), "sobreposicoes_furadeira.csv", "text/csv")
+
+        with tab4: _fragmento_busca()
+
+# ==============================================================================
+# 3. FRAGMENTOS (RERUN PARCIAL)
+# ==============================================================================
+# @st.fragment: mexer num widget do bloco reexecuta só ele (e só as consultas
+# dele). Depois de gravar, st.rerun() normal atualiza a página toda.
+
+@st.fragment
+def _fragmento_apontamento():
+    # Peça/operação (ciclo padrão) e formulário
+    ops = list(ler_local("SELECT nome FROM furadeira_operadores WHERE ativo=1 ORDER BY nome").get("nome", []))
+    if not ops: st.warning("Cadastre operadores na aba Admin primeiro.")
+
+    siglas = {"Furadeira (F)":"F", "Escareador (E)":"E", "Rosqueadeira (R)":"R", "Rebarba (RB)":"RB"}
+
+    # Peça e operação fora do form: trazem o ciclo padrão do histórico.
+    # Cliente também, para o "você quis dizer" aparecer antes de salvar.
+    c_p, c_c, c_t = st.columns(3)
+    peca = sugestoes.normalizar(c_p.selectbox("Peça", get_sugestoes(_planta(), "peca"), index=None, accept_new_options=True,
+                                              placeholder="Digite ou escolha", key="fur_peca"))
+    cli = sugestoes.normalizar(c_c.selectbox("Cliente", get_sugestoes(_planta(), "cliente"), index=None,
+                                             accept_new_options=True, placeholder="Digite ou escolha", key="fur_cliente"))
+    tipo = c_t.selectbox("Operação", list(siglas.keys()), key="fur_tipo")
+    sugestoes.sugerir_grafia({"peca": peca, "cliente": cli}, {"peca": "Peça", "cliente": "Cliente"},
+                             lambda campo, termo: get_parecidos(_planta(), campo, termo),
+                             lambda campo, grafia: st.session_state.update({f"fur_{campo}": grafia}))
+    stats_ciclo = get_ciclo_stats(_planta(), peca, siglas.get(tipo, "F")) if peca else None
+    ciclo_padrao = float(round(stats_ciclo['mediana'])) if stats_ciclo else 30.0
+
+    with st.form("form_fura"):
+        c1, c2 = st.columns(2)
+        dt = c1.date_input("Data", date.today())
+        op = c2.selectbox("Operador", ops) if ops else c2.text_input("Operador")
+
+        st.markdown("---")
+        k1, k2, k3 = st.columns(3)
+        hi = k1.time_input("Início", time(7,0))
+        hf = k2.time_input("Fim", time(17,0))
+        ciclo = k3.number_input("Ciclo (seg)", value=ciclo_padrao, step=1.0,
+                                help=f"Padrão aprendido: mediana de {stats_ciclo['n']} apontamentos" if stats_ciclo else None)
+
+        k4, k5 = st.columns(2)
+        qtd = k4.number_input("Produzido (Boas)", min_value=0)
+        ref = k5.number_input("Refugo", min_value=0)
+        obs = st.text_area("Obs")
+
+        if st.form_submit_button("Salvar Produção"):
+            dti = datetime.combine(dt, hi)
+            dtf = datetime.combine(dt, hf)
+            if hf < hi: dtf += timedelta(days=1)
+            h_trab = (dtf - dti).total_seconds() / 3600
+
+            # Eficiência só para a mensagem: o banco grava eficiencia_calc com a
+            # mesma conta (trigger, ver modules/metricas.py)
+            efic = 0
+            if h_trab > 0:
+                prod_teorica = (h_trab * 3600) / ciclo if ciclo > 0 else 0
+                efic = ((qtd + ref) / prod_teorica * 100) if prod_teorica > 0 else 0
+
+            sigla = siglas.get(tipo, "F")
+
+            # Chave do envio (modules/envio.py): clique duplo no mesmo formulário
+            # esbarra no índice único e nada se repete
+            params = (dt, op, cli.upper(), peca.upper(), sigla, ciclo, hi, hf, qtd, ref, obs)
+            comandos = [("""INSERT INTO furadeira_apontamentos 
+                (data_registro, operador, cliente, peca, tipo_operacao, tempo_ciclo_seg, inicio_prod, fim_prod, qtd_produzida, refugo, observacao, chave_envio, ativo)
+                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,1)""",
+                params + (envio.chave(st.session_state, *params),))]
+
+            # Estatística de ciclo (sem tela de confirmação aqui: o aviso vai num toast)
+            ciclo_real = ciclos.ciclo_real_seg(h_trab, 0, qtd + ref)
+            cmd_ciclo = ciclos.cmd_registrar("furadeira", peca, "", sigla, ciclo_real)
+            if cmd_ciclo: comandos.append(cmd_ciclo)
+            for campo, valor in (("cliente", cli), ("peca", peca)):
+                cmd_sug = sugestoes.cmd_registrar("furadeira", campo, valor)
+                if cmd_sug: comandos.append(cmd_sug)
+
+            if run_transaction(comandos):
+                get_sugestoes.clear()
+                get_parecidos.clear()
+                if ciclos.eh_outlier(ciclo_real, stats_ciclo):
+                    st.toast(f"⚠️ Ciclo real {ciclo_real:.1f}s fora do padrão histórico (mediana {stats_ciclo['mediana']:.1f}s)")
+                st.success(f"Salvo! Eficiência: {efic:.1f}%")
+                st.rerun()
+
+
+@st.fragment
+def _fragmento_dashboard():
+    # Filtro + KPIs + gráficos: trocar a data reexecuta só o painel
+    filtro_data = st.date_input("Filtrar Data", date.today())
+
+    # Produção e paradas do dia, as duas consultas juntas (em paralelo)
+    dados = ler_varios({
+        "prod": ("SELECT * FROM furadeira_apontamentos WHERE ativo=1 AND data_registro=%s", (filtro_data,)),
+        "paradas": ("SELECT * FROM furadeira_paradas_reg WHERE ativo=1 AND data_registro=%s", (filtro_data,)),
+    }, "dashboard")
+    df, df_par = dados["prod"], dados["paradas"]
+
+    if not df.empty:
+        turnos.intervalos(df, 'data_registro', 'inicio_prod', 'fim_prod')
+        # Minutos gravados pelo banco (modules/metricas.py)
+        df['real_min'] = df['min_real']
+        df['teorico_min'] = df['min_teorico']
+
+    # KPI Cards
+    total_pcs = df['qtd_produzida'].sum() if not df.empty else 0
+    total_ref = df['refugo'].sum() if not df.empty else 0
+    media_efic = df['eficiencia_calc'].mean() if not df.empty else 0
+
+    k1, k2, k3 = st.columns(3)
+    k1.metric("Peças Produzidas", f"{total_pcs}")
+    k2.metric("Refugo Total", f"{total_ref}", delta=f"{(total_ref/(total_pcs+total_ref)*100 if total_pcs>0 else 0):.1f}% Taxa", delta_color="inverse")
+    k3.metric("Eficiência Média", f"{media_efic:.1f}%")
+
+    st.divider()
+
+    # Gráficos
+    c1, c2 = st.columns(2)
+
+    with c1:
+        if not df.empty:
+            st.subheader("Eficiência por Operador")
+            # Agregado por operador/cliente (uma barra por par, não por registro)
+            ef = graficos.eficiencia(df, ['operador', 'cliente'], 'teorico_min', 'real_min')
+            fig_bar = px.bar(ef, x='operador', y='Efic', color='cliente', barmode='group', title="Eficiência % por Operador e Cliente", text_auto='.1f')
+            fig_bar.add_hline(y=90, line_dash="dot", annotation_text="Meta 90%", annotation_position="bottom right")
+            st.plotly_chart(fig_bar, use_container_width=True)
+        else:
+            st.info("Sem produção nesta data.")
+
+    with c2:
+        st.subheader("Motivos de Parada (Pareto)")
+        if not df_par.empty:
+            # Duração gravada pelo banco (fim antes do início = passou da meia-noite)
+            df_par['minutos'] = df_par['min_parada']
+            gf_par = df_par.groupby('motivo', as_index=False)['minutos'].sum()
+            fig_pie = px.pie(gf_par, values='minutos', names='motivo', title='Distribuição de Tempo Parado')
+            st.plotly_chart(fig_pie, use_container_width=True)
+        else:
+            st.info("Nenhuma parada registrada hoje.")
+
+    # Turnos e horas (furadeira não tem máquina: o mapa é por operador)
+    if not df.empty:
+        st.divider()
+        st.subheader("🕐 OEE por Turno e Ocupação por Hora")
+        lista_turnos = turnos.turnos_do_setor(st.secrets.get("turnos", {}), "furadeira")
+        f_prod = turnos.fatiar(df, lista_turnos, ['teorico_min', 'qtd_produzida', 'refugo'], ['operador'])
+        f_par = None
+        if not df_par.empty:
+            turnos.intervalos(df_par, 'data_registro', 'inicio', 'fim')
+            f_par = turnos.fatiar(df_par, lista_turnos)
+
+        t1, t2 = st.columns([1, 2])
+        with t1:
+            oee_t = turnos.oee_por_turno(f_prod, f_par, paradas_dentro=False)
+            fig_t = px.bar(oee_t, x="turno", y="oee", text_auto='.1f', range_y=[0, 110], title="OEE % por Turno")
+            st.plotly_chart(fig_t, use_container_width=True)
+        with t2:
+            mapa = turnos.mapa_calor(f_prod, 'operador', dias=1)
+            fig_hm = px.imshow(mapa, labels=dict(x="Hora do Dia", y="Operador", color="% Ocupado"),
+                               color_continuous_scale="RdYlGn", zmin=0, zmax=100, aspect="auto")
+            st.plotly_chart(fig_hm, use_container_width=True)
+
+
+@st.fragment
+def _fragmento_relatorios():
+    # Planilha: pedida aqui, montada pelo serviço de relatórios
+    # (antes era remontada a cada visita na aba, sem clicar em nada).
+    # Pedir/atualizar/baixar não relê o Histórico Completo da aba.
+    relatorios.painel("furadeira", _planta(), st.session_state.get('usuario'))
+
+
+@st.fragment
+def _fragmento_busca():
+    # Busca de texto no histórico (modules/busca.py): índice no banco, ordenada
+    # por relevância e paginada. Trocar de página reexecuta só este bloco.
+    c1, c2, c3 = st.columns([3, 1, 1])
+    texto = c1.text_input("Buscar", placeholder='ex.: cliente, peça, operação, motivo -setup', key="fur_busca_texto")
+    b_ini = c2.date_input("De", date.today() - timedelta(days=365), key="fur_busca_ini")
+    b_fim = c3.date_input("Até", date.today(), key="fur_busca_fim")
+    c4, c5 = st.columns([2, 1])
+    tipos = c4.multiselect("Em", ["apontamentos", "paradas"], default=["apontamentos", "paradas"],
+                           format_func=busca.TIPOS.get, key="fur_busca_tipos")
+    ops = list(ler_local("SELECT nome FROM furadeira_operadores WHERE ativo=1 ORDER BY nome").get("nome", []))
+    op = c5.selectbox("Operador", ["Todos"] + ops, key="fur_busca_op")
+    if not texto.strip() or not tipos:
+        st.caption("Digite uma ou mais palavras: todas precisam aparecer no registro.")
+        return
+
+    # Busca nova volta para a primeira página (paradas não têm operador: saem com o filtro)
+    filtro = (texto, b_ini, b_fim, tuple(tipos), op)
+    if st.session_state.get("fur_busca_filtro") != filtro:
+        st.session_state["fur_busca_filtro"] = filtro
+        st.session_state["fur_busca_pag"] = 0
+    pag = st.session_state["fur_busca_pag"]
+
+    query, params = busca.consulta(["furadeira"], tipos, texto, b_ini, b_fim, None if op == "Todos" else op, pag)
+    df = get_dataframe(query, params)
+    total, n_pag = busca.paginas(df)
+    if not total:
+        st.info("Nada encontrado no período."); return
+    st.caption(f"{total} registros encontrados, página {pag + 1} de {n_pag}.")
+    st.dataframe(df.drop(columns=["setor", "total"]).rename(columns={"maquina_operador": "operador"}),
+                 use_container_width=True, hide_index=True)
+    c_a, c_p = st.columns(2)
+    c_a.button("◀ Anterior", disabled=pag == 0, key="fur_busca_ant",
+               on_click=lambda: st.session_state.update(fur_busca_pag=pag - 1))
+    c_p.button("Próxima ▶", disabled=pag + 1 >= n_pag, key="fur_busca_prox",
+               on_click=lambda: st.session_state.update(fur_busca_pag=pag + 1))
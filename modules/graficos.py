@@ -0,0 +1,105 @@
+# ==============================================================================
+# DADOS DOS GRÁFICOS: AGREGAÇÃO E REDUÇÃO DE PONTOS
+# ==============================================================================
+# O plotly manda para o tablet um JSON com TODOS os pontos do DataFrame.
+# Gráfico de barras feito direto nos apontamentos cresce com o número de
+# registros (um "pedaço" de barra por linha). Regras:
+#
+#   - barras/pizzas: agregar ANTES no grão exibido (máquina, operador...)
+#   - séries no tempo: reduzir para no máximo PONTOS_MAX pontos, com
+#       LTTB    -> mantém o desenho da curva (picos e vales visíveis)
+#       min/max -> mantém o mínimo e o máximo de cada faixa (nada de
+#                  pico "sumindo"), bom para sinais com ruído
+#
+# Assim o tamanho do gráfico depende da tela, não do histórico.
+
+import numpy as np
+import pandas as pd
+
+# Pontos por série: mais que isso o tablet não consegue desenhar distinto
+PONTOS_MAX = 400
+
+
+def eficiencia(df, chaves, col_teorico, col_real):
+    """
+    Eficiência (%) agregada por chaves = soma do tempo teórico / soma do
+    tempo real (ponderada pelo tempo, não média das eficiências).
+    """
+    g = df.groupby(chaves, as_index=False, dropna=False)[[col_teorico, col_real]].sum()
+    g["Efic"] = (g[col_teorico] / g[col_real].where(g[col_real] > 0) * 100).fillna(0)
+    return g
+
+
+def _numerico(x):
+    x = pd.Series(x)
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.astype("int64").to_numpy(dtype=float)
+    return x.to_numpy(dtype=float)
+
+
+def lttb(x, y, pontos=PONTOS_MAX):
+    """
+    Largest-Triangle-Three-Buckets: índices dos 'pontos' que melhor
+    preservam o formato da série (x crescente). Sempre mantém o primeiro
+    e o último ponto.
+    """
+    x, y = _numerico(x), np.asarray(y, dtype=float)
+    n = len(x)
+    if pontos >= n or pontos < 3:
+        return np.arange(n)
+
+    idx = np.empty(pontos, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    # pontos-2 faixas entre o primeiro e o último ponto
+    bordas = np.linspace(1, n - 1, pontos - 1).astype(np.int64)
+    a = 0
+    for i in range(pontos - 2):
+        ini, fim = bordas[i], bordas[i + 1]
+        p_ini, p_fim = bordas[i + 1], (bordas[i + 2] if i + 2 < len(bordas) else n)
+        mx, my = x[p_ini:p_fim].mean(), y[p_ini:p_fim].mean()
+        # Área do triângulo (ponto escolhido antes, candidato, média da próxima faixa)
+        area = np.abs((x[a] - mx) * (y[ini:fim] - y[a]) - (x[a] - x[ini:fim]) * (my - y[a]))
+        a = ini + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def minmax(y, pontos=PONTOS_MAX):
+    """Índices do mínimo e do máximo de cada faixa (pontos/2 faixas), em ordem."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if pontos >= n or pontos < 2:
+        return np.arange(n)
+    bordas = np.linspace(0, n, pontos // 2 + 1).astype(np.int64)
+    idx = set()
+    for ini, fim in zip(bordas[:-1], bordas[1:]):
+        if fim > ini:
+            idx.add(ini + int(np.argmin(y[ini:fim])))
+            idx.add(ini + int(np.argmax(y[ini:fim])))
+    return np.array(sorted(idx), dtype=np.int64)
+
+
+def reduzir_serie(df, col_x, col_y, pontos=PONTOS_MAX, metodo="lttb"):
+    """DataFrame ordenado por col_x com no máximo 'pontos' linhas."""
+    df = df.sort_values(col_x).reset_index(drop=True)
+    if len(df) <= pontos:
+        return df
+    if metodo == "minmax":
+        idx = minmax(df[col_y].fillna(0), pontos)
+    else:
+        idx = lttb(df[col_x], df[col_y].fillna(0), pontos)
+    return df.iloc[idx].reset_index(drop=True)
+
+
+def serie_por_periodo(fatias, col_valor, freq="h", pontos=PONTOS_MAX, metodo="lttb"):
+    """
+    Série no tempo a partir das fatias de turnos.fatiar(): soma col_valor
+    por período (freq do pandas: 'h', 'D'...), completa os períodos sem
+    produção com zero e reduz para no máximo 'pontos'.
+    """
+    if fatias.empty:
+        return pd.DataFrame(columns=["periodo", col_valor])
+    s = fatias.groupby(pd.to_datetime(fatias["inicio"]).dt.floor(freq))[col_valor].sum()
+    s = s.reindex(pd.date_range(s.index.min(), s.index.max(), freq=freq), fill_value=0)
+    df = s.rename_axis("periodo").reset_index(name=col_valor)
+    return reduzir_serie(df, "periodo", col_valor, pontos, metodo)
@@ -0,0 +1,206 @@
+# ==============================================================================
+# HORÍMETRO DAS MÁQUINAS (LIVRO-RAZÃO DE EVENTOS)
+# ==============================================================================
+# O horímetro deixou de ser um contador mutável em '<setor>_maquinas'.
+# Cada apontamento gera um evento 'USO' (delta de horas) e cada manutenção com
+# "Zerar Horímetro?" gera um evento 'ZERAGEM'. De tempos em tempos gravamos um
+# 'SNAPSHOT' com o valor consolidado, então a leitura é sempre:
+#
+#     último evento absoluto (ZERAGEM/SNAPSHOT) + soma dos USO depois dele
+#
+# A tabela é só de inserção (append-only): nada é atualizado nem apagado, então
+# dá para reconstruir o valor de qualquer data e dois salvamentos simultâneos
+# nunca se atropelam.
+#
+# Concorrência: o USO pega um advisory lock COMPARTILHADO da máquina e o
+# SNAPSHOT/ZERAGEM pega o mesmo lock EXCLUSIVO. Assim o snapshot espera os
+# apontamentos em andamento terminarem e nenhum USO fica "esquecido" atrás dele.
+#
+# Cada evento guarda também 'ocorrido_em', o instante da produção (fim do
+# apontamento) ou da manutenção, que pode ser anterior à gravação (grade do
+# turno, ingestão, apontamento atrasado). A posição numa data (ate=True) usa
+# esse instante: a última ZERAGEM até a data + os USO produzidos depois dela
+# até a data. A carga inicial (MIGRACAO) é o contador antigo no dia da
+# criação, então tudo o que foi gravado depois dela soma. Os SNAPSHOT de
+# consolidação não entram nessa conta, porque somam eventos pela ordem de
+# gravação. Eventos antigos, sem 'ocorrido_em', valem pela hora da gravação.
+
+from datetime import date, datetime, time
+
+import modules.banco as banco
+
+# Quantos eventos USO acumulamos antes de consolidar um SNAPSHOT
+INTERVALO_SNAPSHOT = 50
+
+
+# Instante do evento para a posição numa data (eventos antigos: a gravação)
+_MOMENTO = "COALESCE(ocorrido_em, registrado_em)"
+
+
+def _tabela(prefixo):
+    return f"{prefixo}_horimetro_eventos"
+
+
+def momento_do_dia(dia):
+    """Instante de um evento que só tem a data: agora se for hoje, senão o início do dia."""
+    return None if dia == date.today() else datetime.combine(dia, time.min)
+
+
+def ddl(prefixo):
+    """
+    SQL de criação do livro-razão do setor (idempotente).
+    Na primeira execução migra o 'horimetro_total' atual de cada máquina
+    como um SNAPSHOT inicial.
+    """
+    t = _tabela(prefixo)
+    return f"""
+    CREATE TABLE IF NOT EXISTS {t} (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        maquina TEXT NOT NULL,
+        tipo TEXT NOT NULL CHECK (tipo IN ('USO', 'ZERAGEM', 'SNAPSHOT')),
+        horas REAL NOT NULL DEFAULT 0,
+        registrado_em TIMESTAMP NOT NULL DEFAULT clock_timestamp(),
+        origem TEXT
+    );
+    ALTER TABLE {t} ADD COLUMN IF NOT EXISTS ocorrido_em TIMESTAMP;
+
+    CREATE INDEX IF NOT EXISTS ix_{t}_maquina ON {t} (maquina, id);
+    CREATE INDEX IF NOT EXISTS ix_{t}_absolutos ON {t} (maquina, id) WHERE tipo <> 'USO';
+    CREATE INDEX IF NOT EXISTS ix_{t}_ocorrido ON {t} (maquina, tipo, ({_MOMENTO}));
+
+    INSERT INTO {t} (maquina, tipo, horas, origem)
+    SELECT m.nome, 'SNAPSHOT', COALESCE(m.horimetro_total, 0), 'MIGRACAO'
+    FROM {prefixo}_maquinas m
+    WHERE NOT EXISTS (SELECT 1 FROM {t} e WHERE e.maquina = m.nome);
+    """
+
+
+# ------------------------------------------------------------------------------
+# ESCRITA (retornam tuplas (query, params) para entrar na transação do setor)
+# ------------------------------------------------------------------------------
+
+def cmd_uso(prefixo, maquina, horas, origem=None, ocorrido_em=None):
+    """Evento de uso vindo de um apontamento de produção (ocorrido_em: fim da produção)."""
+    sql = f"""
+        INSERT INTO {_tabela(prefixo)} (maquina, tipo, horas, origem, ocorrido_em)
+        SELECT %s, 'USO', %s, %s, %s
+        FROM (SELECT pg_advisory_xact_lock_shared(hashtext(%s))) AS trava
+    """
+    return sql, (maquina, horas, origem, ocorrido_em, f"{prefixo}_horimetro:{maquina}")
+
+
+def cmd_zeragem(prefixo, maquina, origem=None, ocorrido_em=None):
+    """Evento de zeragem vindo do prontuário de manutenção (ocorrido_em: momento_do_dia)."""
+    sql = f"""
+        INSERT INTO {_tabela(prefixo)} (maquina, tipo, horas, origem, ocorrido_em)
+        SELECT %s, 'ZERAGEM', 0, %s, %s
+        FROM (SELECT pg_advisory_xact_lock(hashtext(%s))) AS trava
+    """
+    return sql, (maquina, origem, ocorrido_em, f"{prefixo}_horimetro:{maquina}")
+
+
+def cmds_snapshot(prefixo, maquina):
+    """
+    Consolida um SNAPSHOT da máquina se já houver INTERVALO_SNAPSHOT eventos
+    USO depois do último evento absoluto. Não faz nada caso contrário.
+    São dois comandos: a trava precisa vir num statement ANTERIOR ao INSERT
+    para que a leitura enxergue os USO que acabaram de ser liberados.
+    """
+    t = _tabela(prefixo)
+    sql = f"""
+        WITH base AS (
+            SELECT id, horas FROM {t}
+            WHERE maquina = %s AND tipo <> 'USO'
+            ORDER BY id DESC LIMIT 1
+        ),
+        usos AS (
+            SELECT COUNT(*) AS n, COALESCE(SUM(e.horas), 0) AS horas
+            FROM {t} e
+            WHERE e.maquina = %s AND e.tipo = 'USO'
+              AND e.id > COALESCE((SELECT id FROM base), 0)
+        )
+        INSERT INTO {t} (maquina, tipo, horas, origem)
+        SELECT %s, 'SNAPSHOT', COALESCE((SELECT horas FROM base), 0) + usos.horas, 'CONSOLIDACAO'
+        FROM usos
+        WHERE usos.n >= %s
+    """
+    return [
+        ("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"{prefixo}_horimetro:{maquina}",)),
+        (sql, (maquina, maquina, maquina, INTERVALO_SNAPSHOT)),
+    ]
+
+
+# ------------------------------------------------------------------------------
+# LEITURA
+# ------------------------------------------------------------------------------
+
+def sql_maquinas_com_horimetro(prefixo, ate=False):
+    """
+    Uma única query com todas as máquinas ativas e o horímetro de cada uma
+    na coluna 'horimetro_atual'.
+    Com ate=True espera um parâmetro (timestamp) e reconstrói o valor
+    como estava naquele instante, pela data da produção de cada evento.
+    """
+    if ate:
+        return _sql_posicao(prefixo)
+    t = _tabela(prefixo)
+    sql = f"""
+        SELECT m.*, COALESCE(a.horas, 0) + COALESCE(u.horas, 0) AS horimetro_atual
+        FROM {prefixo}_maquinas m
+        LEFT JOIN LATERAL (
+            SELECT id, horas FROM {t}
+            WHERE maquina = m.nome AND tipo <> 'USO'
+            ORDER BY id DESC LIMIT 1
+        ) a ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT SUM(horas) AS horas FROM {t}
+            WHERE maquina = m.nome AND tipo = 'USO' AND id > COALESCE(a.id, 0)
+        ) u ON TRUE
+        WHERE m.ativo = 1
+        ORDER BY m.nome
+    """
+    # Banco local (sem LATERAL): o último evento absoluto em subconsultas
+    ultimo = f"FROM {t} WHERE maquina = m.nome AND tipo <> 'USO' ORDER BY id DESC LIMIT 1"
+    local = f"""
+        SELECT m.*, COALESCE((SELECT horas {ultimo}), 0)
+             + COALESCE((SELECT SUM(horas) FROM {t}
+                         WHERE maquina = m.nome AND tipo = 'USO' AND id > COALESCE((SELECT id {ultimo}), 0)), 0)
+               AS horimetro_atual
+        FROM {prefixo}_maquinas m
+        WHERE m.ativo = 1
+        ORDER BY m.nome
+    """
+    return banco.Sql(sql, local)
+
+
+def _sql_posicao(prefixo):
+    # Base: última ZERAGEM até a data ou, sem ela, a carga inicial (MIGRACAO,
+    # sempre o primeiro evento). Depois da carga inicial soma todo USO gravado
+    # depois dela (id), depois de uma ZERAGEM só o que foi produzido depois dela
+    t = _tabela(prefixo)
+    base = f"""FROM {t} WHERE maquina = m.nome AND {_MOMENTO} <= %(ate)s
+                 AND (tipo = 'ZERAGEM' OR origem = 'MIGRACAO')
+               ORDER BY tipo = 'ZERAGEM' DESC, {_MOMENTO} DESC, id DESC LIMIT 1"""
+    usos = f"""FROM {t} WHERE maquina = m.nome AND tipo = 'USO' AND {_MOMENTO} <= %(ate)s"""
+    sql = f"""
+        SELECT m.*, COALESCE(a.horas, 0) + COALESCE(u.horas, 0) AS horimetro_atual
+        FROM {prefixo}_maquinas m
+        LEFT JOIN LATERAL (SELECT id, horas, origem, {_MOMENTO} AS momento {base}) a ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT SUM(horas) AS horas {usos}
+               AND (a.id IS NULL OR {_MOMENTO} > a.momento OR (a.origem = 'MIGRACAO' AND id > a.id))
+        ) u ON TRUE
+        WHERE m.ativo = 1
+        ORDER BY m.nome
+    """
+    local = f"""
+        SELECT m.*, COALESCE((SELECT horas {base}), 0)
+             + COALESCE((SELECT SUM(horas) {usos}
+                            AND ({_MOMENTO} > COALESCE((SELECT {_MOMENTO} {base}), '')
+                                 OR ((SELECT origem {base}) = 'MIGRACAO' AND id > (SELECT id {base})))), 0)
+               AS horimetro_atual
+        FROM {prefixo}_maquinas m
+        WHERE m.ativo = 1
+        ORDER BY m.nome
+    """
+    return banco.Sql(sql, local)
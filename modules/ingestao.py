@@ -0,0 +1,338 @@
+# ==============================================================================
+# INGESTÃO EM LOTE (SCRIPTS E CONTROLADORES DAS MÁQUINAS)
+# ==============================================================================
+# Regras do serviço HTTP ferramentas/servico_ingestao.py. Um lote de
+# apontamentos ou paradas de um setor (JSON ou CSV, com os mesmos nomes de
+# coluna das tabelas) é:
+#
+#   - LIDO num DataFrame (ler), tudo como texto e convertido aqui
+#   - VALIDADO com as regras da grade do turno (modules/lote.py): campos
+#     obrigatórios, horários, quantidade, sobreposição na mesma máquina (no
+#     lote e contra o que já está gravado) e, como nos selectbox dos
+#     formulários, máquina/operador/motivo precisam estar cadastrados
+#   - GRAVADO numa transação só: um INSERT com execute_values + um evento
+#     de horímetro por máquina + estatística de ciclo e sugestões em lote.
+#     Lote com qualquer linha errada não grava nada (igual à grade), a não
+#     ser que o chamador peça gravação parcial (coletor de pulsos).
+#
+# A coluna opcional chave_envio (modules/envio.py) torna o reenvio seguro:
+# linha cuja chave já está gravada (ou repetida no próprio lote) é pulada
+# sem erro. Quem reenvia o mesmo lote depois de um 503 não duplica nada.
+#
+# Sem Streamlit aqui: quem chama passa o cursor.
+
+import io
+import json
+
+import pandas as pd
+
+import modules.banco as banco
+import modules.ciclos as ciclos
+import modules.esquema as esquema
+import modules.horimetro as horimetro
+import modules.lote as lote
+import modules.sugestoes as sugestoes
+
+TIPOS = ("apontamentos", "paradas")
+
+# Acima disso o lote é recusado inteiro (divida em lotes menores)
+MAX_LINHAS = 20000
+
+# Operações da furadeira (siglas do formulário)
+OPERACOES_FURADEIRA = ("F", "E", "R", "RB")
+
+# Por setor: coluna de data, horários em texto 'HH:MM' (estamparia), colunas
+# de cada tipo (chave_envio é opcional), obrigatórias, chave da sobreposição
+# e cadastros conferidos
+SETORES = {
+    "usinagem": {
+        "data": "data_registro",
+        "hora_texto": False,
+        "apontamentos": {
+            "colunas": ["data_registro", "cliente", "descricao_pc", "cod_programa", "maquina", "tempo_ciclo_seg",
+                        "operador", "setup_min", "inicio_prod", "fim_prod", "qtd_produzida", "refugo", "chave_envio"],
+            "obrigatorias": {"maquina": "Máquina", "operador": "Operador", "descricao_pc": "Peça",
+                             "tempo_ciclo_seg": "Ciclo"},
+            "chave": ("maquina", "máquina"),
+            "ciclo": {"descricao_pc": "peca", "cod_programa": "operacao"},
+        },
+        "paradas": {
+            "colunas": ["data_registro", "maquina", "motivo", "inicio", "fim", "observacao", "chave_envio"],
+            "obrigatorias": {"maquina": "Máquina", "motivo": "Motivo"},
+        },
+        "cadastros": {"maquina": ("usinagem_maquinas", "nome"), "operador": ("usinagem_operadores", "nome"),
+                      "motivo": ("usinagem_motivos_parada", "motivo")},
+    },
+    "estamparia": {
+        "data": "data",
+        "hora_texto": True,
+        "apontamentos": {
+            "colunas": ["data", "cliente", "descricao_pc", "operacao", "materia_prima", "maquina", "tempo_ciclo_seg",
+                        "operador", "setup_min", "inicio_prod", "fim_prod", "qtd_produzida", "refugo", "meta_pc_hora",
+                        "chave_envio"],
+            "obrigatorias": {"maquina": "Máquina", "operador": "Operador", "descricao_pc": "Produto",
+                             "tempo_ciclo_seg": "Ciclo"},
+            "chave": ("maquina", "máquina"),
+            "ciclo": {"descricao_pc": "peca"},
+        },
+        "paradas": {
+            "colunas": ["data", "maquina", "motivo", "inicio", "fim", "observacao", "chave_envio"],
+            "obrigatorias": {"maquina": "Máquina", "motivo": "Motivo"},
+        },
+        "cadastros": {"maquina": ("estamparia_maquinas", "nome"), "operador": ("estamparia_operadores", "nome"),
+                      "operacao": ("estamparia_cad_operacoes", "nome"),
+                      "materia_prima": ("estamparia_cad_materias", "nome"),
+                      "motivo": ("estamparia_cad_paradas", "nome")},
+    },
+    "furadeira": {
+        "data": "data_registro",
+        "hora_texto": False,
+        "apontamentos": {
+            "colunas": ["data_registro", "operador", "cliente", "peca", "tipo_operacao", "tempo_ciclo_seg",
+                        "inicio_prod", "fim_prod", "qtd_produzida", "refugo", "observacao", "chave_envio"],
+            "obrigatorias": {"operador": "Operador", "peca": "Peça", "tempo_ciclo_seg": "Ciclo"},
+            # Sem máquina na furadeira: quem não pode estar em dois lugares é o operador
+            "chave": ("operador", "pessoa"),
+            "ciclo": {"tipo_operacao": "operacao"},
+        },
+        "paradas": {
+            "colunas": ["data_registro", "motivo", "inicio", "fim", "observacao", "chave_envio"],
+            "obrigatorias": {"motivo": "Motivo"},
+        },
+        "cadastros": {"operador": ("furadeira_operadores", "nome"), "motivo": ("furadeira_motivos_parada", "motivo")},
+    },
+}
+
+# Rótulos nas mensagens de erro (os mesmos das telas)
+ROTULOS = {"maquina": "Máquina", "operador": "Operador", "motivo": "Motivo", "operacao": "Operação",
+           "materia_prima": "Matéria-prima", "tempo_ciclo_seg": "Ciclo", "setup_min": "Setup",
+           "qtd_produzida": "Boas", "refugo": "Refugo", "meta_pc_hora": "Meta pç/h"}
+
+# Linhas com erro listadas na resposta (o total vai à parte)
+MAX_ERROS = 100
+
+_NUMEROS = {"tempo_ciclo_seg", "setup_min", "qtd_produzida", "refugo", "meta_pc_hora"}
+_INTEIROS = {"setup_min", "qtd_produzida", "refugo", "meta_pc_hora"}
+
+
+class LoteInvalido(Exception):
+    """Corpo que nem chega a ser um lote (formato, colunas, tamanho)."""
+
+
+def _horarios(tipo):
+    return ("inicio_prod", "fim_prod") if tipo == "apontamentos" else ("inicio", "fim")
+
+
+def _tabela(setor, tipo):
+    return f"{setor}_{'apontamentos' if tipo == 'apontamentos' else 'paradas_reg'}"
+
+
+def _filtro_data(setor):
+    cfg = SETORES[setor]
+    return f"{cfg['data']}::date" if cfg["hora_texto"] else cfg["data"]
+
+
+# ------------------------------------------------------------------------------
+# LEITURA DO CORPO
+# ------------------------------------------------------------------------------
+
+def ler(corpo, formato, setor, tipo):
+    """
+    DataFrame (tudo texto, '' = vazio) com as colunas do tipo, na ordem.
+    formato: 'json' (lista de objetos, ou {"registros": [...]}) ou 'csv'
+    (cabeçalho com os nomes das colunas, separado por ',' ou ';').
+    Coluna desconhecida ou lote grande demais -> LoteInvalido.
+    """
+    if setor not in SETORES or tipo not in TIPOS:
+        raise LoteInvalido(f"Destino inválido: {setor}/{tipo}")
+    try:
+        if formato == "csv":
+            texto = corpo.decode("utf-8-sig")
+            cabecalho = texto.split("\n", 1)[0]
+            sep = ";" if cabecalho.count(";") > cabecalho.count(",") else ","
+            df = pd.read_csv(io.StringIO(texto), sep=sep, dtype=str, keep_default_na=False, skipinitialspace=True)
+        else:
+            dados = json.loads(corpo)
+            if isinstance(dados, dict):
+                dados = dados.get("registros")
+            if not isinstance(dados, list) or not all(isinstance(r, dict) for r in dados):
+                raise LoteInvalido("JSON deve ser uma lista de objetos (ou {\"registros\": [...]})")
+            df = pd.DataFrame(dados, dtype=object)
+            df = df.where(df.notna(), "").astype(str)
+    except (ValueError, UnicodeDecodeError, pd.errors.ParserError) as e:
+        raise LoteInvalido(f"Corpo ilegível ({formato}): {e}") from e
+
+    colunas = SETORES[setor][tipo]["colunas"]
+    sobrando = [c for c in df.columns if c not in colunas]
+    if sobrando:
+        raise LoteInvalido(f"Colunas desconhecidas: {', '.join(map(str, sobrando))}. Aceitas: {', '.join(colunas)}")
+    if len(df) > MAX_LINHAS:
+        raise LoteInvalido(f"{len(df)} linhas: o máximo por lote é {MAX_LINHAS}")
+    df = df.reindex(columns=colunas, fill_value="").reset_index(drop=True)
+    return df.apply(lambda s: s.str.strip())
+
+
+# ------------------------------------------------------------------------------
+# VALIDAÇÃO
+# ------------------------------------------------------------------------------
+
+def sql_cadastros(setor):
+    """{coluna: query} dos nomes ativos de cada cadastro conferido."""
+    return {col: f"SELECT {campo} FROM {tabela} WHERE ativo = 1"
+            for col, (tabela, campo) in SETORES[setor]["cadastros"].items()}
+
+
+def sql_existentes(setor):
+    """Apontamentos gravados entre duas datas (%s, %s), para a sobreposição."""
+    cfg = SETORES[setor]
+    chave = cfg["apontamentos"]["chave"][0]
+    data = cfg["data"]
+    return (f"SELECT {chave}, {data}, inicio_prod, fim_prod FROM {setor}_apontamentos "
+            f"WHERE ativo = 1 AND {_filtro_data(setor)} BETWEEN %s AND %s")
+
+
+def sql_chaves(setor, tipo):
+    """Chaves de envio já gravadas entre duas datas (%s, %s), para pular reenvios."""
+    return (f"SELECT chave_envio FROM {_tabela(setor, tipo)} "
+            f"WHERE ativo = 1 AND chave_envio IS NOT NULL AND {_filtro_data(setor)} BETWEEN %s AND %s")
+
+
+def ler_cadastros(cur, setor):
+    """{coluna: {NOME EM MAIÚSCULAS: nome gravado}} para conferir o lote."""
+    cadastros = {}
+    for col, query in sql_cadastros(setor).items():
+        cur.execute(query)
+        cadastros[col] = {str(r[0]).strip().upper(): r[0] for r in cur.fetchall() if r[0]}
+    return cadastros
+
+
+def intervalo(df, setor):
+    """(primeira data - 1 dia, última data) do lote: turno que vira o dia cruza com a véspera."""
+    datas = pd.to_datetime(df[SETORES[setor]["data"]], errors="coerce", format="%Y-%m-%d").dropna()
+    if datas.empty:
+        return None
+    return (datas.min() - pd.Timedelta(days=1)).date(), datas.max().date()
+
+
+def repetidos(df, gravadas):
+    """
+    Máscara das linhas que são reenvio: chave_envio já gravada (em
+    'gravadas', de sql_chaves) ou repetida numa linha anterior do lote.
+    """
+    chave = df["chave_envio"]
+    return (chave != "") & (chave.isin(gravadas) | chave.duplicated())
+
+
+def validar(df, setor, tipo, cadastros, existentes=None):
+    """
+    Converte os tipos e devolve df com a coluna 'erro' ('' = linha ok) e as
+    colunas dt_ini, dt_fim e horas de lote.preparar. Nomes de cadastro vêm
+    com a grafia gravada (o lote pode mandar em minúsculas).
+    existentes: DataFrame de sql_existentes (só apontamentos).
+    """
+    cfg = SETORES[setor]
+    tipo_cfg = cfg[tipo]
+    data = cfg["data"]
+    col_ini, col_fim = _horarios(tipo)
+    df = df.mask(df == "")
+    erro = pd.Series("", index=df.index, dtype=object)
+
+    def marcar(mascara, texto):
+        nonlocal erro
+        erro = erro.where(~mascara.fillna(False).astype(bool), erro + texto + "; ")
+
+    dias = pd.to_datetime(df[data], errors="coerce", format="%Y-%m-%d")
+    marcar(df[data].notna() & dias.isna(), "Data inválida (use AAAA-MM-DD)")
+    marcar(df[data].isna(), "Data vazio")
+    df[data] = dias.dt.date
+
+    for col in [c for c in tipo_cfg["colunas"] if c in _NUMEROS]:
+        num = pd.to_numeric(df[col], errors="coerce")
+        marcar(df[col].notna() & num.isna(), f"{ROTULOS[col]} não é número")
+        marcar(num < 0, f"{ROTULOS[col]} negativo")
+        df[col] = num
+    if "tempo_ciclo_seg" in df:
+        marcar(df["tempo_ciclo_seg"] <= 0, "Ciclo deve ser maior que zero")
+    if setor == "furadeira" and tipo == "apontamentos":
+        df["tipo_operacao"] = df["tipo_operacao"].fillna("F").str.upper()
+        marcar(~df["tipo_operacao"].isin(OPERACOES_FURADEIRA), f"Operação fora de {', '.join(OPERACOES_FURADEIRA)}")
+
+    # Mesmo efeito do selectbox: só vale o que está cadastrado (se o cadastro existir)
+    for col, nomes in cadastros.items():
+        if col not in df or not nomes:
+            continue
+        achado = df[col].str.upper().map(nomes)
+        fora = df[col].notna() & achado.isna()
+        erro = erro.where(~fora, erro + ROTULOS[col] + " '" + df[col].astype(str) + "' fora do cadastro; ")
+        df[col] = achado.where(achado.notna(), df[col])
+
+    df = lote.preparar(df, None, col_ini, col_fim, col_data=data)
+    chave, rotulo = tipo_cfg.get("chave", (None, None))
+    if existentes is not None and not existentes.empty:
+        existentes = lote.preparar(existentes, None, col_data=data)
+    df = lote.validar(df, tipo_cfg["obrigatorias"], chave=chave, existentes=existentes,
+                      rotulo_chave=rotulo, quantidade=(tipo == "apontamentos"))
+    df["erro"] = (erro + df["erro"]).str.rstrip("; ")
+    return df
+
+
+def erros(df):
+    """
+    (total de linhas com erro, [{'linha', 'erro'}] das primeiras MAX_ERROS)
+    para a resposta. Linha 1 = primeiro registro do lote.
+    """
+    ruins = df.loc[df["erro"] != "", "erro"]
+    return len(ruins), [{"linha": int(i) + 1, "erro": e} for i, e in ruins.head(MAX_ERROS).items()]
+
+
+# ------------------------------------------------------------------------------
+# GRAVAÇÃO
+# ------------------------------------------------------------------------------
+
+def comandos(df, setor, tipo):
+    """
+    Comandos (query, params) de uma transação para o lote já validado e a
+    lista de máquinas para o horimetro.cmds_snapshot depois do commit.
+    """
+    cfg = SETORES[setor]
+    tipo_cfg = cfg[tipo]
+    data = cfg["data"]
+    col_ini, col_fim = _horarios(tipo)
+    df = df.copy()
+    df["ativo"] = 1
+    colunas = tipo_cfg["colunas"] + ["ativo"]
+
+    inteiros = [c for c in colunas if c in _INTEIROS]
+    df[inteiros] = df[inteiros].fillna(0).astype(int)
+    campos_sug = esquema.CAMPOS_SUGESTAO[setor] if tipo == "apontamentos" else {}
+    for campo in campos_sug:
+        df[campo] = df[campo].where(df[campo].notna(), None).map(sugestoes.normalizar)
+    if tipo == "apontamentos":
+        df["ciclo"] = ciclos.ciclo_real_df(df, data, col_ini, col_fim, "setup_min" if "setup_min" in df else None)
+
+    # Mesmo formato dos formulários: estamparia grava texto, os outros DATE/TIME
+    if cfg["hora_texto"]:
+        df[data] = df[data].astype(str)
+        df[col_ini] = df["dt_ini"].dt.strftime("%H:%M")
+        df[col_fim] = df["dt_fim"].dt.strftime("%H:%M")
+    else:
+        df[col_ini] = df["dt_ini"].dt.time
+        df[col_fim] = df["dt_fim"].dt.time
+
+    cmds = [(f"INSERT INTO {_tabela(setor, tipo)} ({', '.join(colunas)}) VALUES %s",
+             banco.Linhas(lote.linhas(df, colunas)))]
+    if tipo == "paradas":
+        return cmds, []
+
+    maquinas = []
+    if setor in esquema.COM_HORIMETRO:
+        horas = lote.horas_por_maquina(df)
+        cmds += [horimetro.cmd_uso(setor, m, h, "INGESTAO", fim) for m, h, fim in lote.usos_por_dia(df)]
+        maquinas = list(horas)
+    grupos = df.rename(columns=tipo_cfg["ciclo"])
+    if "maquina" not in grupos:
+        grupos["maquina"] = ""
+    cmd_ciclo = ciclos.cmd_registrar_lote(setor, grupos)
+    cmd_sug = sugestoes.cmd_registrar_lote(setor, {campo: df[campo] for campo in campos_sug})
+    cmds += [c for c in (cmd_ciclo, cmd_sug) if c]
+    return cmds, maquinas
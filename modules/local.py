@@ -0,0 +1,657 @@
+# ==============================================================================
+# BANCO LOCAL (SQLITE) NO LUGAR DO POSTGRES
+# ==============================================================================
+# Para rodar o portal inteiro numa máquina só, sem o Supabase: telas,
+# exportações, dashboards, teste de carga e medições de desempenho.
+# No .streamlit/secrets.toml:
+#
+#   [postgres]
+#   DB_MOTOR = "sqlite"
+#   DB_ARQUIVO = "dados_locais/banco_local.db"
+#
+# banco.conectar devolve então uma Conexao daqui, com a mesma cara da
+# conexão do psycopg2 que o resto do sistema usa: cursor(), commit(),
+# rollback(), cancel(), tempo limite por 'SET LOCAL statement_timeout' e
+# os mesmos tipos de erro (psycopg2.Error), para banco.executar e as telas
+# não precisarem saber qual banco está por trás.
+#
+# O SQL continua escrito para o Postgres e é traduzido na hora:
+#   - parâmetros %s / %(nome)s, casts '::tipo' ('::date' vira date()), ILIKE
+#   - funções do Postgres refeitas em Python: now(), similarity(), ...
+#     (a busca de texto é ipar_busca, com a versão SQLite em banco.Sql)
+#   - unnest(listas) vira VALUES; arrays são gravados como JSON
+#   - DDL: SERIAL/IDENTITY, DEFAULT now(), ADD COLUMN IF NOT EXISTS; o que
+#     só existe no Postgres (plpgsql, extensões, índices GIN) é pulado
+# Os poucos comandos sem tradução automática (CTE de escrita, LATERAL,
+# triggers) trazem a versão SQLite junto (banco.Sql). O banco local é
+# criado pelas mesmas definições de tabela (modules/esquema.py).
+
+import json
+import os
+import re
+import sqlite3
+import time as _time
+import unicodedata
+import zlib
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import pandas as pd
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+
+import modules.perfil as perfil
+
+MOTOR = "sqlite"
+
+# Limite de parâmetros por comando do SQLite (VALUES em lote é dividido)
+MAX_PARAMETROS = 30000
+
+# Similaridade mínima do operador '%' do pg_trgm (padrão do Postgres)
+LIMIAR_TRGM = 0.3
+
+Coluna = namedtuple("Coluna", "name type_code display_size internal_size precision scale null_ok")
+
+
+# ------------------------------------------------------------------------------
+# TIPOS: valores Python <-> SQLite
+# ------------------------------------------------------------------------------
+
+def _valor(v):
+    """Parâmetro no formato que o SQLite guarda (datas em ISO, arrays em JSON)."""
+    if isinstance(v, datetime):
+        return v.isoformat(sep=" ")
+    if isinstance(v, (date, time)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, (list, tuple)):
+        return json.dumps([_valor(x) for x in v])
+    if hasattr(v, "item") and not isinstance(v, (str, bytes)):
+        return v.item()  # escalares do numpy (grades do pandas)
+    return v
+
+
+def _texto(b):
+    return b.decode() if isinstance(b, bytes) else b
+
+
+def _array(b):
+    # JSON gravado aqui, ou '{1,2,3}' vindo de um ::int[] do SQL original
+    s = _texto(b).strip()
+    if s.startswith("{"):
+        s = "[" + s[1:-1] + "]"
+    return json.loads(s)
+
+
+# Colunas declaradas com esses tipos voltam como no psycopg2
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(_texto(b)[:10]))
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.fromisoformat(_texto(b)))
+sqlite3.register_converter("TIME", lambda b: time.fromisoformat(_texto(b)))
+sqlite3.register_converter("ARRAY", _array)
+
+
+# ------------------------------------------------------------------------------
+# FUNÇÕES DO POSTGRES REFEITAS EM PYTHON
+# ------------------------------------------------------------------------------
+
+def _agora():
+    return datetime.now().isoformat(sep=" ")
+
+
+def _trigramas(s):
+    # Mesma regra do pg_trgm: palavras em minúsculas com 2 espaços antes e 1 depois
+    tri = set()
+    for palavra in re.findall(r"\w+", (s or "").lower()):
+        p = f"  {palavra} "
+        tri |= {p[i:i + 3] for i in range(len(p) - 2)}
+    return tri
+
+
+def similaridade(a, b):
+    ta, tb = _trigramas(a), _trigramas(b)
+    return len(ta & tb) / len(ta | tb) if ta and tb else 0.0
+
+
+# Busca de texto (modules/busca.py): radical simples em português, sem acento
+_SUFIXOS = ("amente", "mente", "coes", "cao", "oes", "ais", "eis", "ao", "es", "s", "a", "o", "e")
+# Palavras que o dicionário português do Postgres ignora (as mais comuns)
+_VAZIAS = {"a", "o", "e", "as", "os", "de", "da", "do", "das", "dos", "em", "na", "no", "nas", "nos",
+           "um", "uma", "com", "sem", "por", "para", "que", "se", "ou", "ao", "aos", "pela", "pelo"}
+
+
+def _radical(palavra):
+    p = unicodedata.normalize("NFKD", palavra.lower()).encode("ascii", "ignore").decode()
+    for sufixo in _SUFIXOS:
+        if p.endswith(sufixo) and len(p) - len(sufixo) >= 3:
+            return p[:-len(sufixo)]
+    return p
+
+
+def busca(consulta, texto):
+    """
+    Pontuação da busca (0 = não casa), no lugar de texto @@ websearch_to_tsquery.
+    Mesma sintaxe: palavras (todas), "frase", OR e -palavra.
+    """
+    if not consulta or texto is None:
+        return 0
+    palavras = [_radical(w) for w in re.findall(r"\w+", texto) if w.lower() not in _VAZIAS]
+    presentes = set(palavras)
+    total = 0
+    for grupo in re.split(r"\s+OR\s+", consulta):
+        pontos = 0
+        for sinal, termo in re.findall(r'(-?)("[^"]*"|\S+)', grupo):
+            radicais = [_radical(w) for w in re.findall(r"\w+", termo) if w.lower() not in _VAZIAS]
+            if not radicais:
+                continue
+            if termo.startswith('"'):
+                n = len(radicais)
+                achou = any(palavras[i:i + n] == radicais for i in range(len(palavras) - n + 1))
+            else:
+                achou = all(r in presentes for r in radicais)
+            if sinal and achou or not sinal and not achou:
+                pontos = 0
+                break
+            if not sinal:
+                pontos += sum(palavras.count(r) for r in radicais)
+        total = max(total, pontos)
+    return total
+
+
+def _regexp_replace(s, padrao, troca, flags=""):
+    if s is None:
+        return None
+    troca = re.sub(r"\\(\d)", r"\\g<\1>", troca)
+    return re.sub(padrao, troca, s, count=0 if "g" in (flags or "") else 1,
+                  flags=re.IGNORECASE if "i" in (flags or "") else 0)
+
+
+_HORA = re.compile(r"^([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d(\.\d+)?)?$")
+
+
+def minutos(ini, fim):
+    """Igual à ipar_minutos do Postgres (modules/metricas.py)."""
+    if not (isinstance(ini, str) and isinstance(fim, str) and _HORA.match(ini) and _HORA.match(fim)):
+        return None
+    def seg(h):
+        partes = [float(x) for x in h.split(":")]
+        return partes[0] * 3600 + partes[1] * 60 + (partes[2] if len(partes) > 2 else 0)
+    m = (seg(fim) - seg(ini)) / 60
+    return m + 1440 if m < 0 else m
+
+
+def _momento(dia, h):
+    # 'AAAA-MM-DD' + 'HH:MM[:SS]' -> datetime (None se algum não vale)
+    if not (isinstance(dia, str) and isinstance(h, str) and _HORA.match(h)):
+        return None
+    try:
+        return datetime.fromisoformat(f"{dia[:10]} {h if h.count(':') == 2 else h + ':00'}")
+    except ValueError:
+        return None
+
+
+def periodo_ini(dia, ini, fim):
+    """Início do período (texto), como lower(ipar_periodo) do Postgres (modules/sobreposicao.py)."""
+    m = _momento(dia, ini)
+    return m.isoformat(sep=" ") if m and _momento(dia, fim) else None
+
+
+def periodo_fim(dia, ini, fim):
+    """Fim do período (texto); fim < início vira o dia seguinte."""
+    m, f = _momento(dia, ini), _momento(dia, fim)
+    if not (m and f):
+        return None
+    return (f + timedelta(days=1) if f < m else f).isoformat(sep=" ")
+
+
+def _soma_arrays(a, b):
+    a = _array(a) if a is not None else []
+    b = _array(b) if b is not None else []
+    n = max(len(a), len(b))
+    a, b = a + [0] * (n - len(a)), b + [0] * (n - len(b))
+    return json.dumps([x + y for x, y in zip(a, b)])
+
+
+def _soma_posicao(a, k, qtd):
+    # hist[k] = hist[k] + qtd (posição base 1, como no Postgres)
+    a = _array(a)
+    a[int(k) - 1] += qtd
+    return json.dumps(a)
+
+
+def _maior(*v):
+    v = [x for x in v if x is not None]
+    return max(v) if v else None
+
+
+def _menor(*v):
+    v = [x for x in v if x is not None]
+    return min(v) if v else None
+
+
+FUNCOES = {
+    ("now", 0): _agora,
+    ("clock_timestamp", 0): _agora,
+    ("similarity", 2): similaridade,
+    ("regexp_replace", 3): _regexp_replace,
+    ("regexp_replace", 4): _regexp_replace,
+    ("hashtext", 1): lambda s: zlib.crc32(str(s).encode()),
+    # Um escritor por vez no SQLite: as travas do Postgres não fazem falta
+    ("pg_advisory_xact_lock", 1): lambda k: None,
+    ("pg_advisory_xact_lock_shared", 1): lambda k: None,
+    ("greatest", -1): _maior,
+    ("least", -1): _menor,
+    ("ipar_minutos", 2): minutos,
+    ("ipar_periodo_ini", 3): periodo_ini,
+    ("ipar_periodo_fim", 3): periodo_fim,
+    ("ipar_busca", 2): busca,
+    ("ipar_soma_arrays", 2): _soma_arrays,
+    ("ipar_soma_posicao", 3): _soma_posicao,
+}
+
+
+# ------------------------------------------------------------------------------
+# TRADUÇÃO DO SQL
+# ------------------------------------------------------------------------------
+
+# Comandos que só existem no Postgres (o equivalente, quando precisa, vem no banco.Sql)
+_PULAR = re.compile(r"""^\s*(
+      CREATE\s+EXTENSION
+    | CREATE\s+(OR\s+REPLACE\s+)?FUNCTION
+    | CREATE\s+TRIGGER\b.*\bEXECUTE\s+(FUNCTION|PROCEDURE)
+    | DROP\s+TRIGGER\b.*\bON\b
+    | DO\s+\$
+    | CREATE\s+INDEX\b.*\bUSING\s+(gin|gist)\b
+    | SET\s+(?!LOCAL\s+statement_timeout)
+)""", re.IGNORECASE | re.DOTALL | re.VERBOSE)
+
+_TEMPO_LIMITE = re.compile(r"^\s*SET\s+LOCAL\s+statement_timeout\s*=\s*(%s|\d+)\s*$", re.IGNORECASE)
+_ADD_COLUNA = re.compile(r"^\s*ALTER\s+TABLE\s+(\w+)\s+ADD\s+COLUMN\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+(.*)$",
+                         re.IGNORECASE | re.DOTALL)
+_UNNEST = re.compile(r"\bunnest\s*\((?P<args>[^()]*)\)(\s+AS\s+(?P<apelido>\w+)\s*\((?P<colunas>[^()]*)\))?",
+                     re.IGNORECASE)
+_PARAMETRO = re.compile(r"%%|%s|%\((\w+)\)s")
+
+
+def comandos(sql):
+    """Separa um script em comandos (';' fora de aspas, $$...$$ e comentários)."""
+    partes, atual, i, n = [], [], 0, len(sql)
+    while i < n:
+        c = sql[i]
+        if c == "'":
+            j = i + 1
+            while j < n and not (sql[j] == "'" and (j + 1 >= n or sql[j + 1] != "'")):
+                j += 2 if sql[j] == "'" else 1
+            atual.append(sql[i:j + 1]); i = j + 1
+        elif c == "$" and (m := re.match(r"\$\w*\$", sql[i:])):
+            fim = sql.find(m.group(), i + len(m.group()))
+            fim = n if fim < 0 else fim + len(m.group())
+            atual.append(sql[i:fim]); i = fim
+        elif sql.startswith("--", i):
+            fim = sql.find("\n", i)
+            i = n if fim < 0 else fim
+        elif c == ";":
+            partes.append("".join(atual)); atual = []; i += 1
+        else:
+            atual.append(c); i += 1
+    partes.append("".join(atual))
+    # Trigger do SQLite: os ';' entre BEGIN e END são do corpo
+    saida = []
+    for p in (p.strip() for p in partes if p.strip()):
+        if saida and re.match(r"CREATE\s+TRIGGER\b", saida[-1], re.I) and not re.search(r"\bEND$", saida[-1], re.I):
+            saida[-1] += "; " + p
+        else:
+            saida.append(p)
+    return saida
+
+
+def _ddl(cmd):
+    # Tipos e defaults de CREATE/ALTER TABLE e CREATE INDEX
+    cmd = re.sub(r"\b(BIG)?SERIAL\s+PRIMARY\s+KEY", "INTEGER PRIMARY KEY AUTOINCREMENT", cmd, flags=re.I)
+    cmd = re.sub(r"\bBIGINT\s+GENERATED\s+(BY\s+DEFAULT|ALWAYS)\s+AS\s+IDENTITY\s+PRIMARY\s+KEY",
+                 "INTEGER PRIMARY KEY AUTOINCREMENT", cmd, flags=re.I)
+    cmd = re.sub(r"\bDEFAULT\s+(now|clock_timestamp)\(\)", "DEFAULT CURRENT_TIMESTAMP", cmd, flags=re.I)
+    cmd = re.sub(r"\b\w+\[\]", "ARRAY", cmd)
+    cmd = re.sub(r"\s+text_pattern_ops\b", "", cmd, flags=re.I)
+    cmd = re.sub(r"\s+INCLUDE\s*\([^)]*\)", "", cmd, flags=re.I)
+    return cmd
+
+
+def _consulta(cmd):
+    # Diferenças de dialeto em qualquer comando (antes de trocar os parâmetros)
+    cmd = re.sub(r"([\w.]+|%s|%\(\w+\)s)::date\b", r"date(\1)", cmd)
+    cmd = re.sub(r"::\w+(\s+precision)?(\[\])?", "", cmd, flags=re.I)
+    cmd = re.sub(r"\bILIKE\b", "LIKE", cmd, flags=re.I)
+    cmd = re.sub(r"\b(DATE|TIME|TIMESTAMP)\s+('[^']*')", r"\2", cmd, flags=re.I)
+    # Operador de similaridade do pg_trgm: a %% b
+    cmd = re.sub(r"([\w.]+)\s+%%\s+(%\(\w+\)s|%s)", rf"similarity(\1, \2) >= {LIMIAR_TRGM}", cmd)
+    return cmd
+
+
+def _onde_antes_do_conflito(cmd):
+    # INSERT ... SELECT ... FROM x ON CONFLICT: o SQLite confunde o ON com
+    # o de um JOIN; um 'WHERE true' desfaz a ambiguidade
+    m = re.search(r"\bON\s+CONFLICT\b", cmd, re.I)
+    if not m or not re.match(r"\s*INSERT\b", cmd, re.I) or not re.search(r"\bSELECT\b", cmd[:m.start()], re.I):
+        return cmd
+    depois_from = re.split(r"\bFROM\b", cmd[:m.start()], flags=re.I)[-1]
+    if re.search(r"\b(WHERE|GROUP\s+BY|ORDER\s+BY|LIMIT)\b", depois_from, re.I):
+        return cmd
+    return cmd[:m.start()] + "WHERE true " + cmd[m.start():]
+
+
+def _expandir_unnest(cmd, params):
+    """
+    unnest(%s, %s, ...) com listas -> (SELECT ... FROM (VALUES ...)).
+    Só parâmetros posicionais (é como o sistema usa).
+    """
+    if not isinstance(params, (list, tuple)) or not _UNNEST.search(cmd):
+        return cmd, params
+    params = list(params)
+    # Do fim para o começo: as posições dos parâmetros anteriores não mudam
+    for m in reversed(list(_UNNEST.finditer(cmd))):
+        inicio = _qtd_parametros(cmd[:m.start()])
+        qtd = _qtd_parametros(m.group("args"))
+        linhas = list(zip(*params[inicio:inicio + qtd]))
+        nomes = [c.strip() for c in (m.group("colunas") or "").split(",") if c.strip()] or \
+                [f"column{i + 1}" for i in range(qtd)]
+        if linhas:
+            colunas = ", ".join(f"column{i + 1} AS {c}" for i, c in enumerate(nomes))
+            valores = ", ".join("(" + ", ".join(["%s"] * qtd) + ")" for _ in linhas)
+            sub = f"(SELECT {colunas} FROM (VALUES {valores}))"
+        else:
+            sub = f"(SELECT {', '.join(f'NULL AS {c}' for c in nomes)} WHERE 0)"
+        if m.group("apelido"):
+            sub += f" AS {m.group('apelido')}"
+        cmd = cmd[:m.start()] + sub + cmd[m.end():]
+        params[inicio:inicio + qtd] = [v for linha in linhas for v in linha]
+    return cmd, params
+
+
+def _parametros(cmd, params):
+    """%s -> ?, %(nome)s -> :nome, %% -> %; valores convertidos."""
+    if isinstance(params, dict):
+        sql = _PARAMETRO.sub(lambda m: "%" if m.group() == "%%" else f":{m.group(1)}", cmd)
+        return sql, {k: _valor(v) for k, v in params.items()}
+    sql = _PARAMETRO.sub(lambda m: "%" if m.group() == "%%" else "?", cmd)
+    return sql, tuple(_valor(v) for v in (params or ()))
+
+
+def _qtd_parametros(cmd):
+    return sum(1 for m in _PARAMETRO.finditer(cmd) if m.group() == "%s")
+
+
+# ------------------------------------------------------------------------------
+# CONEXÃO E CURSOR (MESMA INTERFACE DO PSYCOPG2)
+# ------------------------------------------------------------------------------
+
+def _erro(e, motivo):
+    """Erro do sqlite3 -> o erro equivalente do psycopg2 (banco.tipo_erro entende)."""
+    if isinstance(e, sqlite3.OperationalError) and "interrupt" in str(e):
+        texto = ("canceling statement due to statement timeout" if motivo == "tempo"
+                 else "canceling statement due to user request")
+        return psycopg2.extensions.QueryCanceledError(texto)
+    if isinstance(e, sqlite3.IntegrityError) and str(e).startswith("Horário cruza"):
+        # RAISE(ABORT) do trigger de sobreposição (modo bloquear)
+        return psycopg2.errors.ExclusionViolation(str(e))
+    if isinstance(e, sqlite3.IntegrityError):
+        return psycopg2.IntegrityError(str(e))
+    if isinstance(e, sqlite3.OperationalError) and "locked" in str(e):
+        return psycopg2.extensions.TransactionRollbackError(str(e))
+    return psycopg2.ProgrammingError(str(e))
+
+
+class Cursor:
+    def __init__(self, conn):
+        self.connection = conn
+        self._cur = conn._db.cursor()
+        self.itersize = 2000
+        self.description = None
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cur.close()
+
+    def _rodar(self, sql, params):
+        conn = self.connection
+        conn._comecar()
+        try:
+            if not conn.autocommit and not conn._db.in_transaction:
+                # Como o psycopg2: toda transação começa no primeiro comando
+                conn._db.execute("BEGIN")
+            self._cur.execute(sql, params)
+        except sqlite3.Error as e:
+            raise _erro(e, conn._motivo) from e
+        self.description = ([Coluna(d[0], None, None, None, None, None, None) for d in self._cur.description]
+                            if self._cur.description else None)
+        self.rowcount = self._cur.rowcount
+
+    def execute(self, query, params=None):
+        t = perfil.relogio()
+        if t is None:
+            return self._execute(query, params)
+        try:
+            return self._execute(query, params)
+        finally:
+            # No SQLite a consulta continua enquanto as linhas são lidas: o
+            # tempo aqui é o da primeira linha
+            perfil.consulta(t, query, self.rowcount)
+
+    def _execute(self, query, params):
+        conn = self.connection
+        if conn.closed:
+            raise psycopg2.InterfaceError("connection already closed")
+        texto = getattr(query, "local", None)
+        texto = str(query) if texto is None else texto
+        posicionais = list(params) if isinstance(params, (list, tuple)) else None
+        for cmd in comandos(texto):
+            p = params
+            if posicionais is not None:
+                # Script com vários comandos: cada um leva os seus %s
+                n = _qtd_parametros(cmd)
+                p, posicionais = posicionais[:n], posicionais[n:]
+            self._comando(cmd, p)
+
+    def _comando(self, cmd, params):
+        conn = self.connection
+        m = _TEMPO_LIMITE.match(cmd)
+        if m:
+            ms = params[0] if m.group(1) == "%s" else int(m.group(1))
+            conn._tempo_limite_tx = int(ms)
+            return
+        if _PULAR.match(cmd):
+            return
+        m = _ADD_COLUNA.match(cmd)
+        if m:
+            tabela, coluna, resto = m.groups()
+            if coluna.lower() in conn.colunas(tabela):
+                return
+            # Default que não é constante não é aceito no ALTER do SQLite
+            resto = re.sub(r"\bDEFAULT\s+\w+\(\)", "", resto, flags=re.I)
+            cmd = f"ALTER TABLE {tabela} ADD COLUMN {coluna} {resto}"
+        if re.match(r"\s*(CREATE|ALTER)\b", cmd, re.I):
+            cmd = _ddl(cmd)
+        cmd = _onde_antes_do_conflito(_consulta(cmd))
+        cmd, params = _expandir_unnest(cmd, params)
+        self._rodar(*_parametros(cmd, params))
+
+    def execute_values(self, query, linhas, molde=None):
+        """Equivalente ao psycopg2.extras.execute_values (VALUES %s em lote)."""
+        t = perfil.relogio()
+        if t is None:
+            return self._execute_values(query, linhas, molde)
+        try:
+            return self._execute_values(query, linhas, molde)
+        finally:
+            perfil.consulta(t, query, len(linhas))
+
+    def _execute_values(self, query, linhas, molde):
+        texto = getattr(query, "local", None)
+        texto = str(query) if texto is None else texto
+        if not linhas:
+            return
+        molde = re.sub(r"::\w+(\[\])?", "", molde or "(" + ", ".join(["%s"] * len(linhas[0])) + ")")
+        por_vez = max(1, MAX_PARAMETROS // max(1, _qtd_parametros(molde)))
+        for i in range(0, len(linhas), por_vez):
+            bloco = linhas[i:i + por_vez]
+            valores = ", ".join([molde] * len(bloco))
+            params = [v for linha in bloco for v in linha]
+            for cmd in comandos(texto):
+                if "VALUES %s" in cmd:
+                    self._comando(cmd.replace("VALUES %s", f"VALUES {valores}", 1), params)
+                else:
+                    self._comando(cmd, None)
+
+    def executemany(self, query, seq):
+        for params in seq:
+            self.execute(query, params)
+
+    # O SQLite continua executando enquanto entrega as linhas
+    def _ler(self, f, *args):
+        try:
+            return f(*args)
+        except sqlite3.Error as e:
+            raise _erro(e, self.connection._motivo) from e
+
+    def fetchone(self):
+        return self._ler(self._cur.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._ler(self._cur.fetchmany, size or self.itersize)
+
+    def fetchall(self):
+        return self._ler(self._cur.fetchall)
+
+
+class Conexao:
+    """Conexão SQLite com a interface da conexão do psycopg2 usada pelo sistema."""
+
+    motor = MOTOR
+    encoding = "UTF8"
+
+    def __init__(self, arquivo, tempo_limite_ms=0):
+        self.dsn = f"sqlite:{arquivo}"
+        # Transação aberta por nós (BEGIN no primeiro comando, _rodar): o BEGIN
+        # implícito do sqlite3 só vale para INSERT/UPDATE/DELETE/REPLACE, e um
+        # WITH ... INSERT, por exemplo, seria gravado fora da transação
+        self._db = sqlite3.connect(arquivo, timeout=30, check_same_thread=False,
+                                   detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for (nome, n), f in FUNCOES.items():
+            self._db.create_function(nome, n, f)
+        # Avisos do banco (RAISE WARNING no Postgres), como conn.notices do psycopg2
+        self.notices = []
+        self._db.create_function("ipar_aviso", 1, lambda msg: self.notices.append(f"WARNING:  {msg}\n"))
+        self._db.set_progress_handler(self._vigia, 1000)
+        self._tempo_limite = tempo_limite_ms
+        self._tempo_limite_tx = None
+        self._prazo = None
+        self._cancelada = False
+        self._motivo = None
+        self.closed = 0
+        self.autocommit = False
+        self.readonly = False
+
+    # Tempo limite e cancelamento (o SQLite consulta o vigia durante o comando)
+
+    def _comecar(self):
+        ms = self._tempo_limite if self._tempo_limite_tx is None else self._tempo_limite_tx
+        self._prazo = _time.monotonic() + ms / 1000 if ms else None
+        self._cancelada = False
+        self._motivo = None
+
+    def _vigia(self):
+        if self._cancelada:
+            self._motivo = "cancelada"
+            return 1
+        if self._prazo is not None and _time.monotonic() > self._prazo:
+            self._motivo = "tempo"
+            return 1
+        return 0
+
+    def cancel(self):
+        self._cancelada = True
+        self._db.interrupt()
+
+    # Mesma interface do psycopg2
+
+    def cursor(self, name=None):
+        return Cursor(self)
+
+    def _fim_transacao(self):
+        self._tempo_limite_tx = None
+
+    def commit(self):
+        try:
+            if self._db.in_transaction:
+                self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            raise _erro(e, None) from e
+        self._fim_transacao()
+
+    def rollback(self):
+        if self._db.in_transaction:
+            self._db.execute("ROLLBACK")
+        self._fim_transacao()
+
+    def close(self):
+        if not self.closed:
+            self._db.close()
+            self.closed = 1
+
+    def set_session(self, readonly=None, autocommit=None):
+        if readonly is not None:
+            self.readonly = readonly
+            self._db.execute(f"PRAGMA query_only = {1 if readonly else 0}")
+        if autocommit is not None:
+            self.autocommit = autocommit
+
+    def get_transaction_status(self):
+        if self._db.in_transaction:
+            return psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def colunas(self, tabela):
+        return {r[1].lower() for r in self._db.execute(f"PRAGMA table_info({tabela})")}
+
+
+def conectar(credenciais, options=""):
+    """Abre o arquivo DB_ARQUIVO (relativo à pasta do sistema). 'options' aceita o statement_timeout."""
+    arquivo = credenciais.get("DB_ARQUIVO") or os.path.join("dados_locais", "banco_local.db")
+    if credenciais.get("DB_SCHEMA"):
+        # Planta com schema próprio (modules/plantas.py): arquivo próprio
+        raiz, ext = os.path.splitext(arquivo)
+        arquivo = f"{raiz}_{credenciais['DB_SCHEMA']}{ext}"
+    if not os.path.isabs(arquivo):
+        arquivo = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), arquivo)
+    os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+    m = re.search(r"statement_timeout=(\d+)", options or "")
+    try:
+        return Conexao(arquivo, int(m.group(1)) if m else 0)
+    except sqlite3.Error as e:
+        raise psycopg2.OperationalError(str(e)) from e
+
+
+def e_local(conn):
+    return isinstance(conn, Conexao)
+
+
+def ler(conn, cur, query, params=None):
+    """
+    O que o banco.ler_copy devolve, pelo banco local: mesmas colunas e os
+    tipos do pd.read_sql (DATE e TIME já voltam como date / time).
+    """
+    cur.execute(query, params)
+    return pd.DataFrame(cur.fetchall(), columns=[d.name for d in cur.description])
@@ -0,0 +1,124 @@
+# ==============================================================================
+# APONTAMENTO EM LOTE (GRADE DO TURNO)
+# ==============================================================================
+# No fim do turno o líder costuma lançar a produção inteira de uma vez. Pelo
+# formulário cada registro custa duas execuções da tela (revisar + confirmar)
+# e um commit no Supabase. Na grade (st.data_editor) ele digita todas as
+# linhas do dia e o lote inteiro é:
+#
+#   - VALIDADO de uma vez com pandas, sem loop por linha: campos vazios,
+#     quantidade zero, início/fim (fim menor que início = virou o dia,
+#     igual ao formulário) e sobreposição de horário na mesma máquina,
+#     entre as linhas da grade e contra o que já está gravado no dia
+#   - GRAVADO numa transação só: um INSERT com execute_values para todos
+#     os apontamentos + um evento de horímetro por máquina + estatística
+#     de ciclo e sugestões em lote (ver ciclos/sugestoes.cmd_registrar_lote)
+
+import pandas as pd
+
+# Duração acima disso é quase sempre início e fim trocados
+HORAS_MAX = 14
+
+# Linhas em branco que a grade já abre
+LINHAS_INICIAIS = 10
+
+_DTYPE = {"texto": object, "numero": "float64", "hora": object}
+
+# HH:MM[:SS[.ffff]] de 00:00 a 23:59 (o to_timedelta aceitaria '25:00' como 1 dia e 1 h)
+_HORA = r"^([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d(\.\d+)?)?$"
+
+
+def grade_vazia(colunas, linhas=LINHAS_INICIAIS):
+    """DataFrame em branco para o data_editor. colunas: {coluna: 'texto' | 'numero' | 'hora'}."""
+    return pd.DataFrame({c: pd.Series([None] * linhas, dtype=_DTYPE[t]) for c, t in colunas.items()})
+
+
+def _hora(s):
+    # time do editor ('07:30:00'), TIME do banco ou texto 'HH:MM' da estamparia
+    s = s.astype(object).where(s.notna(), None).astype(str).str.strip()
+    s = s.where(s.str.match(_HORA))
+    s = s.where(s.str.count(":") != 1, s + ":00")
+    return pd.to_timedelta(s, errors="coerce")
+
+
+def preparar(df, data, col_ini="inicio_prod", col_fim="fim_prod", col_data=None):
+    """
+    Tira as linhas vazias e acrescenta dt_ini, dt_fim e horas. O índice
+    continua o da grade (linha = índice + 1 nas mensagens de erro).
+    'data' é a data do lote; col_data usa a data de cada linha (registros já gravados).
+    """
+    df = df.dropna(how="all").copy()
+    dia = pd.to_datetime(df[col_data].astype(str).str.slice(0, 10), errors="coerce") if col_data else pd.Timestamp(data)
+    df["dt_ini"] = dia + _hora(df[col_ini])
+    df["dt_fim"] = dia + _hora(df[col_fim])
+    df.loc[df["dt_fim"] < df["dt_ini"], "dt_fim"] += pd.Timedelta(days=1)
+    df["horas"] = (df["dt_fim"] - df["dt_ini"]).dt.total_seconds() / 3600
+    return df
+
+
+def sobreposicoes(df, chave="maquina", existentes=None):
+    """
+    Máscara das linhas de df cujo horário cruza com outra linha da mesma
+    'chave' (na grade ou em 'existentes', já passados por preparar()).
+    Ordena por início dentro da chave: há cruzamento se a linha começa
+    antes do maior fim anterior ou termina depois do início seguinte.
+    """
+    cols = [chave, "dt_ini", "dt_fim"]
+    partes = [df[cols].assign(_pos=df.index)]
+    if existentes is not None and not existentes.empty:
+        partes.append(existentes[cols].assign(_pos=-1))
+    todos = pd.concat(partes, ignore_index=True).dropna(subset=cols)
+    todos = todos.sort_values([chave, "dt_ini"], kind="stable")
+
+    grupo = todos.groupby(chave, sort=False)
+    fim_anterior = grupo["dt_fim"].shift().groupby(todos[chave]).cummax()
+    ini_seguinte = grupo["dt_ini"].shift(-1)
+    cruza = (todos["dt_ini"] < fim_anterior) | (todos["dt_fim"] > ini_seguinte)
+
+    mascara = pd.Series(False, index=df.index)
+    mascara[todos.loc[cruza & (todos["_pos"] >= 0), "_pos"].unique()] = True
+    return mascara
+
+
+def validar(df, obrigatorias, chave="maquina", existentes=None, rotulo_chave="máquina", quantidade=True):
+    """
+    Coluna 'erro' com os problemas de cada linha ('' = linha ok).
+    df já passou por preparar(); obrigatorias: {coluna: rótulo}.
+    chave=None não confere sobreposição; quantidade=False é para paradas
+    (sem qtd_produzida/refugo).
+    """
+    erro = pd.Series("", index=df.index, dtype=object)
+
+    def marcar(mascara, texto):
+        nonlocal erro
+        erro = erro.where(~mascara.fillna(False).astype(bool), erro + texto + "; ")
+
+    for col, rotulo in obrigatorias.items():
+        marcar(df[col].isna() | df[col].astype(str).str.strip().eq(""), f"{rotulo} vazio")
+    marcar(df["dt_ini"].isna() | df["dt_fim"].isna(), "Início/fim inválido")
+    marcar(df["horas"] == 0, "Início igual ao fim")
+    marcar(df["horas"] > HORAS_MAX, f"Mais de {HORAS_MAX} h: início e fim trocados?")
+    if quantidade:
+        marcar(df["qtd_produzida"].fillna(0) + df["refugo"].fillna(0) <= 0, "Quantidade zero")
+    if chave:
+        marcar(sobreposicoes(df, chave, existentes), f"Horário cruza com outro apontamento da mesma {rotulo_chave}")
+
+    df["erro"] = erro.str.rstrip("; ")
+    return df
+
+
+def linhas(df, colunas):
+    """Tuplas com tipos do Python (o psycopg2 não adapta numpy.int64) e None no lugar de NaN."""
+    parte = df[colunas].astype(object)
+    return [tuple(r) for r in parte.where(parte.notna(), None).itertuples(index=False)]
+
+
+def horas_por_maquina(df, col_maquina="maquina"):
+    """{máquina: horas somadas} para um evento de horímetro por máquina."""
+    return {m: float(h) for m, h in df.groupby(col_maquina)["horas"].sum().items()}
+
+
+def usos_por_dia(df, col_maquina="maquina"):
+    """[(máquina, horas, fim)] com um evento de horímetro por máquina e dia de produção."""
+    grupos = df.groupby([df[col_maquina], df["dt_ini"].dt.date])
+    return [(m, float(g["horas"].sum()), g["dt_fim"].max().to_pydatetime()) for (m, _), g in grupos]
@@ -0,0 +1,178 @@
+# ==============================================================================
+# MÉTRICAS DERIVADAS GRAVADAS NO BANCO (TRIGGER)
+# ==============================================================================
+# Todo painel recalculava, linha a linha, as mesmas contas. Agora o Postgres
+# grava o resultado junto com o registro (trigger BEFORE INSERT OR UPDATE),
+# igual nos três setores:
+#
+#   <setor>_apontamentos
+#       min_real      minutos entre início e fim (fim < início = virou o dia)
+#       min_teorico   (qtd_produzida + refugo) * tempo_ciclo_seg / 60
+#       eficiencia_calc (só furadeira): min_teorico / min_real * 100
+#   <setor>_paradas_reg
+#       min_parada    minutos entre início e fim da parada
+#
+# Vale para qualquer caminho de escrita (formulário, grade em lote, correção
+# direto no banco). Somas de período viram SUM() simples no SQL. Horário que
+# não é 'HH:MM[:SS]' fica com NULL (não entra nas somas, como no pandas).
+#
+# Linhas antigas são preenchidas uma vez, quando a coluna é criada: a criação
+# só anota a faixa de ids em 'ipar_carga_metricas' e o init_db do setor
+# chama preencher(), que passa o trigger nessa faixa em lotes de LOTE_CARGA
+# ids, um commit por lote (sem um UPDATE da tabela inteira numa transação).
+#
+# No banco local (modules/local.py) são triggers do SQLite (AFTER INSERT /
+# UPDATE) com a mesma conta; ipar_minutos é uma função Python registrada.
+
+import modules.banco as banco
+
+# Horário aceito pela conta (texto da estamparia ou TIME)
+_HORA = r"^([01]?[0-9]|2[0-3]):[0-5][0-9](:[0-5][0-9](\.[0-9]+)?)?$"
+
+# Ids por lote na carga das linhas antigas
+LOTE_CARGA = 10000
+
+
+def _funcao_minutos():
+    return f"""
+    CREATE OR REPLACE FUNCTION ipar_minutos(ini TEXT, fim TEXT) RETURNS REAL AS $$
+        SELECT CASE WHEN ini ~ '{_HORA}' AND fim ~ '{_HORA}' THEN
+            (EXTRACT(EPOCH FROM fim::time - ini::time) / 60
+             + CASE WHEN fim::time < ini::time THEN 1440 ELSE 0 END)::real
+        END
+    $$ LANGUAGE sql IMMUTABLE;
+    """
+
+
+def _coluna_com_carga(tabela, colunas, tipo="REAL"):
+    # Cria as colunas e, só na criação, anota a faixa de ids das linhas antigas
+    adds = "\n            ".join(f"ALTER TABLE {tabela} ADD COLUMN {c} {tipo};" for c in colunas)
+    return f"""
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = current_schema() AND table_name = '{tabela}'
+                         AND column_name = '{colunas[0]}') THEN
+            {adds}
+            INSERT INTO ipar_carga_metricas (tabela, coluna, proximo_id, ultimo_id)
+            SELECT '{tabela}', '{colunas[0]}', COALESCE(MIN(id), 1), COALESCE(MAX(id), 0) FROM {tabela}
+            ON CONFLICT (tabela) DO NOTHING;
+        END IF;
+    END $$;
+    """
+
+
+def sql_carga():
+    """
+    Um lote da carga das linhas antigas em cada tabela pendente (UPDATE que
+    dispara o trigger) e, no fim, quantas continuam pendentes. Um commit por
+    execução; no banco local a carga já roda no próprio DDL.
+    """
+    sql = f"""
+    DO $$ DECLARE c RECORD; BEGIN
+        FOR c IN SELECT * FROM ipar_carga_metricas WHERE proximo_id <= ultimo_id LOOP
+            EXECUTE 'UPDATE ' || quote_ident(c.tabela) || ' SET ' || quote_ident(c.coluna)
+                    || ' = NULL WHERE id >= $1 AND id < $2' USING c.proximo_id, c.proximo_id + {LOTE_CARGA};
+            UPDATE ipar_carga_metricas SET proximo_id = c.proximo_id + {LOTE_CARGA} WHERE tabela = c.tabela;
+        END LOOP;
+    END $$;
+    SELECT COUNT(*) FROM ipar_carga_metricas WHERE proximo_id <= ultimo_id;
+    """
+    return banco.Sql(sql, "SELECT 0")
+
+
+def preencher(rodar):
+    """
+    Roda sql_carga() até não sobrar lote. rodar(sql) executa e faz commit,
+    devolvendo as linhas (run_query com fetch=True, commit=True).
+    """
+    while True:
+        res = rodar(sql_carga())
+        if not res or not res[0][0]:
+            return
+
+
+def ddl(prefixo, col_indice=None, eficiencia=False, indice_data=True):
+    """
+    SQL (idempotente) das colunas de métricas + triggers do setor.
+    col_indice: coluna incluída no índice de somas por data (ex. 'maquina').
+    indice_data=False quando a data é texto (estamparia: 'data::date' não usa índice).
+    eficiencia=True: o trigger também calcula 'eficiencia_calc' (furadeira).
+    """
+    ap, par = f"{prefixo}_apontamentos", f"{prefixo}_paradas_reg"
+    efic = ("NEW.eficiencia_calc := COALESCE(CASE WHEN NEW.min_real > 0 "
+            "THEN NEW.min_teorico / NEW.min_real * 100 END, 0);") if eficiencia else ""
+    sql = _funcao_minutos() + f"""
+    CREATE TABLE IF NOT EXISTS ipar_carga_metricas (
+        tabela TEXT PRIMARY KEY, coluna TEXT NOT NULL,
+        proximo_id BIGINT NOT NULL, ultimo_id BIGINT NOT NULL
+    );
+
+    CREATE OR REPLACE FUNCTION {ap}_metricas() RETURNS trigger AS $$
+    BEGIN
+        NEW.min_real := ipar_minutos(NEW.inicio_prod::text, NEW.fim_prod::text);
+        NEW.min_teorico := ((NEW.qtd_produzida + NEW.refugo) * NEW.tempo_ciclo_seg / 60.0)::real;
+        {efic}
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql;
+    DROP TRIGGER IF EXISTS trg_{ap}_metricas ON {ap};
+    CREATE TRIGGER trg_{ap}_metricas BEFORE INSERT OR UPDATE ON {ap}
+        FOR EACH ROW EXECUTE FUNCTION {ap}_metricas();
+
+    CREATE OR REPLACE FUNCTION {par}_metricas() RETURNS trigger AS $$
+    BEGIN
+        NEW.min_parada := ipar_minutos(NEW.inicio::text, NEW.fim::text);
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql;
+    DROP TRIGGER IF EXISTS trg_{par}_metricas ON {par};
+    CREATE TRIGGER trg_{par}_metricas BEFORE INSERT OR UPDATE ON {par}
+        FOR EACH ROW EXECUTE FUNCTION {par}_metricas();
+    """
+    sql += _coluna_com_carga(ap, ["min_real", "min_teorico"]) + _coluna_com_carga(par, ["min_parada"])
+
+    extra = f"{col_indice}, " if col_indice else ""
+    if indice_data:
+        # Somas do dia/período só pelo índice (index-only scan)
+        sql += f"""
+    CREATE INDEX IF NOT EXISTS ix_{ap}_metricas ON {ap} (data_registro)
+        INCLUDE ({extra}min_real, min_teorico, qtd_produzida, refugo) WHERE ativo = 1;
+    CREATE INDEX IF NOT EXISTS ix_{par}_metricas ON {par} (data_registro)
+        INCLUDE (min_parada) WHERE ativo = 1;
+    """
+    return banco.Sql(sql, _ddl_local(ap, par, extra, eficiencia, indice_data))
+
+
+def _ddl_local(ap, par, extra, eficiencia, indice_data):
+    # Mesmas colunas e contas no SQLite (o trigger atualiza a linha gravada)
+    real = "ipar_minutos(inicio_prod, fim_prod)"
+    teorico = "((qtd_produzida + refugo) * tempo_ciclo_seg / 60.0)"
+    sets = f"min_real = {real}, min_teorico = {teorico}"
+    if eficiencia:
+        sets += f", eficiencia_calc = COALESCE(CASE WHEN {real} > 0 THEN {teorico} / {real} * 100 END, 0)"
+    parada = "min_parada = ipar_minutos(inicio, fim)"
+    sql = f"""
+    ALTER TABLE {ap} ADD COLUMN IF NOT EXISTS min_real REAL;
+    ALTER TABLE {ap} ADD COLUMN IF NOT EXISTS min_teorico REAL;
+    ALTER TABLE {par} ADD COLUMN IF NOT EXISTS min_parada REAL;
+    """
+    for tabela, colunas, conta in [(ap, "inicio_prod, fim_prod, qtd_produzida, refugo, tempo_ciclo_seg", sets),
+                                   (par, "inicio, fim", parada)]:
+        sql += f"""
+    DROP TRIGGER IF EXISTS trg_{tabela}_metricas_ins;
+    CREATE TRIGGER trg_{tabela}_metricas_ins AFTER INSERT ON {tabela}
+    BEGIN UPDATE {tabela} SET {conta} WHERE id = NEW.id; END;
+    DROP TRIGGER IF EXISTS trg_{tabela}_metricas_upd;
+    CREATE TRIGGER trg_{tabela}_metricas_upd AFTER UPDATE OF {colunas} ON {tabela}
+    BEGIN UPDATE {tabela} SET {conta} WHERE id = NEW.id; END;
+    """
+    sql += f"""
+    UPDATE {ap} SET {sets} WHERE min_real IS NULL;
+    UPDATE {par} SET {parada} WHERE min_parada IS NULL;
+    """
+    if indice_data:
+        # SQLite não tem INCLUDE: as colunas somadas entram na chave do índice
+        sql += f"""
+    CREATE INDEX IF NOT EXISTS ix_{ap}_metricas ON {ap}
+        (data_registro, {extra}min_real, min_teorico, qtd_produzida, refugo) WHERE ativo = 1;
+    CREATE INDEX IF NOT EXISTS ix_{par}_metricas ON {par} (data_registro, min_parada) WHERE ativo = 1;
+    """
+    return sql
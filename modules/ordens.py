@@ -0,0 +1,209 @@
+# ==============================================================================
+# ACOMPANHAMENTO DE ORDENS DE PRODUÇÃO (ENTRE SETORES)
+# ==============================================================================
+# A mesma ordem (campo "Cliente / Ordem Produção") passa pela estamparia,
+# pela usinagem e pela furadeira. Para saber quanto dela já foi feito e com
+# que refugo, em vez de exportar três planilhas, o banco mantém a tabela
+# 'ordens_producao', uma linha por (ordem, setor):
+#
+#   apontamentos, boas, refugo, min_real (somas dos apontamentos ativos)
+#   ultimo_dia (último dia com apontamento da ordem no setor)
+#
+# Um trigger AFTER em <setor>_apontamentos tira a contribuição antiga da
+# linha (UPDATE/DELETE ou exclusão lógica) e soma a nova (upsert), para
+# qualquer caminho de escrita (formulário, grade, ingestão, coletor,
+# correção direto no banco). Consultar uma ordem é uma busca pela chave
+# primária. O ultimo_dia só é recontado (índice por ordem e data) quando
+# um apontamento sai da ordem ou do dia: exclusão, troca de ordem ou de
+# data. Editar quantidade, refugo ou horário não relê a tabela.
+#
+# A ordem é normalizada como no autocompletar (sugestoes.normalizar:
+# maiúsculas, espaços simples). Na primeira subida a tabela é carregada com
+# o histórico do setor. Para recontar um setor: apagar as linhas dele em
+# ordens_producao e reiniciar o portal.
+#
+# No banco local (modules/local.py) são triggers do SQLite com as mesmas
+# contas (sem o índice por ordem: quando há recontagem do ultimo_dia, ela
+# lê a tabela).
+
+import pandas as pd
+
+import modules.banco as banco
+import modules.sugestoes as sugestoes
+
+TABELA = "ordens_producao"
+
+# Quantas ordens recentes aparecem na lista da tela
+LIMITE_RECENTES = 300
+
+# Coluna de data dos apontamentos de cada setor
+DATAS = {"usinagem": "data_registro", "estamparia": "data", "furadeira": "data_registro"}
+
+ROTULOS = {"usinagem": "Usinagem", "estamparia": "Estamparia", "furadeira": "Furadeiras"}
+
+# Colunas que mudam a contribuição de um apontamento
+_COLUNAS = ["cliente", "inicio_prod", "fim_prod", "qtd_produzida", "refugo", "ativo"]
+
+
+def _ordem(col):
+    # Mesma normalização de sugestoes.normalizar; vazio = sem ordem
+    return f"NULLIF(UPPER(REGEXP_REPLACE(TRIM({col}), '\\s+', ' ', 'g')), '')"
+
+
+def _dia(expr, local):
+    return f"date({expr})" if local else f"({expr})::date"
+
+
+def _minutos(reg, local):
+    # No Postgres min_real já veio do trigger BEFORE (modules/metricas.py); no
+    # SQLite ele é gravado por outro trigger AFTER, sem ordem garantida: a
+    # mesma conta é refeita aqui
+    return f"ipar_minutos({reg}.inicio_prod, {reg}.fim_prod)" if local else f"{reg}.min_real"
+
+
+def _tabela():
+    return f"""
+    CREATE TABLE IF NOT EXISTS {TABELA} (
+        ordem TEXT NOT NULL,
+        setor TEXT NOT NULL,
+        apontamentos INTEGER NOT NULL DEFAULT 0,
+        boas BIGINT NOT NULL DEFAULT 0,
+        refugo BIGINT NOT NULL DEFAULT 0,
+        min_real REAL NOT NULL DEFAULT 0,
+        ultimo_dia DATE,
+        atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (ordem, setor)
+    );
+    """
+
+
+def _carga(setor, local):
+    # Só na primeira vez (setor ainda sem nenhuma linha), como as sugestões
+    ap, data = f"{setor}_apontamentos", DATAS[setor]
+    return f"""
+    INSERT INTO {TABELA} (ordem, setor, apontamentos, boas, refugo, min_real, ultimo_dia)
+    SELECT ordem, '{setor}', COUNT(*), COALESCE(SUM(qtd_produzida), 0), COALESCE(SUM(refugo), 0),
+           COALESCE(SUM(min_real), 0), {_dia(f"MAX({data})", local)}
+      FROM (SELECT {_ordem("cliente")} AS ordem, {data}, qtd_produzida, refugo, min_real
+              FROM {ap} WHERE ativo = 1) h
+     WHERE ordem IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {TABELA} WHERE setor = '{setor}')
+     GROUP BY ordem;
+    """
+
+
+def _somar(setor, reg, local):
+    # Upsert da contribuição de um apontamento (reg = NEW)
+    data = DATAS[setor]
+    return f"""INSERT INTO {TABELA} (ordem, setor, apontamentos, boas, refugo, min_real, ultimo_dia)
+            SELECT {_ordem(f"{reg}.cliente")}, '{setor}', 1, COALESCE({reg}.qtd_produzida, 0),
+                   COALESCE({reg}.refugo, 0), COALESCE({_minutos(reg, local)}, 0), {_dia(f"{reg}.{data}", local)}
+             WHERE {reg}.ativo = 1 AND {_ordem(f"{reg}.cliente")} IS NOT NULL
+            ON CONFLICT (ordem, setor) DO UPDATE SET
+                apontamentos = {TABELA}.apontamentos + 1,
+                boas = {TABELA}.boas + EXCLUDED.boas,
+                refugo = {TABELA}.refugo + EXCLUDED.refugo,
+                min_real = {TABELA}.min_real + EXCLUDED.min_real,
+                ultimo_dia = greatest({TABELA}.ultimo_dia, EXCLUDED.ultimo_dia),
+                atualizado_em = CURRENT_TIMESTAMP"""
+
+
+def _tirar(setor, reg, local, novo=None):
+    # Desconta um apontamento (reg = OLD). O último dia é recontado na tabela
+    # só se o registro saiu da ordem ou do dia (novo = NEW na edição; sem
+    # ele, exclusão); senão continua o mesmo e o _somar mantém o maior
+    ap, data = f"{setor}_apontamentos", DATAS[setor]
+    recontar = f"""(SELECT {_dia(f"MAX({data})", local)} FROM {ap}
+                               WHERE ativo = 1 AND {_ordem("cliente")} = {TABELA}.ordem)"""
+    if novo:
+        dif = "IS NOT" if local else "IS DISTINCT FROM"
+        saiu = (f"{novo}.ativo {dif} 1 OR {novo}.{data} {dif} {reg}.{data} "
+                f"OR {_ordem(f'{novo}.cliente')} {dif} {_ordem(f'{reg}.cliente')}")
+        recontar = f"CASE WHEN {saiu}\n                            THEN {recontar} ELSE ultimo_dia END"
+    return f"""UPDATE {TABELA} SET
+                apontamentos = apontamentos - 1,
+                boas = boas - COALESCE({reg}.qtd_produzida, 0),
+                refugo = refugo - COALESCE({reg}.refugo, 0),
+                min_real = min_real - COALESCE({_minutos(reg, local)}, 0),
+                ultimo_dia = {recontar},
+                atualizado_em = CURRENT_TIMESTAMP
+             WHERE {reg}.ativo = 1 AND ordem = {_ordem(f"{reg}.cliente")} AND setor = '{setor}'"""
+
+
+def ddl(setor):
+    """SQL (idempotente) da tabela de ordens, do índice por ordem e do trigger do setor."""
+    ap, data = f"{setor}_apontamentos", DATAS[setor]
+    sql = _tabela() + f"""
+    CREATE INDEX IF NOT EXISTS ix_{ap}_ordem ON {ap} (({_ordem("cliente")}), {data}) WHERE ativo = 1;
+
+    CREATE OR REPLACE FUNCTION {ap}_ordem() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            {_tirar(setor, "OLD", False)};
+        ELSIF TG_OP = 'UPDATE' THEN
+            {_tirar(setor, "OLD", False, "NEW")};
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            {_somar(setor, "NEW", False)};
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+    DROP TRIGGER IF EXISTS trg_{ap}_ordem ON {ap};
+    CREATE TRIGGER trg_{ap}_ordem AFTER INSERT OR DELETE OR UPDATE OF {", ".join(_COLUNAS + [data])} ON {ap}
+        FOR EACH ROW EXECUTE FUNCTION {ap}_ordem();
+    """
+    return banco.Sql(sql + _carga(setor, False), _ddl_local(setor))
+
+
+def _ddl_local(setor):
+    ap, data = f"{setor}_apontamentos", DATAS[setor]
+    sql = _tabela()
+    for evento, nome, corpo in [
+        ("INSERT", "ins", _somar(setor, "NEW", True)),
+        ("DELETE", "del", _tirar(setor, "OLD", True)),
+        (f"UPDATE OF {', '.join(_COLUNAS + [data])}", "upd",
+         _tirar(setor, "OLD", True, "NEW") + ";\n            " + _somar(setor, "NEW", True)),
+    ]:
+        sql += f"""
+    DROP TRIGGER IF EXISTS trg_{ap}_ordem_{nome};
+    CREATE TRIGGER trg_{ap}_ordem_{nome} AFTER {evento} ON {ap}
+    BEGIN
+            {corpo};
+    END;
+    """
+    return sql + _carga(setor, True)
+
+
+# ------------------------------------------------------------------------------
+# CONSULTAS DA TELA
+# ------------------------------------------------------------------------------
+
+# Uma ordem, uma linha por setor (chave primária). Parâmetro: ordem normalizada.
+SQL_ORDEM = f"""
+    SELECT setor, apontamentos, boas, refugo, min_real, ultimo_dia, atualizado_em
+      FROM {TABELA} WHERE ordem = %(ordem)s AND apontamentos > 0
+"""
+
+# Ordens com atividade mais recente, somadas nos setores. Parâmetro: limite.
+SQL_RECENTES = f"""
+    SELECT ordem, COUNT(*) AS setores, SUM(apontamentos) AS apontamentos, SUM(boas) AS boas,
+           SUM(refugo) AS refugo, SUM(min_real) AS min_real, MAX(ultimo_dia) AS ultimo_dia
+      FROM {TABELA} WHERE apontamentos > 0
+     GROUP BY ordem
+     ORDER BY MAX(ultimo_dia) DESC, ordem
+     LIMIT %(limite)s
+"""
+
+
+def params_ordem(ordem):
+    return {"ordem": sugestoes.normalizar(ordem)}
+
+
+def indicadores(df):
+    """Acrescenta refugo_pct (sobre o total produzido) e horas (de min_real)."""
+    df = df.copy()
+    for c in ["boas", "refugo", "min_real"]:
+        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
+    total = df["boas"] + df["refugo"]
+    df["refugo_pct"] = (df["refugo"] / total.where(total > 0) * 100).fillna(0)
+    df["horas"] = df["min_real"] / 60
+    return df
@@ -0,0 +1,235 @@
+# ==============================================================================
+# PERFIL DE EXECUÇÃO (ADMIN): ONDE A TELA GASTA O TEMPO
+# ==============================================================================
+# Com o perfil ligado na sessão (chave na barra lateral do admin, main.py),
+# cada execução da tela roda dentro de medir():
+#
+#   - cProfile (determinístico) na thread do script: tempo próprio de cada
+#     função, agrupado por CAMADA (banco, pandas, plotly, Streamlit, código
+#     do portal) e o tempo acumulado das funções do portal (render_app e os
+#     _fragmento_* são as seções da tela);
+#   - cada comando SQL (cursor do psycopg2, banco local e espelho), também
+#     os das leituras em paralelo (banco.paralelo leva o contexto junto):
+#     texto, tempo e linhas.
+#
+# As últimas MAX_PERFIS execuções ficam na sessão, para baixar (.prof para
+# snakeviz / python -m pstats, CSV das consultas).
+#
+# Desligado, o custo é nenhum na tela e um teste de inteiro por comando SQL
+# (relogio() devolve None enquanto nenhuma sessão do processo estiver
+# medindo). Reexecução só de um fragmento não passa pelo main.py e não é
+# medida.
+
+import contextvars
+import cProfile
+import io
+import marshal
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+# Execuções guardadas por sessão
+MAX_PERFIS = 10
+
+# Funções do portal listadas (as de maior tempo acumulado)
+MAX_FUNCOES = 25
+
+# Caracteres do SQL que identificam a consulta na tabela
+TAM_SQL = 200
+
+# (camada, trechos de "arquivo:função"); vale a primeira que casar. Funções
+# em C (psycopg2, sqlite3) aparecem com o nome do objeto no lugar do arquivo.
+# O que não casa (biblioteca padrão, builtins: deepcopy, isinstance...) conta
+# para a camada de quem chamou, na proporção do tempo de cada chamador.
+CAMADAS = [
+    ("Banco (SQL)", ("psycopg2", "sqlite3", "modules/banco.py", "modules/local.py", "modules/espelho.py")),
+    ("Espera (leituras em paralelo)", ("_thread.lock", "threading.py")),
+    ("pandas", ("pandas/", "numpy")),
+    ("plotly", ("plotly",)),
+    ("Streamlit (elementos e serialização)", ("streamlit/", "pyarrow")),
+    ("Portal (modules/, main.py)", ("modules/", "main.py")),
+]
+OUTROS = "Outros (Python, bibliotecas)"
+
+_atual = contextvars.ContextVar("ipar_perfil", default=None)
+
+# Perfis em andamento no processo (todas as sessões)
+_ativos = 0
+_trava = threading.Lock()
+
+
+def relogio():
+    """Início da medição de um comando, ou None (sem custo) sem perfil na sessão."""
+    if _ativos and _atual.get() is not None:
+        return time.perf_counter()
+    return None
+
+
+def consulta(inicio, sql, linhas=None):
+    """Registra um comando medido desde relogio() no perfil da sessão."""
+    p = _atual.get()
+    if p is not None:
+        # banco.Sql: o texto do Postgres (o que está no código), mesmo no banco local
+        texto = " ".join(str(sql).split())[:TAM_SQL]
+        p.consultas.append((texto, time.perf_counter() - inicio,
+                            linhas if linhas is not None and linhas >= 0 else None,
+                            threading.current_thread().name))
+
+
+def _caminho(arquivo):
+    # cProfile no Windows devolve caminhos com barra invertida
+    return arquivo.replace("\\", "/")
+
+
+def _camada(arquivo, funcao):
+    chave = f"{_caminho(arquivo)}:{funcao}"
+    for nome, trechos in CAMADAS:
+        if any(t in chave for t in trechos):
+            return nome
+    return OUTROS
+
+
+def _camadas(stats):
+    """Tempo próprio por camada, a partir das estatísticas do cProfile."""
+    memo = {}
+
+    def rateio(k, caminho):
+        # {camada: fração} do tempo próprio de k
+        if k in memo:
+            return memo[k]
+        nome = _camada(k[0], k[2])
+        if nome != OUTROS:
+            return {nome: 1.0}
+        chamadores = stats[k][4]
+        if k in caminho or len(caminho) > 50 or not chamadores:
+            return {OUTROS: 1.0}
+        pesos = {c: v[2] for c, v in chamadores.items()}
+        total = sum(pesos.values())
+        if total <= 0:
+            pesos = {c: v[0] for c, v in chamadores.items()}
+            total = sum(pesos.values()) or 1
+        res = {}
+        for c, w in pesos.items():
+            if c not in stats:
+                continue
+            for camada, f in rateio(c, caminho | {k}).items():
+                res[camada] = res.get(camada, 0.0) + f * w / total
+        memo[k] = res or {OUTROS: 1.0}
+        return memo[k]
+
+    camadas = {}
+    for k, (_, _, tt, _, _) in stats.items():
+        for camada, f in rateio(k, frozenset()).items():
+            camadas[camada] = camadas.get(camada, 0.0) + tt * f
+    return camadas
+
+
+def _portal(arquivo):
+    arquivo = _caminho(arquivo)
+    return "/modules/" in arquivo or arquivo.endswith("main.py")
+
+
+class Perfil:
+    """Uma execução medida da tela."""
+
+    def __init__(self, rotulo):
+        self.rotulo = rotulo
+        self.quando = datetime.now()
+        self.segundos = 0.0
+        self.interrompida = False
+        self.consultas = []
+        self.camadas = pd.DataFrame(columns=["camada", "segundos", "pct"])
+        self.funcoes = pd.DataFrame(columns=["funcao", "chamadas", "acumulado_s", "proprio_s"])
+        self.prof = None
+
+    def descricao(self):
+        fim = " (interrompida)" if self.interrompida else ""
+        return f"{self.quando:%H:%M:%S} | {self.rotulo} | {self.segundos:.2f} s{fim}"
+
+    def fechar(self, prof):
+        # Resume o cProfile e guarda só o resumo e o .prof (o objeto é grande)
+        if prof is None:
+            return
+        prof.create_stats()
+        stats = prof.stats
+        self.prof = marshal.dumps(stats)
+        funcoes = [(f"{_caminho(arquivo).rsplit('/', 1)[-1]}:{funcao}", nc, ct, tt)
+                   for (arquivo, _, funcao), (_, nc, tt, ct, _) in stats.items() if _portal(arquivo)]
+        df = pd.DataFrame(list(_camadas(stats).items()), columns=["camada", "segundos"])
+        df["pct"] = df["segundos"] / max(df["segundos"].sum(), 1e-9) * 100
+        self.camadas = df.sort_values("segundos", ascending=False, ignore_index=True)
+        df = pd.DataFrame(funcoes, columns=["funcao", "chamadas", "acumulado_s", "proprio_s"])
+        self.funcoes = df.sort_values("acumulado_s", ascending=False, ignore_index=True).head(MAX_FUNCOES)
+
+    def tabela_consultas(self):
+        """Comandos agrupados pelo texto: execuções, tempo total e máximo, linhas."""
+        df = pd.DataFrame(self.consultas, columns=["sql", "segundos", "linhas", "thread"])
+        if df.empty:
+            return pd.DataFrame(columns=["sql", "execucoes", "total_s", "max_s", "linhas"])
+        df = df.groupby("sql", as_index=False).agg(execucoes=("segundos", "size"), total_s=("segundos", "sum"),
+                                                   max_s=("segundos", "max"),
+                                                   linhas=("linhas", lambda v: v.sum(min_count=1)))
+        return df.sort_values("total_s", ascending=False, ignore_index=True)
+
+    def sql_segundos(self):
+        return sum(s for _, s, _, _ in self.consultas)
+
+
+def historico(perfis):
+    """Uma linha por execução guardada, da mais recente para a mais antiga."""
+    return pd.DataFrame([{"quando": p.quando.strftime("%H:%M:%S"), "tela": p.rotulo, "segundos": round(p.segundos, 3),
+                          "sql_s": round(p.sql_segundos(), 3), "comandos": len(p.consultas),
+                          "interrompida": p.interrompida} for p in reversed(perfis)])
+
+
+def zip_perfis(perfis):
+    """Zip com o .prof e o CSV das consultas de cada execução guardada."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for p in perfis:
+            nome = f"{p.quando:%Y%m%d_%H%M%S_%f}"
+            if p.prof is not None:
+                z.writestr(f"{nome}.prof", p.prof)
+            z.writestr(f"{nome}_consultas.csv",
+                       p.tabela_consultas().to_csv(index=False, sep=";").encode("utf-8-sig"))
+    return buf.getvalue()
+
+
+@contextmanager
+def medir(rotulo, guardar):
+    """
+    Mede o bloco (a execução da tela) e acrescenta o Perfil em guardar
+    (ex.: deque(maxlen=MAX_PERFIS) da sessão), mesmo se o bloco for
+    interrompido (st.rerun, erro).
+    """
+    global _ativos
+    p = Perfil(rotulo)
+    token = _atual.set(p)
+    with _trava:
+        _ativos += 1
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:
+        # Outro cProfile ligado no processo (Python 3.12+ permite um só):
+        # fica só o tempo das consultas
+        prof = None
+    inicio = time.perf_counter()
+    try:
+        yield p
+    except BaseException:
+        p.interrompida = True
+        raise
+    finally:
+        if prof is not None:
+            prof.disable()
+        p.segundos = time.perf_counter() - inicio
+        with _trava:
+            _ativos -= 1
+        _atual.reset(token)
+        p.fechar(prof)
+        guardar.append(p)
@@ -0,0 +1,81 @@
+# ==============================================================================
+# VÁRIAS PLANTAS (UNIDADES IPAR) NO MESMO PORTAL
+# ==============================================================================
+# Cada planta tem os próprios dados, num destes arranjos (secrets.toml):
+#
+#   - SCHEMA próprio no mesmo banco: as tabelas continuam com o mesmo nome
+#     (usinagem_apontamentos...) e a conexão da planta usa
+#     'search_path = <schema>, public'. O código dos setores não muda.
+#     O schema é criado na primeira conexão (banco.conectar).
+#   - BANCO próprio: [plantas.<id>.postgres] com as credenciais dele.
+#     Isolamento total de carga (recomendado quando a outra unidade tiver
+#     volume alto).
+#
+#   [plantas.diadema]
+#   nome = "IPAR Diadema"              # sem schema: 'public' (dados atuais)
+#
+#   [plantas.segunda]
+#   nome = "IPAR Segunda Unidade"
+#   schema = "planta_segunda"
+#   # [plantas.segunda.postgres]        # opcional: outro banco
+#   # DB_HOST = "..."
+#
+# Sem a seção [plantas] o sistema roda como antes: uma planta só (PADRAO)
+# com o [postgres] de sempre.
+#
+# Tudo que é por planta: conexões (uma por setor e planta em cada worker),
+# espelho local, caches (a planta entra na chave), versões de cache do
+# cluster e a fila de relatórios.
+
+import os
+import re
+
+PADRAO = "diadema"
+NOME_PADRAO = "IPAR Diadema"
+
+_ID = re.compile(r"^[a-z][a-z0-9_]*$")
+
+
+def configuradas(secrets):
+    """{id da planta: {'nome', 'credenciais'}}, na ordem do secrets.toml."""
+    base = dict(secrets["postgres"])
+    secao = dict(secrets.get("plantas", {}))
+    if not secao:
+        return {PADRAO: {"nome": NOME_PADRAO, "credenciais": base}}
+
+    plantas = {}
+    for planta, cfg in secao.items():
+        if not _ID.match(planta):
+            raise ValueError(f"Id de planta inválido: {planta!r} (use minúsculas, números e _)")
+        cfg = dict(cfg)
+        cred = {**base, **dict(cfg.get("postgres", {}))}
+        if cfg.get("schema"):
+            if not _ID.match(cfg["schema"]):
+                raise ValueError(f"Schema inválido na planta {planta}: {cfg['schema']!r}")
+            cred["DB_SCHEMA"] = cfg["schema"]
+        plantas[planta] = {"nome": cfg.get("nome", planta), "credenciais": cred}
+    return plantas
+
+
+def credenciais(secrets, planta):
+    return configuradas(secrets)[planta]["credenciais"]
+
+
+def nome(secrets, planta):
+    return configuradas(secrets).get(planta, {}).get("nome", planta)
+
+
+def chave(planta, nome_cache):
+    """
+    Chave de cache compartilhado (cluster.versao_cache) da planta.
+    A planta padrão mantém as chaves antigas.
+    """
+    return nome_cache if planta == PADRAO else f"{planta}:{nome_cache}"
+
+
+def arquivo_local(planta, arquivo):
+    """Arquivo em dados_locais da planta: 'espelho.db' -> 'espelho_segunda.db'."""
+    if planta == PADRAO:
+        return arquivo
+    raiz, ext = os.path.splitext(arquivo)
+    return f"{raiz}_{planta}{ext}"
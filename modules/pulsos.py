@@ -0,0 +1,293 @@
+# ==============================================================================
+# PULSOS DAS MÁQUINAS -> APONTAMENTOS E PARADAS
+# ==============================================================================
+# Contadores de golpe das prensas e sinais de fim de ciclo dos CNCs mandam
+# um pulso por peça (ou a cada N peças). Guardar cada pulso como linha não
+# escala, e digitar a quantidade à mão é o que se quer evitar. O Agregador
+# junta os pulsos em memória, por máquina, em JANELAS do relógio
+# (07:00-07:15, 07:15-07:30...) e devolve linhas prontas para a ingestão
+# (modules/ingestao.py):
+#
+#   - APONTAMENTO por máquina e janela: peças boas e refugo somados, ciclo
+#     = mediana do intervalo entre pulsos, início = primeiro pulso menos um
+#     ciclo, fim = último pulso. Troca de peça, operador ou programa no
+#     meio da janela fecha um apontamento e abre outro.
+#   - PARADA candidata quando o intervalo entre dois pulsos passa do ciclo
+#     em mais de 'limiar' minutos. Intervalo acima de 'parada_max' é
+#     máquina desligada (fim de turno, fim de semana): não vira parada.
+#
+# Regra de cada setor (a mesma dos dashboards, ver turnos.oee_por_turno):
+# na usinagem a parada fica DENTRO do tempo apontado, então o apontamento
+# da janela atravessa a parada; na estamparia a parada soma ao disponível,
+# então o apontamento é cortado nela.
+#
+# Sem Streamlit e sem banco aqui: ferramentas/coletor_pulsos.py lê o fluxo,
+# chama fechar() de tempos em tempos e grava os lotes.
+#
+# Formato do pulso (uma linha por pulso, JSON ou texto com ';'):
+#   {"maquina": "PRENSA 01", "t": "2026-10-19T07:00:03", "qtd": 1, "refugo": 0,
+#    "peca": "SUPORTE X", "operador": "JOÃO", "programa": "O1234"}
+#   PRENSA 01;2026-10-19T07:00:03;1
+# qtd (padrão 1) e refugo (padrão 0) são peças desde o pulso anterior; peça,
+# operador e programa valem até o próximo pulso que os trouxer.
+
+import heapq
+import json
+import random
+import statistics
+from datetime import datetime, timedelta
+
+# Padrões do coletor (minutos)
+JANELA_MIN = 15
+LIMIAR_PARADA_MIN = 5
+PARADA_MAX_MIN = 120
+
+# Ciclo assumido até a máquina ter dois pulsos seguidos (segundos)
+CICLO_INICIAL = 60.0
+
+MOTIVO_PARADA = "SEM PULSO"
+
+# Coluna da "operação" em cada setor (na usinagem é o programa do CNC)
+CAMPO_PROGRAMA = {"usinagem": "cod_programa", "estamparia": "operacao"}
+
+# Setores com paradas dentro do tempo apontado
+PARADAS_DENTRO = {"usinagem"}
+
+# Horários gravados com precisão de minuto ('HH:MM' da estamparia)
+EM_MINUTOS = {"estamparia"}
+
+
+class PulsoInvalido(ValueError):
+    pass
+
+
+def ler_pulso(linha):
+    """Linha do fluxo -> dict do pulso (t em datetime). Linha em branco -> None."""
+    linha = linha.strip()
+    if not linha:
+        return None
+    try:
+        if linha.startswith("{"):
+            p = json.loads(linha)
+        else:
+            partes = [x.strip() for x in linha.split(";")]
+            p = dict(zip(["maquina", "t", "qtd", "refugo"], partes))
+        t = p["t"]
+        p["t"] = datetime.fromtimestamp(float(t)) if isinstance(t, (int, float)) else datetime.fromisoformat(str(t))
+        p["t"] = p["t"].replace(tzinfo=None)
+        p["maquina"] = str(p["maquina"]).strip().upper()
+        p["qtd"] = 1 if p.get("qtd") in (None, "") else int(p["qtd"])
+        p["refugo"] = int(p.get("refugo") or 0)
+    except (KeyError, ValueError, TypeError) as e:
+        raise PulsoInvalido(f"{e}: {linha[:120]}") from e
+    if not p["maquina"] or p["qtd"] < 0 or p["refugo"] < 0:
+        raise PulsoInvalido(linha[:120])
+    return p
+
+
+def _piso(t, minutos):
+    m = (t.hour * 60 + t.minute) // minutos * minutos
+    return t.replace(hour=m // 60, minute=m % 60, second=0, microsecond=0)
+
+
+def _minuto_acima(t):
+    base = t.replace(second=0, microsecond=0)
+    return base if base == t else base + timedelta(minutes=1)
+
+
+class _Maquina:
+    def __init__(self, nome):
+        self.nome = nome
+        self.ident = {"operador": None, "peca": None, "programa": None}
+        self.seg = None            # apontamento aberto
+        self.ultimo = None         # último pulso
+        self.ultimo_fim = None     # fim do último apontamento fechado
+        self.ciclo = None          # último ciclo medido (s/pç)
+
+
+class Agregador:
+    """
+    Pulsos -> apontamentos e paradas. Não é thread-safe: uma thread só
+    chama adicionar() e fechar().
+    setor: 'usinagem' ou 'estamparia' (regra das paradas e dos horários).
+    """
+
+    def __init__(self, setor, janela=JANELA_MIN, limiar=LIMIAR_PARADA_MIN, parada_max=PARADA_MAX_MIN,
+                 ciclo_inicial=CICLO_INICIAL, motivo=MOTIVO_PARADA, padrao=None):
+        self.setor = setor
+        self.janela = timedelta(minutes=janela)
+        self.janela_min = janela
+        self.limiar = timedelta(minutes=limiar)
+        self.parada_max = timedelta(minutes=parada_max)
+        self.ciclo_inicial = ciclo_inicial
+        self.motivo = motivo
+        self.dentro = setor in PARADAS_DENTRO
+        self.minutos = setor in EM_MINUTOS
+        self.padrao = padrao or {}     # operador/peca/programa quando o pulso não traz
+        self.maquinas = {}
+        self.apontamentos = []
+        self.paradas = []
+        self.atrasados = 0             # pulsos de janela já gravada (descartados)
+        self.relogio = None            # maior horário visto no fluxo
+
+    # ------------------------------------------------------------------
+    def adicionar(self, p):
+        m = self.maquinas.get(p["maquina"])
+        if m is None:
+            m = self.maquinas[p["maquina"]] = _Maquina(p["maquina"])
+        t = p["t"]
+        if self.relogio is None or t > self.relogio:
+            self.relogio = t
+
+        # Fora de ordem: conta no apontamento aberto; se a janela já foi, descarta
+        if m.ultimo is not None and t < m.ultimo:
+            if m.seg and t >= m.seg["janela"]:
+                m.seg["qtd"] += p["qtd"]
+                m.seg["refugo"] += p["refugo"]
+            else:
+                self.atrasados += 1
+            return
+
+        ident = {k: (str(p[k]).strip().upper() if p.get(k) else m.ident[k] or self.padrao.get(k))
+                 for k in m.ident}
+        janela = _piso(t, self.janela_min)
+        intervalo = t - m.ultimo if m.ultimo is not None else None
+
+        if m.seg and (janela != m.seg["janela"] or ident != m.ident or intervalo > self.parada_max
+                      or (not self.dentro and intervalo > self.limiar)):
+            self._fechar_segmento(m)
+        if intervalo is not None and self.limiar < intervalo <= self.parada_max:
+            self._parada(m, m.ultimo, t)
+        m.ident = ident
+
+        pecas = p["qtd"] + p["refugo"]
+        if m.seg is None:
+            m.seg = {"janela": janela, "primeiro": t, "qtd": 0, "refugo": 0, "intervalos": []}
+        elif intervalo is not None and intervalo <= self.limiar and pecas:
+            m.seg["intervalos"].append(intervalo.total_seconds() / pecas)
+        m.seg["qtd"] += p["qtd"]
+        m.seg["refugo"] += p["refugo"]
+        m.seg["ultimo"] = t
+        m.ultimo = t
+
+    def _ciclo(self, m):
+        if m.seg and m.seg["intervalos"]:
+            m.ciclo = statistics.median(m.seg["intervalos"])
+        return m.ciclo or self.ciclo_inicial
+
+    def _parada(self, m, ini, prox):
+        # A peça do pulso seguinte levou um ciclo: a parada termina antes dela
+        fim = max(prox - timedelta(seconds=self._ciclo(m)), ini)
+        if fim - ini < self.limiar:
+            return
+        if self.minutos:
+            ini, fim = _minuto_acima(ini), fim.replace(second=0, microsecond=0)
+            if fim <= ini:
+                return
+        self.paradas.append({"maquina": m.nome, "data": ini.date(), "inicio": ini, "fim": fim,
+                             "motivo": self.motivo})
+
+    def _fechar_segmento(self, m):
+        s, m.seg = m.seg, None
+        ciclo = statistics.median(s["intervalos"]) if s["intervalos"] else (m.ciclo or self.ciclo_inicial)
+        m.ciclo = ciclo
+        ini = max(s["primeiro"] - timedelta(seconds=ciclo), s["janela"])
+        fim = s["ultimo"]
+        if self.minutos:
+            ini, fim = ini.replace(second=0, microsecond=0), _minuto_acima(fim)
+        if m.ultimo_fim is not None:
+            ini = max(ini, m.ultimo_fim)
+        if fim <= ini:
+            fim = ini + (timedelta(minutes=1) if self.minutos else timedelta(seconds=max(ciclo, 1)))
+        m.ultimo_fim = fim
+        self.apontamentos.append({"maquina": m.nome, "data": s["janela"].date(), "inicio": ini, "fim": fim,
+                                  "qtd": s["qtd"], "refugo": s["refugo"], "ciclo": round(ciclo, 2), **m.ident})
+
+    # ------------------------------------------------------------------
+    def fechar(self, agora, tolerancia=60, tudo=False):
+        """
+        Fecha o que não recebe mais pulsos e devolve (apontamentos, paradas)
+        desde a última chamada. Janela fecha 'tolerancia' segundos depois do
+        fim (pulso atrasado ainda entra); máquina parada fecha o apontamento
+        depois do limiar. tudo=True fecha todas (fim do replay/desligamento).
+        """
+        folga = timedelta(seconds=tolerancia)
+        for m in self.maquinas.values():
+            if m.seg is None:
+                continue
+            fim_janela = m.seg["janela"] + self.janela
+            ocioso = agora - m.seg["ultimo"]
+            if tudo or agora >= fim_janela + folga or ocioso > (self.parada_max if self.dentro else self.limiar):
+                self._fechar_segmento(m)
+        apontamentos, paradas = self.apontamentos, self.paradas
+        self.apontamentos, self.paradas = [], []
+        return apontamentos, paradas
+
+    def pendentes(self):
+        """Máquinas com apontamento aberto (para o log)."""
+        return sum(1 for m in self.maquinas.values() if m.seg)
+
+
+# ------------------------------------------------------------------------------
+# LINHAS NO FORMATO DA INGESTÃO
+# ------------------------------------------------------------------------------
+
+def _hora(t):
+    return t.strftime("%H:%M:%S")
+
+
+def para_ingestao(setor, apontamentos, paradas, colunas_ap, colunas_par, col_data):
+    """
+    Listas de dicts com as colunas das tabelas (texto, como ingestao.ler
+    devolve). colunas_*: colunas aceitas pela ingestão no setor.
+    chave_envio = máquina + início: o mesmo trecho do fluxo dá a mesma chave.
+    """
+    programa = CAMPO_PROGRAMA[setor]
+    peca = "descricao_pc"
+    ap = []
+    for a in apontamentos:
+        linha = {col_data: a["data"].isoformat(), "maquina": a["maquina"], "operador": a["operador"] or "",
+                 peca: a["peca"] or "", programa: a["programa"] or "", "tempo_ciclo_seg": str(a["ciclo"]),
+                 "setup_min": "0", "inicio_prod": _hora(a["inicio"]), "fim_prod": _hora(a["fim"]),
+                 "qtd_produzida": str(a["qtd"]), "refugo": str(a["refugo"]),
+                 "chave_envio": f"pulso:{a['maquina']}:{a['inicio']:%Y-%m-%d %H:%M:%S}"}
+        ap.append({c: linha.get(c, "") for c in colunas_ap})
+    par = []
+    for p in paradas:
+        linha = {col_data: p["data"].isoformat(), "maquina": p["maquina"], "motivo": p["motivo"],
+                 "inicio": _hora(p["inicio"]), "fim": _hora(p["fim"]),
+                 "observacao": "Detectada pelo coletor de pulsos",
+                 "chave_envio": f"pulso:{p['maquina']}:{p['inicio']:%Y-%m-%d %H:%M:%S}"}
+        par.append({c: linha.get(c, "") for c in colunas_par})
+    return ap, par
+
+
+# ------------------------------------------------------------------------------
+# FLUXO DE TESTE (REPLAY)
+# ------------------------------------------------------------------------------
+
+def fluxo_teste(maquinas=4, inicio=None, horas=8, semente=42, prob_parada=0.002):
+    """
+    Pulsos sintéticos em ordem de horário (linhas JSON), sempre os mesmos
+    para a mesma semente: cada máquina com seu ciclo, variação de ±10%,
+    refugo de vez em quando e paradas de 6 a 40 min.
+    """
+    rnd = random.Random(semente)
+    inicio = inicio or datetime.now().replace(hour=6, minute=0, second=0, microsecond=0)
+    fim = inicio + timedelta(hours=horas)
+
+    def pulsos(i):
+        nome, ciclo = f"MAQ {i:02d}", rnd.uniform(8, 60)
+        peca, t = f"PC-{rnd.randrange(1000, 9999)}", inicio
+        while True:
+            t += timedelta(seconds=ciclo * rnd.uniform(0.9, 1.1))
+            if rnd.random() < prob_parada:
+                t += timedelta(minutes=rnd.uniform(6, 40))
+            if t >= fim:
+                return
+            refugo = 1 if rnd.random() < 0.01 else 0
+            yield t, json.dumps({"maquina": nome, "t": t.isoformat(timespec="seconds"),
+                                 "qtd": 1 - refugo, "refugo": refugo, "peca": peca}, ensure_ascii=False)
+
+    for _, linha in heapq.merge(*[pulsos(i) for i in range(1, maquinas + 1)]):
+        yield linha
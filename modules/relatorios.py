@@ -0,0 +1,311 @@
+# ==============================================================================
+# RELATÓRIOS EXCEL EM SEGUNDO PLANO (FILA + ARQUIVOS EM DISCO)
+# ==============================================================================
+# A planilha não é mais montada dentro da tela do supervisor. A tela só:
+#   1. coloca um pedido na fila (setor + período)
+#   2. mostra o andamento e, quando pronto, o botão de download do arquivo
+#
+# Quem monta é o serviço 'ferramentas/servico_relatorios.py' (processo
+# separado, com um pool de processos), que também gera toda noite os
+# relatórios padrão de cada setor: dia anterior e mês até ontem.
+#
+# Fila e andamento ficam num SQLite local; os .xlsx ficam em
+# dados_locais/relatorios/ e são baixados direto do disco.
+#
+# Cada pedido é de uma planta (modules/plantas.py): o serviço conecta no
+# banco/schema dela e limita quantos relatórios de uma mesma planta rodam
+# juntos, para a exportação pesada de uma não ocupar o pool das outras.
+#
+# Além do período, a tela pode pedir o histórico completo do setor (como a
+# antiga "Baixar Banco de Dados Completo"): o pedido fica com início vazio
+# e as abas saem sem filtro de data.
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from modules.cluster import PASTA_DADOS
+from modules.plantas import PADRAO
+
+ARQUIVO_DB = os.path.join(PASTA_DADOS, "relatorios.db")
+PASTA_ARQUIVOS = os.path.join(PASTA_DADOS, "relatorios")
+
+# Arquivos mais velhos que isso são apagados pelo serviço
+DIAS_GUARDAR = 45
+
+# Tipos de pedido
+SOB_DEMANDA = "Sob demanda"
+DIA_ANTERIOR = "Dia anterior"
+MES_ATE_ONTEM = "Mês até ontem"
+HISTORICO = "Histórico completo"
+
+# Abas de cada relatório: (nome da aba, tabela, expressão da data do período)
+ABAS = {
+    "usinagem": [
+        ("Producao", "usinagem_apontamentos", "data_registro"),
+        ("Paradas", "usinagem_paradas_reg", "data_registro"),
+        ("Manutencao", "usinagem_manutencoes", "data_manut::date"),
+    ],
+    "estamparia": [
+        ("Producao", "estamparia_apontamentos", "data::date"),
+        ("Paradas", "estamparia_paradas_reg", "data::date"),
+    ],
+    "furadeira": [
+        ("Producao", "furadeira_apontamentos", "data_registro"),
+        ("Paradas", "furadeira_paradas_reg", "data_registro"),
+    ],
+}
+
+_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_estrutura_ok = False
+
+
+@contextmanager
+def _conectar():
+    global _estrutura_ok
+    os.makedirs(PASTA_ARQUIVOS, exist_ok=True)
+    conn = sqlite3.connect(ARQUIVO_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        if not _estrutura_ok:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS pedidos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                setor TEXT NOT NULL, tipo TEXT NOT NULL,
+                inicio TEXT NOT NULL, fim TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'FILA',
+                progresso REAL NOT NULL DEFAULT 0, mensagem TEXT,
+                arquivo TEXT, pedido_por TEXT,
+                criado_em TEXT NOT NULL, concluido_em TEXT)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_pedidos_status ON pedidos (status, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_pedidos_setor ON pedidos (setor, id)")
+            if "planta" not in [r["name"] for r in conn.execute("PRAGMA table_info(pedidos)")]:
+                conn.execute(f"ALTER TABLE pedidos ADD COLUMN planta TEXT NOT NULL DEFAULT '{PADRAO}'")
+            conn.execute("""CREATE TABLE IF NOT EXISTS agenda (
+                nome TEXT PRIMARY KEY, ultima TEXT NOT NULL)""")
+            _estrutura_ok = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# ------------------------------------------------------------------------------
+# USADO PELAS TELAS
+# ------------------------------------------------------------------------------
+
+def pedir(setor, inicio, fim, tipo=SOB_DEMANDA, usuario=None, planta=PADRAO):
+    """
+    Coloca um relatório na fila e devolve o id. Se o mesmo relatório já
+    estiver na fila ou sendo gerado, devolve o pedido existente.
+    inicio=None: histórico completo do setor (fim é só o dia do pedido).
+    """
+    inicio = "" if inicio is None else str(inicio)
+    if not inicio:
+        tipo = HISTORICO
+    with _conectar() as conn:
+        row = conn.execute("""SELECT id FROM pedidos WHERE planta = ? AND setor = ? AND inicio = ? AND fim = ?
+                              AND status IN ('FILA', 'RODANDO')""",
+                           (planta, setor, inicio, str(fim))).fetchone()
+        if row:
+            return row["id"]
+        cur = conn.execute("""INSERT INTO pedidos (planta, setor, tipo, inicio, fim, pedido_por, criado_em)
+                              VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                           (planta, setor, tipo, inicio, str(fim), usuario, datetime.now().isoformat(" ", "seconds")))
+        return cur.lastrowid
+
+
+def listar(setor, limite=15, planta=PADRAO):
+    """Pedidos mais recentes do setor na planta (dicts), do mais novo para o mais velho."""
+    with _conectar() as conn:
+        rows = conn.execute("SELECT * FROM pedidos WHERE planta = ? AND setor = ? ORDER BY id DESC LIMIT ?",
+                            (planta, setor, limite)).fetchall()
+    return [dict(r) for r in rows]
+
+
+def ler_arquivo(pedido):
+    """Bytes do .xlsx pronto (None se o arquivo não existir mais)."""
+    caminho = pedido.get("arquivo")
+    if pedido.get("status") != "PRONTO" or not caminho or not os.path.exists(caminho):
+        return None
+    with open(caminho, "rb") as f:
+        return f.read()
+
+
+def periodo(pedido):
+    """Período do pedido para a tela."""
+    ini, fim = pedido["inicio"], pedido["fim"]
+    if not ini:
+        return f"todo o histórico (pedido em {fim})"
+    return ini if ini == fim else f"{ini} a {fim}"
+
+
+def nome_download(pedido):
+    ini, fim = pedido["inicio"], pedido["fim"]
+    if not ini:
+        periodo = f"completo_{fim}"
+    else:
+        periodo = ini if ini == fim else f"{ini}_a_{fim}"
+    planta = pedido.get("planta") or PADRAO
+    setor = pedido['setor'] if planta == PADRAO else f"{planta}_{pedido['setor']}"
+    return f"relatorio_{setor}_{periodo}.xlsx"
+
+
+def painel(setor, planta=PADRAO, usuario=None):
+    """
+    Bloco da tela de exportação do setor: pedido (período ou histórico
+    completo), andamento e download dos arquivos prontos. Chamado de dentro
+    de um @st.fragment da tela, para pedir/atualizar/baixar não reexecutar
+    a página toda.
+    """
+    import streamlit as st
+
+    c1, c2, c3 = st.columns(3)
+    completo = c3.checkbox("Todo o histórico", key=f"rel_{setor}_completo",
+                           help="Todas as linhas ativas do setor, sem filtro de data.")
+    ini = c1.date_input("De", date.today().replace(day=1), key=f"rel_{setor}_ini", disabled=completo)
+    fim = c2.date_input("Até", date.today(), key=f"rel_{setor}_fim", disabled=completo)
+    if c3.button("Gerar Relatório (.xlsx)", key=f"rel_{setor}_gerar"):
+        if completo:
+            pedir(setor, None, date.today(), usuario=usuario, planta=planta)
+        else:
+            pedir(setor, ini, fim, usuario=usuario, planta=planta)
+        st.toast("Relatório na fila. Ele aparece abaixo quando ficar pronto.")
+
+    pedidos = listar(setor, planta=planta)
+    for p in pedidos:
+        if p['status'] in ('FILA', 'RODANDO'):
+            st.progress(p['progresso'] / 100, text=f"{periodo(p)}: {p['mensagem'] or 'Na fila'}")
+        elif p['status'] == 'ERRO':
+            st.error(f"{periodo(p)}: {p['mensagem']}")
+    if any(p['status'] in ('FILA', 'RODANDO') for p in pedidos):
+        st.button("🔄 Atualizar andamento", key=f"rel_{setor}_atualizar")  # o clique já reexecuta o fragmento
+    prontos = [p for p in pedidos if p['status'] == 'PRONTO']
+    if prontos:
+        escolha = st.selectbox("Relatórios prontos", prontos, key=f"rel_{setor}_prontos",
+                               format_func=lambda p: f"{p['tipo']} | {periodo(p)} | gerado {p['concluido_em']}")
+        dados = ler_arquivo(escolha)
+        if dados:
+            st.download_button("📥 Baixar", dados, nome_download(escolha), _XLSX, key=f"rel_{setor}_baixar")
+
+
+# ------------------------------------------------------------------------------
+# USADO PELO SERVIÇO
+# ------------------------------------------------------------------------------
+
+def retomar_interrompidos():
+    """Na subida do serviço: o que estava RODANDO quando ele caiu volta para a fila."""
+    with _conectar() as conn:
+        conn.execute("UPDATE pedidos SET status = 'FILA', progresso = 0 WHERE status = 'RODANDO'")
+
+
+def pegar_proximos(quantos, por_planta=None):
+    """
+    Marca como RODANDO e devolve os ids dos próximos pedidos da fila.
+    por_planta: máximo de pedidos RODANDO de uma mesma planta (None = sem limite);
+    a fila de uma planta cheia não segura a das outras.
+    """
+    if quantos <= 0:
+        return []
+    with _conectar() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rodando = dict(conn.execute(
+            "SELECT planta, count(*) FROM pedidos WHERE status = 'RODANDO' GROUP BY planta").fetchall())
+        ids = []
+        for r in conn.execute("SELECT id, planta FROM pedidos WHERE status = 'FILA' ORDER BY id"):
+            if len(ids) == quantos:
+                break
+            if por_planta is not None and rodando.get(r["planta"], 0) >= por_planta:
+                continue
+            rodando[r["planta"]] = rodando.get(r["planta"], 0) + 1
+            ids.append(r["id"])
+        conn.executemany("UPDATE pedidos SET status = 'RODANDO', mensagem = 'Iniciando' WHERE id = ?",
+                         [(i,) for i in ids])
+    return ids
+
+
+def progresso(pedido_id, pct, mensagem):
+    with _conectar() as conn:
+        conn.execute("UPDATE pedidos SET progresso = ?, mensagem = ? WHERE id = ?", (pct, mensagem, pedido_id))
+
+
+def concluir(pedido_id, arquivo=None, erro=None):
+    with _conectar() as conn:
+        conn.execute("""UPDATE pedidos SET status = ?, progresso = ?, mensagem = ?, arquivo = ?, concluido_em = ?
+                        WHERE id = ?""",
+                     ("ERRO" if erro else "PRONTO", 0 if erro else 100, erro or "Pronto", arquivo,
+                      datetime.now().isoformat(" ", "seconds"), pedido_id))
+
+
+def gerar(pedido_id, credenciais):
+    """
+    Monta o .xlsx de um pedido (roda num processo do pool do serviço).
+    credenciais: {planta: credenciais do banco} (plantas.configuradas).
+    Grava num arquivo temporário e só renomeia no fim: um download nunca
+    pega planilha pela metade.
+    """
+    import pandas as pd
+    import modules.banco as banco
+
+    with _conectar() as conn:
+        p = dict(conn.execute("SELECT * FROM pedidos WHERE id = ?", (pedido_id,)).fetchone())
+    abas = ABAS[p["setor"]]
+    destino = os.path.join(PASTA_ARQUIVOS, f"{pedido_id}_{nome_download(p)}")
+    temporario = destino + ".parcial"
+    pg = None
+    try:
+        pg = banco.conectar(credenciais[p["planta"]], options=banco.opcao_tempo_limite("exportacao"))
+        pg.set_session(readonly=True)
+        with pd.ExcelWriter(temporario, engine='openpyxl') as w, pg.cursor() as cur:
+            for i, (aba, tabela, data) in enumerate(abas):
+                progresso(pedido_id, 100 * i / len(abas), f"Lendo {aba}")
+                filtro = f" AND {data} BETWEEN %(ini)s AND %(fim)s" if p["inicio"] else ""
+                query = f"SELECT * FROM {tabela} WHERE ativo = 1{filtro} ORDER BY id"
+                df = banco.ler_copy(pg, cur, query, {"ini": p["inicio"], "fim": p["fim"]})
+                progresso(pedido_id, 100 * (i + 0.5) / len(abas), f"Gravando {aba} ({len(df)} linhas)")
+                df.to_excel(w, index=False, sheet_name=aba)
+        os.replace(temporario, destino)
+        concluir(pedido_id, arquivo=destino)
+    except Exception as e:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        concluir(pedido_id, erro=f"Erro: {e}")
+    finally:
+        banco.fechar(pg)
+    return pedido_id
+
+
+def agendar_noturnos(hora, agora=None, plantas=(PADRAO,)):
+    """
+    A partir da 'hora' (0-23), uma vez por dia, põe na fila o dia anterior
+    e o mês até ontem de cada setor de cada planta. Retorna True se agendou.
+    """
+    agora = agora or datetime.now()
+    hoje = agora.date().isoformat()
+    if agora.hour < hora:
+        return False
+    with _conectar() as conn:
+        row = conn.execute("SELECT ultima FROM agenda WHERE nome = 'noturno'").fetchone()
+        if row and row["ultima"] == hoje:
+            return False
+        conn.execute("INSERT OR REPLACE INTO agenda (nome, ultima) VALUES ('noturno', ?)", (hoje,))
+    ontem = agora.date() - timedelta(days=1)
+    for planta in plantas:
+        for setor in ABAS:
+            pedir(setor, ontem, ontem, DIA_ANTERIOR, "agenda", planta)
+            pedir(setor, ontem.replace(day=1), ontem, MES_ATE_ONTEM, "agenda", planta)
+    return True
+
+
+def limpar_antigos(dias=DIAS_GUARDAR):
+    limite = (datetime.now() - timedelta(days=dias)).isoformat(" ", "seconds")
+    with _conectar() as conn:
+        velhos = conn.execute("SELECT id, arquivo FROM pedidos WHERE criado_em < ? AND status IN ('PRONTO', 'ERRO')",
+                              (limite,)).fetchall()
+        for r in velhos:
+            if r["arquivo"] and os.path.exists(r["arquivo"]):
+                os.remove(r["arquivo"])
+        conn.executemany("DELETE FROM pedidos WHERE id = ?", [(r["id"],) for r in velhos])
@@ -0,0 +1,280 @@
+# ==============================================================================
+# SOBREPOSIÇÃO DE HORÁRIOS (CONFERIDA PELO BANCO NA GRAVAÇÃO)
+# ==============================================================================
+# Dois apontamentos da mesma máquina no mesmo horário (ou uma parada em
+# cima de outra) contam o tempo duas vezes: tempo_real_min inflado e
+# disponibilidade errada nos painéis de OEE. A grade do turno e a ingestão
+# já conferem o lote (modules/lote.py), mas o formulário, o coletor de
+# pulsos e a correção direto no banco passavam sem conferência.
+#
+# Cada <setor>_apontamentos / <setor>_paradas_reg ganha a coluna 'periodo'
+# (tsrange: data + início .. fim, virando o dia quando fim < início),
+# preenchida por trigger, e um índice GiST (chave, periodo). O mesmo
+# trigger procura pelo índice outro registro ativo da mesma chave
+# (máquina; operador na furadeira) com período cruzado (&&) e:
+#
+#   modo "aviso"     grava e deixa um WARNING na conexão (a tela mostra)
+#   modo "bloquear"  recusa a gravação (exclusion_violation) e, se o
+#                    histórico já está limpo, a tabela ganha a restrição
+#                    EXCLUDE USING gist (chave WITH =, periodo WITH &&):
+#                    nem dois envios simultâneos passam
+#
+# Na estamparia a parada fica FORA do tempo apontado (disponível = produção
+# + parado), então apontamento e parada da mesma máquina também não podem
+# cruzar entre si. Na usinagem a parada acontece DENTRO do apontamento e na
+# furadeira a parada não tem máquina nem operador: lá só se confere tabela
+# com ela mesma (e na furadeira, só os apontamentos).
+#
+# O modo vem do secrets.toml (padrão "aviso"), por setor:
+#   [sobreposicao]
+#   estamparia = "bloquear"
+#
+# relatorio(setor) lista as sobreposições já gravadas, para corrigir o
+# histórico antes de ligar o bloqueio.
+#
+# No banco local (modules/local.py) o período são duas colunas de texto
+# (periodo_ini, periodo_fim) com índice comum e a conferência é um trigger
+# do SQLite (RAISE no bloqueio, ipar_aviso no aviso).
+
+import modules.banco as banco
+import modules.metricas as metricas
+
+MODOS = ("aviso", "bloquear")
+
+# Começo das mensagens (a tela e o banco local reconhecem por ele)
+AVISO = "Horário cruza"
+
+_DIA = r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$"
+
+# Por setor: chave da sobreposição, coluna de data, se as paradas entram
+# e se apontamento x parada também é conferido
+SETORES = {
+    "usinagem": {"chave": "maquina", "data": "data_registro"},
+    "estamparia": {"chave": "maquina", "data": "data", "cruzar": True},
+    "furadeira": {"chave": "operador", "data": "data_registro", "paradas": False},
+}
+
+_ROTULO_CHAVE = {"maquina": "máquina", "operador": "operador"}
+
+
+def modo(config, setor):
+    """Modo do setor na seção [sobreposicao] do secrets ('aviso' se ausente ou inválido)."""
+    m = str(config.get(setor, "aviso")).lower()
+    return m if m in MODOS else "aviso"
+
+
+def _tabelas(setor):
+    # (tabela, registro, como aparece na mensagem, coluna de início, coluna de fim)
+    lista = [(f"{setor}_apontamentos", "apontamento", "o apontamento", "inicio_prod", "fim_prod")]
+    if SETORES[setor].get("paradas", True):
+        lista.append((f"{setor}_paradas_reg", "parada", "a parada", "inicio", "fim"))
+    return lista
+
+
+def _pares(setor):
+    # Pares de tabelas conferidos: cada uma com ela mesma (+ apontamento x parada)
+    tabelas = _tabelas(setor)
+    pares = [(t, t) for t in tabelas]
+    if SETORES[setor].get("cruzar") and len(tabelas) == 2:
+        pares.append((tabelas[0], tabelas[1]))
+    return pares
+
+
+def _conferidas(setor, tabela):
+    # Onde procurar cruzamento para um registro gravado em 'tabela'
+    return [b if a[0] == tabela else a for a, b in _pares(setor) if tabela in (a[0], b[0])]
+
+
+def _funcao_periodo():
+    return f"""
+    CREATE OR REPLACE FUNCTION ipar_periodo(dia TEXT, ini TEXT, fim TEXT) RETURNS tsrange AS $$
+        SELECT CASE WHEN dia ~ '{_DIA}' AND ini ~ '{metricas._HORA}' AND fim ~ '{metricas._HORA}' THEN
+            tsrange(dia::date + ini::time,
+                    dia::date + fim::time + CASE WHEN fim::time < ini::time THEN interval '1 day'
+                                                 ELSE interval '0' END)
+        END
+    $$ LANGUAGE sql IMMUTABLE;
+    """
+
+
+def ddl(setor, modo="aviso"):
+    """
+    SQL (idempotente) da coluna periodo, índice GiST, trigger de conferência
+    e, no modo 'bloquear', da restrição de exclusão. Rodar de novo com
+    outro modo troca o comportamento (o trigger é recriado).
+    """
+    cfg = SETORES[setor]
+    chave, data = cfg["chave"], cfg["data"]
+    rotulo = _ROTULO_CHAVE[chave]
+    tabelas = _tabelas(setor)
+    sql = "CREATE EXTENSION IF NOT EXISTS btree_gist;" + _funcao_periodo()
+
+    # Colunas primeiro, nas duas tabelas (o trigger de uma consulta a outra).
+    # Linhas antigas são preenchidas na criação, antes de existir a conferência.
+    for t, _, _, ini, fim in tabelas:
+        sql += f"""
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = current_schema() AND table_name = '{t}'
+                         AND column_name = 'periodo') THEN
+            ALTER TABLE {t} ADD COLUMN periodo tsrange;
+            UPDATE {t} SET periodo = ipar_periodo({data}::text, {ini}::text, {fim}::text);
+        END IF;
+    END $$;
+    CREATE INDEX IF NOT EXISTS ix_{t}_periodo ON {t} USING gist ({chave}, periodo) WHERE ativo = 1;
+    """
+
+    for t, _, _, ini, fim in tabelas:
+        procura = ""
+        for o, _, rot, _, _ in _conferidas(setor, t):
+            proprio = " AND id <> NEW.id" if o == t else ""
+            procura += f"""
+        IF outro IS NULL THEN
+            SELECT '{rot} ' || id INTO outro FROM {o}
+             WHERE ativo = 1 AND {chave} = NEW.{chave} AND periodo && NEW.periodo{proprio} LIMIT 1;
+        END IF;"""
+        sql += f"""
+    CREATE OR REPLACE FUNCTION {t}_periodo() RETURNS trigger AS $$
+    DECLARE
+        outro TEXT;
+    BEGIN
+        NEW.periodo := ipar_periodo(NEW.{data}::text, NEW.{ini}::text, NEW.{fim}::text);
+        IF NEW.ativo IS DISTINCT FROM 1 OR NEW.{chave} IS NULL OR NEW.periodo IS NULL OR isempty(NEW.periodo) THEN
+            RETURN NEW;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            -- Horário e chave iguais (ex.: só mudou a quantidade): nada a conferir
+            IF NEW.periodo = OLD.periodo AND NEW.{chave} = OLD.{chave} AND OLD.ativo = 1 THEN
+                RETURN NEW;
+            END IF;
+        END IF;
+        IF TG_ARGV[0] = 'bloquear' THEN
+            -- Dois envios da mesma chave ao mesmo tempo: um espera o outro e o vê
+            PERFORM pg_advisory_xact_lock(hashtext('periodo:{setor}:' || NEW.{chave}));
+        END IF;{procura}
+        IF outro IS NOT NULL THEN
+            IF TG_ARGV[0] = 'bloquear' THEN
+                RAISE EXCEPTION '{AVISO} com % ({rotulo} %, %)', outro, NEW.{chave},
+                    to_char(lower(NEW.periodo), 'DD/MM/YYYY HH24:MI') USING ERRCODE = 'exclusion_violation';
+            END IF;
+            RAISE WARNING '{AVISO} com % ({rotulo} %, %)', outro, NEW.{chave},
+                to_char(lower(NEW.periodo), 'DD/MM/YYYY HH24:MI');
+        END IF;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql;
+    DROP TRIGGER IF EXISTS trg_{t}_periodo ON {t};
+    CREATE TRIGGER trg_{t}_periodo BEFORE INSERT OR UPDATE ON {t}
+        FOR EACH ROW EXECUTE FUNCTION {t}_periodo('{modo}');
+    """
+
+    # Restrição de exclusão (só tabela com ela mesma): com histórico cruzado
+    # o ALTER falharia, então fica para depois da limpeza (o trigger já bloqueia)
+    for t, *_ in tabelas:
+        if modo != "bloquear":
+            sql += f"""
+    ALTER TABLE {t} DROP CONSTRAINT IF EXISTS ex_{t}_periodo;
+    """
+            continue
+        sql += f"""
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                        WHERE conname = 'ex_{t}_periodo' AND conrelid = '{t}'::regclass) THEN
+            IF EXISTS (SELECT 1 FROM {t} a JOIN {t} b ON b.{chave} = a.{chave} AND b.periodo && a.periodo
+                        AND b.ativo = 1 AND b.id > a.id WHERE a.ativo = 1) THEN
+                RAISE NOTICE '{t}: há horários cruzados no histórico; restrição não criada (veja o relatório)';
+            ELSE
+                ALTER TABLE {t} ADD CONSTRAINT ex_{t}_periodo
+                    EXCLUDE USING gist ({chave} WITH =, periodo WITH &&) WHERE (ativo = 1);
+            END IF;
+        END IF;
+    END $$;
+    """
+    return banco.Sql(sql, _ddl_local(setor, modo))
+
+
+def _ddl_local(setor, modo):
+    # Mesmo período em duas colunas de texto ('AAAA-MM-DD HH:MM:SS'), que
+    # comparadas como texto seguem a ordem do tempo
+    cfg = SETORES[setor]
+    chave, data = cfg["chave"], cfg["data"]
+    rotulo = _ROTULO_CHAVE[chave]
+    tabelas = _tabelas(setor)
+    sql = ""
+    for t, _, _, ini, fim in tabelas:
+        conta = (f"periodo_ini = ipar_periodo_ini({data}, {ini}, {fim}), "
+                 f"periodo_fim = ipar_periodo_fim({data}, {ini}, {fim})")
+        sql += f"""
+    ALTER TABLE {t} ADD COLUMN IF NOT EXISTS periodo_ini TEXT;
+    ALTER TABLE {t} ADD COLUMN IF NOT EXISTS periodo_fim TEXT;
+    DROP TRIGGER IF EXISTS trg_{t}_periodo_ins;
+    CREATE TRIGGER trg_{t}_periodo_ins AFTER INSERT ON {t}
+    BEGIN UPDATE {t} SET {conta} WHERE id = NEW.id; END;
+    DROP TRIGGER IF EXISTS trg_{t}_periodo_upd;
+    CREATE TRIGGER trg_{t}_periodo_upd AFTER UPDATE OF {data}, {ini}, {fim} ON {t}
+    BEGIN UPDATE {t} SET {conta} WHERE id = NEW.id; END;
+    UPDATE {t} SET {conta} WHERE periodo_ini IS NULL;
+    CREATE INDEX IF NOT EXISTS ix_{t}_periodo ON {t} ({chave}, periodo_ini, periodo_fim) WHERE ativo = 1;
+    """
+
+    for t, _, _, ini, fim in tabelas:
+        novo_ini = f"ipar_periodo_ini(NEW.{data}, NEW.{ini}, NEW.{fim})"
+        novo_fim = f"ipar_periodo_fim(NEW.{data}, NEW.{ini}, NEW.{fim})"
+        existe = " OR ".join(
+            f"EXISTS (SELECT 1 FROM {o} x WHERE x.ativo = 1 AND x.{chave} = NEW.{chave}"
+            + (" AND x.id IS NOT NEW.id" if o == t else "")
+            + f" AND x.periodo_ini < {novo_fim} AND x.periodo_fim > {novo_ini})"
+            for o, *_ in _conferidas(setor, t))
+        mensagem = f"{AVISO} com outro registro da mesma {rotulo}" if chave == "maquina" \
+            else f"{AVISO} com outro registro do mesmo {rotulo}"
+        acao = (f"SELECT RAISE(ABORT, '{mensagem}')" if modo == "bloquear"
+                else f"SELECT ipar_aviso('{mensagem} (' || NEW.{chave} || ')')")
+        quando = f"NEW.ativo = 1 AND {novo_ini} < {novo_fim} AND ({existe})"
+        for evento, nome in [("INSERT", "ins"), (f"UPDATE OF {data}, {ini}, {fim}, {chave}, ativo", "upd")]:
+            sql += f"""
+    DROP TRIGGER IF EXISTS trg_{t}_periodo_conf_{nome};
+    CREATE TRIGGER trg_{t}_periodo_conf_{nome} BEFORE {evento} ON {t}
+    WHEN {quando}
+    BEGIN {acao}; END;
+    """
+    return sql
+
+
+def _sql_pares(setor, local):
+    cfg = SETORES[setor]
+    chave = cfg["chave"]
+    partes = []
+    for (ta, reg_a, *_), (tb, reg_b, *_) in _pares(setor):
+        if local:
+            cruza = "b.periodo_ini < a.periodo_fim AND b.periodo_fim > a.periodo_ini"
+            ini_a, fim_a, ini_b, fim_b = "a.periodo_ini", "a.periodo_fim", "b.periodo_ini", "b.periodo_fim"
+            minutos = f"(julianday(least({fim_a}, {fim_b})) - julianday(greatest({ini_a}, {ini_b}))) * 1440"
+        else:
+            cruza = "b.periodo && a.periodo"
+            ini_a, fim_a, ini_b, fim_b = "lower(a.periodo)", "upper(a.periodo)", "lower(b.periodo)", "upper(b.periodo)"
+            minutos = "EXTRACT(EPOCH FROM upper(a.periodo * b.periodo) - lower(a.periodo * b.periodo)) / 60"
+        # Mesma tabela: cada par uma vez só
+        mesma = " AND b.id > a.id" if ta == tb else ""
+        partes.append(f"""
+        SELECT a.{chave} AS {chave}, '{reg_a}' AS registro_a, a.id AS id_a,
+               {ini_a} AS inicio_a, {fim_a} AS fim_a,
+               '{reg_b}' AS registro_b, b.id AS id_b, {ini_b} AS inicio_b, {fim_b} AS fim_b,
+               ROUND(CAST({minutos} AS numeric), 1) AS minutos_cruzados
+          FROM {ta} a JOIN {tb} b ON b.{chave} = a.{chave} AND {cruza} AND b.ativo = 1{mesma}
+         WHERE a.ativo = 1""")
+    return " UNION ALL ".join(partes) + f"\n        ORDER BY {chave}, inicio_a"
+
+
+def relatorio(setor):
+    """
+    Sobreposições já gravadas no setor: um par de registros ativos por linha
+    (chave, registro/id/início/fim de cada lado e minutos cruzados). O
+    cruzamento vai pelo índice de período, sem varrer pares da tabela toda.
+    """
+    return banco.Sql(_sql_pares(setor, local=False), _sql_pares(setor, local=True))
+
+
+def avisos(conn):
+    """Avisos de sobreposição (modo 'aviso') deixados na conexão; esvazia a lista."""
+    msgs = [n.split(":", 1)[-1].strip().splitlines()[0] for n in conn.notices if AVISO in n]
+    del conn.notices[:]
+    return msgs
@@ -0,0 +1,150 @@
+# ==============================================================================
+# SUGESTÕES (AUTOCOMPLETAR) PARA CLIENTE / PEÇA / PROGRAMA
+# ==============================================================================
+# Em vez de procurar valores distintos no histórico inteiro a cada digitação,
+# mantemos um dicionário '<setor>_sugestoes' (campo, valor, usos) alimentado
+# a cada apontamento salvo. Ele tem poucos milhares de linhas mesmo com
+# milhões de apontamentos, e fica indexado por:
+#   - (campo, usos DESC)        -> lista dos mais usados (opções do selectbox)
+#   - (campo, valor pattern)    -> busca por prefixo (LIKE 'ABC%')
+#   - GIN trigram (pg_trgm)     -> "você quis dizer" para grafias parecidas
+#
+# Todo valor é normalizado (maiúsculas, espaços simples) antes de gravar,
+# para que "Acme  ltda" e "ACME LTDA" virem a mesma chave nos dashboards.
+#
+# O selectbox só filtra, ao digitar, os LIMITE_OPCOES mais usados (o filtro
+# roda no navegador, sem ida ao banco). Um valor raro fora dessa lista é
+# digitado como novo: se for a grafia exata, é aceito como está; se não,
+# o "você quis dizer" da confirmação (sql_parecidos, prefixo + trigram no
+# dicionário inteiro) oferece a grafia já gravada.
+
+# Quantos valores mais usados vão para o navegador (o resto cai no "você quis dizer")
+LIMITE_OPCOES = 500
+
+# Similaridade mínima (pg_trgm) para sugerir uma grafia existente
+SIMILARIDADE_MINIMA = 0.4
+
+
+def normalizar(valor):
+    return " ".join(str(valor or "").split()).upper()
+
+
+def ddl(prefixo, tabela_origem, campos):
+    """
+    Cria o dicionário do setor e, na primeira vez, carrega os valores já
+    existentes no histórico. campos: {campo_sugestao: coluna_na_origem}.
+    """
+    t = f"{prefixo}_sugestoes"
+    sql = f"""
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+    CREATE TABLE IF NOT EXISTS {t} (
+        campo TEXT NOT NULL,
+        valor TEXT NOT NULL,
+        usos INTEGER NOT NULL DEFAULT 0,
+        ultimo_uso TIMESTAMP DEFAULT now(),
+        PRIMARY KEY (campo, valor)
+    );
+    CREATE INDEX IF NOT EXISTS ix_{t}_usos ON {t} (campo, usos DESC);
+    CREATE INDEX IF NOT EXISTS ix_{t}_prefixo ON {t} (campo, valor text_pattern_ops);
+    CREATE INDEX IF NOT EXISTS ix_{t}_trgm ON {t} USING gin (valor gin_trgm_ops);
+    """
+    for campo, coluna in campos.items():
+        sql += f"""
+    INSERT INTO {t} (campo, valor, usos)
+    SELECT '{campo}', v, COUNT(*) FROM (
+        SELECT UPPER(REGEXP_REPLACE(TRIM({coluna}), '\\s+', ' ', 'g')) AS v
+        FROM {tabela_origem} WHERE ativo = 1
+    ) h
+    WHERE v <> '' AND NOT EXISTS (SELECT 1 FROM {t} WHERE campo = '{campo}')
+    GROUP BY v
+    ON CONFLICT (campo, valor) DO NOTHING;
+    """
+    return sql
+
+
+def cmd_registrar(prefixo, campo, valor):
+    """Conta mais um uso do valor (upsert). None se o valor estiver vazio."""
+    valor = normalizar(valor)
+    if not valor:
+        return None
+    sql = f"""
+        INSERT INTO {prefixo}_sugestoes AS s (campo, valor, usos) VALUES (%s, %s, 1)
+        ON CONFLICT (campo, valor) DO UPDATE SET usos = s.usos + 1, ultimo_uso = now()
+    """
+    return sql, (campo, valor)
+
+
+def cmd_registrar_lote(prefixo, valores):
+    """
+    Vários usos de uma vez (grade do turno): valores = {campo: lista de
+    valores}. Um upsert só, somando quantas vezes cada valor apareceu.
+    None se não houver valor.
+    """
+    contagem = {}
+    for campo, lista in valores.items():
+        for v in lista:
+            v = normalizar(v if v == v else None)  # NaN da grade = vazio
+            if v:
+                contagem[(campo, v)] = contagem.get((campo, v), 0) + 1
+    if not contagem:
+        return None
+    sql = f"""
+        INSERT INTO {prefixo}_sugestoes AS s (campo, valor, usos)
+        SELECT * FROM unnest(%s::text[], %s::text[], %s::int[])
+        ON CONFLICT (campo, valor) DO UPDATE SET usos = s.usos + EXCLUDED.usos, ultimo_uso = now()
+    """
+    return sql, ([c for c, _ in contagem], [v for _, v in contagem], list(contagem.values()))
+
+
+def sql_mais_usados(prefixo):
+    """Parâmetros: (campo, limite)."""
+    return f"SELECT valor FROM {prefixo}_sugestoes WHERE campo = %s ORDER BY usos DESC LIMIT %s"
+
+
+def sql_parecidos(prefixo):
+    """
+    Valores que começam com o termo ou têm grafia parecida (trigram),
+    os mais próximos primeiro. Nada se o termo já estiver no dicionário
+    (busca exata pela chave, não só entre os LIMITE_OPCOES mais usados).
+    Parâmetros: dict campo, termo, limite.
+    """
+    return f"""
+        SELECT valor, similarity(valor, %(termo)s) AS sim
+        FROM {prefixo}_sugestoes
+        WHERE campo = %(campo)s
+          AND (valor LIKE %(prefixo)s OR similarity(valor, %(termo)s) >= {SIMILARIDADE_MINIMA} AND valor %% %(termo)s)
+          AND valor <> %(termo)s
+          AND NOT EXISTS (SELECT 1 FROM {prefixo}_sugestoes WHERE campo = %(campo)s AND valor = %(termo)s)
+        ORDER BY (valor LIKE %(prefixo)s) DESC, sim DESC, usos DESC
+        LIMIT %(limite)s
+    """
+
+
+def params_parecidos(campo, termo, limite=5):
+    termo = normalizar(termo)
+    prefixo = termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return {"campo": campo, "termo": termo, "prefixo": prefixo, "limite": limite}
+
+
+def sugerir_grafia(valores, rotulos, parecidos, usar):
+    """
+    "Você quis dizer...?" na tela: para cada valor novo (fora do dicionário)
+    com grafias parecidas, um botão para trocar pela já usada (evita "ACME",
+    "ACME LTDA", "ACME LTDA." como clientes diferentes).
+    valores: {campo: valor}; rotulos: {campo: rótulo na tela};
+    parecidos(campo, valor): lista de sql_parecidos (cacheada pelo setor);
+    usar(campo, grafia): grava a escolha (roda no clique, antes da reexecução).
+    """
+    import streamlit as st
+
+    for campo, rotulo in rotulos.items():
+        valor = valores.get(campo)
+        if not valor:
+            continue
+        opcoes = parecidos(campo, valor)
+        if opcoes:
+            st.info(f"**{rotulo}** '{valor}' é novo. Já existem grafias parecidas:")
+            cols = st.columns(len(opcoes))
+            for col, p in zip(cols, opcoes):
+                col.button(f"Usar '{p}'", key=f"sug_{campo}_{p}", on_click=usar, args=(campo, p))
@@ -0,0 +1,196 @@
+# ==============================================================================
+# FATIAMENTO POR TURNO E HORA DO DIA (VETORIZADO)
+# ==============================================================================
+# Os apontamentos e paradas chegam como intervalos inteiros (início/fim, com
+# a virada de dia já corrigida). Para ver produção por turno ou por hora
+# cortamos cada intervalo em "grãos" de tempo (30 min, 15 min... conforme os
+# limites dos turnos) com numpy, sem loop em Python:
+#
+#   07:40-10:10  ->  07:40-08:00 | 08:00-09:00 | 09:00-10:00 | 10:00-10:10  (grão 60)
+#
+# Cada fatia sabe a hora do dia, o turno e a data do turno (o pedaço depois
+# da meia-noite do 3º turno conta para o dia em que o turno começou).
+# Colunas de valor (peças, minutos teóricos...) são distribuídas entre as
+# fatias proporcionalmente ao tempo.
+
+from math import gcd
+
+import numpy as np
+import pandas as pd
+
+# (nome, início, fim) — o turno que passa da meia-noite é tratado sozinho
+TURNOS_PADRAO = [
+    ("1º Turno", "06:00", "14:00"),
+    ("2º Turno", "14:00", "22:00"),
+    ("3º Turno", "22:00", "06:00"),
+]
+
+FORA_DE_TURNO = "Fora de Turno"
+
+_NS_MIN = 60 * 10**9
+
+
+def turnos_do_setor(config, setor):
+    """
+    Lê os turnos do secrets.toml (seção [turnos], chave = setor), ex:
+        estamparia = [["1º Turno", "05:30", "15:18"], ["2º Turno", "15:18", "00:36"]]
+    Sem configuração, usa TURNOS_PADRAO.
+    """
+    lista = (config or {}).get(setor)
+    return [tuple(t) for t in lista] if lista else TURNOS_PADRAO
+
+
+def _minutos(hhmm):
+    h, m = str(hhmm).split(":")[:2]
+    return (int(h) * 60 + int(m)) % 1440
+
+
+def _grao(turnos):
+    # Maior grão que respeita as horas cheias e todos os limites de turno
+    g = 60
+    for _, ini, fim in turnos:
+        g = gcd(g, gcd(_minutos(ini), _minutos(fim)) or 60)
+    return g
+
+
+def _mapa_turnos(turnos, grao):
+    """Para cada grão do dia: índice do turno (-1 = fora) e se é o pedaço pós meia-noite."""
+    slots = np.arange(0, 1440, grao)
+    idx = np.full(len(slots), -1)
+    virada = np.zeros(len(slots), dtype=bool)
+    for i, (_, ini, fim) in enumerate(turnos):
+        a, b = _minutos(ini), _minutos(fim)
+        if a < b:
+            dentro = (slots >= a) & (slots < b)
+        else:
+            dentro = (slots >= a) | (slots < b)
+            virada |= dentro & (slots < b)
+        idx = np.where(dentro & (idx < 0), i, idx)
+    return idx, virada
+
+
+def intervalos(df, col_data, col_ini, col_fim):
+    """
+    Adiciona dt_ini / dt_fim ao DataFrame (mesma regra dos dashboards:
+    fim menor que início = terminou no dia seguinte).
+    """
+    df['dt_ini'] = pd.to_datetime(df[col_data].astype(str) + ' ' + df[col_ini].astype(str))
+    df['dt_fim'] = pd.to_datetime(df[col_data].astype(str) + ' ' + df[col_fim].astype(str))
+    df.loc[df['dt_fim'] < df['dt_ini'], 'dt_fim'] += pd.Timedelta(days=1)
+    return df
+
+
+def fatiar(df, turnos=None, colunas_valor=(), colunas_chave=()):
+    """
+    Corta os intervalos (dt_ini, dt_fim) do df nos limites de hora e turno.
+
+    Retorna um DataFrame com uma linha por fatia:
+        linha, inicio, minutos, hora, turno, data_turno,
+        + colunas_chave copiadas (ex: maquina)
+        + colunas_valor rateadas pelo tempo (ex: qtd_produzida)
+    """
+    turnos = turnos or TURNOS_PADRAO
+    colunas = ["linha", "inicio", "minutos", "hora", "turno", "data_turno", *colunas_chave, *colunas_valor]
+    if df.empty:
+        return pd.DataFrame(columns=colunas)
+
+    grao = _grao(turnos)
+    g_ns = grao * _NS_MIN
+    ini = df['dt_ini'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    fim = df['dt_fim'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+    # Quantos grãos cada intervalo atravessa
+    b0 = ini // g_ns
+    b1 = (fim - 1) // g_ns
+    n = np.where(fim > ini, b1 - b0 + 1, 0)
+
+    # "Explode" os intervalos: linha de origem + posição do grão
+    linha = np.repeat(np.arange(len(df)), n)
+    desloc = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    inicio_grao = (np.repeat(b0, n) + desloc) * g_ns
+
+    s = np.maximum(ini[linha], inicio_grao)
+    e = np.minimum(fim[linha], inicio_grao + g_ns)
+    minutos = (e - s) / _NS_MIN
+
+    minuto_dia = (inicio_grao // _NS_MIN) % 1440
+    idx_turno, virada = _mapa_turnos(turnos, grao)
+    slot = minuto_dia // grao
+    t = idx_turno[slot]
+    nomes = np.array([nome for nome, _, _ in turnos] + [FORA_DE_TURNO], dtype=object)
+
+    dia = inicio_grao - minuto_dia * _NS_MIN
+    dia = dia - virada[slot] * (1440 * _NS_MIN)
+
+    out = pd.DataFrame({
+        "linha": linha,
+        "inicio": pd.to_datetime(s),
+        "minutos": minutos,
+        "hora": minuto_dia // 60,
+        "turno": nomes[t],  # -1 cai no último item (FORA_DE_TURNO)
+        "data_turno": pd.to_datetime(dia).date,
+    })
+    for c in colunas_chave:
+        out[c] = df[c].to_numpy()[linha]
+
+    duracao = ((fim - ini) / _NS_MIN)[linha]
+    for c in colunas_valor:
+        out[c] = pd.to_numeric(df[c], errors='coerce').fillna(0).to_numpy()[linha] * minutos / duracao
+    return out[colunas]
+
+
+# ------------------------------------------------------------------------------
+# INDICADORES
+# ------------------------------------------------------------------------------
+
+def oee_por_turno(fatias_prod, fatias_parada=None, paradas_dentro=False, por_dia=True):
+    """
+    OEE por (data_turno, turno), ou só por turno no período todo com
+    por_dia=False. fatias_prod precisa das colunas de valor 'teorico_min',
+    'qtd_produzida' e 'refugo'.
+
+    paradas_dentro=True  -> paradas acontecem DENTRO do tempo apontado
+                           (regra da Usinagem: disponível = apontado - parado)
+    paradas_dentro=False -> paradas somam ao tempo disponível
+                           (regra da Estamparia: disponível = produção + parado)
+    """
+    chave = ["data_turno", "turno"] if por_dia else ["turno"]
+    r = fatias_prod.groupby(chave).agg(
+        tempo_prod=("minutos", "sum"), teorico=("teorico_min", "sum"),
+        boas=("qtd_produzida", "sum"), refugo=("refugo", "sum"))
+    if fatias_parada is not None and not fatias_parada.empty:
+        par = fatias_parada.groupby(chave)["minutos"].sum().rename("tempo_parado")
+        r = r.join(par, how="outer").fillna(0)
+    else:
+        r["tempo_parado"] = 0.0
+
+    if paradas_dentro:
+        operando = (r["tempo_prod"] - r["tempo_parado"]).clip(lower=0)
+        base = r["tempo_prod"]
+    else:
+        operando = r["tempo_prod"]
+        base = r["tempo_prod"] + r["tempo_parado"]
+
+    total = r["boas"] + r["refugo"]
+    r["disponibilidade"] = (operando / base.where(base > 0) * 100).fillna(0)
+    r["performance"] = (r["teorico"] / operando.where(operando > 0) * 100).fillna(0).clip(upper=100)
+    r["qualidade"] = (r["boas"] / total.where(total > 0) * 100).fillna(0)
+    r["oee"] = r["disponibilidade"] * r["performance"] * r["qualidade"] / 10000
+    return r.reset_index()
+
+
+def mapa_calor(fatias, coluna="maquina", dias=1, descontar=None):
+    """
+    Utilização (%) por <coluna> x hora do dia: minutos ocupados na hora
+    dividido pelos minutos disponíveis (60 x dias do período).
+    descontar: fatias de parada a abater (setores onde a parada acontece
+    dentro do tempo apontado).
+    """
+    if fatias.empty:
+        return pd.DataFrame(columns=range(24))
+    m = fatias.pivot_table(index=coluna, columns="hora", values="minutos", aggfunc="sum", fill_value=0)
+    m = m.reindex(columns=range(24), fill_value=0)
+    if descontar is not None and not descontar.empty and coluna in descontar:
+        p = descontar.pivot_table(index=coluna, columns="hora", values="minutos", aggfunc="sum", fill_value=0)
+        m = (m - p.reindex(index=m.index, columns=range(24), fill_value=0)).clip(lower=0)
+    return (m / (60 * max(dias, 1)) * 100).clip(upper=100)
@@ -2,71 +2,227 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import psycopg2
 from datetime import datetime, date, time, timedelta
+import modules.horimetro as horimetro
+import modules.cluster as cluster
+import modules.ciclos as ciclos
+import modules.sugestoes as sugestoes
+import modules.turnos as turnos
+import modules.espelho as espelho
+import modules.banco as banco
+import modules.relatorios as relatorios
+import modules.lote as lote
+import modules.cadastro as cadastro
+import modules.esquema as esquema
+import modules.metricas as metricas
+import modules.envio as envio
+import modules.sobreposicao as sobreposicao
+import modules.busca as busca
+import modules.plantas as plantas
 
 # ==============================================================================
 # 1. CONEXÃO E BANCO DE DADOS (COM CACHE DE PERFORMANCE)
 # ==============================================================================
 
+# Planta do usuário logado (escolhida no main.py). Conexão, espelho e caches
+# são por planta: a planta entra como argumento das funções cacheadas.
+def _planta():
+    return st.session_state.get("planta", plantas.PADRAO)
+
+def _versao_cache(tabela):
+    return cluster.versao_cache(plantas.chave(_planta(), tabela))
+
+def _invalidar_cache(tabela):
+    cluster.invalidar_cache(plantas.chave(_planta(), tabela))
+
 # O cache segura a conexão aberta por 1 hora (3600s) para não reconectar toda hora
+# (com keepalive TCP; ver modules/banco.py). Uma conexão por planta.
 @st.cache_resource(ttl=3600)
-def init_connection():
+def init_connection(planta):
     try:
-        return psycopg2.connect(
-            host=st.secrets["postgres"]["DB_HOST"],
-            user=st.secrets["postgres"]["DB_USER"],
-            password=st.secrets["postgres"]["DB_PASS"],
-            dbname=st.secrets["postgres"]["DB_NAME"],
-            port=st.secrets["postgres"]["DB_PORT"],
-            sslmode='require'
-        )
+        banco.configurar(st.secrets.get("tempo_limite", {}))
+        return banco.conectar(plantas.credenciais(st.secrets, planta))
     except Exception as e:
         st.error(f"Erro de Conexão: {e}")
         return None
 
-def run_query(query, params=(), fetch=False, commit=False):
-    conn = init_connection()
-    if not conn: return None
-    result = None
-    try:
-        # Criamos um cursor novo, mas usamos a MESMA conexão cacheada
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            if commit:
-                conn.commit()
-                result = "OK"
-            if fetch:
-                result = cur.fetchall()
-        # NÃO fechamos a conexão aqui (conn.close) pois ela está no cache!
+def get_connection(forcar=False):
+    # Pre-ping: conexão do cache morta (queda de link) -> reconecta sem erro na tela
+    planta = _planta()
+    conn = init_connection(planta)
+    if forcar or not banco.viva(conn):
+        banco.fechar(conn)
+        init_connection.clear(planta)  # só a desta planta
+        conn = init_connection(planta)
+    return conn
+
+# 'classe' escolhe o tempo limite da consulta (banco.TEMPO_LIMITE):
+# formulario, escrita, leitura, dashboard, exportacao, manutencao
+def run_query(query, params=(), fetch=False, commit=False, classe=None):
+    def acao(conn, cur):
+        # Cursor novo, mas a MESMA conexão cacheada (não fechamos a conexão!)
+        result = None
+        cur.execute(query, params)
+        if commit:
+            conn.commit()
+            _apos_escrita(query)
+            result = "OK"
+        if fetch:
+            result = cur.fetchall()
         return result
+    classe = classe or ("escrita" if commit else "formulario")
+    try:
+        # Escrita não é repetida automaticamente (poderia gravar em dobro)
+        return banco.executar(get_connection, acao, classe, repetir=not commit)
     except Exception as e:
-        st.error(f"Erro SQL: {e}")
-        conn.rollback() # Em caso de erro, desfazemos a transação atual
+        st.error(banco.mensagem_erro(e, "Erro SQL", classe))
         return None
 
-def get_dataframe(query, params=None):
-    conn = init_connection()
-    if not conn: return pd.DataFrame()
+def get_dataframe(query, params=None, classe="leitura"):
+    # Dashboard e exportação vêm em massa por COPY (colunas já tipadas);
+    # leituras pequenas continuam no pd.read_sql
     try:
         # O pandas usa a conexão cacheada
-        df = pd.read_sql(query, conn, params=params)
-        return df
+        return banco.executar(get_connection, banco.acao_leitura(query, params, classe), classe, repetir=True)
     except Exception as e:
-        st.error(f"Erro ao gerar tabela: {e}")
+        st.error(banco.mensagem_erro(e, "Erro ao gerar tabela", classe))
         return pd.DataFrame()
 
+def run_transaction(comandos, classe="escrita"):
+    # Executa vários comandos (lista de (query, params)) numa transação só:
+    # ou grava tudo, ou não grava nada. Com chave de envio (modules/envio.py)
+    # é repetida se a conexão cair, e chave já gravada conta como sucesso.
+    # Horário cruzado: no modo aviso grava e avisa, no bloquear dá erro.
+    def acao(conn, cur):
+        for query, params in comandos:
+            banco.executar_comando(cur, query, params)
+        conn.commit()
+        _apos_escrita(*(q for q, _ in comandos))
+        for aviso in sobreposicao.avisos(conn):
+            st.toast(aviso, icon="⚠️")
+        return "OK"
+    try:
+        return banco.executar(get_connection, acao, classe, repetir=envio.tem_chave(comandos))
+    except Exception as e:
+        if envio.repetido(e):
+            st.toast("Este envio já estava gravado: nada foi duplicado.")
+            return "OK"
+        st.error(banco.mensagem_erro(e, "Erro SQL", classe))
+        return None
+
+# Roda uma vez por processo (cache), e não a cada clique
+# (tabelas do setor + horímetro, ciclos, sugestões, espelho e métricas: modules/esquema.py)
+@st.cache_resource
+def init_db_usinagem(planta):
+    modo = sobreposicao.modo(st.secrets.get("sobreposicao", {}), "usinagem")
+    for q in esquema.scripts("usinagem", modo):
+        run_query(q, commit=True, classe="manutencao")
+    metricas.preencher(lambda q: run_query(q, fetch=True, commit=True, classe="manutencao"))
+    return True
+
+# Tabelas copiadas para o espelho local (SQLite no servidor da fábrica)
+TABELAS_ESPELHO = esquema.TABELAS_ESPELHO["usinagem"]
+
+# Um espelho por processo e planta, com a thread de sincronização ligada
+# (modules/espelho.py). Desliga com [espelho] ativo = false no secrets.toml
+# (e no banco local, que já é local).
+def get_espelho(planta):
+    return espelho.do_setor(st.secrets, planta, TABELAS_ESPELHO)
+
+def _apos_escrita(*queries):
+    espelho.invalidar(get_espelho(_planta()), *queries)
+
+def ler_local(query, params=None, classe="leitura"):
+    # Leitura pela rede local (espelho). Se o espelho não garantir a
+    # defasagem máxima, lê direto do Supabase como antes.
+    return espelho.ler(get_espelho(_planta()), query, params, lambda: get_dataframe(query, params, classe))
+
+def _ler_banco(planta, query, params=None, classe="leitura"):
+    # Leitura numa conexão do pool de leitura da planta (não na cacheada):
+    # várias rodam ao mesmo tempo (ler_varios, get_listas)
+    leitores = banco.leitores(plantas.credenciais(st.secrets, planta))
+    return leitores.executar(banco.acao_leitura(query, params, classe), classe, repetir=True)
+
+def ler_varios(consultas, classe="leitura"):
+    # Consultas independentes da tela ({nome: (query, params)}) ao mesmo
+    # tempo: a tela espera só a mais lenta (banco.paralelo). Cada uma segue
+    # o caminho do ler_local (espelho se der, senão o Supabase).
+    planta = _planta()
+    esp = get_espelho(planta)
+    def ler(query, params):
+        def no_banco():
+            try:
+                return _ler_banco(planta, query, params, classe)
+            except Exception as e:
+                return e  # mostrado abaixo, na thread da tela
+        return espelho.ler(esp, query, params, no_banco)
+    res = banco.paralelo({nome: (lambda q=q, p=p: ler(q, p)) for nome, (q, p) in consultas.items()})
+    for nome, r in res.items():
+        if isinstance(r, Exception):
+            st.error(banco.mensagem_erro(r, "Erro ao gerar tabela", classe))
+            res[nome] = pd.DataFrame()
+    return res
+
+# Campos de texto livre com autocompletar (campo -> coluna em usinagem_apontamentos)
+CAMPOS_SUGESTAO = esquema.CAMPOS_SUGESTAO["usinagem"]
+
+# Valores mais usados (vão como opções do selectbox; o filtro ao digitar é no navegador)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_sugestoes(planta, campo):
+    res = run_query(sugestoes.sql_mais_usados("usinagem"), (campo, sugestoes.LIMITE_OPCOES), fetch=True)
+    return [r[0] for r in res] if res else []
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_parecidos(planta, campo, termo):
+    res = run_query(sugestoes.sql_parecidos("usinagem"), sugestoes.params_parecidos(campo, termo), fetch=True)
+    return [r[0] for r in res] if res else []
+
+def sugerir_grafia(dados, rotulos):
+    # "Você quis dizer...?" quando o valor digitado ainda não existe no dicionário
+    sugestoes.sugerir_grafia(dados, rotulos, lambda campo, termo: get_parecidos(_planta(), campo, termo),
+                             dados.__setitem__)
+
+# Ciclo padrão aprendido do histórico (busca pela chave primária, cacheada)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_ciclo_stats(planta, peca, maquina, cod_prog):
+    res = run_query(ciclos.sql_consulta("usinagem"), ciclos.params_consulta(peca, maquina, cod_prog), fetch=True)
+    return ciclos.resumo(res[0]) if res else None
+
 # ... (O resto do código: get_list, render_app, etc., continua igual)
 
+# Listas dos dropdowns em cache. A 'versao' vem do cluster: um cadastro feito
+# em qualquer worker muda a versão e todos os workers releem a lista.
+@st.cache_data(ttl=600, show_spinner=False)
+def _get_list_cache(planta, table_name, col_name, versao):
+    query = f"SELECT {col_name} FROM {table_name} WHERE ativo = 1 ORDER BY {col_name}"
+    def no_banco():
+        try:
+            return _ler_banco(planta, query, classe="formulario")
+        except Exception as e:
+            st.error(banco.mensagem_erro(e, "Erro SQL", "formulario"))
+            raise LookupError(table_name) from e # erro de banco não entra no cache
+    return espelho.ler(get_espelho(planta), query, None, no_banco)[col_name].tolist()
+
 def get_list(table_name, col_name="nome"):
     # Agora aceita 'col_name', mas usa 'nome' como padrão se não informarmos nada
-    res = run_query(f"SELECT {col_name} FROM {table_name} WHERE ativo = 1 ORDER BY {col_name}", fetch=True)
-    return [r[0] for r in res] if res else []
+    try:
+        return _get_list_cache(_planta(), table_name, col_name, _versao_cache(table_name))
+    except LookupError:
+        return []
+
+def get_listas(*tabelas):
+    # Várias listas de uma vez, em paralelo (as que não estão no cache vão
+    # ao banco juntas). Cada item: 'tabela' ou ('tabela', 'coluna').
+    pedidos = [t if isinstance(t, tuple) else (t,) for t in tabelas]
+    res = banco.paralelo({i: (lambda p=p: get_list(*p)) for i, p in enumerate(pedidos)})
+    return [res[i] for i in range(len(pedidos))]
 
 # ==============================================================================
 # 2. APLICAÇÃO PRINCIPAL (ENVELOPE)
 # ==============================================================================
 def render_app():
+    init_db_usinagem(_planta())
+
     # --- BARRA LATERAL (ORIGINAL RESTAURADA) ---
     st.sidebar.divider()
     st.sidebar.title("⚙️ Controle CNC")
@@ -78,12 +234,13 @@ def render_app():
         "🛑 Registro de Paradas",
         "🔧 Manutenção",
         "⚙️ Cadastros Gerais",
-        "📂 Histórico & Exportar"
+        "📂 Histórico & Exportar",
+        "🔎 Busca no Histórico"
     ])
     
     # --- SENHA DE SUPERVISOR (Recuperada) ---
     autenticado = False
-    areas_restritas = ["⚙️ Cadastros Gerais", "📂 Histórico & Exportar"]
+    areas_restritas = ["⚙️ Cadastros Gerais", "📂 Histórico & Exportar", "🔎 Busca no Histórico"]
 
     if menu in areas_restritas:
         st.sidebar.markdown("---")
@@ -101,104 +258,13 @@ def render_app():
     if menu == "📝 Apontamento Produção":
         st.header("📝 Registro de Produção (CNC)")
         
-        if "confirma_producao" not in st.session_state:
-            st.session_state.confirma_producao = None
-        
-        ops = get_list("usinagem_operadores")
-        maqs = get_list("usinagem_maquinas")
-        
-        if not ops or not maqs:
-            st.warning("⚠️ Atenção: Cadastre Operadores e Máquinas (em Cadastros Gerais) antes de apontar.")
+        modo = st.radio("Lançamento", ["Um apontamento", "Turno inteiro (grade)"], horizontal=True, key="usi_modo")
+        if modo == "Um apontamento":
+            _fragmento_apontamento()
         else:
-            # MODO FORMULÁRIO
-            if st.session_state.confirma_producao is None:
-                with st.form("f_prod", clear_on_submit=False):
-                    st.subheader("1. Dados do Processo")
-                    c1, c2, c3 = st.columns(3)
-                    with c1:
-                        data_reg = st.date_input("Data", date.today())
-                        maquina = st.selectbox("Torno / Centro Usinagem", maqs)
-                        operador = st.selectbox("Operador", ops)
-                    with c2:
-                        desc_pc = st.text_input("Nome da Peça / Produto")
-                        cod_prog = st.text_input("Código do Programa (Opcional)", placeholder="Ex: O0554")
-                    with c3:
-                        tempo_c = st.number_input("Ciclo (Segundos/Peça)", value=30.0, step=0.5, min_value=1.0)
-                        cliente = st.text_input("Cliente / Ordem Produção")
-
-                    st.markdown("---")
-                    st.subheader("2. Quantidades e Tempos")
-                    c4, c5, c6 = st.columns(3)
-                    with c4:
-                        qtd_p = st.number_input("Peças Boas", min_value=0)
-                        refugo = st.number_input("Refugo / Sucata", min_value=0)
-                    with c5:
-                        h_i = st.time_input("Início do Lote", time(7, 0))
-                        h_f = st.time_input("Fim do Lote", time(17, 0))
-                    with c6:
-                        setup = st.number_input("Tempo Setup (min)", value=0)
-
-                    submitted = st.form_submit_button("🔍 Revisar Apontamento")
-                    
-                    if submitted:
-                        dt_i = datetime.combine(data_reg, h_i)
-                        dt_f = datetime.combine(data_reg, h_f)
-                        if h_f < h_i: dt_f += timedelta(days=1)
-                        horas_trabalhadas = (dt_f - dt_i).total_seconds() / 3600
-                        
-                        if horas_trabalhadas <= 0:
-                            st.error("❌ Tempo de produção inválido.")
-                        else:
-                            st.session_state.confirma_producao = {
-                                "data": data_reg, "cliente": cliente, "descricao_pc": desc_pc,
-                                "cod_programa": cod_prog, "maquina": maquina,
-                                "tempo_c": tempo_c, "operador": operador, "setup": setup,
-                                "h_i": h_i, "h_f": h_f, "qtd_p": qtd_p, "refugo": refugo,
-                                "horas_trab": horas_trabalhadas
-                            }
-                            st.rerun()
-
-            # MODO CONFIRMAÇÃO
-            else:
-                dados = st.session_state.confirma_producao
-                st.info("✋ **CONFIRMAÇÃO DE DADOS**")
-                
-                with st.container(border=True):
-                    k1, k2, k3, k4 = st.columns(4)
-                    k1.metric("Peça", dados['descricao_pc'])
-                    k2.metric("Total Produzido", f"{dados['qtd_p'] + dados['refugo']} pçs")
-                    k3.metric("Tempo Apontado", f"{dados['horas_trab']:.2f} h")
-                    ciclo_real_seg = ((dados['horas_trab'] * 3600) - (dados['setup']*60)) / (dados['qtd_p'] + dados['refugo']) if (dados['qtd_p'] + dados['refugo']) > 0 else 0
-                    k4.metric("Ciclo Real (Médio)", f"{ciclo_real_seg:.1f} s", delta=f"{dados['tempo_c'] - ciclo_real_seg:.1f}s vs Padrão")
-
-                col_confirma, col_cancela = st.columns(2)
-                
-                if col_confirma.button("✅ GRAVAR APONTAMENTO"):
-                    sql = """INSERT INTO usinagem_apontamentos (data_registro, cliente, descricao_pc, cod_programa, 
-                                maquina, tempo_ciclo_seg, operador, setup_min, inicio_prod, fim_prod,
-                                qtd_produzida, refugo, ativo)
-                                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,1)"""
-                    
-                    run_query(sql, (dados['data'], dados['cliente'], dados['descricao_pc'], dados['cod_programa'],
-                                    dados['maquina'], dados['tempo_c'], dados['operador'], dados['setup'],
-                                    dados['h_i'], dados['h_f'], dados['qtd_p'], dados['refugo']), commit=True)
-                    
-                    # Atualiza horímetro
-                    run_query("UPDATE usinagem_maquinas SET horimetro_total = horimetro_total + %s WHERE nome = %s",
-                            (dados['horas_trab'], dados['maquina']), commit=True)
-                    
-                    st.success("🎉 Produção registrada com sucesso!")
-                    st.session_state.confirma_producao = None
-                    st.rerun()
-                
-                if col_cancela.button("❌ CORRIGIR"):
-                    st.session_state.confirma_producao = None
-                    st.rerun()
+            _fragmento_grade()
 
-        st.divider()
-        st.markdown("### 🕒 Últimos Registros")
-        df_ultimos = get_dataframe('SELECT id, fim_prod as "Fim", maquina, descricao_pc as "Peca", qtd_produzida as "Boas" FROM usinagem_apontamentos WHERE ativo = 1 ORDER BY id DESC LIMIT 5')
-        st.dataframe(df_ultimos, use_container_width=True, hide_index=True)
+        _fragmento_ultimos()
 
     # ==========================================================================
     # 2. DASHBOARD OEE
@@ -206,92 +272,14 @@ def render_app():
     elif menu == "📊 Dashboard OEE":
         st.header("📊 Inteligência de Usinagem")
         
-        c_filtro1, c_filtro2 = st.columns(2)
-        data_filtro = c_filtro1.date_input("Filtrar Data", date.today())
-        
-        df_prod = get_dataframe(f"SELECT * FROM usinagem_apontamentos WHERE ativo = 1 AND data_registro = '{data_filtro}'")
-        df_parada = get_dataframe(f"SELECT * FROM usinagem_paradas_reg WHERE ativo = 1 AND data_registro = '{data_filtro}'")
-        
-        if df_prod.empty and df_parada.empty:
-            st.info(f"Sem dados para a data: {data_filtro.strftime('%d/%m/%Y')}")
-        else:
-            # Tratamento de Datas para Cálculo
-            if not df_prod.empty:
-                df_prod['dt_ini'] = pd.to_datetime(df_prod['data_registro'].astype(str) + ' ' + df_prod['inicio_prod'].astype(str))
-                df_prod['dt_fim'] = pd.to_datetime(df_prod['data_registro'].astype(str) + ' ' + df_prod['fim_prod'].astype(str))
-                df_prod.loc[df_prod['dt_fim'] < df_prod['dt_ini'], 'dt_fim'] += pd.Timedelta(days=1)
-                tempo_apontado_min = ((df_prod['dt_fim'] - df_prod['dt_ini']).dt.total_seconds() / 60).sum()
-            else:
-                tempo_apontado_min = 0
-
-            tempo_parado_min = 0
-            if not df_parada.empty:
-                df_parada['dt_ini'] = pd.to_datetime(df_parada['data_registro'].astype(str) + ' ' + df_parada['inicio'].astype(str))
-                df_parada['dt_fim'] = pd.to_datetime(df_parada['data_registro'].astype(str) + ' ' + df_parada['fim'].astype(str))
-                df_parada.loc[df_parada['dt_fim'] < df_parada['dt_ini'], 'dt_fim'] += pd.Timedelta(days=1)
-                tempo_parado_min = ((df_parada['dt_fim'] - df_parada['dt_ini']).dt.total_seconds() / 60).sum()
-            
-            # Métricas OEE
-            tempo_operando_min = tempo_apontado_min - tempo_parado_min
-            
-            disponibilidade = (tempo_operando_min / tempo_apontado_min * 100) if tempo_apontado_min > 0 else 0
-            
-            total_pecas = df_prod['qtd_produzida'].sum() + df_prod['refugo'].sum() if not df_prod.empty else 0
-            
-            # Performance baseada na média ponderada
-            tempo_teorico_total = 0
-            if not df_prod.empty:
-                df_prod['teorico_linha'] = ((df_prod['qtd_produzida'] + df_prod['refugo']) * df_prod['tempo_ciclo_seg']) / 60
-                tempo_teorico_total = df_prod['teorico_linha'].sum()
-            
-            performance = (tempo_teorico_total / tempo_operando_min * 100) if tempo_operando_min > 0 else 0
-            if performance > 100: performance = 100 
-            
-            pecas_boas = df_prod['qtd_produzida'].sum() if not df_prod.empty else 0
-            qualidade = (pecas_boas / total_pecas * 100) if total_pecas > 0 else 0
-            
-            oee = (disponibilidade * performance * qualidade) / 10000
-            
-            col_gauge, col_kpi = st.columns([1, 2])
-            with col_gauge:
-                fig = go.Figure(go.Indicator(
-                    mode = "gauge+number", value = oee, title = {'text': "OEE DO DIA"},
-                    gauge = {'axis': {'range': [None, 100]}, 'bar': {'color': "#2E86C1"},
-                        'steps': [{'range': [0, 60], 'color': "#E74C3C"}, {'range': [60, 85], 'color': "#F4D03F"}, {'range': [85, 100], 'color': "#2ECC71"}]}
-                ))
-                fig.update_layout(height=250, margin=dict(l=20,r=20,t=30,b=20))
-                st.plotly_chart(fig, use_container_width=True)
-                
-            with col_kpi:
-                st.markdown("#### Detalhamento dos Indicadores")
-                k1, k2, k3 = st.columns(3)
-                k1.metric("Disponibilidade", f"{disponibilidade:.1f}%", delta=f"-{tempo_parado_min:.0f} min Parado", delta_color="inverse")
-                k2.metric("Performance", f"{performance:.1f}%")
-                k3.metric("Qualidade", f"{qualidade:.1f}%", delta=f"{df_prod['refugo'].sum() if not df_prod.empty else 0} Refugos", delta_color="inverse")
-
-            st.divider()
-            c1, c2 = st.columns(2)
-            if not df_prod.empty:
-                with c1:
-                    st.subheader("Produção por Máquina")
-                    fig_bar = px.bar(df_prod, x="maquina", y="qtd_produzida", title="Peças Boas", text_auto=True)
-                    st.plotly_chart(fig_bar, use_container_width=True)
-            
-            if not df_parada.empty:
-                with c2:
-                    st.subheader("Pareto de Paradas")
-                    df_parada['duracao'] = ((df_parada['dt_fim'] - df_parada['dt_ini']).dt.total_seconds() / 60)
-                    gf_par = df_parada.groupby("motivo")[["duracao"]].sum().reset_index().sort_values("duracao", ascending=False)
-                    fig_pie = px.bar(gf_par, x="duracao", y="motivo", orientation='h', text_auto='.0f')
-                    st.plotly_chart(fig_pie, use_container_width=True)
+        _fragmento_dashboard()
 
     # ==========================================================================
     # 3. REGISTRO DE PARADAS
     # ==========================================================================
     elif menu == "🛑 Registro de Paradas":
         st.header("🛑 Registro de Paradas")
-        maqs = get_list("usinagem_maquinas")
-        list_paradas = get_list("usinagem_motivos_parada", "motivo")
+        maqs, list_paradas = get_listas("usinagem_maquinas", ("usinagem_motivos_parada", "motivo"))
         
         if not maqs:
             st.warning("Cadastre máquinas primeiro.")
@@ -310,13 +298,14 @@ def render_app():
                     if h_f_p <= h_i_p:
                         st.error("A hora final deve ser maior que a inicial.")
                     else:
-                        run_query("""INSERT INTO usinagem_paradas_reg (data_registro, maquina, motivo, inicio, fim, observacao, ativo)
-                                    VALUES (%s,%s,%s,%s,%s,%s,1)""",
-                                (d_p, m_p, motivo, h_i_p, h_f_p, obs), commit=True)
-                        st.success("Parada registrada!")
+                        params = (d_p, m_p, motivo, h_i_p, h_f_p, obs)
+                        # Chave do envio: o segundo clique no mesmo registro não duplica
+                        if run_transaction([("""INSERT INTO usinagem_paradas_reg (data_registro, maquina, motivo, inicio, fim, observacao, chave_envio, ativo)
+                                    VALUES (%s,%s,%s,%s,%s,%s,%s,1)""", params + (envio.chave(st.session_state, *params),))]):
+                            st.success("Parada registrada!")
             
             st.subheader("Histórico de Paradas do Dia")
-            df_hj = get_dataframe(f"SELECT id, maquina, inicio, fim, motivo, observacao FROM usinagem_paradas_reg WHERE data_registro = '{date.today()}' AND ativo = 1 ORDER BY id DESC")
+            df_hj = ler_local("SELECT id, maquina, inicio, fim, motivo, observacao FROM usinagem_paradas_reg WHERE data_registro = %s AND ativo = 1 ORDER BY id DESC", (date.today(),))
             st.dataframe(df_hj, use_container_width=True)
 
     # ==========================================================================
@@ -327,17 +316,7 @@ def render_app():
         tab_status, tab_prontuario = st.tabs(["📊 Status & Horímetros", "🛠️ Prontuário Técnico"])
         
         with tab_status:
-            df_m = get_dataframe("SELECT * FROM usinagem_maquinas WHERE ativo = 1 ORDER BY nome")
-            if not df_m.empty:
-                col_cards = st.columns(3)
-                for index, row in df_m.iterrows():
-                    with col_cards[index % 3]:
-                        st.container(border=True).markdown(f"""
-                        ### {row['nome']}
-                        **Horímetro:** {row['horimetro_total']:.1f} h / Meta: {row['meta_manutencao']:.0f} h
-                        """)
-                        perc = (row['horimetro_total'] / row['meta_manutencao']) if row['meta_manutencao'] > 0 else 0
-                        st.progress(min(perc, 1.0))
+            _fragmento_horimetros()
         
         with tab_prontuario:
             maqs = get_list("usinagem_maquinas")
@@ -351,11 +330,16 @@ def render_app():
                 zerar = st.checkbox("Zerar Horímetro?")
                 
                 if st.form_submit_button("Salvar Histórico"):
-                    run_query("INSERT INTO usinagem_manutencoes (data_manut, maquina, tipo_manut, pecas_trocadas, tecnico, ativo) VALUES (%s,%s,%s,%s,%s,1)",
-                             (d, m, tp, pecas, tec), commit=True)
+                    params = (d, m, tp, pecas, tec)
+                    # Chave do envio: clique duplo não zera o horímetro duas vezes
+                    comandos = [("INSERT INTO usinagem_manutencoes (data_manut, maquina, tipo_manut, pecas_trocadas, tecnico, chave_envio, ativo) VALUES (%s,%s,%s,%s,%s,%s,1)",
+                                 params + (envio.chave(st.session_state, *params, zerar),))]
                     if zerar:
-                        run_query("UPDATE usinagem_maquinas SET horimetro_total = 0 WHERE nome = %s", (m,), commit=True)
-                    st.success("Salvo!")
+                        # A zeragem também é um evento do livro-razão (fica no histórico)
+                        comandos.append(horimetro.cmd_zeragem("usinagem", m, f"MANUTENCAO {tp.upper()}",
+                                                              horimetro.momento_do_dia(d)))
+                    if run_transaction(comandos):
+                        st.success("Salvo!")
 
     # ==========================================================================
     # 5. CADASTROS GERAIS
@@ -364,26 +348,12 @@ def render_app():
         st.header("⚙️ Configurações do Sistema")
         tab_op, tab_mq, tab_par = st.tabs(["👥 Operadores", "🏗️ Máquinas", "🛑 Motivos Parada"])
         
-        def gerenciar_cadastro(tabela, label_singular, key_suf):
-            c1, c2 = st.columns([3, 1])
-            novo = c1.text_input(f"Novo(a) {label_singular}", key=f"n_{key_suf}")
-            if c2.button("Adicionar", key=f"a_{key_suf}"):
-                if novo:
-                    run_query(f"INSERT INTO {tabela} (nome, ativo) VALUES (%s, 1)", (novo.upper(),), commit=True)
-                    st.success("Adicionado!")
-                    st.rerun()
-            
-            df = get_dataframe(f"SELECT * FROM {tabela} WHERE ativo = 1 ORDER BY nome")
-            for _, row in df.iterrows():
-                col_a, col_b = st.columns([4, 1])
-                col_a.write(row['nome'])
-                if col_b.button("🗑️", key=f"del_{key_suf}_{row['id']}"):
-                    run_query(f"UPDATE {tabela} SET ativo = 0 WHERE id = %s", (row['id'],), commit=True)
-                    st.rerun()
-
-        with tab_op: gerenciar_cadastro("usinagem_operadores", "Operador", "oper")
+        with tab_op:
+            _fragmento_cadastro("usinagem_operadores", ["nome"], "oper",
+                                {"nome": st.column_config.TextColumn("Operador", required=True)})
         with tab_mq: 
-            # Cadastro de Máquinas precisa ser customizado por causa do horímetro
+            # Máquina nova continua pelo formulário; o nome fica travado na grade
+            # porque é ele que liga apontamentos e horímetro à máquina
             c1, c2, c3, c4 = st.columns([2, 2, 1, 1])
             n_mq = c1.text_input("Nome (Ex: CNC-01)")
             mod_mq = c2.text_input("Modelo")
@@ -392,36 +362,53 @@ def render_app():
                 if n_mq:
                     run_query("INSERT INTO usinagem_maquinas (nome, modelo, meta_manutencao, ativo) VALUES (%s,%s,%s,1)",
                              (n_mq.upper(), mod_mq, meta_mq), commit=True)
+                    _invalidar_cache("usinagem_maquinas")
                     st.rerun()
             
-            df_mq = get_dataframe("SELECT * FROM usinagem_maquinas WHERE ativo = 1")
-            st.dataframe(df_mq[['nome', 'modelo', 'meta_manutencao']])
+            _fragmento_cadastro("usinagem_maquinas", ["nome", "modelo", "meta_manutencao"], "maq", {
+                "nome": st.column_config.TextColumn("Máquina", disabled=True),
+                "modelo": st.column_config.TextColumn("Modelo"),
+                "meta_manutencao": st.column_config.NumberColumn("Meta Manut. (h)", min_value=0, step=10),
+            }, tipos={"meta_manutencao": "real"}, novas=False)
 
         with tab_par: 
             # Motivos de Parada (Campo é 'motivo' e não 'nome', adaptação necessária)
-            c1, c2 = st.columns([3, 1])
-            novo = c1.text_input(f"Novo Motivo")
-            if c2.button("Adicionar Motivo"):
-                if novo:
-                    run_query(f"INSERT INTO usinagem_motivos_parada (motivo, ativo) VALUES (%s, 1)", (novo.upper(),), commit=True)
-                    st.rerun()
-            
-            df = get_dataframe(f"SELECT * FROM usinagem_motivos_parada WHERE ativo = 1 ORDER BY motivo")
-            for _, row in df.iterrows():
-                col_a, col_b = st.columns([4, 1])
-                col_a.write(row['motivo'])
-                if col_b.button("🗑️", key=f"del_mot_{row['id']}"):
-                    run_query(f"UPDATE usinagem_motivos_parada SET ativo = 0 WHERE id = %s", (row['id'],), commit=True)
-                    st.rerun()
+            _fragmento_cadastro("usinagem_motivos_parada", ["motivo"], "mot",
+                                {"motivo": st.column_config.TextColumn("Motivo", required=True)})
 
     # ==========================================================================
     # 6. HISTÓRICO & EXPORTAR
     # ==========================================================================
     elif menu == "📂 Histórico & Exportar" and autenticado:
         st.header("📂 Gerenciamento de Dados")
+
+        with st.expander("🔄 Recalcular estatísticas de ciclo (histórico completo)"):
+            st.caption("Normalmente não é preciso: cada apontamento já atualiza as estatísticas.")
+            if st.button("Recalcular Ciclos"):
+                df_h = get_dataframe("""SELECT descricao_pc AS peca, maquina, cod_programa AS operacao, data_registro,
+                                        inicio_prod, fim_prod, setup_min, qtd_produzida, refugo
+                                        FROM usinagem_apontamentos WHERE ativo = 1""", classe="exportacao")
+                if not df_h.empty:
+                    df_h['ciclo'] = ciclos.ciclo_real_df(df_h, 'data_registro', 'inicio_prod', 'fim_prod', 'setup_min')
+                if run_transaction(ciclos.cmds_reconstruir("usinagem", df_h), classe="exportacao"):
+                    get_ciclo_stats.clear()
+                    st.success(f"Estatísticas recalculadas a partir de {len(df_h)} apontamentos.")
+
+        with st.expander("⏱️ Horários cruzados na mesma máquina"):
+            st.caption("Apontamentos (ou paradas) que se sobrepõem contam o tempo em dobro no OEE. "
+                       "Corrija ou exclua um dos dois; com [sobreposicao] usinagem = \"bloquear\" o banco recusa novos.")
+            if st.button("Procurar Sobreposições"):
+                df_s = get_dataframe(sobreposicao.relatorio("usinagem"), classe="exportacao")
+                if df_s.empty:
+                    st.success("Nenhum horário cruzado.")
+                else:
+                    st.warning(f"{len(df_s)} pares cruzados, {df_s['minutos_cruzados'].sum():.0f} min contados em dobro.")
+                    st.dataframe(df_s, use_container_width=True, hide_index=True)
+                    st.download_button("📥 Baixar CSV", df_s.to_csv(index=False, sep=";").encode("utf-8-sig"),
+                                       "sobreposicoes_usinagem.csv", "text/csv")
         
         st.subheader("Registros de Produção Ativos")
-        df_a = get_dataframe("SELECT id, data_registro, maquina, operador, descricao_pc, qtd_produzida FROM usinagem_apontamentos WHERE ativo = 1 ORDER BY id DESC")
+        df_a = ler_local("SELECT id, data_registro, maquina, operador, descricao_pc, qtd_produzida FROM usinagem_apontamentos WHERE ativo = 1 ORDER BY id DESC")
         st.dataframe(df_a, use_container_width=True)
         
         with st.expander("🗑️ Excluir Registro (Correção)"):
@@ -432,17 +419,447 @@ def render_app():
                 st.success("Registro excluído.")
                 st.rerun()
 
+        _fragmento_relatorios()
+
+    # ==========================================================================
+    # 7. BUSCA NO HISTÓRICO
+    # ==========================================================================
+    elif menu == "🔎 Busca no Histórico" and autenticado:
+        st.header("🔎 Busca no Histórico")
+        st.caption("Apontamentos, paradas e manutenções por cliente, peça, programa, motivo ou observação.")
+        _fragmento_busca()
+
+# ==============================================================================
+# 3. FRAGMENTOS (RERUN PARCIAL)
+# ==============================================================================
+# Cada bloco abaixo é um @st.fragment: um clique ou filtro dentro dele
+# reexecuta só o próprio bloco (e só as consultas dele), não a página toda.
+# Depois de GRAVAR usamos st.rerun() normal (página toda), para os outros
+# blocos (ex.: Últimos Registros) mostrarem o registro novo.
+
+@st.fragment
+def _fragmento_apontamento():
+    # Formulário + confirmação: trocar peça/máquina (busca do ciclo padrão)
+    # não recarrega os Últimos Registros
+    if "confirma_producao" not in st.session_state:
+        st.session_state.confirma_producao = None
+
+    ops, maqs = get_listas("usinagem_operadores", "usinagem_maquinas")
+
+    if not ops or not maqs:
+        st.warning("⚠️ Atenção: Cadastre Operadores e Máquinas (em Cadastros Gerais) antes de apontar.")
+    else:
+        # MODO FORMULÁRIO
+        if st.session_state.confirma_producao is None:
+            st.subheader("1. Dados do Processo")
+            # Peça / Máquina / Programa ficam fora do form: ao preencher,
+            # o ciclo padrão já vem do histórico dessa combinação
+            c1, c2, c3 = st.columns(3)
+            maquina = c1.selectbox("Torno / Centro Usinagem", maqs, key="usi_maquina")
+            desc_pc = c2.selectbox("Nome da Peça / Produto", get_sugestoes(_planta(), "descricao_pc"), index=None,
+                                   accept_new_options=True, placeholder="Digite ou escolha", key="usi_peca")
+            cod_prog = c3.selectbox("Código do Programa (Opcional)", get_sugestoes(_planta(), "cod_programa"), index=None,
+                                    accept_new_options=True, placeholder="Ex: O0554", key="usi_prog")
+            stats_ciclo = get_ciclo_stats(_planta(), desc_pc, maquina, cod_prog) if desc_pc else None
+            ciclo_padrao = max(round(stats_ciclo['mediana'], 1), 1.0) if stats_ciclo else 30.0
+
+            with st.form("f_prod", clear_on_submit=False):
+                c1, c2, c3 = st.columns(3)
+                with c1:
+                    data_reg = st.date_input("Data", date.today())
+                    operador = st.selectbox("Operador", ops)
+                with c2:
+                    cliente = st.selectbox("Cliente / Ordem Produção", get_sugestoes(_planta(), "cliente"), index=None,
+                                           accept_new_options=True, placeholder="Digite ou escolha")
+                with c3:
+                    tempo_c = st.number_input("Ciclo (Segundos/Peça)", value=ciclo_padrao, step=0.5, min_value=1.0,
+                                              help=f"Padrão aprendido: mediana de {stats_ciclo['n']} apontamentos" if stats_ciclo else None)
+
+                st.markdown("---")
+                st.subheader("2. Quantidades e Tempos")
+                c4, c5, c6 = st.columns(3)
+                with c4:
+                    qtd_p = st.number_input("Peças Boas", min_value=0)
+                    refugo = st.number_input("Refugo / Sucata", min_value=0)
+                with c5:
+                    h_i = st.time_input("Início do Lote", time(7, 0))
+                    h_f = st.time_input("Fim do Lote", time(17, 0))
+                with c6:
+                    setup = st.number_input("Tempo Setup (min)", value=0)
+
+                submitted = st.form_submit_button("🔍 Revisar Apontamento")
+
+                if submitted:
+                    dt_i = datetime.combine(data_reg, h_i)
+                    dt_f = datetime.combine(data_reg, h_f)
+                    if h_f < h_i: dt_f += timedelta(days=1)
+                    horas_trabalhadas = (dt_f - dt_i).total_seconds() / 3600
+
+                    if horas_trabalhadas <= 0:
+                        st.error("❌ Tempo de produção inválido.")
+                    else:
+                        st.session_state.confirma_producao = {
+                            "data": data_reg, "cliente": sugestoes.normalizar(cliente),
+                            "descricao_pc": sugestoes.normalizar(desc_pc),
+                            "cod_programa": sugestoes.normalizar(cod_prog), "maquina": maquina,
+                            "tempo_c": tempo_c, "operador": operador, "setup": setup,
+                            "h_i": h_i, "h_f": h_f, "qtd_p": qtd_p, "refugo": refugo,
+                            "horas_trab": horas_trabalhadas, "fim": dt_f
+                        }
+                        st.rerun(scope="fragment")
+
+        # MODO CONFIRMAÇÃO
+        else:
+            dados = st.session_state.confirma_producao
+            st.info("✋ **CONFIRMAÇÃO DE DADOS**")
+
+            with st.container(border=True):
+                k1, k2, k3, k4 = st.columns(4)
+                k1.metric("Peça", dados['descricao_pc'])
+                k2.metric("Total Produzido", f"{dados['qtd_p'] + dados['refugo']} pçs")
+                k3.metric("Tempo Apontado", f"{dados['horas_trab']:.2f} h")
+                ciclo_real_seg = ciclos.ciclo_real_seg(dados['horas_trab'], dados['setup'], dados['qtd_p'] + dados['refugo'])
+                k4.metric("Ciclo Real (Médio)", f"{ciclo_real_seg:.1f} s", delta=f"{dados['tempo_c'] - ciclo_real_seg:.1f}s vs Padrão")
+
+            # Confere o ciclo real contra o histórico da peça/máquina/programa
+            stats_ciclo = get_ciclo_stats(_planta(), dados['descricao_pc'], dados['maquina'], dados['cod_programa'])
+            if ciclos.eh_outlier(ciclo_real_seg, stats_ciclo):
+                lim_inf, lim_sup = ciclos.faixa_normal(stats_ciclo)
+                st.warning(f"⚠️ Ciclo real fora do padrão histórico: normal entre {lim_inf:.1f}s e {lim_sup:.1f}s "
+                           f"(mediana {stats_ciclo['mediana']:.1f}s em {stats_ciclo['n']} apontamentos). Confira quantidades e horários.")
+
+            sugerir_grafia(dados, {"cliente": "Cliente", "descricao_pc": "Peça", "cod_programa": "Programa"})
+
+            col_confirma, col_cancela = st.columns(2)
+
+            if col_confirma.button("✅ GRAVAR APONTAMENTO"):
+                sql = """INSERT INTO usinagem_apontamentos (data_registro, cliente, descricao_pc, cod_programa, 
+                            maquina, tempo_ciclo_seg, operador, setup_min, inicio_prod, fim_prod,
+                            qtd_produzida, refugo, chave_envio, ativo)
+                            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,1)"""
+                params = (dados['data'], dados['cliente'], dados['descricao_pc'], dados['cod_programa'],
+                          dados['maquina'], dados['tempo_c'], dados['operador'], dados['setup'],
+                          dados['h_i'], dados['h_f'], dados['qtd_p'], dados['refugo'])
+                # Chave do envio (modules/envio.py): clique duplo ou nova tentativa
+                # esbarra no índice único e a transação inteira não se repete
+                params += (envio.chave(st.session_state, *params),)
+
+                # Apontamento + evento no horímetro na MESMA transação
+                comandos = [
+                    (sql, params),
+                    horimetro.cmd_uso("usinagem", dados['maquina'], dados['horas_trab'], "APONTAMENTO", dados['fim']),
+                ]
+                # Estatística de ciclo atualizada de forma incremental
+                cmd_ciclo = ciclos.cmd_registrar("usinagem", dados['descricao_pc'], dados['maquina'], dados['cod_programa'], ciclo_real_seg)
+                if cmd_ciclo: comandos.append(cmd_ciclo)
+                # Dicionário de sugestões (autocompletar)
+                for campo in CAMPOS_SUGESTAO:
+                    cmd_sug = sugestoes.cmd_registrar("usinagem", campo, dados[campo])
+                    if cmd_sug: comandos.append(cmd_sug)
+                ok = run_transaction(comandos)
+
+                if ok:
+                    run_transaction(horimetro.cmds_snapshot("usinagem", dados['maquina']))
+                    get_sugestoes.clear()
+                    get_parecidos.clear()
+                    st.success("🎉 Produção registrada com sucesso!")
+                    st.session_state.confirma_producao = None
+                    st.rerun()
+
+            if col_cancela.button("❌ CORRIGIR"):
+                st.session_state.confirma_producao = None
+                st.rerun(scope="fragment")
+
+
+# Colunas da grade do turno (mesmos nomes de usinagem_apontamentos)
+COLUNAS_GRADE = {"maquina": "texto", "operador": "texto", "descricao_pc": "texto", "cliente": "texto",
+                 "cod_programa": "texto", "tempo_ciclo_seg": "numero", "setup_min": "numero",
+                 "inicio_prod": "hora", "fim_prod": "hora", "qtd_produzida": "numero", "refugo": "numero"}
+
+@st.fragment
+def _fragmento_grade():
+    # Turno inteiro numa grade: validado e gravado em lote (ver modules/lote.py)
+    ops, maqs = get_listas("usinagem_operadores", "usinagem_maquinas")
+    if not ops or not maqs:
+        st.warning("⚠️ Atenção: Cadastre Operadores e Máquinas (em Cadastros Gerais) antes de apontar.")
+        return
+
+    # A versão troca a key do editor: depois de gravar a grade volta em branco
+    st.session_state.setdefault("grade_usi_versao", 0)
+    data_reg = st.date_input("Data do Turno", date.today(), key="grade_usi_data")
+    grade = st.data_editor(
+        lote.grade_vazia(COLUNAS_GRADE), num_rows="dynamic", hide_index=True, use_container_width=True,
+        key=f"grade_usi_{st.session_state.grade_usi_versao}",
+        column_config={
+            "maquina": st.column_config.SelectboxColumn("Máquina", options=maqs, required=True),
+            "operador": st.column_config.SelectboxColumn("Operador", options=ops, required=True),
+            "descricao_pc": st.column_config.TextColumn("Peça", required=True),
+            "cliente": st.column_config.TextColumn("Cliente / OP"),
+            "cod_programa": st.column_config.TextColumn("Programa"),
+            "tempo_ciclo_seg": st.column_config.NumberColumn("Ciclo (s/pç)", min_value=1.0, step=0.5, required=True),
+            "setup_min": st.column_config.NumberColumn("Setup (min)", min_value=0, step=1, default=0),
+            "inicio_prod": st.column_config.TimeColumn("Início", format="HH:mm", step=60, required=True),
+            "fim_prod": st.column_config.TimeColumn("Fim", format="HH:mm", step=60, required=True),
+            "qtd_produzida": st.column_config.NumberColumn("Boas", min_value=0, step=1, default=0),
+            "refugo": st.column_config.NumberColumn("Refugo", min_value=0, step=1, default=0),
+        })
+
+    if not st.button("💾 Validar e Gravar Lote"):
+        return
+    df = lote.preparar(grade, data_reg)
+    if df.empty:
+        st.warning("A grade está vazia.")
+        return
+
+    # Validação de todas as linhas juntas, contra o que já foi gravado no dia
+    existentes = ler_local("SELECT maquina, data_registro, inicio_prod, fim_prod FROM usinagem_apontamentos WHERE ativo = 1 AND data_registro = %s",
+                           (data_reg,))
+    existentes = lote.preparar(existentes, None, col_data="data_registro") if not existentes.empty else None
+    df = lote.validar(df, {"maquina": "Máquina", "operador": "Operador", "descricao_pc": "Peça", "tempo_ciclo_seg": "Ciclo"},
+                      existentes=existentes)
+    erros = df[df['erro'] != ""]
+    if not erros.empty:
+        st.error(f"❌ {len(erros)} linha(s) com problema. Nada foi gravado.")
+        st.dataframe(erros.assign(linha=erros.index + 1)[['linha', 'maquina', 'inicio_prod', 'fim_prod', 'erro']],
+                     hide_index=True, use_container_width=True)
+        return
+
+    df['data_registro'] = data_reg
+    df['ativo'] = 1
+    df[['setup_min', 'qtd_produzida', 'refugo']] = df[['setup_min', 'qtd_produzida', 'refugo']].fillna(0).astype(int)
+    for campo in CAMPOS_SUGESTAO:
+        df[campo] = df[campo].where(df[campo].notna(), None).map(sugestoes.normalizar)
+    df['ciclo'] = ciclos.ciclo_real_df(df, 'data_registro', 'inicio_prod', 'fim_prod', 'setup_min')
+
+    # Todos os apontamentos num INSERT só + horímetro por máquina + ciclos e sugestões em lote
+    colunas = ['data_registro', 'cliente', 'descricao_pc', 'cod_programa', 'maquina', 'tempo_ciclo_seg',
+               'operador', 'setup_min', 'inicio_prod', 'fim_prod', 'qtd_produzida', 'refugo', 'ativo']
+    # Uma chave de envio por linha: gravar a mesma grade de novo não duplica
+    df['chave_envio'] = envio.chaves(st.session_state, lote.linhas(df, colunas))
+    colunas.append('chave_envio')
+    comandos = [(f"INSERT INTO usinagem_apontamentos ({', '.join(colunas)}) VALUES %s",
+                 banco.Linhas(lote.linhas(df, colunas)))]
+    horas = lote.horas_por_maquina(df)
+    comandos += [horimetro.cmd_uso("usinagem", m, h, "APONTAMENTO LOTE", fim) for m, h, fim in lote.usos_por_dia(df)]
+    cmd_ciclo = ciclos.cmd_registrar_lote("usinagem", df.rename(columns={'descricao_pc': 'peca', 'cod_programa': 'operacao'}))
+    cmd_sug = sugestoes.cmd_registrar_lote("usinagem", {campo: df[campo] for campo in CAMPOS_SUGESTAO})
+    comandos += [c for c in (cmd_ciclo, cmd_sug) if c]
+
+    if run_transaction(comandos):
+        run_transaction([c for m in horas for c in horimetro.cmds_snapshot("usinagem", m)])
+        get_sugestoes.clear()
+        get_parecidos.clear()
+        get_ciclo_stats.clear()
+        st.session_state.grade_usi_versao += 1
+        st.toast(f"🎉 {len(df)} apontamentos gravados ({sum(horas.values()):.1f} h em {len(horas)} máquina(s)).")
+        st.rerun()
+
+
+@st.fragment
+def _fragmento_cadastro(tabela, colunas, key_suf, column_config, tipos=None, novas=True):
+    # Cadastro editado na grade: inclua, altere ou apague linhas e salve tudo
+    # de uma vez. Só o que mudou vai para o banco (ver modules/cadastro.py).
+    # novas=False: só edição (sem incluir nem apagar linhas)
+    chave_versao = f"cad_{key_suf}_versao"
+    st.session_state.setdefault(chave_versao, 0)
+    original = ler_local(f"SELECT id, {', '.join(colunas)} FROM {tabela} WHERE ativo = 1 ORDER BY {colunas[0]}")
+    editado = st.data_editor(
+        original, num_rows="dynamic" if novas else "fixed", hide_index=True, use_container_width=True,
+        key=f"cad_{key_suf}_{st.session_state[chave_versao]}",
+        column_config={"id": None, **column_config})
+
+    if not st.button("💾 Salvar alterações", key=f"salvar_{key_suf}"):
+        return
+    dif = cadastro.diff(original, editado, colunas)
+    if dif["erro"]:
+        st.error(f"❌ {dif['erro']} Nada foi gravado.")
+    elif cadastro.vazio(dif):
+        st.info("Nenhuma alteração.")
+    elif run_transaction([cadastro.cmd_aplicar(tabela, dif, colunas, tipos)]):
+        _invalidar_cache(tabela)
+        st.session_state[chave_versao] += 1
+        st.toast(f"✅ {cadastro.resumo(dif)}.")
+        st.rerun()
+
+
+@st.fragment
+def _fragmento_ultimos():
+    st.divider()
+    st.markdown("### 🕒 Últimos Registros")
+    df_ultimos = ler_local('SELECT id, fim_prod as "Fim", maquina, descricao_pc as "Peca", qtd_produzida as "Boas" FROM usinagem_apontamentos WHERE ativo = 1 ORDER BY id DESC LIMIT 5')
+    st.dataframe(df_ultimos, use_container_width=True, hide_index=True)
+
+
+@st.fragment
+def _fragmento_dashboard():
+    # Filtro + KPIs + gráficos: trocar a data reexecuta só o painel
+    c_filtro1, c_filtro2 = st.columns(2)
+    data_filtro = c_filtro1.date_input("Filtrar Data", date.today())
+
+    # Produção e paradas do dia vêm juntas (em paralelo)
+    dados = ler_varios({
+        "prod": ("SELECT * FROM usinagem_apontamentos WHERE ativo = 1 AND data_registro = %s", (data_filtro,)),
+        "parada": ("SELECT * FROM usinagem_paradas_reg WHERE ativo = 1 AND data_registro = %s", (data_filtro,)),
+    }, "dashboard")
+    df_prod, df_parada = dados["prod"], dados["parada"]
+
+    if df_prod.empty and df_parada.empty:
+        st.info(f"Sem dados para a data: {data_filtro.strftime('%d/%m/%Y')}")
+    else:
+        # Minutos reais/teóricos/parados já vêm gravados pelo banco (modules/metricas.py);
+        # início/fim como datetime só para o fatiamento por turno
+        if not df_prod.empty:
+            df_prod['dt_ini'] = pd.to_datetime(df_prod['data_registro'].astype(str) + ' ' + df_prod['inicio_prod'].astype(str))
+            df_prod['dt_fim'] = pd.to_datetime(df_prod['data_registro'].astype(str) + ' ' + df_prod['fim_prod'].astype(str))
+            df_prod.loc[df_prod['dt_fim'] < df_prod['dt_ini'], 'dt_fim'] += pd.Timedelta(days=1)
+            tempo_apontado_min = df_prod['min_real'].sum()
+        else:
+            tempo_apontado_min = 0
+
+        tempo_parado_min = 0
+        if not df_parada.empty:
+            df_parada['dt_ini'] = pd.to_datetime(df_parada['data_registro'].astype(str) + ' ' + df_parada['inicio'].astype(str))
+            df_parada['dt_fim'] = pd.to_datetime(df_parada['data_registro'].astype(str) + ' ' + df_parada['fim'].astype(str))
+            df_parada.loc[df_parada['dt_fim'] < df_parada['dt_ini'], 'dt_fim'] += pd.Timedelta(days=1)
+            tempo_parado_min = df_parada['min_parada'].sum()
+
+        # Métricas OEE
+        tempo_operando_min = tempo_apontado_min - tempo_parado_min
+
+        disponibilidade = (tempo_operando_min / tempo_apontado_min * 100) if tempo_apontado_min > 0 else 0
+
+        total_pecas = df_prod['qtd_produzida'].sum() + df_prod['refugo'].sum() if not df_prod.empty else 0
+
+        # Performance baseada na média ponderada
+        tempo_teorico_total = df_prod['min_teorico'].sum() if not df_prod.empty else 0
+
+        performance = (tempo_teorico_total / tempo_operando_min * 100) if tempo_operando_min > 0 else 0
+        if performance > 100: performance = 100 
+
+        pecas_boas = df_prod['qtd_produzida'].sum() if not df_prod.empty else 0
+        qualidade = (pecas_boas / total_pecas * 100) if total_pecas > 0 else 0
+
+        oee = (disponibilidade * performance * qualidade) / 10000
+
+        col_gauge, col_kpi = st.columns([1, 2])
+        with col_gauge:
+            fig = go.Figure(go.Indicator(
+                mode = "gauge+number", value = oee, title = {'text': "OEE DO DIA"},
+                gauge = {'axis': {'range': [None, 100]}, 'bar': {'color': "#2E86C1"},
+                    'steps': [{'range': [0, 60], 'color': "#E74C3C"}, {'range': [60, 85], 'color': "#F4D03F"}, {'range': [85, 100], 'color': "#2ECC71"}]}
+            ))
+            fig.update_layout(height=250, margin=dict(l=20,r=20,t=30,b=20))
+            st.plotly_chart(fig, use_container_width=True)
+
+        with col_kpi:
+            st.markdown("#### Detalhamento dos Indicadores")
+            k1, k2, k3 = st.columns(3)
+            k1.metric("Disponibilidade", f"{disponibilidade:.1f}%", delta=f"-{tempo_parado_min:.0f} min Parado", delta_color="inverse")
+            k2.metric("Performance", f"{performance:.1f}%")
+            k3.metric("Qualidade", f"{qualidade:.1f}%", delta=f"{df_prod['refugo'].sum() if not df_prod.empty else 0} Refugos", delta_color="inverse")
+
         st.divider()
-        st.subheader("📥 Exportação para Excel")
-        
-        if st.button("Baixar Banco de Dados Completo (.xlsx)"):
-            try:
-                out = io.BytesIO()
-                with pd.ExcelWriter(out, engine='openpyxl') as w:
-                    get_dataframe("SELECT * FROM usinagem_apontamentos WHERE ativo=1").to_excel(w, index=False, sheet_name='Producao')
-                    get_dataframe("SELECT * FROM usinagem_paradas_reg WHERE ativo=1").to_excel(w, index=False, sheet_name='Paradas')
-                    get_dataframe("SELECT * FROM usinagem_manutencoes WHERE ativo=1").to_excel(w, index=False, sheet_name='Manutencao')
-                
-                st.download_button("Clique aqui para baixar", out.getvalue(), "relatorio_usinagem_cnc.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-            except Exception as e:
-                st.error(f"Erro ao gerar Excel: {e}")
+        c1, c2 = st.columns(2)
+        if not df_prod.empty:
+            with c1:
+                st.subheader("Produção por Máquina")
+                # Soma por máquina antes do gráfico (uma barra por máquina, não por apontamento)
+                gf_prod = df_prod.groupby("maquina", as_index=False)["qtd_produzida"].sum()
+                fig_bar = px.bar(gf_prod, x="maquina", y="qtd_produzida", title="Peças Boas", text_auto=True)
+                st.plotly_chart(fig_bar, use_container_width=True)
+
+        if not df_parada.empty:
+            with c2:
+                st.subheader("Pareto de Paradas")
+                gf_par = df_parada.rename(columns={"min_parada": "duracao"}).groupby("motivo")[["duracao"]].sum().reset_index().sort_values("duracao", ascending=False)
+                fig_pie = px.bar(gf_par, x="duracao", y="motivo", orientation='h', text_auto='.0f')
+                st.plotly_chart(fig_pie, use_container_width=True)
+
+        # --- Visão por turno e por hora do dia ---
+        if not df_prod.empty:
+            st.divider()
+            st.subheader("🕐 OEE por Turno e Ocupação por Hora")
+            lista_turnos = turnos.turnos_do_setor(st.secrets.get("turnos", {}), "usinagem")
+            df_prod['teorico_min'] = df_prod['min_teorico']
+            f_prod = turnos.fatiar(df_prod, lista_turnos, ['teorico_min', 'qtd_produzida', 'refugo'], ['maquina'])
+            f_par = turnos.fatiar(df_parada, lista_turnos, colunas_chave=['maquina']) if not df_parada.empty else None
+
+            # Na usinagem a parada acontece DENTRO do tempo apontado
+            oee_t = turnos.oee_por_turno(f_prod, f_par, paradas_dentro=True)
+            t1, t2 = st.columns([1, 2])
+            with t1:
+                st.dataframe(oee_t[['turno', 'tempo_prod', 'tempo_parado', 'disponibilidade', 'performance', 'qualidade', 'oee']],
+                             hide_index=True, use_container_width=True,
+                             column_config={c: st.column_config.NumberColumn(format="%.1f") for c in
+                                            ['tempo_prod', 'tempo_parado', 'disponibilidade', 'performance', 'qualidade', 'oee']})
+            with t2:
+                mapa = turnos.mapa_calor(f_prod, 'maquina', dias=1, descontar=f_par)
+                fig_hm = px.imshow(mapa, labels=dict(x="Hora do Dia", y="Máquina", color="% Ocupado"),
+                                   color_continuous_scale="RdYlGn", zmin=0, zmax=100, aspect="auto")
+                st.plotly_chart(fig_hm, use_container_width=True)
+
+
+@st.fragment
+def _fragmento_horimetros():
+    # Posição do horímetro em qualquer data (reconstruída pelo livro-razão)
+    data_pos = st.date_input("Posição em", date.today(), key="pos_horimetro")
+    df_m = get_dataframe(horimetro.sql_maquinas_com_horimetro("usinagem", ate=True),
+                         {"ate": datetime.combine(data_pos, time.max)})
+    if not df_m.empty:
+        col_cards = st.columns(3)
+        for index, row in df_m.iterrows():
+            with col_cards[index % 3]:
+                st.container(border=True).markdown(f"""
+                ### {row['nome']}
+                **Horímetro:** {row['horimetro_atual']:.1f} h / Meta: {row['meta_manutencao']:.0f} h
+                """)
+                perc = (row['horimetro_atual'] / row['meta_manutencao']) if row['meta_manutencao'] > 0 else 0
+                st.progress(min(perc, 1.0))
+
+
+@st.fragment
+def _fragmento_relatorios():
+    # Pedir/atualizar/baixar relatório não relê a tabela de registros acima.
+    # A planilha é montada pelo serviço de relatórios (modules/relatorios.py).
+    st.divider()
+    st.subheader("📥 Exportação para Excel")
+    relatorios.painel("usinagem", _planta(), st.session_state.get('usuario'))
+
+@st.fragment
+def _fragmento_busca():
+    # Busca de texto no histórico (modules/busca.py): índice no banco, ordenada
+    # por relevância e paginada. Trocar de página reexecuta só este bloco.
+    c1, c2, c3 = st.columns([3, 1, 1])
+    texto = c1.text_input("Buscar", placeholder='ex.: cliente, peça, programa, "troca de óleo" -preventiva',
+                          key="usi_busca_texto")
+    b_ini = c2.date_input("De", date.today() - timedelta(days=365), key="usi_busca_ini")
+    b_fim = c3.date_input("Até", date.today(), key="usi_busca_fim")
+    c4, c5 = st.columns([2, 1])
+    tipos = c4.multiselect("Em", list(busca.TIPOS), default=list(busca.TIPOS), format_func=busca.TIPOS.get,
+                           key="usi_busca_tipos")
+    maq = c5.selectbox("Máquina", ["Todas"] + get_list("usinagem_maquinas"), key="usi_busca_maq")
+    if not texto.strip() or not tipos:
+        st.caption("Digite uma ou mais palavras: todas precisam aparecer no registro.")
+        return
+
+    # Busca nova volta para a primeira página
+    filtro = (texto, b_ini, b_fim, tuple(tipos), maq)
+    if st.session_state.get("usi_busca_filtro") != filtro:
+        st.session_state["usi_busca_filtro"] = filtro
+        st.session_state["usi_busca_pag"] = 0
+    pag = st.session_state["usi_busca_pag"]
+
+    query, params = busca.consulta(["usinagem"], tipos, texto, b_ini, b_fim, None if maq == "Todas" else maq, pag)
+    df = get_dataframe(query, params)
+    total, n_pag = busca.paginas(df)
+    if not total:
+        st.info("Nada encontrado no período.")
+        return
+    st.caption(f"{total} registros encontrados, página {pag + 1} de {n_pag}.")
+    st.dataframe(df.drop(columns=["setor", "total"]).rename(columns={"maquina_operador": "maquina"}),
+                 use_container_width=True, hide_index=True)
+    c_a, c_p = st.columns(2)
+    c_a.button("◀ Anterior", disabled=pag == 0, key="usi_busca_ant",
+               on_click=lambda: st.session_state.update(usi_busca_pag=pag - 1))
+    c_p.button("Próxima ▶", disabled=pag + 1 >= n_pag, key="usi_busca_prox",
+               on_click=lambda: st.session_state.update(usi_busca_pag=pag + 1))
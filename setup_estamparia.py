@@ -1,5 +1,8 @@
 import streamlit as st
 import psycopg2
+import modules.horimetro as horimetro
+import modules.ciclos as ciclos
+import modules.esquema as esquema
 
 # Configuração da Página de Setup
 st.set_page_config(page_title="Instalador Estamparia", page_icon="🏗️")
@@ -21,85 +24,9 @@ def init_connection():
         st.error(f"Erro de Conexão: {e}")
         return None
 
-# SQL de Criação das Tabelas
-SQL_SCRIPT = """
--- 1. Tabela de Apontamentos
-CREATE TABLE IF NOT EXISTS estamparia_apontamentos (
-    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-    data TEXT, 
-    cliente TEXT, 
-    descricao_pc TEXT, 
-    operacao TEXT, 
-    materia_prima TEXT, 
-    maquina TEXT, 
-    tempo_ciclo_seg REAL, 
-    operador TEXT, 
-    setup_min INTEGER, 
-    inicio_prod TEXT, 
-    fim_prod TEXT, 
-    qtd_produzida INTEGER, 
-    refugo INTEGER,
-    meta_pc_hora INTEGER DEFAULT 0, 
-    custo_refugo_unit REAL DEFAULT 0, 
-    ativo INTEGER DEFAULT 1
-);
-
--- 2. Tabela de Paradas (Registro)
-CREATE TABLE IF NOT EXISTS estamparia_paradas_reg (
-    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-    data TEXT, 
-    maquina TEXT, 
-    motivo TEXT, 
-    inicio TEXT, 
-    fim TEXT, 
-    observacao TEXT, 
-    ativo INTEGER DEFAULT 1
-);
-
--- 3. Cadastros Básicos
-CREATE TABLE IF NOT EXISTS estamparia_operadores (
-    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-    nome TEXT UNIQUE, 
-    ativo INTEGER DEFAULT 1
-);
-
-CREATE TABLE IF NOT EXISTS estamparia_maquinas (
-    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-    nome TEXT UNIQUE, 
-    horimetro_total REAL DEFAULT 0, 
-    meta_manutencao REAL DEFAULT 500, 
-    ativo INTEGER DEFAULT 1
-);
-
-CREATE TABLE IF NOT EXISTS estamparia_manutencoes (
-    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-    data_manut TEXT, 
-    maquina TEXT, 
-    tipo_manut TEXT, 
-    descricao TEXT, 
-    tecnico TEXT, 
-    ativo INTEGER DEFAULT 1
-);
-
-CREATE TABLE IF NOT EXISTS estamparia_cad_operacoes (
-    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-    nome TEXT UNIQUE, 
-    ativo INTEGER DEFAULT 1
-);
-
-CREATE TABLE IF NOT EXISTS estamparia_cad_materias (
-    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-    nome TEXT UNIQUE, 
-    ativo INTEGER DEFAULT 1
-);
-
-CREATE TABLE IF NOT EXISTS estamparia_cad_paradas (
-    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-    nome TEXT UNIQUE, 
-    ativo INTEGER DEFAULT 1
-);
-
--- 4. Inserir Dados Iniciais (Seus padrões IPAR)
+# SQL de Criação das Tabelas (definição única em modules/esquema.py) + dados iniciais
+SQL_SCRIPT = esquema.TABELAS["estamparia"] + """
+-- Dados Iniciais (Seus padrões IPAR)
 -- Operações
 INSERT INTO estamparia_cad_operacoes (nome) VALUES 
 ('CORTE'), ('DOBRA'), ('REPUXO'), ('FURACAO'),
@@ -130,8 +57,10 @@ if st.button("🚀 CRIAR TABELAS 'ESTAMPARIA_' AGORA"):
     if conn:
         cur = conn.cursor()
         try:
-            # Executa o script inteiro
+            # Executa o script inteiro (+ livro-razão do horímetro)
             cur.execute(SQL_SCRIPT)
+            cur.execute(horimetro.ddl("estamparia"))
+            cur.execute(ciclos.ddl("estamparia"))
             conn.commit()
             st.success("✅ SUCESSO! Tabelas com prefixo 'estamparia_' criadas.")
             st.info("Dados padrão (AR, BC, P1...) inseridos.")
@@ -0,0 +1,20 @@
+# Testes da lógica pura (sem Streamlit e sem Postgres). Na pasta do sistema:
+#   python -m pytest -q
+# Os que precisam de banco usam o banco local (modules/local.py) num arquivo
+# temporário.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modules.local as local  # noqa: E402
+
+
+@pytest.fixture
+def conn(tmp_path):
+    c = local.conectar({"DB_ARQUIVO": str(tmp_path / "teste.db")})
+    yield c
+    c.close()
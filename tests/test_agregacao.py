@@ -0,0 +1,122 @@
+from datetime import date, time
+
+import pandas as pd
+import pytest
+
+import modules.agregacao as agregacao
+import modules.banco as banco
+import modules.local as local
+
+# Linhas de vários blocos: virada de dia, duração zero, refugo e ciclo NULL,
+# operador NULL e parada sem fim
+PRODUCAO = [
+    (date(2026, 3, 2), "P1", "ANA", time(6), time(8), 100, 2, 60),
+    (date(2026, 3, 2), "P1", "ANA", time(8), time(8), 0, 0, 60),
+    (date(2026, 3, 2), "P1", "BIA", time(22), time(2), 200, None, 50),
+    (date(2026, 3, 3), "P2", "BIA", time(7, 30), time(9, 15), 80, 5, None),
+    (date(2026, 3, 3), "P2", None, time(10), time(11), 40, 1, 70),
+    (date(2026, 3, 4), "P2", "ANA", time(13), time(13), 0, 0, 70),
+    (date(2026, 3, 4), "P3", "CAIO", time(14), time(18, 40), 310, 12, 45),
+]
+PARADAS = [
+    (date(2026, 3, 2), "P1", time(9), time(9, 30)),
+    (date(2026, 3, 2), "P1", time(23, 50), time(0, 10)),
+    (date(2026, 3, 3), "P2", time(12), time(12)),
+    (date(2026, 3, 4), "P3", time(19), None),
+]
+Q_PROD = ("SELECT data, maquina, operador, inicio_prod, fim_prod, qtd_produzida, refugo, tempo_ciclo_seg "
+          "FROM t_apontamentos ORDER BY id")
+Q_PAR = "SELECT data, maquina, inicio, fim FROM t_paradas ORDER BY id"
+
+
+@pytest.fixture
+def banco_local(conn):
+    cur = conn.cursor()
+    cur.execute("""CREATE TABLE t_apontamentos (id SERIAL PRIMARY KEY, data DATE, maquina TEXT, operador TEXT,
+                   inicio_prod TIME, fim_prod TIME, qtd_produzida INTEGER, refugo INTEGER, tempo_ciclo_seg REAL)""")
+    cur.execute("CREATE TABLE t_paradas (id SERIAL PRIMARY KEY, data DATE, maquina TEXT, inicio TIME, fim TIME)")
+    cur.execute_values("INSERT INTO t_apontamentos (data, maquina, operador, inicio_prod, fim_prod, qtd_produzida, "
+                       "refugo, tempo_ciclo_seg) VALUES %s", PRODUCAO)
+    cur.execute_values("INSERT INTO t_paradas (data, maquina, inicio, fim) VALUES %s", PARADAS)
+    conn.commit()
+    return conn
+
+
+def _kpis_do_painel(df, df_p):
+    # Contas do painel em memória antes dos totais (DataFrame inteiro)
+    df['dt_ini'] = pd.to_datetime(df['data'].astype(str) + ' ' + df['inicio_prod'].astype(str))
+    df['dt_fim'] = pd.to_datetime(df['data'].astype(str) + ' ' + df['fim_prod'].astype(str))
+    df.loc[df['dt_fim'] < df['dt_ini'], 'dt_fim'] += pd.Timedelta(days=1)
+    df['tempo_real_min'] = (df['dt_fim'] - df['dt_ini']).dt.total_seconds() / 60
+    df['tempo_teorico_min'] = ((df['qtd_produzida'] + df['refugo']) * df['tempo_ciclo_seg']) / 60
+    tempo_prod = df['tempo_real_min'].sum()
+    df_p['dt_ini'] = pd.to_datetime(df_p['data'].astype(str) + ' ' + df_p['inicio'].astype(str))
+    df_p['dt_fim'] = pd.to_datetime(df_p['data'].astype(str) + ' ' + df_p['fim'].astype(str), errors="coerce")
+    df_p.loc[df_p['dt_fim'] < df_p['dt_ini'], 'dt_fim'] += pd.Timedelta(days=1)
+    tempo_parado = ((df_p['dt_fim'] - df_p['dt_ini']).dt.total_seconds() / 60).sum()
+    tempo_disp = tempo_prod + tempo_parado
+    disp = (tempo_prod / tempo_disp * 100) if tempo_disp > 0 else 0
+    perf = min((df['tempo_teorico_min'].sum() / tempo_prod * 100) if tempo_prod > 0 else 0, 100)
+    total_pcs = df['qtd_produzida'].sum() + df['refugo'].sum()
+    qual = (df['qtd_produzida'].sum() / total_pcs * 100) if total_pcs > 0 else 0
+    return {"disponibilidade": disp, "performance": perf, "qualidade": qual,
+            "oee": (disp / 100) * (perf / 100) * (qual / 100) * 100,
+            "total_pcs": total_pcs, "refugo": df['refugo'].sum()}
+
+
+def _ler(conn, query):
+    return local.ler(conn, conn.cursor(), query)
+
+
+@pytest.mark.parametrize("tamanho", [1, 2, 3, 100])
+def test_blocos_batem_com_o_painel_em_memoria(banco_local, tamanho):
+    conn = banco_local
+    prod, linhas = agregacao.totais_producao(banco.ler_em_blocos(conn, Q_PROD, tamanho=tamanho))
+    paradas = agregacao.totais_paradas(banco.ler_em_blocos(conn, Q_PAR, tamanho=tamanho))
+    assert linhas == len(PRODUCAO)
+
+    esperado = _kpis_do_painel(_ler(conn, Q_PROD), _ler(conn, Q_PAR))
+    assert agregacao.indicadores(prod, paradas) == pytest.approx(esperado)
+
+    # Mesmos totais do DataFrame inteiro (somar_* de uma vez), por máquina x operador
+    inteiro = agregacao.somar_producao(agregacao.preparar_producao(_ler(conn, Q_PROD)))
+    pd.testing.assert_frame_equal(prod.sort_index(), inteiro.sort_index(), check_dtype=False,
+                                  check_index_type=False)
+    assert prod.loc[("P1", "BIA"), "tempo_real_min"] == 240  # virou o dia
+    sem_operador = prod.reset_index().query("operador.isna()")
+    assert sem_operador["qtd_produzida"].tolist() == [40]    # operador NULL não some
+    par = agregacao.somar_paradas(agregacao.preparar_paradas(_ler(conn, Q_PAR)))
+    pd.testing.assert_frame_equal(paradas.sort_index(), par.sort_index(), check_dtype=False)
+    assert paradas.loc["P1", "tempo_parado_min"] == 50
+
+
+def test_acumular_soma_chaves_novas_e_repetidas():
+    a = pd.DataFrame({"maquina": ["P1", "P2"], "tempo_parado_min": [10.0, 5.0]}).set_index("maquina")
+    b = pd.DataFrame({"maquina": ["P2", "P3"], "tempo_parado_min": [1.0, 2.0]}).set_index("maquina")
+    total = agregacao.acumular(agregacao.acumular(None, a), b)
+    assert total["tempo_parado_min"].to_dict() == {"P1": 10.0, "P2": 6.0, "P3": 2.0}
+
+
+def test_minutos_gravados_pelo_banco_tem_preferencia():
+    df = pd.DataFrame({"data": [date(2026, 3, 2)], "inicio_prod": [time(6)], "fim_prod": [time(7)],
+                       "qtd_produzida": [10], "refugo": [0], "tempo_ciclo_seg": [60],
+                       "min_real": [55.0], "min_teorico": [9.0]})
+    df = agregacao.preparar_producao(df)
+    assert df.loc[0, "tempo_real_min"] == 55 and df.loc[0, "tempo_teorico_min"] == 9
+
+
+def test_horarios_com_e_sem_segundos_na_mesma_coluna():
+    # Texto da estamparia: o pandas inferia o formato pela primeira linha e
+    # perdia as outras
+    df = pd.DataFrame({"data": ["2026-03-02"] * 3, "inicio": ["07:00", "07:30:15", "7h"],
+                       "fim": ["07:10:30", "08:00", "08:00"]})
+    df = agregacao.preparar_paradas(df)
+    assert df["tempo_parado_min"].tolist()[:2] == [10.5, pytest.approx(29.75)]
+    assert df["tempo_parado_min"].isna().tolist() == [False, False, True]
+
+
+def test_periodo_vazio():
+    prod, linhas = agregacao.totais_producao(iter([]))
+    paradas = agregacao.totais_paradas(iter([]))
+    assert linhas == 0 and prod.empty and paradas.empty
+    assert agregacao.indicadores(prod, paradas)["oee"] == 0
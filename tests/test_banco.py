@@ -0,0 +1,106 @@
+import datetime
+
+import pandas as pd
+import psycopg2
+import pytest
+
+import modules.banco as banco
+
+# (nome, oid) e o CSV que o Postgres manda no COPY
+COLUNAS = [("id", 23), ("refugo", 23), ("qtd", 1700), ("ativo", 16), ("op", 25),
+           ("data", 1082), ("hora", 1083), ("criado_em", 1114)]
+CSV = (b"1,2,1.5,t,OP-1,2026-10-19,07:30:00,2026-10-19 07:30:00.5\n"
+       b"2,\\N,0.333333,f,\\N,\\N,23:59:59.25,\\N\n")
+
+
+class _Coluna:
+    def __init__(self, nome, oid):
+        self.name, self.type_code = nome, oid
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.connection = conn
+        self.description = None
+        self.executados = []
+
+    def mogrify(self, query, params):
+        return (query % params).encode()
+
+    def execute(self, sql):
+        self.executados.append(sql)
+        self.description = [_Coluna(n, o) for n, o in COLUNAS]
+
+    def copy_expert(self, sql, buf):
+        buf.write(CSV)
+
+
+class _Conexao:
+    dsn = "dbname=teste"
+    encoding = "UTF8"
+
+
+def test_ler_copy_tipos_do_read_sql():
+    cur = _Cursor(_Conexao())
+    df = banco.ler_copy(cur.connection, cur, "SELECT * FROM t WHERE x = %(x)s", {"x": 1})
+    assert df["id"].dtype == "int64"
+    assert df["refugo"].dtype == "float64" and pd.isna(df["refugo"].iloc[1])
+    assert df["qtd"].dtype == "float64"
+    assert df["ativo"].tolist() == [True, False]
+    assert df["data"].iloc[0] == datetime.date(2026, 10, 19) and pd.isna(df["data"].iloc[1])
+    assert df["hora"].tolist() == [datetime.time(7, 30), datetime.time(23, 59, 59, 250000)]
+    assert df["criado_em"].iloc[0] == pd.Timestamp("2026-10-19 07:30:00.5")
+    assert pd.api.types.is_datetime64_any_dtype(df["criado_em"])
+
+
+def test_esquema_guardado_e_limitado(monkeypatch):
+    monkeypatch.setattr(banco, "MAX_ESQUEMAS", 3)
+    monkeypatch.setattr(banco, "_esquemas", {})
+    cur = _Cursor(_Conexao())
+    for i in range(5):
+        banco.esquema(cur, f"SELECT {i}", f"SELECT {i}")
+    banco.esquema(cur, "SELECT 4", "SELECT 4")
+    assert len(cur.executados) == 5
+    assert list(banco._esquemas) == [("dbname=teste", f"SELECT {i}") for i in (2, 3, 4)]
+
+
+def test_ler_local_tipos_do_read_sql(conn):
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE t (id SERIAL PRIMARY KEY, data DATE, hora TIME, criado_em TIMESTAMP)")
+    cur.execute("INSERT INTO t (data, hora, criado_em) VALUES (%s, %s, %s)",
+                (datetime.date(2026, 10, 19), datetime.time(7, 30), datetime.datetime(2026, 10, 19, 7, 30)))
+    df = banco.ler_copy(conn, cur, "SELECT data, hora, criado_em FROM t")
+    assert df["data"].iloc[0] == datetime.date(2026, 10, 19)
+    assert df["hora"].iloc[0] == datetime.time(7, 30)
+    assert pd.api.types.is_datetime64_any_dtype(df["criado_em"])
+
+
+class _Aberta:
+    closed = 0
+    ultimo_ok = 0.0
+
+    def close(self):
+        self.closed = 1
+
+
+def test_orcamento_de_conexoes_do_worker(monkeypatch):
+    monkeypatch.setenv("IPAR_WORKER_ID", "1")
+    monkeypatch.setenv("IPAR_WORKERS", "4")
+    monkeypatch.setattr(banco.cluster, "MAX_CONEXOES_BANCO", 18)
+    monkeypatch.setattr(banco.cluster, "CONEXOES_SERVICOS", 10)
+    assert banco.cluster.orcamento_conexoes() == 2
+    monkeypatch.setattr(banco, "PARAMETROS_TCP", {**banco.PARAMETROS_TCP, "connect_timeout": 0.2})
+    monkeypatch.setattr(banco.psycopg2, "connect", lambda **kw: _Aberta())
+    monkeypatch.setattr(banco, "_abertas", banco.weakref.WeakSet())
+    cred = {"DB_HOST": "h", "DB_USER": "u", "DB_PASS": "p", "DB_NAME": "d", "DB_PORT": 5432}
+    a, b = banco.conectar(cred), banco.conectar(cred)
+    with pytest.raises(psycopg2.OperationalError):
+        banco.conectar(cred)
+    assert banco.tipo_erro(psycopg2.OperationalError()) == "conexao"
+    banco.fechar(a)
+    c = banco.conectar(cred)
+    # Fora do cluster não há limite
+    monkeypatch.delenv("IPAR_WORKER_ID")
+    assert banco.cluster.orcamento_conexoes() is None
+    assert banco.conectar(cred) is not None
+    del b, c
@@ -0,0 +1,77 @@
+import itertools
+import re
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import modules.busca as busca
+import modules.esquema as esquema
+import modules.local as local
+
+
+def _escolhas(opcoes):
+    return [list(c) for n in range(1, len(opcoes) + 1) for c in itertools.combinations(opcoes, n)]
+
+
+COMBINACOES = [(s, t) for s in _escolhas(busca.SETORES) for t in _escolhas(busca.TIPOS)]
+
+
+@pytest.fixture(scope="module")
+def cur(tmp_path_factory):
+    conn = local.conectar({"DB_ARQUIVO": str(tmp_path_factory.mktemp("busca") / "busca.db")})
+    c = conn.cursor()
+    for setor in busca.SETORES:
+        for q in esquema.scripts(setor):
+            c.execute(q)
+    c.execute("INSERT INTO usinagem_apontamentos (data_registro, maquina, cliente, inicio_prod, fim_prod) "
+              "VALUES ('2026-03-02', 'CNC-01', 'Metalúrgica Sul', '07:00', '08:00')")
+    c.execute("INSERT INTO usinagem_paradas_reg (data_registro, maquina, motivo, inicio, fim) "
+              "VALUES ('2026-03-03', 'CNC-02', 'Troca de ferramenta', '09:00', '09:10')")
+    c.execute("INSERT INTO estamparia_manutencoes (data_manut, maquina, tipo_manut, descricao) "
+              "VALUES ('2026-03-04', 'P1', 'Corretiva', 'troca da mola')")
+    c.execute("INSERT INTO furadeira_paradas_reg (data_registro, motivo, inicio, fim) "
+              "VALUES ('2026-03-05', 'Troca de broca', '10:00', '10:05')")
+    conn.commit()
+    yield c
+    conn.close()
+
+
+@pytest.mark.parametrize("setores, tipos", COMBINACOES)
+@pytest.mark.parametrize("chave", [None, "CNC-01"])
+def test_consulta_de_cada_combinacao(cur, setores, tipos, chave):
+    query, params = busca.consulta(setores, tipos, "troca", date(2026, 3, 1), date(2026, 3, 31), chave, pagina=2)
+    esperadas = [busca.TABELAS[s][t]["tabela"] for s in setores for t in tipos
+                 if t in busca.TABELAS[s] and (not chave or busca.TABELAS[s][t]["chave"])]
+    for sql in (str(query), query.local):
+        assert re.findall(r"FROM (\w+)\n", sql) == esperadas
+        assert sql.count("UNION ALL") == max(len(esperadas) - 1, 0)
+        assert sql.count("= %(chave)s") == (len(esperadas) if chave else 0)
+    if esperadas:
+        assert "websearch_to_tsquery('ipar_pt', %(texto)s)" in str(query) and "ipar_busca" not in str(query)
+        assert "ipar_busca(%(texto)s" in query.local and "tsquery" not in query.local
+    assert params == {"texto": "troca", "ini": date(2026, 3, 1), "fim": date(2026, 3, 31), "chave": chave,
+                      "limite": busca.PAGINA, "deslocamento": 2 * busca.PAGINA}
+
+    # Roda no banco local, inclusive a escolha sem tabela pesquisável (ex.:
+    # manutenções da furadeira), que devolve as mesmas colunas e nada
+    cur.execute(query.local, dict(params, deslocamento=0))
+    assert esperadas or cur.fetchall() == []
+    assert [d.name for d in cur.description] == ["setor", "registro", "id", "data", "maquina_operador",
+                                                 "texto", "relevancia", "total"]
+
+
+def test_resultado_no_banco_local(cur):
+    query, params = busca.consulta(list(busca.SETORES), list(busca.TIPOS), "troca",
+                                   date(2026, 3, 1), date(2026, 3, 31))
+    cur.execute(query.local, params)
+    linhas = cur.fetchall()
+    assert sorted((r[0], r[1]) for r in linhas) == [("Estamparia", "Manutenção"), ("Furadeiras", "Parada"),
+                                                   ("Usinagem", "Parada")]
+    assert {r[-1] for r in linhas} == {3}
+
+
+@pytest.mark.parametrize("total, paginas", [(None, 1), (1, 1), (50, 1), (51, 2), (100, 2), (101, 3)])
+def test_paginas(total, paginas):
+    df = pd.DataFrame({"total": [] if total is None else [total] * min(total, busca.PAGINA)})
+    assert busca.paginas(df) == (total or 0, paginas)
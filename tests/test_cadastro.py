@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+import modules.cadastro as cadastro
+
+COLUNAS = ["nome", "setor"]
+
+
+def _original():
+    return pd.DataFrame({"id": [1, 2, 3], "nome": ["ANA", "BIA", "CAIO"], "setor": ["A", "B", np.nan]})
+
+
+def test_diff_novos_alterados_removidos():
+    editado = pd.DataFrame({"id": [1, 2, np.nan, np.nan],
+                            "nome": ["ANA", "bia  souza", " davi ", None],
+                            "setor": ["A", "B", "C", None]})
+    dif = cadastro.diff(_original(), editado, COLUNAS)
+    assert dif["erro"] is None
+    assert dif["novos"]["nome"].tolist() == ["DAVI"]
+    assert dif["alterados"]["id"].tolist() == [2]
+    assert dif["alterados"]["nome"].tolist() == ["BIA SOUZA"]
+    assert dif["removidos"] == [3]
+    assert cadastro.resumo(dif) == "1 novo(s), 1 alterado(s), 1 excluído(s)"
+
+
+def test_diff_sem_mudanca():
+    # Célula vazia que continuou vazia não é alteração
+    dif = cadastro.diff(_original(), _original(), COLUNAS)
+    assert cadastro.vazio(dif)
+
+
+def test_diff_nome_em_branco():
+    editado = _original().assign(nome=["ANA", "  ", "CAIO"])
+    dif = cadastro.diff(_original(), editado, COLUNAS)
+    assert "em branco" in dif["erro"]
+    assert cadastro.vazio(dif)
+
+
+def test_diff_nomes_repetidos_depois_de_normalizar():
+    editado = pd.concat([_original(), pd.DataFrame({"id": [np.nan], "nome": ["ana"], "setor": ["A"]})])
+    dif = cadastro.diff(_original(), editado, COLUNAS)
+    assert dif["erro"] == "Nomes repetidos: ANA"
+
+
+def test_cmd_aplicar_no_banco_local(conn):
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE pessoas (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT UNIQUE, setor TEXT, ativo INTEGER)")
+    cur.execute("INSERT INTO pessoas (nome, setor, ativo) VALUES ('ANA', 'A', 1), ('BIA', 'B', 1), ('CAIO', NULL, 1)")
+    editado = pd.DataFrame({"id": [1, 2, np.nan], "nome": ["ANA", "BIA", "DAVI"], "setor": ["A", "X", "C"]})
+    sql, linhas = cadastro.cmd_aplicar("pessoas", cadastro.diff(_original(), editado, COLUNAS), COLUNAS)
+    cur.execute_values(sql, linhas, linhas.molde)
+    conn.commit()
+    cur.execute("SELECT nome, setor, ativo FROM pessoas ORDER BY nome")
+    assert cur.fetchall() == [("ANA", "A", 1), ("BIA", "X", 1), ("CAIO", None, 0), ("DAVI", "C", 1)]
+
+
+def test_diff_apagada_e_digitada_de_novo_continua_a_mesma_linha():
+    editado = pd.DataFrame({"id": [1, 2, np.nan], "nome": ["ANA", "BIA", "caio"], "setor": ["A", "B", "Z"]})
+    dif = cadastro.diff(_original(), editado, COLUNAS)
+    assert dif["novos"].empty and dif["removidos"] == []
+    assert dif["alterados"][["id", "nome", "setor"]].values.tolist() == [[3, "CAIO", "Z"]]
+
+
+def test_cmd_aplicar_reativa_nome_excluido(conn):
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE pessoas (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT UNIQUE, setor TEXT, ativo INTEGER)")
+    cur.execute("INSERT INTO pessoas (nome, setor, ativo) VALUES ('ANA', 'A', 1), ('BIA', 'B', 0)")
+    original = pd.DataFrame({"id": [1], "nome": ["ANA"], "setor": ["A"]})
+    editado = pd.DataFrame({"id": [1, np.nan, np.nan], "nome": ["ANA", "bia", "CAIO"], "setor": ["A", "X", "C"]})
+    sql, linhas = cadastro.cmd_aplicar("pessoas", cadastro.diff(original, editado, COLUNAS), COLUNAS)
+    cur.execute_values(sql, linhas, linhas.molde)
+    conn.commit()
+    cur.execute("SELECT id, nome, setor, ativo FROM pessoas ORDER BY id")
+    assert cur.fetchall() == [(1, "ANA", "A", 1), (2, "BIA", "X", 1), (3, "CAIO", "C", 1)]
@@ -0,0 +1,72 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import modules.ciclos as ciclos
+
+
+def _stats(conn, peca):
+    cur = conn.cursor()
+    cur.execute(ciclos.sql_consulta("t"), ciclos.params_consulta(peca, "m1", "op"))
+    return cur.fetchone()
+
+
+@pytest.fixture
+def cur(conn):
+    c = conn.cursor()
+    c.execute(ciclos.ddl("t"))
+    return c
+
+
+def test_faixa_limites():
+    assert ciclos.faixa(0) == 1
+    assert ciclos.faixa(ciclos.CICLO_MINIMO) == 1
+    assert ciclos.faixa(10**9) == ciclos.NUM_FAIXAS
+    assert ciclos.faixa(10) < ciclos.faixa(11)
+
+
+def test_registrar_welford(conn, cur):
+    xs = [10, 12, 11, 30, 9.5]
+    for x in xs:
+        cur.execute(*ciclos.cmd_registrar("t", " p1 ", "m1", "op", x))
+    n, media, m2, hist = _stats(conn, "P1")
+    assert n == len(xs) and sum(hist) == len(xs)
+    assert media == pytest.approx(np.mean(xs))
+    assert m2 == pytest.approx(np.var(xs) * len(xs))
+
+
+def test_registrar_lote_chan_junta_com_o_existente(conn, cur):
+    antes, lote = [10, 12, 11], [30, 9.5, 14]
+    for x in antes:
+        cur.execute(*ciclos.cmd_registrar("t", "p1", "m1", "op", x))
+    df = pd.DataFrame({"peca": ["p1"] * 4 + ["p2"], "maquina": ["m1"] * 5, "operacao": ["op"] * 5,
+                       "ciclo": lote + [0, 7]})
+    cur.execute(*ciclos.cmd_registrar_lote("t", df))
+    todos = antes + lote
+    n, media, m2, hist = _stats(conn, "P1")
+    assert n == len(todos) and sum(hist) == len(todos)
+    assert media == pytest.approx(np.mean(todos))
+    assert m2 == pytest.approx(np.var(todos) * len(todos))
+    # Chave nova entra pelo INSERT
+    assert _stats(conn, "P2")[:3] == (1, 7, 0)
+
+
+def test_registrar_ignora_ciclo_invalido():
+    assert ciclos.cmd_registrar("t", "p1", "m1", "op", 0) is None
+    assert ciclos.cmd_registrar("t", " ", "m1", "op", 5) is None
+    assert ciclos.cmd_registrar_lote("t", pd.DataFrame({"peca": [None], "maquina": [""], "operacao": [""],
+                                                        "ciclo": [5]})) is None
+
+
+def test_resumo_e_outlier():
+    hist = [0] * ciclos.NUM_FAIXAS
+    for x in [10] * 8 + [11, 12]:
+        hist[ciclos.faixa(x) - 1] += 1
+    stats = ciclos.resumo((10, 10.3, 4.1, hist))
+    assert stats["desvio"] == pytest.approx(math.sqrt(4.1 / 9))
+    assert stats["mediana"] == pytest.approx(10, rel=ciclos.RAZAO_FAIXA - 1)
+    assert not ciclos.eh_outlier(10.5, stats)
+    assert ciclos.eh_outlier(60, stats)
+    assert ciclos.resumo(None) is None and ciclos.resumo((0, 0, 0, hist)) is None
@@ -0,0 +1,23 @@
+import modules.envio as envio
+
+REGISTRO = ("2026-03-02", "CNC-01", "07:00", "08:00", 50)
+
+
+def test_mesma_chave_no_mesmo_login_inclusive_depois_do_f5():
+    estado = {"token_sessao": "tok-a"}
+    assert envio.chave(estado, *REGISTRO) == envio.chave(estado, *REGISTRO)
+    # F5: sessão nova do Streamlit, token restaurado do cookie
+    recarregada = {"token_sessao": "tok-a"}
+    assert envio.chave(recarregada, *REGISTRO) == envio.chave(estado, *REGISTRO)
+    assert envio.chave(estado, *REGISTRO) != envio.chave(estado, *REGISTRO[:-1], 51)
+
+
+def test_chave_muda_entre_logins():
+    assert envio.chave({"token_sessao": "tok-a"}, *REGISTRO) != envio.chave({"token_sessao": "tok-b"}, *REGISTRO)
+
+
+def test_sem_login_vale_o_numero_da_sessao():
+    estado, outra = {}, {}
+    assert envio.chave(estado, *REGISTRO) == envio.chave(estado, *REGISTRO)
+    assert envio.chave(estado, *REGISTRO) != envio.chave(outra, *REGISTRO)
+    assert envio.chaves(estado, [REGISTRO, REGISTRO]) == [envio.chave(estado, *REGISTRO)] * 2
@@ -0,0 +1,81 @@
+import datetime
+import sqlite3
+
+import pandas as pd
+
+import modules.espelho as espelho
+
+# (nome, oid) como no cursor do psycopg2 e as linhas que o Postgres devolve
+COLUNAS = [("id", 23), ("data_registro", 1082), ("inicio", 1083), ("atualizado_em", 1114), ("maquina", 25)]
+LINHAS = [(1, datetime.date(2026, 10, 19), datetime.time(7, 30), datetime.datetime(2026, 10, 19, 7, 31), "T01"),
+          (2, datetime.date(2026, 10, 20), datetime.time(23, 59, 59), datetime.datetime(2026, 10, 20, 0, 1), None)]
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self._linhas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.conn.executados.append(params)
+        self.description = COLUNAS
+        self._linhas = [r for r in LINHAS if r[0] > params[0]]
+
+    def fetchmany(self, n):
+        linhas, self._linhas = self._linhas[:n], self._linhas[n:]
+        return linhas
+
+
+class _Conexao:
+    def __init__(self):
+        self.executados = []
+
+    def cursor(self):
+        return _Cursor(self)
+
+
+def _espelho(tmp_path):
+    esp = espelho.Espelho({}, ["usinagem_apontamentos"], arquivo=str(tmp_path / "espelho.db"))
+    pg = _Conexao()
+    esp._postgres = lambda: pg
+    return esp, pg
+
+
+def test_ler_devolve_tipos_do_postgres(tmp_path):
+    esp, _ = _espelho(tmp_path)
+    esp.sincronizar("usinagem_apontamentos")
+    df = esp.ler("SELECT *, inicio AS hora FROM usinagem_apontamentos WHERE data_registro = %s",
+                 (datetime.date(2026, 10, 19),))
+    assert len(df) == 1
+    assert df["data_registro"].iloc[0] == datetime.date(2026, 10, 19)
+    assert df["inicio"].iloc[0] == datetime.time(7, 30)
+    assert df["hora"].iloc[0] == datetime.time(7, 30)
+    assert pd.api.types.is_datetime64_any_dtype(df["atualizado_em"])
+
+
+def test_tabela_sem_tipos_e_recriada(tmp_path):
+    esp, pg = _espelho(tmp_path)
+    # Espelho antigo: colunas sem tipo e já sincronizado até o id 1
+    with sqlite3.connect(tmp_path / "espelho.db") as conn:
+        conn.execute('CREATE TABLE usinagem_apontamentos ("id" INTEGER PRIMARY KEY, "data_registro", "inicio", '
+                     '"atualizado_em", "maquina")')
+        conn.execute("INSERT INTO usinagem_apontamentos VALUES (1, '2026-10-19', '07:30:00', '2026-10-19 07:31:00', 'T01')")
+        conn.execute("INSERT INTO _sync VALUES ('usinagem_apontamentos', 1, '2026-10-19 07:31:00', 0)")
+    esp.sincronizar("usinagem_apontamentos")
+    assert [p[0] for p in pg.executados] == [1, 0]
+    df = esp.ler("SELECT * FROM usinagem_apontamentos ORDER BY id")
+    assert df["id"].tolist() == [1, 2]
+    assert df["data_registro"].tolist() == [datetime.date(2026, 10, 19), datetime.date(2026, 10, 20)]
+
+
+def test_do_setor_sem_espelho_no_banco_local(tmp_path):
+    secrets = {"postgres": {"DB_MOTOR": "sqlite", "DB_ARQUIVO": str(tmp_path / "teste.db")}}
+    assert espelho.do_setor(secrets, "diadema", ["usinagem_apontamentos"]) is None
+    assert espelho.ler(None, "SELECT 1", None, lambda: "banco") == "banco"
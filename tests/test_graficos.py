@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+import modules.graficos as graficos
+
+
+def test_lttb_mantem_extremos_e_pico():
+    y = np.sin(np.linspace(0, 20, 5000))
+    y[2345] = 50
+    idx = graficos.lttb(np.arange(5000), y, 100)
+    assert len(idx) == 100
+    assert idx[0] == 0 and idx[-1] == 4999
+    assert (np.diff(idx) > 0).all()
+    assert 2345 in idx
+
+
+def test_lttb_serie_curta_ou_poucos_pontos():
+    assert graficos.lttb(range(10), range(10), 50).tolist() == list(range(10))
+    assert graficos.lttb(range(10), range(10), 2).tolist() == list(range(10))
+
+
+def test_lttb_eixo_de_datas():
+    x = pd.date_range("2026-10-19", periods=1000, freq="min")
+    idx = graficos.lttb(x, np.random.default_rng(1).normal(size=1000), 50)
+    assert len(idx) == 50 and (np.diff(idx) > 0).all()
+
+
+def test_minmax_mantem_minimo_e_maximo():
+    y = np.random.default_rng(2).normal(size=3000)
+    idx = graficos.minmax(y, 100)
+    assert len(idx) <= 100
+    assert y.argmax() in idx and y.argmin() in idx
+
+
+def test_reduzir_serie_ordena_e_limita():
+    df = pd.DataFrame({"x": np.arange(2000)[::-1], "y": np.arange(2000) % 7})
+    r = graficos.reduzir_serie(df, "x", "y", pontos=200)
+    assert len(r) == 200
+    assert r["x"].is_monotonic_increasing
+
+
+def test_eficiencia_ponderada_pelo_tempo():
+    df = pd.DataFrame({"m": ["A", "A", "B"], "teo": [50, 10, 5], "real": [100, 10, 0]})
+    g = graficos.eficiencia(df, ["m"], "teo", "real").set_index("m")
+    assert g.loc["A", "Efic"] == 60 / 110 * 100
+    assert g.loc["B", "Efic"] == 0
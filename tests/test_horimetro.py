@@ -0,0 +1,115 @@
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
+
+import modules.horimetro as horimetro
+import modules.lote as lote
+
+
+def _preparar(conn, total=100.0):
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE t_maquinas (id SERIAL PRIMARY KEY, nome TEXT, horimetro_total REAL, ativo INTEGER)")
+    cur.execute("INSERT INTO t_maquinas (nome, horimetro_total, ativo) VALUES ('CNC', %s, 1)", (total,))
+    cur.execute(horimetro.ddl("t"))
+    conn.commit()
+    return cur
+
+
+def _rodar(conn, comandos):
+    cur = conn.cursor()
+    for sql, params in comandos:
+        cur.execute(sql, params)
+    conn.commit()
+
+
+def _horimetro(cur, ate=None):
+    if ate is None:
+        cur.execute(horimetro.sql_maquinas_com_horimetro("t"))
+    else:
+        cur.execute(horimetro.sql_maquinas_com_horimetro("t", ate=True), {"ate": ate})
+    return cur.fetchall()[0][-1]
+
+
+def _eventos(cur, tipo):
+    cur.execute("SELECT COUNT(*) FROM t_horimetro_eventos WHERE tipo = %s", (tipo,))
+    return cur.fetchone()[0]
+
+
+def test_carga_inicial_uso_e_zeragem(conn):
+    cur = _preparar(conn)
+    assert _horimetro(cur) == 100
+    # A migração não se repete
+    cur.execute(horimetro.ddl("t"))
+    assert _eventos(cur, "SNAPSHOT") == 1
+
+    _rodar(conn, [horimetro.cmd_uso("t", "CNC", 2.5), horimetro.cmd_uso("t", "CNC", 1.5)])
+    assert _horimetro(cur) == 104
+    _rodar(conn, [horimetro.cmd_zeragem("t", "CNC", "MANUTENCAO PREVENTIVA")])
+    assert _horimetro(cur) == 0
+    _rodar(conn, [horimetro.cmd_uso("t", "CNC", 3)])
+    assert _horimetro(cur) == 3
+
+
+def test_snapshot_a_cada_intervalo_sem_mudar_o_total(conn):
+    cur = _preparar(conn, total=10)
+    for _ in range(horimetro.INTERVALO_SNAPSHOT - 1):
+        _rodar(conn, [horimetro.cmd_uso("t", "CNC", 0.5)])
+    _rodar(conn, horimetro.cmds_snapshot("t", "CNC"))
+    assert _eventos(cur, "SNAPSHOT") == 1
+
+    _rodar(conn, [horimetro.cmd_uso("t", "CNC", 0.5)])
+    _rodar(conn, horimetro.cmds_snapshot("t", "CNC"))
+    assert _eventos(cur, "SNAPSHOT") == 2
+    cur.execute("SELECT horas FROM t_horimetro_eventos WHERE origem = 'CONSOLIDACAO'")
+    assert cur.fetchone()[0] == 10 + 0.5 * horimetro.INTERVALO_SNAPSHOT
+
+    # Depois do snapshot a leitura parte dele e dá o mesmo total
+    _rodar(conn, [horimetro.cmd_uso("t", "CNC", 1)])
+    assert _horimetro(cur) == 10 + 0.5 * horimetro.INTERVALO_SNAPSHOT + 1
+    _rodar(conn, horimetro.cmds_snapshot("t", "CNC"))
+    assert _eventos(cur, "SNAPSHOT") == 2
+
+
+def test_posicao_na_data_pela_producao(conn):
+    cur = _preparar(conn, total=0)
+    dia = lambda d, h=12: datetime(2026, 3, d, h)  # noqa: E731
+    _rodar(conn, [horimetro.cmd_uso("t", "CNC", 8, "APONTAMENTO", dia(2)),
+                  horimetro.cmd_zeragem("t", "CNC", "MANUTENCAO", horimetro.momento_do_dia(date(2026, 3, 5))),
+                  horimetro.cmd_uso("t", "CNC", 4, "APONTAMENTO", dia(6)),
+                  # Gravado por último, produzido antes da zeragem (grade do turno atrasada)
+                  horimetro.cmd_uso("t", "CNC", 2, "APONTAMENTO LOTE", dia(3))])
+    fim_do_dia = lambda d: datetime.combine(date(2026, 3, d), time.max)  # noqa: E731
+    # Antes da carga inicial (criada hoje) só entra o que foi produzido até a data
+    assert _horimetro(cur, fim_do_dia(1)) == 0
+    assert _horimetro(cur, fim_do_dia(2)) == 8
+    assert _horimetro(cur, fim_do_dia(3)) == 10
+    assert _horimetro(cur, fim_do_dia(5)) == 0
+    assert _horimetro(cur, fim_do_dia(6)) == 4
+    assert _horimetro(cur, datetime(2099, 1, 1)) == 4
+    # O valor atual segue a ordem de gravação: o USO atrasado entra depois da zeragem
+    assert _horimetro(cur) == 6
+
+
+def test_posicao_ignora_consolidacao(conn):
+    cur = _preparar(conn, total=0)
+    inicio = datetime(2026, 3, 1, 8)
+    for i in range(horimetro.INTERVALO_SNAPSHOT):
+        _rodar(conn, [horimetro.cmd_uso("t", "CNC", 1, "APONTAMENTO", inicio + timedelta(hours=i))])
+    _rodar(conn, horimetro.cmds_snapshot("t", "CNC"))
+    assert _eventos(cur, "SNAPSHOT") == 2
+    assert _horimetro(cur, inicio + timedelta(hours=9)) == 10
+    assert _horimetro(cur, datetime(2026, 12, 31)) == horimetro.INTERVALO_SNAPSHOT
+
+
+def test_usos_por_dia():
+    df = lote.preparar(pd.DataFrame({
+        "data": [date(2026, 3, 2), date(2026, 3, 2), date(2026, 3, 3), date(2026, 3, 2)],
+        "maquina": ["CNC", "CNC", "CNC", "TORNO"],
+        "inicio_prod": [time(7), time(22), time(8), time(9)],
+        "fim_prod": [time(9), time(1), time(9), time(10)],
+    }), None, col_data="data")
+    assert lote.usos_por_dia(df) == [
+        ("CNC", 5.0, datetime(2026, 3, 3, 1)),
+        ("CNC", 1.0, datetime(2026, 3, 3, 9)),
+        ("TORNO", 1.0, datetime(2026, 3, 2, 10)),
+    ]
@@ -0,0 +1,137 @@
+import json
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import modules.banco as banco
+import modules.esquema as esquema
+import modules.ingestao as ingestao
+from ferramentas import servico_ingestao
+
+CABECALHO = "data_registro,maquina,operador,descricao_pc,tempo_ciclo_seg,inicio_prod,fim_prod,qtd_produzida,refugo"
+
+
+def _csv(linhas, sep=","):
+    texto = "\n".join([CABECALHO] + linhas).replace(",", sep)
+    return texto.encode("utf-8")
+
+
+def test_ler_csv_virgula_ponto_e_virgula_e_bom():
+    linha = "2026-03-02,CNC-01,ANA,PC-1,60,07:00,08:00,50,1"
+    for corpo in [_csv([linha]), _csv([linha], sep=";"), "\ufeff".encode() + _csv([linha])]:
+        df = ingestao.ler(corpo, "csv", "usinagem", "apontamentos")
+        assert list(df.columns) == ingestao.SETORES["usinagem"]["apontamentos"]["colunas"]
+        assert df.loc[0, "maquina"] == "CNC-01" and df.loc[0, "fim_prod"] == "08:00"
+        assert df.loc[0, "chave_envio"] == "" and df.loc[0, "cliente"] == ""
+
+
+def test_ler_json_lista_ou_registros():
+    registros = [{"data_registro": "2026-03-02", "maquina": " CNC-01 ", "qtd_produzida": 5, "refugo": None}]
+    for corpo in [json.dumps(registros), json.dumps({"registros": registros})]:
+        df = ingestao.ler(corpo.encode(), "json", "usinagem", "apontamentos")
+        assert df.loc[0, ["maquina", "qtd_produzida", "refugo"]].tolist() == ["CNC-01", "5", ""]
+
+
+@pytest.mark.parametrize("corpo, formato, texto", [
+    (b"data_registro,maquina,turno\n2026-03-02,CNC-01,A", "csv", "Colunas desconhecidas: turno"),
+    (b'{"maquina": "CNC-01"}', "json", "lista de objetos"),
+    (b"[{", "json", "ilegível"),
+])
+def test_ler_recusa_o_lote(corpo, formato, texto):
+    with pytest.raises(ingestao.LoteInvalido, match=texto):
+        ingestao.ler(corpo, formato, "usinagem", "apontamentos")
+    with pytest.raises(ingestao.LoteInvalido, match="Destino"):
+        ingestao.ler(b"[]", "json", "pintura", "apontamentos")
+
+
+def test_validar_cadastro_em_minusculas_vira_a_grafia_gravada():
+    df = ingestao.ler(_csv(["2026-03-02,cnc-01,ana,PC-1,60,07:00,08:00,50,1",
+                            "2026-03-02,CNC-99,Ana,PC-1,60,08:00,09:00,50,1",
+                            "02/03/2026,CNC-01,ANA,PC-1,-5,09:00,10:00,0,0"]), "csv", "usinagem", "apontamentos")
+    cadastros = {"maquina": {"CNC-01": "CNC-01"}, "operador": {"ANA": "Ana"}, "motivo": {}}
+    v = ingestao.validar(df, "usinagem", "apontamentos", cadastros)
+    assert v.loc[0, ["maquina", "operador", "erro"]].tolist() == ["CNC-01", "Ana", ""]
+    assert v.loc[1, "erro"] == "Máquina 'CNC-99' fora do cadastro"
+    assert "Data inválida" in v.loc[2, "erro"] and "Ciclo negativo" in v.loc[2, "erro"]
+    assert "Quantidade zero" in v.loc[2, "erro"]
+    total, lista = ingestao.erros(v)
+    assert total == 2 and [e["linha"] for e in lista] == [2, 3]
+
+
+def test_repetidos_gravados_e_no_proprio_lote():
+    df = pd.DataFrame({"chave_envio": ["a", "b", "", "c", "c", ""]})
+    assert ingestao.repetidos(df, {"a"}).tolist() == [True, False, False, False, True, False]
+
+
+# ------------------------------------------------------------------------------
+# Serviço inteiro (servico_ingestao.gravar) no banco local
+# ------------------------------------------------------------------------------
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = banco.Conexoes({"DB_MOTOR": "sqlite", "DB_ARQUIVO": str(tmp_path / "ingestao.db")}, 1)
+
+    def criar(conn, cur):
+        for q in esquema.scripts("usinagem"):
+            cur.execute(q)
+        cur.execute("INSERT INTO usinagem_maquinas (nome) VALUES ('CNC-01'), ('CNC-02')")
+        cur.execute("INSERT INTO usinagem_operadores (nome) VALUES ('Ana'), ('BIA')")
+        conn.commit()
+    pool.executar(criar)
+    return pool
+
+
+def _contar(pool, sql):
+    return pool.executar(lambda conn, cur: (cur.execute(sql), cur.fetchone()[0])[1])
+
+
+def _lote(linhas, chaves=None):
+    df = ingestao.ler(_csv(linhas), "csv", "usinagem", "apontamentos")
+    if chaves:
+        df["chave_envio"] = chaves
+    return df
+
+
+BOAS = ["2026-03-02,cnc-01,ana,pc-1,60,07:00,08:00,50,1",
+        "2026-03-02,CNC-02,bia,PC-2,30,22:00,01:00,300,0"]
+RUIM = "2026-03-02,CNC-01,ANA,PC-1,60,07:30,08:30,50,0"  # cruza com a primeira
+
+
+def test_gravar_lote_e_reenvio_com_chave(pool):
+    gravados, ruins, repetidos = servico_ingestao.gravar(pool, "usinagem", "apontamentos",
+                                                         _lote(BOAS, ["k1", "k2"]))
+    assert (gravados, len(ruins), repetidos) == (2, 0, 0)
+    assert pool.executar(lambda conn, cur: (cur.execute(
+        "SELECT maquina, operador, descricao_pc FROM usinagem_apontamentos ORDER BY id"), cur.fetchall())[1]) == \
+        [("CNC-01", "Ana", "PC-1"), ("CNC-02", "BIA", "PC-2")]
+    assert _contar(pool, "SELECT SUM(horas) FROM usinagem_horimetro_eventos WHERE tipo = 'USO'") == 4
+
+    # Reenvio do mesmo lote (timeout, 503): nada duplica, nem o horímetro
+    gravados, ruins, repetidos = servico_ingestao.gravar(pool, "usinagem", "apontamentos",
+                                                         _lote(BOAS, ["k1", "k2"]))
+    assert (gravados, len(ruins), repetidos) == (0, 0, 2)
+    assert _contar(pool, "SELECT COUNT(*) FROM usinagem_apontamentos") == 2
+    assert _contar(pool, "SELECT SUM(horas) FROM usinagem_horimetro_eventos WHERE tipo = 'USO'") == 4
+
+
+def test_gravar_tudo_ou_nada_e_parcial(pool):
+    lote = _lote(BOAS + [RUIM])
+    gravados, ruins, _ = servico_ingestao.gravar(pool, "usinagem", "apontamentos", lote)
+    assert gravados == 0 and ruins.index.tolist() == [0, 2]
+    assert _contar(pool, "SELECT COUNT(*) FROM usinagem_apontamentos") == 0
+
+    # Parcial (coletor de pulsos): grava as boas, devolve as ruins
+    lote = _lote(BOAS[1:] + [RUIM, "2026-03-02,CNC-01,ANA,PC-1,60,10:00,11:00,50,0"])
+    gravados, ruins, _ = servico_ingestao.gravar(pool, "usinagem", "apontamentos", lote, parcial=True)
+    assert gravados == 3 and ruins.empty
+    lote = _lote(["2026-03-02,CNC-01,ANA,PC-1,60,10:30,10:45,50,0", "2026-03-02,CNC-01,ANA,PC-1,60,12:00,13:00,5,0"])
+    gravados, ruins, _ = servico_ingestao.gravar(pool, "usinagem", "apontamentos", lote, parcial=True)
+    assert gravados == 1 and ruins.index.tolist() == [0]
+    assert "cruza" in ruins.loc[0, "erro"]
+    assert _contar(pool, "SELECT COUNT(*) FROM usinagem_apontamentos") == 4
+
+
+def test_intervalo_pega_a_vespera():
+    df = pd.DataFrame({"data_registro": ["2026-03-02", "2026-03-05", "x"]})
+    assert ingestao.intervalo(df, "usinagem") == (date(2026, 3, 1), date(2026, 3, 5))
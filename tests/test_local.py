@@ -0,0 +1,121 @@
+from datetime import date, time
+
+import psycopg2
+import psycopg2.extensions
+import pytest
+
+import modules.banco as banco
+import modules.local as local
+
+
+def test_comandos_separa_fora_de_aspas_dolar_e_comentarios():
+    sql = """
+        INSERT INTO t VALUES ('a;b', 'it''s');  -- comentário; com ponto e vírgula
+        DO $$ BEGIN PERFORM 1; END $$;
+        CREATE TRIGGER tr AFTER INSERT ON t BEGIN UPDATE u SET n = n + 1; DELETE FROM v; END;
+        SELECT 1
+    """
+    partes = local.comandos(sql)
+    assert len(partes) == 4
+    assert partes[0] == "INSERT INTO t VALUES ('a;b', 'it''s')"
+    assert partes[1] == "DO $$ BEGIN PERFORM 1; END $$"
+    assert partes[2].startswith("CREATE TRIGGER") and partes[2].endswith("END")
+    assert partes[3] == "SELECT 1"
+
+
+def test_consulta_dialeto():
+    assert local._consulta("SELECT x::date, %(d)s::date, y::double precision, z::int[]") == \
+        "SELECT date(x), date(%(d)s), y, z"
+    assert local._consulta("WHERE nome ILIKE %s AND dia >= DATE '2026-01-01'") == \
+        "WHERE nome LIKE %s AND dia >= '2026-01-01'"
+    assert local._consulta("WHERE nome %% %(q)s") == f"WHERE similarity(nome, %(q)s) >= {local.LIMIAR_TRGM}"
+
+
+def test_parametros():
+    assert local._parametros("a = %s AND b LIKE 'x%%'", (1,)) == ("a = ? AND b LIKE 'x%'", (1,))
+    sql, p = local._parametros("a = %(a)s", {"a": date(2026, 10, 19)})
+    assert sql == "a = :a" and p == {"a": "2026-10-19"}
+    assert local._qtd_parametros("%s, %(x)s, %%, %s") == 2
+
+
+def test_ddl():
+    cmd = local._ddl("CREATE TABLE t (id SERIAL PRIMARY KEY, h INTEGER[], em TIMESTAMP DEFAULT now())")
+    assert cmd == "CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT, h ARRAY, em TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    assert local._PULAR.match("CREATE INDEX ix ON t USING gin (x)")
+    assert not local._PULAR.match("CREATE INDEX ix ON t (x)")
+
+
+def test_onde_antes_do_conflito():
+    cmd = "INSERT INTO t (a) SELECT a FROM x ON CONFLICT (a) DO NOTHING"
+    assert local._onde_antes_do_conflito(cmd) == "INSERT INTO t (a) SELECT a FROM x WHERE true ON CONFLICT (a) DO NOTHING"
+    com_where = "INSERT INTO t (a) SELECT a FROM x WHERE a > 0 ON CONFLICT (a) DO NOTHING"
+    assert local._onde_antes_do_conflito(com_where) == com_where
+
+
+def test_expandir_unnest():
+    cmd, params = local._expandir_unnest("SELECT * FROM unnest(%s, %s) AS u(a, b) WHERE c = %s",
+                                         [[1, 2], ["x", "y"], 9])
+    assert cmd == "SELECT * FROM (SELECT column1 AS a, column2 AS b FROM (VALUES (%s, %s), (%s, %s))) AS u WHERE c = %s"
+    assert params == [1, "x", 2, "y", 9]
+
+
+def test_execucao_traduzida(conn):
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE IF NOT EXISTS t (id SERIAL PRIMARY KEY, dia DATE, h TIME, n INTEGER UNIQUE)")
+    cur.execute_values("INSERT INTO t (dia, h, n) VALUES %s",
+                       [(date(2026, 10, 19), time(7, 30), i) for i in range(3)], "(%s::date, %s::time, %s)")
+    cur.execute("INSERT INTO t (n) SELECT n FROM unnest(%s::int[]) AS u(n) ON CONFLICT (n) DO NOTHING", ([2, 3],))
+    cur.execute("SELECT COUNT(*), MIN(dia::date) FROM t WHERE dia::date = %(d)s", {"d": date(2026, 10, 19)})
+    assert cur.fetchone() == (3, "2026-10-19")
+    cur.execute("SELECT COUNT(*) FROM t")
+    assert cur.fetchone() == (4,)
+
+
+def test_erros_com_tipos_do_psycopg2(conn):
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE t (n INTEGER UNIQUE)")
+    cur.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(psycopg2.IntegrityError):
+        cur.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(psycopg2.ProgrammingError):
+        cur.execute("SELECT * FROM nao_existe")
+
+
+def test_transacao_inclui_escrita_com_with(conn):
+    # O BEGIN implícito do sqlite3 não pega um WITH ... INSERT: o rollback tem que desfazer
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE t (n INTEGER)")
+    conn.commit()
+    cur.execute("WITH x (n) AS (VALUES (1)) INSERT INTO t SELECT n FROM x")
+    assert conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    conn.rollback()
+    assert conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    cur.execute("SELECT COUNT(*) FROM t")
+    assert cur.fetchone() == (0,)
+
+
+def test_transacao_do_diff_do_cadastro(conn, tmp_path):
+    # Comando em várias partes (banco.Sql): tudo ou nada
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE t (n INTEGER UNIQUE)")
+    conn.commit()
+    sql = banco.Sql("-", "WITH x (n) AS (VALUES (1)) INSERT INTO t SELECT n FROM x; INSERT INTO t VALUES (1)")
+    with pytest.raises(psycopg2.IntegrityError):
+        cur.execute(sql)
+    conn.rollback()
+    outra = local.conectar({"DB_ARQUIVO": str(tmp_path / "teste.db")})
+    c2 = outra.cursor()
+    c2.execute("SELECT COUNT(*) FROM t")
+    assert c2.fetchone() == (0,)
+    outra.close()
+
+
+def test_autocommit(conn):
+    conn.set_session(autocommit=True)
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE t (n INTEGER)")
+    cur.execute("INSERT INTO t VALUES (1)")
+    assert conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    conn.rollback()
+    cur.execute("SELECT COUNT(*) FROM t")
+    assert cur.fetchone() == (1,)
@@ -0,0 +1,96 @@
+from datetime import date
+
+import pandas as pd
+
+import modules.lote as lote
+
+OBRIGATORIAS = {"maquina": "Máquina", "operador": "Operador"}
+
+
+def _grade(linhas):
+    return pd.DataFrame(linhas, columns=["maquina", "operador", "inicio_prod", "fim_prod", "qtd_produzida", "refugo"])
+
+
+def _validar(linhas, existentes=None):
+    return lote.validar(lote.preparar(_grade(linhas), date(2026, 10, 19)), OBRIGATORIAS, existentes=existentes)
+
+
+def test_preparar_vira_o_dia_e_ignora_linhas_vazias():
+    df = lote.preparar(_grade([["T01", "ANA", "22:00", "02:00", 10, 0], [None] * 6]), date(2026, 10, 19))
+    assert len(df) == 1
+    assert df["dt_fim"].iloc[0] == pd.Timestamp("2026-10-20 02:00")
+    assert df["horas"].iloc[0] == 4
+
+
+def test_preparar_aceita_hora_sem_segundos_e_time():
+    df = lote.preparar(_grade([["T01", "ANA", "07:30", "08:15:30", 1, 0]]), date(2026, 10, 19))
+    assert df["dt_ini"].iloc[0] == pd.Timestamp("2026-10-19 07:30")
+    assert df["dt_fim"].iloc[0] == pd.Timestamp("2026-10-19 08:15:30")
+
+
+def test_hora_limites():
+    s = pd.Series(["00:00", "23:59", "23:59:59", "7:05", " 07:30:00.5 ", "24:00", "25:00", "12:60", "", None])
+    h = lote._hora(s)
+    assert h[:5].tolist() == [pd.Timedelta(0), pd.Timedelta("23:59:00"), pd.Timedelta("23:59:59"),
+                              pd.Timedelta("07:05:00"), pd.Timedelta("07:30:00.5")]
+    assert h[5:].isna().all()
+
+
+def test_validar_linha_ok():
+    df = _validar([["T01", "ANA", "07:00", "08:00", 10, 1]])
+    assert df["erro"].tolist() == [""]
+
+
+def test_validar_campos_e_quantidades():
+    df = _validar([
+        ["T01", "", "07:00", "08:00", 10, 0],
+        ["T02", "ANA", "07:00", "07:00", 10, 0],
+        ["T03", "ANA", "08:00", "07:00", 10, 0],
+        ["T04", "ANA", "07:00", "08:00", 0, 0],
+        ["T05", "ANA", "xx", "08:00", 1, 0],
+        ["T06", "ANA", "25:00", "26:00", 1, 0],
+        ["T07", "ANA", "07:60", "08:00", 1, 0],
+    ])
+    erros = df["erro"].tolist()
+    assert "Operador vazio" in erros[0]
+    assert "Início igual ao fim" in erros[1]
+    assert "Mais de" in erros[2]
+    assert erros[3] == "Quantidade zero"
+    assert "Início/fim inválido" in erros[4]
+    assert "Início/fim inválido" in erros[5]
+    assert "Início/fim inválido" in erros[6]
+
+
+def test_sobreposicoes_na_grade():
+    df = _validar([
+        ["T01", "ANA", "07:00", "08:00", 1, 0],
+        ["T01", "BIA", "07:30", "09:00", 1, 0],
+        ["T01", "ANA", "09:00", "10:00", 1, 0],   # encosta, não cruza
+        ["T02", "ANA", "07:30", "09:00", 1, 0],   # outra máquina
+    ])
+    cruza = df["erro"].str.contains("cruza")
+    assert cruza.tolist() == [True, True, False, False]
+
+
+def test_sobreposicao_contida_em_intervalo_anterior():
+    # A terceira começa depois da segunda, mas dentro da primeira (maior fim anterior)
+    df = _validar([
+        ["T01", "ANA", "07:00", "12:00", 1, 0],
+        ["T01", "ANA", "08:00", "09:00", 1, 0],
+        ["T01", "ANA", "10:00", "11:00", 1, 0],
+    ])
+    assert df["erro"].str.contains("cruza").all()
+
+
+def test_sobreposicao_contra_existentes():
+    gravados = pd.DataFrame({"maquina": ["T01"], "data_registro": ["2026-10-19"],
+                             "inicio_prod": ["06:00:00"], "fim_prod": ["07:15:00"]})
+    existentes = lote.preparar(gravados, None, col_data="data_registro")
+    df = _validar([["T01", "ANA", "07:00", "08:00", 1, 0], ["T01", "ANA", "08:00", "09:00", 1, 0]], existentes)
+    assert df["erro"].str.contains("cruza").tolist() == [True, False]
+
+
+def test_linhas_tipos_python():
+    df = pd.DataFrame({"a": [1, None], "b": ["x", None]})
+    assert lote.linhas(df, ["a", "b"]) == [(1.0, "x"), (None, None)]
+    assert type(lote.linhas(df, ["a"])[0][0]) is float
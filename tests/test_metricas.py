@@ -0,0 +1,98 @@
+import re
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import modules.agregacao as agregacao
+import modules.local as local
+import modules.metricas as metricas
+
+APONTAMENTOS = [
+    ("06:00", "08:00", 100, 2, 60.0),
+    ("22:00", "02:00", 200, 0, 50.0),   # virou o dia
+    ("08:00", "08:00", 0, 0, 60.0),     # duração zero
+    ("07:30:15", "09:15", 80, 5, 70.0),
+    ("7h", "09:00", 10, 0, 60.0),       # horário inválido: NULL
+    ("10:00", "11:00", 40, None, 70.0),  # refugo NULL
+]
+PARADAS = [("09:00", "09:30"), ("23:50", "00:10"), ("12:00", "12:00"), ("19:00", None)]
+
+
+@pytest.fixture
+def cur(conn):
+    c = conn.cursor()
+    c.execute("""CREATE TABLE t_apontamentos (id SERIAL PRIMARY KEY, data_registro DATE, inicio_prod TEXT,
+                 fim_prod TEXT, qtd_produzida INTEGER, refugo INTEGER, tempo_ciclo_seg REAL,
+                 eficiencia_calc REAL, ativo INTEGER DEFAULT 1)""")
+    c.execute("CREATE TABLE t_paradas_reg (id SERIAL PRIMARY KEY, data_registro DATE, inicio TEXT, fim TEXT, "
+              "ativo INTEGER DEFAULT 1)")
+    # Metade das linhas antes das colunas existirem (carga), metade depois (trigger)
+    c.execute_values("INSERT INTO t_apontamentos (data_registro, inicio_prod, fim_prod, qtd_produzida, refugo, "
+                     "tempo_ciclo_seg) VALUES %s", [(date(2026, 3, 2),) + a for a in APONTAMENTOS[:3]])
+    c.execute_values("INSERT INTO t_paradas_reg (data_registro, inicio, fim) VALUES %s",
+                     [(date(2026, 3, 2),) + p for p in PARADAS[:2]])
+    c.execute(metricas.ddl("t", eficiencia=True))
+    c.execute_values("INSERT INTO t_apontamentos (data_registro, inicio_prod, fim_prod, qtd_produzida, refugo, "
+                     "tempo_ciclo_seg) VALUES %s", [(date(2026, 3, 2),) + a for a in APONTAMENTOS[3:]])
+    c.execute_values("INSERT INTO t_paradas_reg (data_registro, inicio, fim) VALUES %s",
+                     [(date(2026, 3, 2),) + p for p in PARADAS[2:]])
+    return c
+
+
+def _tabela(cur, sql):
+    cur.execute(sql)
+    return pd.DataFrame(cur.fetchall(), columns=[d.name for d in cur.description])
+
+
+def test_mesmas_contas_do_painel(cur):
+    df = _tabela(cur, "SELECT * FROM t_apontamentos ORDER BY id")
+    # Contas do painel a partir dos horários (sem as colunas gravadas)
+    painel = agregacao.preparar_producao(df.drop(columns=["min_real", "min_teorico"]), "data_registro")
+    pd.testing.assert_series_equal(df["min_real"], painel["tempo_real_min"], check_names=False)
+    pd.testing.assert_series_equal(df["min_teorico"], painel["tempo_teorico_min"], check_names=False)
+    assert df["min_real"].tolist()[:4] == [120, 240, 0, pytest.approx(104.75)]
+    assert df["min_real"].isna().tolist() == [False, False, False, False, True, False]
+
+    # Eficiência da furadeira: teórico / real, 0 sem tempo real
+    efic = (painel["tempo_teorico_min"] / painel["tempo_real_min"] * 100).where(painel["tempo_real_min"] > 0)
+    pd.testing.assert_series_equal(df["eficiencia_calc"], efic.fillna(0), check_names=False)
+
+    par = _tabela(cur, "SELECT * FROM t_paradas_reg ORDER BY id")
+    painel_p = agregacao.preparar_paradas(par.drop(columns=["min_parada"]), "data_registro")
+    pd.testing.assert_series_equal(par["min_parada"], painel_p["tempo_parado_min"], check_names=False)
+    assert par["min_parada"].tolist()[:3] == [30, 20, 0]
+
+
+def test_trigger_recalcula_na_edicao(cur):
+    cur.execute("UPDATE t_apontamentos SET fim_prod = '09:00', refugo = 10 WHERE id = 1")
+    cur.execute("SELECT min_real, min_teorico, eficiencia_calc FROM t_apontamentos WHERE id = 1")
+    assert cur.fetchone() == (180, 110, pytest.approx(110 / 180 * 100))
+    cur.execute("UPDATE t_paradas_reg SET fim = '10:00' WHERE id = 1")
+    cur.execute("SELECT min_parada FROM t_paradas_reg WHERE id = 1")
+    assert cur.fetchone() == (60,)
+
+
+def test_ddl_idempotente(cur):
+    cur.execute(metricas.ddl("t", eficiencia=True))
+    cur.execute("SELECT COUNT(*), SUM(min_real) FROM t_apontamentos")
+    assert cur.fetchone() == (6, 120 + 240 + 0 + 104.75 + 60)
+
+
+@pytest.mark.parametrize("hora", ["07:30", "7:30", "23:59:59", "07:30:00.5", "24:00", "7h", "07:60", "", "0730"])
+def test_horario_aceito_igual_no_postgres_e_no_local(hora):
+    assert bool(re.match(metricas._HORA, hora)) == bool(local._HORA.match(hora))
+
+
+def test_carga_em_lotes():
+    sql = metricas.sql_carga()
+    assert f"c.proximo_id + {metricas.LOTE_CARGA}" in sql and "id >= $1 AND id < $2" in sql and "%" not in sql
+    assert sql.local == "SELECT 0"
+    assert "ipar_carga_metricas" in metricas.ddl("t") and "UPDATE t_apontamentos SET min_real = NULL" not in metricas.ddl("t")
+
+    pendentes = [[(2,)], [(1,)], [(0,)], [(5,)]]
+    chamadas = []
+    metricas.preencher(lambda q: chamadas.append(q) or pendentes.pop(0))
+    assert len(chamadas) == 3
+    # Erro no lote (run_query devolve None): para sem travar o init_db
+    metricas.preencher(lambda q: None)
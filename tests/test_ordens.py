@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+import modules.esquema as esquema
+import modules.ordens as ordens
+
+INSERT = ("INSERT INTO usinagem_apontamentos (data_registro, cliente, maquina, inicio_prod, fim_prod, "
+          "qtd_produzida, refugo) VALUES (%s, %s, 'CNC-01', %s, %s, %s, %s)")
+
+
+@pytest.fixture
+def cur(conn):
+    c = conn.cursor()
+    for q in esquema.scripts("usinagem"):
+        c.execute(q)
+    c.execute(INSERT, ("2026-03-02", "op 100", "07:00", "08:00", 50, 2))
+    c.execute(INSERT, ("2026-03-04", " OP  100 ", "08:00", "10:00", 30, 1))
+    c.execute(INSERT, ("2026-03-03", "OP-200", "10:00", "10:30", 10, 0))
+    c.execute(INSERT, ("2026-03-03", "", "11:00", "12:00", 5, 0))   # sem ordem
+    conn.commit()
+    return c
+
+
+def _ordem(cur, ordem):
+    cur.execute(ordens.SQL_ORDEM, ordens.params_ordem(ordem))
+    linhas = cur.fetchall()
+    if not linhas:
+        return None
+    setor, apontamentos, boas, refugo, min_real, ultimo_dia, _ = linhas[0]
+    return apontamentos, boas, refugo, min_real, str(ultimo_dia)
+
+
+def test_insercao_soma_na_ordem_normalizada(cur):
+    assert _ordem(cur, "op 100") == (2, 80, 3, 180, "2026-03-04")
+    assert _ordem(cur, "OP-200") == (1, 10, 0, 30, "2026-03-03")
+    cur.execute(f"SELECT COUNT(*) FROM {ordens.TABELA}")
+    assert cur.fetchone()[0] == 2
+
+
+def test_edicao_sem_mudar_ordem_nem_dia_nao_reconta(cur):
+    # Marca o último dia: se a edição recontasse, voltaria a 2026-03-04
+    cur.execute(f"UPDATE {ordens.TABELA} SET ultimo_dia = '2026-03-09' WHERE ordem = 'OP 100'")
+    cur.execute("UPDATE usinagem_apontamentos SET qtd_produzida = 40, fim_prod = '09:00' WHERE id = 2")
+    assert _ordem(cur, "OP 100") == (2, 90, 3, 120, "2026-03-09")
+
+
+def test_edicao_da_data_reconta_o_ultimo_dia(cur):
+    cur.execute("UPDATE usinagem_apontamentos SET data_registro = '2026-03-01' WHERE id = 2")
+    assert _ordem(cur, "OP 100") == (2, 80, 3, 180, "2026-03-02")
+
+
+def test_exclusao_logica_e_volta(cur):
+    cur.execute("UPDATE usinagem_apontamentos SET ativo = 0 WHERE id = 2")
+    assert _ordem(cur, "OP 100") == (1, 50, 2, 60, "2026-03-02")
+    cur.execute("UPDATE usinagem_apontamentos SET ativo = 0 WHERE id = 3")
+    assert _ordem(cur, "OP-200") is None   # linha fica com zero apontamentos e some da tela
+    cur.execute("UPDATE usinagem_apontamentos SET ativo = 1 WHERE id = 2")
+    assert _ordem(cur, "OP 100") == (2, 80, 3, 180, "2026-03-04")
+    cur.execute("DELETE FROM usinagem_apontamentos WHERE id = 1")
+    assert _ordem(cur, "OP 100") == (1, 30, 1, 120, "2026-03-04")
+
+
+def test_mudar_de_ordem(cur):
+    cur.execute("UPDATE usinagem_apontamentos SET cliente = 'op-200' WHERE id = 2")
+    assert _ordem(cur, "OP 100") == (1, 50, 2, 60, "2026-03-02")
+    assert _ordem(cur, "OP-200") == (2, 40, 1, 150, "2026-03-04")
+    # Registro sem ordem que ganha uma
+    cur.execute("UPDATE usinagem_apontamentos SET cliente = 'OP 300' WHERE id = 4")
+    assert _ordem(cur, "op 300") == (1, 5, 0, 60, "2026-03-03")
+
+
+def test_carga_inicial_do_historico(conn, cur):
+    cur.execute(f"DELETE FROM {ordens.TABELA}")
+    for q in esquema.scripts("usinagem"):
+        cur.execute(q)
+    assert _ordem(cur, "OP 100") == (2, 80, 3, 180, "2026-03-04")
+    # Só na primeira vez: rodar de novo não soma outra vez
+    cur.execute(ordens.ddl("usinagem").local)
+    assert _ordem(cur, "OP-200") == (1, 10, 0, 30, "2026-03-03")
+
+
+def test_postgres_so_reconta_quando_sai_da_ordem_ou_do_dia():
+    sql = str(ordens.ddl("estamparia"))
+    corpo = sql.split("ELSIF TG_OP = 'UPDATE' THEN")[1].split("END IF;")[0]
+    assert "CASE WHEN NEW.ativo IS DISTINCT FROM 1 OR NEW.data IS DISTINCT FROM OLD.data" in corpo
+    assert corpo.index("THEN (SELECT (MAX(data))::date") < corpo.index("ELSE ultimo_dia END")
+    exclusao = sql.split("IF TG_OP = 'DELETE' THEN")[1].split("ELSIF")[0]
+    assert "CASE" not in exclusao and "MAX(data)" in exclusao
+
+
+def test_indicadores():
+    df = ordens.indicadores(pd.DataFrame({"boas": [90, 0], "refugo": [10, 0], "min_real": [120, None]}))
+    assert df["refugo_pct"].tolist() == [10, 0] and df["horas"].tolist() == [2, 0]
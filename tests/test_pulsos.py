@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import modules.pulsos as pulsos
+
+INICIO = datetime(2026, 10, 19, 7, 0)
+
+
+def _fluxo(maquina, inicio, fim, passo=30, **extra):
+    t, saida = inicio, []
+    while t <= fim:
+        saida.append({"maquina": maquina, "t": t, "qtd": 1, "refugo": 0, **extra})
+        t += timedelta(seconds=passo)
+    return saida
+
+
+def _rodar(setor, fluxo):
+    ag = pulsos.Agregador(setor)
+    for p in fluxo:
+        ag.adicionar(p)
+    return ag, ag.fechar(fluxo[-1]["t"], tudo=True)
+
+
+def test_ler_pulso_json_e_texto():
+    p = pulsos.ler_pulso('{"maquina": " prensa 01 ", "t": "2026-10-19T07:00:03", "refugo": 1}')
+    assert p["maquina"] == "PRENSA 01" and p["qtd"] == 1 and p["refugo"] == 1
+    assert p["t"] == datetime(2026, 10, 19, 7, 0, 3)
+    p = pulsos.ler_pulso("PRENSA 01;2026-10-19T07:00:03;5")
+    assert (p["qtd"], p["refugo"]) == (5, 0)
+    assert pulsos.ler_pulso("  ") is None
+    for ruim in ["PRENSA 01;ontem", '{"t": "2026-10-19T07:00:00"}', "PRENSA 01;2026-10-19T07:00:00;-1"]:
+        with pytest.raises(pulsos.PulsoInvalido):
+            pulsos.ler_pulso(ruim)
+
+
+def test_agregador_janelas_e_pecas():
+    fluxo = _fluxo("T01", INICIO + timedelta(seconds=30), INICIO + timedelta(minutes=40), peca="p1")
+    _, (aps, pars) = _rodar("usinagem", fluxo)
+    assert sum(a["qtd"] for a in aps) == len(fluxo)
+    assert [a["inicio"].strftime("%H:%M") for a in aps] == ["07:00", "07:15", "07:30"]
+    assert all(a["ciclo"] == 30 and a["peca"] == "P1" for a in aps)
+    assert not pars
+    # Apontamentos da máquina não se cruzam
+    assert all(a["fim"] <= b["inicio"] for a, b in zip(aps, aps[1:]))
+
+
+def test_agregador_parada_usinagem_fica_dentro_do_apontamento():
+    fluxo = (_fluxo("T01", INICIO, INICIO + timedelta(minutes=5))
+             + _fluxo("T01", INICIO + timedelta(minutes=12), INICIO + timedelta(minutes=14)))
+    _, (aps, pars) = _rodar("usinagem", fluxo)
+    assert len(aps) == 1 and aps[0]["inicio"] <= INICIO and aps[0]["fim"] == INICIO + timedelta(minutes=14)
+    assert len(pars) == 1
+    par = pars[0]
+    assert par["inicio"] == INICIO + timedelta(minutes=5)
+    assert par["fim"] == INICIO + timedelta(minutes=12) - timedelta(seconds=30)
+    assert par["motivo"] == pulsos.MOTIVO_PARADA
+
+
+def test_agregador_parada_estamparia_corta_o_apontamento_em_minutos():
+    fluxo = (_fluxo("P01", INICIO, INICIO + timedelta(minutes=5))
+             + _fluxo("P01", INICIO + timedelta(minutes=12), INICIO + timedelta(minutes=14)))
+    _, (aps, pars) = _rodar("estamparia", fluxo)
+    assert len(aps) == 2 and len(pars) == 1
+    assert aps[0]["fim"] <= pars[0]["inicio"] and pars[0]["fim"] <= aps[1]["inicio"]
+    for r in aps + pars:
+        assert r["inicio"].second == 0 and r["fim"].second == 0
+
+
+def test_agregador_maquina_desligada_nao_vira_parada():
+    fluxo = (_fluxo("T01", INICIO, INICIO + timedelta(minutes=5))
+             + _fluxo("T01", INICIO + timedelta(hours=5), INICIO + timedelta(hours=5, minutes=2)))
+    _, (aps, pars) = _rodar("usinagem", fluxo)
+    assert not pars and len(aps) == 2
+
+
+def test_agregador_troca_de_peca_fecha_apontamento():
+    fluxo = (_fluxo("T01", INICIO, INICIO + timedelta(minutes=3), peca="A")
+             + _fluxo("T01", INICIO + timedelta(minutes=3, seconds=30), INICIO + timedelta(minutes=6), peca="B"))
+    _, (aps, _) = _rodar("usinagem", fluxo)
+    assert [a["peca"] for a in aps] == ["A", "B"]
+
+
+def test_agregador_pulso_atrasado():
+    ag = pulsos.Agregador("usinagem")
+    for p in _fluxo("T01", INICIO, INICIO + timedelta(minutes=20)):
+        ag.adicionar(p)
+    ag.fechar(INICIO + timedelta(minutes=20))       # fecha a janela das 07:00
+    ag.adicionar({"maquina": "T01", "t": INICIO + timedelta(minutes=16), "qtd": 2, "refugo": 0})
+    ag.adicionar({"maquina": "T01", "t": INICIO + timedelta(minutes=1), "qtd": 1, "refugo": 0})
+    assert ag.atrasados == 1
+    aps, _ = ag.fechar(INICIO + timedelta(minutes=20), tudo=True)
+    assert sum(a["qtd"] for a in aps) == 11 + 2    # 07:15 a 07:20 + o atrasado da janela aberta
+
+
+def test_para_ingestao_chave_estavel():
+    fluxo = _fluxo("T01", INICIO, INICIO + timedelta(minutes=2))
+    _, (aps, pars) = _rodar("usinagem", fluxo)
+    ap, _ = pulsos.para_ingestao("usinagem", aps, pars, ["data_registro", "maquina", "qtd_produzida",
+                                                          "cod_programa", "chave_envio"], [], "data_registro")
+    assert ap == [{"data_registro": "2026-10-19", "maquina": "T01", "qtd_produzida": str(len(fluxo)),
+                   "cod_programa": "", "chave_envio": f"pulso:T01:{aps[0]['inicio']:%Y-%m-%d %H:%M:%S}"}]
@@ -0,0 +1,31 @@
+from datetime import date
+
+import pytest
+
+import modules.relatorios as relatorios
+
+
+@pytest.fixture
+def fila(tmp_path, monkeypatch):
+    monkeypatch.setattr(relatorios, "ARQUIVO_DB", str(tmp_path / "relatorios.db"))
+    monkeypatch.setattr(relatorios, "PASTA_ARQUIVOS", str(tmp_path / "relatorios"))
+    monkeypatch.setattr(relatorios, "_estrutura_ok", False)
+
+
+def test_pedir_periodo_repete_pedido_em_andamento(fila):
+    a = relatorios.pedir("usinagem", date(2026, 10, 1), date(2026, 10, 19))
+    assert relatorios.pedir("usinagem", date(2026, 10, 1), date(2026, 10, 19)) == a
+    p = relatorios.listar("usinagem")[0]
+    assert p["tipo"] == relatorios.SOB_DEMANDA
+    assert relatorios.periodo(p) == "2026-10-01 a 2026-10-19"
+    assert relatorios.nome_download(p) == "relatorio_usinagem_2026-10-01_a_2026-10-19.xlsx"
+
+
+def test_pedir_historico_completo(fila):
+    a = relatorios.pedir("usinagem", date(2026, 10, 19), date(2026, 10, 19))
+    b = relatorios.pedir("usinagem", None, date(2026, 10, 19))
+    assert a != b
+    p = relatorios.listar("usinagem")[0]
+    assert p["id"] == b and p["tipo"] == relatorios.HISTORICO and p["inicio"] == ""
+    assert relatorios.periodo(p) == "todo o histórico (pedido em 2026-10-19)"
+    assert relatorios.nome_download(p) == "relatorio_usinagem_completo_2026-10-19.xlsx"
@@ -0,0 +1,96 @@
+import psycopg2
+import pytest
+
+import modules.esquema as esquema
+import modules.sobreposicao as sobreposicao
+
+INSERT = ("INSERT INTO usinagem_apontamentos (data_registro, maquina, inicio_prod, fim_prod, qtd_produzida) "
+          "VALUES (%s, %s, %s, %s, 10)")
+
+
+def _criar(conn, setor, modo):
+    cur = conn.cursor()
+    for q in esquema.scripts(setor, modo):
+        cur.execute(q)
+    conn.commit()
+    return cur
+
+
+def _apontar(cur, dia, ini, fim, maquina="CNC-01"):
+    cur.execute(INSERT, (dia, maquina, ini, fim))
+
+
+def test_bloquear_recusa_cruzado_e_aceita_encostado(conn):
+    cur = _criar(conn, "usinagem", "bloquear")
+    _apontar(cur, "2026-03-02", "07:00", "08:00")
+    with pytest.raises(psycopg2.errors.ExclusionViolation, match=sobreposicao.AVISO):
+        _apontar(cur, "2026-03-02", "07:30", "08:30")
+    # Fim de um = início do outro: não cruza; outra máquina também não
+    _apontar(cur, "2026-03-02", "08:00", "09:00")
+    _apontar(cur, "2026-03-02", "06:00", "07:00")
+    _apontar(cur, "2026-03-02", "07:30", "08:30", maquina="CNC-02")
+    # Edição que passa a cruzar também é recusada; excluído não conta
+    with pytest.raises(psycopg2.errors.ExclusionViolation):
+        cur.execute("UPDATE usinagem_apontamentos SET fim_prod = '08:30' WHERE id = 1")
+    cur.execute("UPDATE usinagem_apontamentos SET ativo = 0 WHERE id = 1")
+    _apontar(cur, "2026-03-02", "07:15", "07:45")
+    cur.execute("SELECT COUNT(*) FROM usinagem_apontamentos WHERE ativo = 1")
+    assert cur.fetchone()[0] == 4
+
+
+def test_virada_da_meia_noite(conn):
+    cur = _criar(conn, "usinagem", "bloquear")
+    _apontar(cur, "2026-03-02", "22:00", "02:00")
+    with pytest.raises(psycopg2.errors.ExclusionViolation):
+        _apontar(cur, "2026-03-03", "01:00", "03:00")
+    _apontar(cur, "2026-03-03", "02:00", "03:00")
+    cur.execute("SELECT periodo_ini, periodo_fim FROM usinagem_apontamentos WHERE id = 1")
+    assert [v[:16] for v in cur.fetchone()] == ["2026-03-02 22:00", "2026-03-03 02:00"]
+
+
+def test_aviso_grava_e_deixa_o_aviso(conn):
+    cur = _criar(conn, "usinagem", "aviso")
+    _apontar(cur, "2026-03-02", "07:00", "08:00")
+    assert sobreposicao.avisos(conn) == []
+    _apontar(cur, "2026-03-02", "07:30", "08:30")
+    assert sobreposicao.avisos(conn) == [f"{sobreposicao.AVISO} com outro registro da mesma máquina (CNC-01)"]
+    assert sobreposicao.avisos(conn) == []
+    conn.commit()
+
+    cur.execute(sobreposicao.relatorio("usinagem").local)
+    linhas = cur.fetchall()
+    assert [(r[0], r[1], r[2], r[5], r[6], float(r[9])) for r in linhas] == \
+        [("CNC-01", "apontamento", 1, "apontamento", 2, 30.0)]
+
+
+def test_estamparia_cruza_apontamento_com_parada(conn):
+    cur = _criar(conn, "estamparia", "bloquear")
+    cur.execute("INSERT INTO estamparia_apontamentos (data, maquina, inicio_prod, fim_prod) "
+                "VALUES ('2026-03-02', 'P1', '07:00', '08:00')")
+    with pytest.raises(psycopg2.errors.ExclusionViolation):
+        cur.execute("INSERT INTO estamparia_paradas_reg (data, maquina, inicio, fim) "
+                    "VALUES ('2026-03-02', 'P1', '07:50', '08:10')")
+    cur.execute("INSERT INTO estamparia_paradas_reg (data, maquina, inicio, fim) "
+                "VALUES ('2026-03-02', 'P1', '08:00', '08:10')")
+
+
+def test_restricao_de_exclusao_so_no_bloqueio_e_com_historico_limpo():
+    bloquear = str(sobreposicao.ddl("usinagem", "bloquear"))
+    for t in ("usinagem_apontamentos", "usinagem_paradas_reg"):
+        trecho = bloquear.split(f"conname = 'ex_{t}_periodo'")[1].split("END $$;")[0]
+        # Só cria se não houver par cruzado gravado; senão avisa e fica no trigger
+        assert trecho.index("há horários cruzados") < trecho.index("ADD CONSTRAINT")
+        assert "EXCLUDE USING gist (maquina WITH =, periodo WITH &&) WHERE (ativo = 1)" in trecho
+    aviso = str(sobreposicao.ddl("usinagem", "aviso"))
+    assert "EXCLUDE" not in aviso
+    assert "DROP CONSTRAINT IF EXISTS ex_usinagem_apontamentos_periodo" in aviso
+
+    # Furadeira: chave é o operador e as paradas ficam de fora
+    furadeira = str(sobreposicao.ddl("furadeira", "bloquear"))
+    assert "(operador WITH =" in furadeira and "furadeira_paradas_reg" not in furadeira
+
+
+def test_modo_pelo_secrets():
+    assert sobreposicao.modo({"estamparia": "BLOQUEAR"}, "estamparia") == "bloquear"
+    assert sobreposicao.modo({"estamparia": "travar"}, "estamparia") == "aviso"
+    assert sobreposicao.modo({}, "usinagem") == "aviso"
@@ -0,0 +1,40 @@
+import pytest
+
+import modules.sugestoes as sugestoes
+
+
+def _parecidos(cur, termo):
+    cur.execute(sugestoes.sql_parecidos("t"), sugestoes.params_parecidos("cliente", termo))
+    return [r[0] for r in cur.fetchall()]
+
+
+@pytest.fixture
+def cur(conn):
+    c = conn.cursor()
+    c.execute("CREATE TABLE t_apontamentos (id INTEGER PRIMARY KEY, cliente TEXT, ativo INTEGER)")
+    c.execute(sugestoes.ddl("t", "t_apontamentos", {"cliente": "cliente"}))
+    return c
+
+
+def test_normalizar():
+    assert sugestoes.normalizar("  acme   ltda ") == "ACME LTDA"
+    assert sugestoes.normalizar(None) == ""
+
+
+def test_parecidos_so_para_valor_novo(cur):
+    for valor in ["ACME LTDA", "ACME", "BETA"]:
+        cur.execute(*sugestoes.cmd_registrar("t", "cliente", valor))
+    assert _parecidos(cur, "acme ltda.") == ["ACME LTDA", "ACME"]
+    # Já existe no dicionário (mesmo fora dos mais usados): não é novo
+    assert _parecidos(cur, "acme") == []
+
+
+def test_valor_raro_fora_da_lista_cai_no_voce_quis_dizer(cur):
+    for valor, usos in [("ACME", 3), ("BETA", 2), ("ZETA INDUSTRIAL", 1)]:
+        for _ in range(usos):
+            cur.execute(*sugestoes.cmd_registrar("t", "cliente", valor))
+    cur.execute(sugestoes.sql_mais_usados("t"), ("cliente", 2))
+    assert [r[0] for r in cur.fetchall()] == ["ACME", "BETA"]
+    # Fora das opções do selectbox: o prefixo digitado acha a grafia gravada
+    assert _parecidos(cur, "zeta") == ["ZETA INDUSTRIAL"]
+    assert _parecidos(cur, "zeta industrial") == []
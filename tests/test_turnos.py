@@ -0,0 +1,53 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import modules.turnos as turnos
+
+
+def _intervalos(linhas):
+    df = pd.DataFrame(linhas, columns=["data", "ini", "fim", "maquina", "qtd"])
+    return turnos.intervalos(df, "data", "ini", "fim")
+
+
+def test_fatiar_nas_horas_cheias():
+    f = turnos.fatiar(_intervalos([["2026-10-19", "07:40", "10:10", "T01", 150]]),
+                      colunas_valor=["qtd"], colunas_chave=["maquina"])
+    assert f["minutos"].tolist() == [20, 60, 60, 10]
+    assert f["hora"].tolist() == [7, 8, 9, 10]
+    assert (f["turno"] == "1º Turno").all()
+    assert (f["maquina"] == "T01").all()
+    # Valor rateado pelo tempo
+    assert f["qtd"].tolist() == pytest.approx([20, 60, 60, 10])
+
+
+def test_fatiar_corta_no_limite_do_turno():
+    f = turnos.fatiar(_intervalos([["2026-10-19", "13:30", "14:30", "T01", 60]]), colunas_valor=["qtd"])
+    por_turno = f.groupby("turno")["minutos"].sum()
+    assert por_turno.to_dict() == {"1º Turno": 30, "2º Turno": 30}
+
+
+def test_fatiar_terceiro_turno_conta_no_dia_em_que_comecou():
+    f = turnos.fatiar(_intervalos([["2026-10-19", "23:00", "01:00", "T01", 10]]))
+    assert f["minutos"].sum() == 120
+    assert set(f["turno"]) == {"3º Turno"}
+    assert set(f["data_turno"]) == {date(2026, 10, 19)}
+
+
+def test_fatiar_fora_de_turno_e_grao_de_meia_hora():
+    config = [("A", "07:30", "12:00")]
+    f = turnos.fatiar(_intervalos([["2026-10-19", "07:00", "08:00", "T01", 0]]), turnos=config)
+    assert f["minutos"].tolist() == [30, 30]
+    assert f["turno"].tolist() == [turnos.FORA_DE_TURNO, "A"]
+
+
+def test_fatiar_vazio_e_intervalo_nulo():
+    assert turnos.fatiar(_intervalos([])).empty
+    assert turnos.fatiar(_intervalos([["2026-10-19", "07:00", "07:00", "T01", 5]])).empty
+
+
+def test_turnos_do_setor():
+    config = {"estamparia": [["1º Turno", "05:30", "15:18"]]}
+    assert turnos.turnos_do_setor(config, "estamparia") == [("1º Turno", "05:30", "15:18")]
+    assert turnos.turnos_do_setor(config, "usinagem") == turnos.TURNOS_PADRAO